@@ -157,6 +157,32 @@ def coverage(session: Session) -> None:
     session.run("coverage", *args)
 
 
+@session(python="3.11")
+def benchmarks(session: Session) -> None:
+    """Run the benchmark suite and compare against the stored baselines.
+
+    Not run by default (``nox -s benchmarks``), as timings are only
+    comparable on the machine and interpreter the baseline was recorded
+    with. Baselines are stored per interpreter, the latest one in
+    ``tests/benchmarks/baselines/Linux-CPython-3.11-64bit`` is compared
+    against by this session. The comparison is informational only and
+    never fails the session. Record a baseline on your machine first, see
+    the contributing guide. The benchmarked zettelkasten's size is
+    controlled by the ``ZK_BENCH_*`` environment variables (see
+    ``tests/benchmarks/conftest.py``).
+    """
+    args = session.posargs or ["--benchmark-compare"]
+    session.install(".")
+    session.install("pytest", "pytest-benchmark", "typer")
+    session.run(
+        "pytest",
+        "tests/benchmarks",
+        "--benchmark-only",
+        "--benchmark-storage=tests/benchmarks/baselines",
+        *args,
+    )
+
+
 @session(python=python_versions)
 def typeguard(session: Session) -> None:
     """Runtime type checking using Typeguard."""
@@ -7,14 +7,20 @@ functionalities.
 import logging
 import os
 import pathlib
-import shutil
 
 from . import defaults
+from . import filetypes
+from . import index as zindex
 from . import parse
+from . import profiling
+from . import sources as zsources
+from . import storage
+from . import tracing
 
 logger = logging.getLogger(__name__)
 
 
+@profiling.timed("add.create_zettel_location")
 def create_zettel_location(parsed_zettel_name, dummy_location=None):
     """Utility for making sure the requested zettel location exists.
 
@@ -70,8 +76,6 @@ def create_zettel_location(parsed_zettel_name, dummy_location=None):
         tests/testkasten/woodturning/tools/chisel
 
     """
-    logger.debug(79 * "-")
-    logger.debug("Preparing to create zettel location")
     folder = parsed_zettel_name.category
     subfolder = parsed_zettel_name.subcategory
     zettel_folder = parsed_zettel_name.uid
@@ -82,24 +86,27 @@ def create_zettel_location(parsed_zettel_name, dummy_location=None):
         zk_location = defaults.location
     # create zettel directory
     if folder is None and subfolder is None:
-        logger.debug("Only zettel uid was stated.")
-        logger.debug("Creating a lobby location for it")
-
-        zettel_path = os.path.join(zk_location, "lobby", zettel_folder)
+        shard = parse.lobby_shard(zettel_folder)
+        if shard is None:
+            zettel_path = os.path.join(zk_location, "lobby", zettel_folder)
+        else:
+            zettel_path = os.path.join(
+                zk_location, "lobby", shard, zettel_folder
+            )
 
     else:
-        logger.debug("Complete zettel name was stated")
-
         zettel_path = os.path.join(
             zk_location, folder, subfolder, zettel_folder
         )
 
     # create zettel path
-    pathlib.Path(zettel_path).mkdir(parents=True, exist_ok=True)
+    storage.backend.makedirs(zettel_path)
+    tracing.event("add.create_zettel_location", path=zettel_path)
 
     return pathlib.Path(zettel_path)
 
 
+@profiling.timed("add.write_org_zettel_attributes")
 def write_org_zettel_attributes(org_file_path, zettel_attributes):
     r"""Utility wrapping the attribute writing in a singular call.
 
@@ -142,14 +149,22 @@ def write_org_zettel_attributes(org_file_path, zettel_attributes):
         test1 test_attribute
         test2 test_attribute
     """
-    with open(org_file_path, "w") as f:
-        for attribute, value in zettel_attributes.items():
-            f.write(" ".join((attribute, str(value), "\n")))
+    storage.backend.write(
+        org_file_path,
+        "".join(
+            " ".join((attribute, str(value), "\n"))
+            for attribute, value in zettel_attributes.items()
+        ),
+    )
 
-    logger.debug(f"Wrote zettel_attributes: {zettel_attributes}")
-    logger.debug(f"Into Zettel at: {org_file_path}")
+    tracing.event(
+        "add.write_org_zettel_attributes",
+        path=org_file_path,
+        attributes=zettel_attributes,
+    )
 
 
+@profiling.timed("add.write_org_zettel_bibliography")
 def write_org_zettel_bibliography(
     org_file_path, bibliography_file, force_overwrite=False
 ):
@@ -197,21 +212,22 @@ def write_org_zettel_bibliography(
         bibliography:bibliography.bib
 
     """
-    logger.debug("Writing bibliography section into zettel.")
-    logger.debug("Assumed bibliography file name is")
-    logger.debug(f"{bibliography_file}")
-
-    if force_overwrite:
-        mode = "w"
-    else:
-        mode = "a"
+    tracing.event(
+        "add.write_org_zettel_bibliography",
+        path=org_file_path,
+        bibliography_file=bibliography_file,
+    )
 
-    with open(org_file_path, mode) as f:
-        f.writelines(
+    storage.backend.write(
+        org_file_path,
+        "".join(
             ["\n", "* Bibliography\n\n", f"bibliography:{bibliography_file}"]
-        )
+        ),
+        append=not force_overwrite,
+    )
 
 
+@profiling.timed("add.create_bibliography_file")
 def create_bibliography_file(bibliography_file_path, force_overwrite=False):
     """Wrap bibliography file creation.
 
@@ -255,27 +271,29 @@ def create_bibliography_file(bibliography_file_path, force_overwrite=False):
         >>> os.path.isfile(dummy_loc)
         True
     """
-    logger.debug(f"Writing bibliography file in {bibliography_file_path}.")
+    tracing.event("add.create_bibliography_file", path=bibliography_file_path)
 
     # check for overwrite
-    if os.path.isfile(bibliography_file_path):
+    if storage.backend.is_file(bibliography_file_path):
         already_exists_msg = (
             f"Bibliography file in '{bibliography_file_path}' already exists"
         )
 
         if force_overwrite:
-            logger.debug(already_exists_msg)
-            logger.debug("Forced overwrite requested")
+            tracing.event(
+                "add.create_bibliography_file.overwrite",
+                path=bibliography_file_path,
+            )
         else:  # dont force overwrite unless explicitly requested
             logger.error(already_exists_msg)
             logger.error("To purposely overwrite bibliography file use:")
             logger.error("zk add [-f/--force] zettel")
             raise FileExistsError
 
-    with open(bibliography_file_path, "w"):
-        pass
+    storage.backend.write(bibliography_file_path, "")
 
 
+@profiling.timed("add.create_bibliography_file_test_entries")
 def create_bibliography_file_test_entries(
     zettel_name, force_overwrite=False, dummy_location=None
 ):
@@ -346,6 +364,8 @@ def create_bibliography_file_test_entries(
         )
 
 
+@profiling.timed("add.new_zettel")
+@tracing.traced("add.new_zettel")
 def new_zettel(name, force_overwrite=False, dummy_location=None, **kwargs):
     r"""Add a new Zettel to the Zettelkasten.
 
@@ -449,9 +469,6 @@ def new_zettel(name, force_overwrite=False, dummy_location=None, **kwargs):
         <BLANKLINE>
         bibliography:gouge.bib
     """
-    logger.debug("-------------------------------")
-    logger.debug(f"Preparing to add Zettel '{name}'")
-
     # dissassemble the name/location syntax:
     zettel_name = parse.zettel_name(name)
 
@@ -468,11 +485,10 @@ def new_zettel(name, force_overwrite=False, dummy_location=None, **kwargs):
     )
 
     # check for overwrite
-    if os.path.isfile(org_file_path):
+    if storage.backend.is_file(org_file_path):
         already_exists_msg = f"Zettel in '{zettel_path}' already exists"
         if force_overwrite:
-            logger.debug(already_exists_msg)
-            logger.debug("Forced overwrite requested")
+            tracing.event("add.new_zettel.overwrite", path=org_file_path)
         else:  # dont force overwrite unless explicitly requested
             logger.error(already_exists_msg)
             logger.error("To purposely overwrite a Zettel use:")
@@ -500,6 +516,8 @@ def new_zettel(name, force_overwrite=False, dummy_location=None, **kwargs):
     logger.info(f"Succesfully created org-Zettel in '{org_file_path}'")
 
 
+@profiling.timed("add.write_source_entry")
+@tracing.traced("add.write_source_entry")
 def write_source_entry(
     bibliography_file_path,
     source_file,
@@ -572,11 +590,9 @@ def write_source_entry(
         Prevents unwanted data loss.
     """
     # open the zettel's bib file to write:
-    logger.debug("Preparing to write the source entry")
-
     overwrite = False
-    with open(bibliography_file_path) as f:
-        content = f.read()
+    with profiling.phase("add.write_source_entry.read"):
+        content = storage.backend.read(bibliography_file_path)
         if uid in content:
             already_exists_msg = (
                 f"Entry of key {uid} already present in "
@@ -587,9 +603,6 @@ def write_source_entry(
 
                 overwrite = True
 
-                logger.debug(already_exists_msg)
-                logger.debug("Overwrite requested.")
-
                 part_1 = f"@misc{{{uid},\n"
                 part_2 = content.split(part_1)[-1].split("\n}%\n")[0] + "\n}%\n"
 
@@ -617,30 +630,39 @@ def write_source_entry(
                 raise FileExistsError
 
     if overwrite:
-        with open(bibliography_file_path, "w") as f:
-            logger.debug("Overwriting:\n")
-            logger.debug(f"{content_to_overwrite}\n")
-            logger.debug(f"in {bibliography_file_path}\n")
-            logger.debug(f"with:\n {replacement}\n")
-            f.write(content)
+        with profiling.phase("add.write_source_entry.write"):
+            tracing.event(
+                "add.write_source_entry.overwrite",
+                path=bibliography_file_path,
+                overwritten=content_to_overwrite,
+                replacement=replacement,
+            )
+            storage.backend.write(bibliography_file_path, content)
 
     else:
-        with open(bibliography_file_path, "a") as f:
-            logger.debug("No overwrite necessary, creating the entry")
-            # print(f'writing into {bibliography_file_path}')
-            f.writelines(
-                defaults.bibliography_entry(
-                    source_file=source_file,
-                    key=uid,
-                    location_specifier=locspec,
-                    author=author,
-                    title=title,
-                    year=year,
-                    date=date,
-                )
+        with profiling.phase("add.write_source_entry.write"):
+            tracing.event(
+                "add.write_source_entry.append", path=bibliography_file_path
+            )
+            storage.backend.write(
+                bibliography_file_path,
+                "".join(
+                    defaults.bibliography_entry(
+                        source_file=source_file,
+                        key=uid,
+                        location_specifier=locspec,
+                        author=author,
+                        title=title,
+                        year=year,
+                        date=date,
+                    )
+                ),
+                append=True,
             )
 
 
+@profiling.timed("add.new_source")
+@tracing.traced("add.new_source")
 def new_source(
     zettel_name,
     source_file,
@@ -765,8 +787,6 @@ def new_source(
         True
     """
     # generating the bib file string
-    logger.debug("Preparing to add a new source entry")
-
     # dissassemble the name/location syntax:
     parsed_zettel_name = parse.zettel_name(zettel_name)
 
@@ -780,7 +800,7 @@ def new_source(
     )
 
     # is zettel existing
-    if not org_file_path.is_file():
+    if not storage.backend.is_file(org_file_path):
         logger.error(f"Requested zettel was not found in {org_file_path}")
         raise FileNotFoundError
 
@@ -794,7 +814,6 @@ def new_source(
     else:
         location = defaults.location
 
-    logger.debug("Copying the new source entry into to main bib file")
     # also write an entry into the zettelkasten's bib file:
     zk_bib_file = os.path.join(
         location,
@@ -803,55 +822,50 @@ def new_source(
     )
 
     # copying the source file
-    # find out directory by inspecting fileendings
-    ftype = defaults.infer_file_type(source_file)
+    # find out directory by inspecting file endings or the file's content
+    ftype = filetypes.infer_file_type(source_file)
 
     if ftype is None:
         msg = f"Could not infer file type of {source_file}"
         raise TypeError(msg)
 
-    destination = os.path.join(
-        location,
-        # defaults.location,
-        defaults.sources_directory,
-        ftype,
-        source_file.split("/")[-1],
-    )
+    destination = zsources.source_destination(source_file, ftype, location)
+    storage.backend.makedirs(os.path.dirname(destination))
 
-    logger.debug(f"Copying the source file into {destination}")
+    # and ingest the file using the handler of its type
+    with profiling.phase("add.new_source.copy"):
+        storage.backend.copy(source_file, destination, ftype)
+    tracing.event("add.new_source.copy", source=source_file, path=destination)
 
-    # and copy the file including permissions and meta data
-    shutil.copy2(
-        source_file,
-        destination,
-    )
-
-    logger.debug("Writing the entry into the main bib file:")
     # also write the entry into the zk bib file
-    write_source_entry(
-        zk_bib_file,
-        source_file=destination,
-        uid=uid,
-        force_overwrite=force_overwrite,
-        locspec=locspec,
-        author=author,
-        title=title,
-        year=year,
-        date=date,
-    )
+    with profiling.phase("add.new_source.main_bib"):
+        write_source_entry(
+            zk_bib_file,
+            source_file=destination,
+            uid=uid,
+            force_overwrite=force_overwrite,
+            locspec=locspec,
+            author=author,
+            title=title,
+            year=year,
+            date=date,
+        )
 
     # write the actual source entry
-    logger.debug("Writing the actual entry:")
-    write_source_entry(
-        bibliography_file_path=bib_file_path,
-        source_file=destination,
-        uid=uid,
-        force_overwrite=force_overwrite,
-        locspec=locspec,
-        author=author,
-        title=title,
-        year=year,
-        date=date,
-    )
+    with profiling.phase("add.new_source.zettel_bib"):
+        write_source_entry(
+            bibliography_file_path=bib_file_path,
+            source_file=destination,
+            uid=uid,
+            force_overwrite=force_overwrite,
+            locspec=locspec,
+            author=author,
+            title=title,
+            year=year,
+            date=date,
+        )
 
-    logger.debug("Successfully added a new source entry")
+    # keep the persisted citation index of local zettelkastens up to date
+    if storage.backend.local:
+        with profiling.phase("add.new_source.index"):
+            zindex.refresh_persisted([zettel_path, zk_bib_file], location)
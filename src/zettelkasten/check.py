@@ -0,0 +1,308 @@
+# zettelkasten/check.py
+"""Module checking the integrity of the zettelkasten.
+
+Every zettel folder of :func:`zettelkasten.compile.zettel_mapping` is
+expected to hold a ``<uid>.org`` and a ``<uid>.bib`` file. Each entry of a
+zettel's bibliography is expected to point at an existing file inside the
+:attr:`sources directory <zettelkasten.defaults.sources_directory>` and to be
+present (unchanged) inside the :attr:`zettelkasten's bibliography file
+<zettelkasten.defaults.zettelkasten_bib_file>`.
+
+The zettel folders are checked in chunks by a process pool. Findings are
+yielded as soon as their chunk is checked, so large zettelkastens report
+their first findings early.
+"""
+import concurrent.futures
+import os
+import typing
+
+from . import add
+from . import compile as comp
+from . import defaults
+from . import parse
+from . import storage
+from . import tracing
+
+chunk_size = 256
+"""Number of zettels checked by a single worker job."""
+
+fixable_checks = ("missing_org", "missing_bib", "missing_main_entry")
+"""Checks whose findings :func:`check` is able to fix."""
+
+
+class Finding(typing.NamedTuple):
+    """Integrity violation consisting of ``zettel``, ``check`` and ``message``.
+
+    Parameters
+    ----------
+    zettel: str
+        Name of the zettel violating the check.
+
+    check: str
+        Name of the violated check. One of ``missing_org``, ``missing_bib``,
+        ``missing_source``, ``foreign_source``, ``missing_main_entry`` or
+        ``entry_mismatch``.
+
+    message: str
+        Human readable description of the violation.
+
+    fixed: bool, default=False
+        ``True`` if the violation was fixed by :func:`check`.
+
+    Examples
+    --------
+    >>> Finding("lobby/my_zettel", "missing_bib", "my_zettel.bib not found")
+    Finding(zettel='lobby/my_zettel', check='missing_bib', \
+message='my_zettel.bib not found', fixed=False)
+    """
+
+    zettel: str
+    check: str
+    message: str
+    fixed: bool = False
+
+
+def _zettel_folders(mapping, sep):
+    """Yield ``(name, folder parts, uid)`` of each zettel inside mapping."""
+    for category, subcategories in mapping.items():
+        if category == "lobby":
+            for uid in subcategories:
+                name = f"lobby{sep}{uid}"
+                yield name, tuple(parse.zettel_folder_parts(name)), uid
+            continue
+        for subcategory, uids in subcategories.items():
+            for uid in uids:
+                yield (
+                    f"{category}{sep}{subcategory}{sep}{uid}",
+                    (category, subcategory, uid),
+                    uid,
+                )
+
+
+def _source_findings(name, url, sources, exists):
+    """Check a single bibliography url, caching file lookups in exists."""
+    if not url or not url.startswith("file://"):
+        return
+    path = os.path.abspath(url[len("file://") :])
+    if path not in exists:
+        exists[path] = os.path.isfile(path)
+    if not exists[path]:
+        yield Finding(name, "missing_source", f"source '{path}' not found")
+    elif os.path.commonpath([path, sources]) != sources:
+        yield Finding(
+            name, "foreign_source", f"source '{path}' outside of '{sources}'"
+        )
+
+
+def _check_chunk(job):
+    """Process pool worker checking a chunk of zettel folders.
+
+    Returns the findings and the ``(zettel, entry)`` tuples of the
+    bibliography entries found.
+    """
+    location, sources, zettels = job
+
+    findings = list()
+    entries = list()
+    exists = dict()
+    for name, parts, uid in zettels:
+        folder = os.path.join(location, *parts)
+        if not os.path.isfile(os.path.join(folder, f"{uid}.org")):
+            findings.append(
+                Finding(name, "missing_org", f"'{uid}.org' not found")
+            )
+
+        bib_file = os.path.join(folder, f"{uid}.bib")
+        if not os.path.isfile(bib_file):
+            findings.append(
+                Finding(name, "missing_bib", f"'{uid}.bib' not found")
+            )
+            continue
+
+        with open(bib_file) as f:
+            content = f.read()
+        for entry in parse.bibliography_entries(content):
+            entries.append((name, entry))
+            findings.extend(
+                _source_findings(name, entry.fields.get("url"), sources, exists)
+            )
+
+    return findings, entries
+
+
+def format_entry(entry):
+    """Format a bibliography entry as written by
+    :func:`zettelkasten.defaults.bibliography_entry`.
+
+    Parameters
+    ----------
+    entry: zettelkasten.parse.BibEntry
+        Parsed bibliography entry.
+
+    Returns
+    -------
+    text: str
+        Text of the entry including its trailing newline.
+
+    Examples
+    --------
+    >>> entry = parse.BibEntry(
+    ...     "misc", "pdf_2021_p2", {"title": "Test PDF", "url": "file:///a"})
+    >>> print(format_entry(entry), end="")
+    @misc{pdf_2021_p2,
+      title    = {Test PDF},
+      url      = "file:///a",
+    }%
+    """
+    lines = [f"@{entry.kind}{{{entry.key},\n"]
+    for field, value in entry.fields.items():
+        if field == "url":
+            lines.append(f'  {field:<8} = "{value}",\n')
+        else:
+            lines.append(f"  {field:<8} = {{{value}}},\n")
+    lines.append("}%\n")
+
+    return "".join(lines)
+
+
+def _fix(finding, parts, main_bib_file, entry=None):
+    """Fix a finding of one of the :attr:`fixable_checks`."""
+    folder = os.path.join(defaults.location, *parts)
+    uid = parts[-1]
+    if finding.check == "missing_org":
+        if parts[0] != "lobby":
+            zettel_name = parse.ZettelName(*parts)
+        else:
+            zettel_name = parse.zettel_name(uid)
+        org_file = os.path.join(folder, f"{uid}.org")
+        add.write_org_zettel_attributes(
+            org_file, parse.zettel_attributes(zettel_name)
+        )
+        add.write_org_zettel_bibliography(org_file, f"{uid}.bib")
+    elif finding.check == "missing_bib":
+        add.create_bibliography_file(os.path.join(folder, f"{uid}.bib"))
+    elif finding.check == "missing_main_entry":
+        with open(main_bib_file, "a") as f:
+            f.write(format_entry(entry))
+    else:
+        return finding
+
+    tracing.event("check.fix", zettel=finding.zettel, check=finding.check)
+    return finding._replace(fixed=True)
+
+
+def _entry_finding(name, entry, main_entries):
+    """Finding of a zettel's bibliography entry not matching the main
+    bibliography. ``None`` if it matches."""
+    main_entry = main_entries.get(entry.key)
+    if main_entry is None:
+        return Finding(
+            name,
+            "missing_main_entry",
+            f"entry '{entry.key}' not found in "
+            + f"'{defaults.zettelkasten_bib_file}'",
+        )
+    if main_entry != entry:
+        return Finding(
+            name,
+            "entry_mismatch",
+            f"entry '{entry.key}' differs from the one in "
+            + f"'{defaults.zettelkasten_bib_file}'",
+        )
+    return None
+
+
+def _checked(results, parts, main_entries, main_bib_file, fix):
+    """Findings of the checked chunks' results, fixed if requested.
+
+    Entries appended to the main bibliography while fixing are added to
+    main_entries.
+    """
+    for findings, entries in results:
+        for finding in findings:
+            if fix and finding.check in fixable_checks:
+                finding = _fix(finding, parts[finding.zettel], main_bib_file)
+            yield finding
+
+        for name, entry in entries:
+            finding = _entry_finding(name, entry, main_entries)
+            if finding is None:
+                continue
+            if fix and finding.check in fixable_checks:
+                finding = _fix(finding, parts[name], main_bib_file, entry)
+                main_entries[entry.key] = entry
+            yield finding
+
+
+def check(processes=None, fix=False):
+    """Check the integrity of the zettelkasten.
+
+    Uses :attr:`zettelkasten.defaults.location` as top level folder for
+    checking.
+
+    Parameters
+    ----------
+    processes: int, None, default=None
+        Number of worker processes used for checking. ``None`` uses
+        :func:`os.cpu_count`. ``1`` checks inside the calling process.
+
+    fix: bool, default=False
+        If ``True`` findings of the :attr:`fixable_checks` are fixed: Missing
+        org files are recreated from the zettel's name, missing bibliography
+        files are created empty and missing entries are appended to the
+        zettelkasten's bibliography file.
+
+    Yields
+    ------
+    finding: Finding
+        Integrity violations in the order their chunks finished checking.
+
+    Raises
+    ------
+    RuntimeError
+        Raised if the :attr:`storage backend <zettelkasten.storage.backend>`
+        is not local, see :func:`zettelkasten.storage.require_local`.
+
+    Examples
+    --------
+    >>> from zettelkasten import add, defaults, initialize
+    >>> defaults.location = "tests/doctest_dir/doctest_kasten"
+    >>> initialize.structure_zettelkasten()
+    >>> add.new_zettel("woodturning/tools/chisel", force_overwrite=True)
+    >>> os.remove(os.path.join(
+    ...     defaults.location, "woodturning", "tools", "chisel", "chisel.bib"))
+    >>> [(f.check, f.fixed) for f in check(processes=1, fix=True)]
+    [('missing_bib', True)]
+    >>> list(check(processes=1))
+    []
+    """
+    storage.require_local("Checking the zettelkasten")
+    location = os.path.abspath(defaults.location)
+    sources = os.path.join(location, defaults.sources_directory)
+    main_bib_file = os.path.join(sources, defaults.zettelkasten_bib_file)
+
+    zettels = list(_zettel_folders(comp.zettel_mapping(), defaults.name_sep))
+    parts = {name: folder_parts for name, folder_parts, _ in zettels}
+    jobs = [
+        (location, sources, zettels[i : i + chunk_size])
+        for i in range(0, len(zettels), chunk_size)
+    ]
+
+    main_entries = dict()
+    if os.path.isfile(main_bib_file):
+        with open(main_bib_file) as f:
+            for entry in parse.bibliography_entries(f.read()):
+                main_entries[entry.key] = entry
+
+    if processes == 1 or len(jobs) < 2:
+        results = map(_check_chunk, jobs)
+        yield from _checked(results, parts, main_entries, main_bib_file, fix)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        futures = [executor.submit(_check_chunk, job) for job in jobs]
+        results = (
+            future.result()
+            for future in concurrent.futures.as_completed(futures)
+        )
+        yield from _checked(results, parts, main_entries, main_bib_file, fix)
@@ -2,30 +2,61 @@
 # type: ignore[attr-defined]
 """Module aggregating the command line interface."""
 import configparser
+import json
 import logging
 import os
 import platform
+import socket
 import subprocess
+import sys
+import time
+import typing
 from pathlib import Path
 
 import typer
 from rich.console import Console
+from rich.progress import BarColumn
+from rich.progress import DownloadColumn
+from rich.progress import Progress
+from rich.progress import TextColumn
+from rich.progress import TimeRemainingColumn
+from rich.progress import TransferSpeedColumn
 from rich.prompt import IntPrompt
 from rich.prompt import Prompt
+from rich.table import Table
 from rich.theme import Theme
 
 from . import __version__
 from . import add as zadd
-from . import compile as comp
+from . import check as zcheck
 from . import defaults
+from . import delete as zdelete
+from . import edit as zedit
+from . import find as zfind
+from . import index as zindex
+from . import metadata as zmetadata
+from . import migrate as zmigrate
 from . import monkeypatch
+from . import move as zmove
 from . import parse
+from . import profiling
+from . import setup as zsetup
+from . import server as zserver
+from . import site as zsite
+from . import sources as zsources
+from . import stats as zstats
+from . import storage as zstorage
+from . import tracing
+from . import transfer as ztransfer
+from . import watch as zwatch
 
 logger = logging.getLogger(__name__)
 
 # monkey patch
 zk_path = Path.home() / ".zettelkasten.d" / "zk.cfg"
+_patch_start = time.perf_counter()
 monkeypatch.patch_defaults(zk_path)
+_patch_duration = time.perf_counter() - _patch_start
 
 custom_theme = Theme(
     {
@@ -43,8 +74,28 @@ app = typer.Typer(
     + "org-mode file zettels",
     # add_completion=False,
 )
+migrate_app = typer.Typer(help="Migrates the zettelkasten's folder layout.")
+app.add_typer(migrate_app, name="migrate")
 console = Console(theme=custom_theme)
 
+metadata_timeout = 5.0
+"""Seconds a command waits at exit for the pending :mod:`metadata
+<zettelkasten.metadata>` extractions of its added sources."""
+
+local_commands = {
+    "check",
+    "gc",
+    "mv",
+    "open",
+    "rm",
+    "serve",
+    "set",
+    "tag",
+    "watch",
+}
+"""Commands accessing the zettelkasten's local files directly, refused for
+other :attr:`storage backends <zettelkasten.defaults.storage_backend>`."""
+
 
 def version_callback(value: bool):
     """Prints the version of the package."""
@@ -55,8 +106,50 @@ def version_callback(value: bool):
         raise typer.Exit()
 
 
+def print_profile(wall_time):
+    """Print the recorded :mod:`profiling <zettelkasten.profiling>` phases."""
+    table = Table(title="Profile")
+    table.add_column("Phase", style="def")
+    table.add_column("Calls", justify="right")
+    table.add_column("Total [ms]", justify="right")
+    table.add_column("Mean [ms]", justify="right")
+    table.add_column("Share", justify="right")
+
+    for row in profiling.report():
+        table.add_row(
+            row["phase"],
+            str(row["calls"]),
+            f"{row['total'] * 1e3:.3f}",
+            f"{row['mean'] * 1e3:.3f}",
+            f"{row['total'] / wall_time:.1%}" if wall_time else "-",
+        )
+
+    console.print(table)
+    console.print(f"[info]Command wall time:[/] {wall_time * 1e3:.3f} ms")
+
+
+def use_configured_backend(ctx):
+    """Access the zettelkasten through the configured backend while the
+    command runs. Exits for unknown backends and :attr:`local_commands`."""
+    try:
+        kasten = zstorage.configured_backend()
+    except ValueError as error:
+        console.print(f"[danger]{error}[/]")
+        raise typer.Exit(code=1)
+    ctx.with_resource(zstorage.using(kasten))
+    ctx.call_on_close(kasten.close)
+
+    if ctx.invoked_subcommand in local_commands:
+        try:
+            zstorage.require_local(f"'zk {ctx.invoked_subcommand}'")
+        except RuntimeError as error:
+            console.print(f"[danger]{error}[/]")
+            raise typer.Exit(code=1)
+
+
 @app.callback()
 def version(
+    ctx: typer.Context,
     version: bool = typer.Option(
         None,
         "-v",
@@ -64,16 +157,87 @@ def version(
         callback=version_callback,
         # is_eager=True,
     ),
+    profile: bool = typer.Option(
+        False,
+        "--profile",
+        help="Print the wall time spent in each phase of the command.",
+    ),
+    profile_output: Path = typer.Option(
+        None,
+        "--profile-output",
+        help="Also write the profile to this file. Files ending on '.json' "
+        + "receive a chrome trace, all others pstats statistics.",
+    ),
+    trace: Path = typer.Option(
+        None,
+        "--trace",
+        help="Append spans and events of the command to this json-lines file.",
+    ),
 ):
     """Prints the version of the package."""
+    ctx.call_on_close(lambda: zmetadata.shutdown(timeout=metadata_timeout))
+    if defaults.storage_backend != "local":
+        use_configured_backend(ctx)
+
+    if trace is not None:
+        tracing.enable(trace)
+        ctx.call_on_close(tracing.disable)
+
+    if not profile and profile_output is None:
+        return
+
+    profiling.enable(
+        cprofile=profile_output is not None and profile_output.suffix != ".json"
+    )
+    profiling.record(
+        "monkeypatch.patch_defaults", _patch_start, _patch_duration
+    )
+    start = time.perf_counter()
+
+    def finish():
+        # the defaults are patched at import, before the command starts
+        wall_time = time.perf_counter() - start + _patch_duration
+        profiling.disable()
+        print_profile(wall_time)
+        if profile_output is not None:
+            profiling.dump(profile_output)
+            console.print(f"[info]Profile written to[/] {profile_output}")
+        profiling.reset()
+
+    ctx.call_on_close(finish)
+
+
+def served(op, fallback, **args):
+    """Answer op by a running :mod:`server <zettelkasten.server>`.
+
+    Calls fallback if the configured storage backend is not local, no server
+    is running or the connection to it failed or timed out. Exceptions
+    raised by the server are reraised.
+    """
+    if not zstorage.backend.local:
+        return fallback()
+    try:
+        response = zserver.send(op, **args)
+    except (OSError, socket.timeout, ValueError):
+        logger.debug(f"Server did not answer '{op}'", exc_info=True)
+        return fallback()
+    return zserver.unpack(response)
 
 
 def complete_zettel_name(incomplete: str):
     """Utility to propose zettelname completesion based on input."""
-    completion = []
-    for name in comp.parsed_zettels():
-        if name.startswith(incomplete):
-            completion.append(name)
+
+    def complete():
+        return zindex.zettel_tree().startswith(incomplete)
+
+    completion = served("complete", complete, incomplete=incomplete)
+    if not completion and incomplete:
+        # nothing starts with the input, propose fuzzy matches instead
+        completion = served(
+            "find",
+            lambda: zfind.find_zettels(incomplete),
+            query=incomplete,
+        )
     return completion
 
 
@@ -91,7 +255,12 @@ def add(
     ),
 ):
     """Adds a Zettel."""
-    zadd.new_zettel(name=zettel, force_overwrite=force_overwrite)
+    served(
+        "add",
+        lambda: zadd.new_zettel(name=zettel, force_overwrite=force_overwrite),
+        name=zettel,
+        force_overwrite=force_overwrite,
+    )
 
 
 # @app.command()
@@ -100,28 +269,55 @@ def add(
 #     typer.echo("Change Zettel")
 
 
-def print_colored_zettel(zettel, cmap):
-    """Create a colored zettel list output according to the :ref:`colors`."""
+list_batch_size = 1024
+"""Number of zettels written at once by ``zk list``."""
+
+
+def list_colors():
+    """Read the colors of the zettel name parts from the :ref:`styles`."""
+    # create a config parse able to parse lists
+    configs = configparser.ConfigParser(
+        converters={"list": lambda x: [i.strip() for i in x.split(",")]}
+    )
+
+    # read in the config styles file
+    configs.read(defaults.styles_file)
+    return {k: v for k, v in configs["list_colors"].items()}
+
+
+def colored_zettel(zettel, cmap):
+    """Create a colored zettel list entry according to the :ref:`colors`."""
     # decontruct zettel name
     parts = zettel.split(defaults.name_sep)
 
-    colored_zettel = ""
-    for i, part in enumerate(parts):
-        if part in cmap:
-            if i < len(parts) - 1:
-                # add a name_sep it its not the first
-                colored_zettel += (
-                    f"[{cmap[part]}]{part}[/{cmap[part]}]{defaults.name_sep}"
-                )
-            else:
-                colored_zettel += f"[{cmap[part]}]{part}[/{cmap[part]}]"
-        else:
-            if i < len(parts) - 1:
-                colored_zettel += f"{part}{defaults.name_sep}"
-            else:
-                colored_zettel += part
+    return defaults.name_sep.join(
+        f"[{cmap[part]}]{part}[/{cmap[part]}]" if part in cmap else part
+        for part in parts
+    )
+
 
-    console.print(colored_zettel)
+def print_colored_zettels(zettels, cmap):
+    """Print colored zettel names in batches."""
+    # each console.print call has a sizeable overhead
+    for start in range(0, len(zettels), list_batch_size):
+        console.print(
+            "\n".join(
+                colored_zettel(zettel, cmap)
+                for zettel in zettels[start : start + list_batch_size]
+            )
+        )
+
+
+def write_lines(lines):
+    """Write lines to stdout in batches, bypassing rich's rendering."""
+    out = sys.stdout
+    for start in range(0, len(lines), list_batch_size):
+        out.write(
+            "".join(
+                f"{line}\n" for line in lines[start : start + list_batch_size]
+            )
+        )
+    out.flush()
 
 
 @app.command()
@@ -138,39 +334,209 @@ def list(
         "--subcat",
         help="Only list zettels of this subcategory",
     ),
+    porcelain: bool = typer.Option(
+        False,
+        "-p",
+        "--porcelain",
+        help="Plain zettel names, one per line (as for piping into fzf).",
+    ),
+    json_output: bool = typer.Option(
+        False,
+        "--json",
+        help="Zettel names as json array.",
+    ),
+    sort: str = typer.Option(
+        "name",
+        "--sort",
+        help="Sort by 'name', creation date 'doc' or modification 'mtime'.",
+    ),
+    reverse: bool = typer.Option(
+        False,
+        "-r",
+        "--reverse",
+        help="Sort in descending order.",
+    ),
+    limit: int = typer.Option(
+        None,
+        "-n",
+        "--limit",
+        help="List at most this many zettels.",
+    ),
+    offset: int = typer.Option(
+        0,
+        "--offset",
+        help="Skip this many zettels before listing.",
+    ),
 ):
-    """List stored zettels."""
-    # create a config parse able to parse lists
-    configs = configparser.ConfigParser(
-        converters={"list": lambda x: [i.strip() for i in x.split(",")]}
+    """List stored zettels.
+
+    Category and subcategory filters match exactly, unless they contain glob
+    wildcards as in 'wood*'.
+    """
+    if porcelain and json_output:
+        raise typer.BadParameter("Use either --porcelain or --json")
+    if sort not in zindex.sort_keys:
+        raise typer.BadParameter(
+            f"Sort by one of {', '.join(zindex.sort_keys)}", param_hint="--sort"
+        )
+
+    selection = dict(
+        category=category,
+        subcategory=subcategory,
+        sort=sort,
+        reverse=reverse,
+        offset=offset,
+        limit=limit,
+    )
+    lst = served(
+        "select", lambda: zindex.select_zettels(**selection), **selection
     )
 
-    # read in the config styles file
-    configs.read(defaults.styles_file)
-    cmap = {k: v for k, v in configs["list_colors"].items()}
+    if porcelain:
+        write_lines(lst)
+        return
+    if json_output:
+        write_lines([json.dumps(lst)])
+        return
+
+    cmap = list_colors()
 
-    lst = comp.parsed_zettels()
-    # filter out cats/subcats if requested
+    sep = defaults.name_sep
     if category:
-        lst = [e for e in lst if e.startswith(category)]
         if category in cmap:
-            console.rule(f"[{cmap[category]}]{category}*/*")
+            console.rule(f"[{cmap[category]}]{category}{sep}*")
         else:
-            console.rule(f"[bold green]{category}*/*")
+            console.rule(f"[bold green]{category}{sep}*")
     if subcategory:
-        subcat_str = f"{defaults.name_sep}{subcategory}{defaults.name_sep}"
-        lst = [e for e in lst if subcat_str in e]
+        subcat_str = f"{sep}{subcategory}{sep}"
         if subcategory in cmap:
             console.rule(f"[{cmap[subcategory]}]*{subcat_str}*")
         else:
             console.rule(f"[bold green]*{subcat_str}*")
 
     console.print()
-    for entry in lst:
-        print_colored_zettel(entry, cmap)
+    print_colored_zettels(lst, cmap)
     console.print()
 
 
+@app.command()
+def find(
+    query: str = typer.Argument(
+        ...,
+        help="Characters of the zettel name in order, as in 'wtchsl'.",
+    ),
+    limit: int = typer.Option(
+        10,
+        "-n",
+        "--limit",
+        help="Maximum number of zettels found.",
+    ),
+    porcelain: bool = typer.Option(
+        False,
+        "-p",
+        "--porcelain",
+        help="Plain zettel names, one per line.",
+    ),
+):
+    """Fuzzy finds zettels by name, best match first.
+
+    Short queries into large unsorted lobbies may take a few hundred
+    milliseconds, longer queries narrow the search.
+    """
+    found = served(
+        "find",
+        lambda: zfind.find_zettels(query, limit),
+        query=query,
+        limit=limit,
+    )
+
+    if porcelain:
+        write_lines(found)
+        return
+
+    print_colored_zettels(found, list_colors())
+
+
+def print_histogram(title, label, histogram, total):
+    """Print a histogram as table including each bucket's share."""
+    table = Table(title=title)
+    table.add_column(label, style="def")
+    table.add_column("Count", justify="right")
+    table.add_column("Share", justify="right")
+    for key, count in histogram.items():
+        table.add_row(key, str(count), f"{count / total:.1%}" if total else "-")
+    console.print(table)
+
+
+refresh_index = typer.Option(
+    False,
+    "--refresh",
+    help="Pick up zettels edited outside of zk, checking every zettel file "
+    + "for changes.",
+)
+
+
+@app.command()
+def stats(
+    bucket: str = typer.Option(
+        "month",
+        "-b",
+        "--bucket",
+        help="Count zettel creation dates per 'year', 'month' or 'day'.",
+    ),
+    json_output: bool = typer.Option(
+        False,
+        "--json",
+        help="Statistics as json object.",
+    ),
+    refresh: bool = refresh_index,
+):
+    """Print statistics of the zettelkasten."""
+    if bucket not in zstats.date_buckets:
+        raise typer.BadParameter(
+            f"Bucket by one of {', '.join(zstats.date_buckets)}",
+            param_hint="--bucket",
+        )
+    report = served(
+        "stats", lambda: zstats.collect(bucket, refresh), bucket=bucket
+    )
+
+    if json_output:
+        write_lines([json.dumps(report)])
+        return
+
+    zettels = report["zettels"]
+    print_histogram("Categories", "Category", report["categories"], zettels)
+    print_histogram(
+        "Subcategories", "Subcategory", report["subcategories"], zettels
+    )
+    print_histogram("Growth", "Created", report["growth"], zettels)
+
+    table = Table(title="Sources")
+    table.add_column("Type", style="def")
+    table.add_column("Files", justify="right")
+    table.add_column("Bytes", justify="right")
+    for ftype, files in report["sources"].items():
+        table.add_row(ftype, str(files), str(report["source_bytes"][ftype]))
+    table.add_row(
+        "total",
+        str(sum(report["sources"].values())),
+        str(sum(report["source_bytes"].values())),
+        style="req",
+    )
+    console.print(table)
+
+    console.print(
+        f"[req]{zettels}[/] zettels, "
+        + f"[req]{report['references']}[/] references, "
+        + f"[req]{report['bib_entries']}[/] bibliography entries"
+    )
+    if report["missing_sources"]:
+        console.print(
+            f"[danger]{report['missing_sources']}[/] source files not found"
+        )
+
+
 @app.command()
 def open(
     zettel: str = typer.Argument(
@@ -179,7 +545,9 @@ def open(
     ),
 ):
     """Opens a zettel if found inside zettelkasten."""
-    zettel_path = parse.zettel_path(zettel).resolve()
+    zettel_path = Path(
+        served("path", lambda: parse.zettel_path(zettel), name=zettel)
+    ).resolve()
 
     if platform.system() == "Darwin":  # macOS
         subprocess.call(("open", zettel_path))
@@ -189,6 +557,257 @@ def open(
         subprocess.call(("xdg-open", zettel_path))
 
 
+def edit_selected(edits, category, subcategory, name, jobs):
+    """Apply edits to the selected zettels and report the changed ones."""
+    try:
+        changed = zedit.edit_zettels(
+            zedit.select(category, subcategory, name), edits, processes=jobs
+        )
+    except ValueError as error:
+        raise typer.BadParameter(str(error))
+
+    for zettel in changed:
+        console.print(f"[info]Edited[/] {zettel}")
+    console.print(f"[req]{len(changed)}[/] zettels edited")
+
+
+select_category = typer.Option(
+    None, "-c", "--cat", help="Only edit zettels of this category."
+)
+select_subcategory = typer.Option(
+    None, "-s", "--subcat", help="Only edit zettels of this subcategory."
+)
+select_name = typer.Option(
+    None,
+    "-n",
+    "--name",
+    help="Only edit zettels whose name matches this glob as in 'wood*/*/ch*'.",
+)
+edit_jobs = typer.Option(
+    None,
+    "-j",
+    "--jobs",
+    help="Number of editing processes. Defaults to the cpu count.",
+)
+
+
+@app.command()
+def tag(
+    tags: typing.List[str] = typer.Argument(..., help="Tags as in '#Rework'."),
+    remove: bool = typer.Option(
+        False, "-r", "--remove", help="Remove the tags instead of adding them."
+    ),
+    attribute: str = typer.Option(
+        "tags",
+        "-a",
+        "--attribute",
+        help="List attribute to edit as in 'topics'.",
+    ),
+    category: str = select_category,
+    subcategory: str = select_subcategory,
+    name: str = select_name,
+    jobs: int = edit_jobs,
+):
+    """Adds (or removes) tags to the selected zettels.
+
+    Category and subcategory filters match exactly, unless they contain glob
+    wildcards as in 'wood*'. Without filters all zettels are edited.
+    """
+    operation = "remove" if remove else "add"
+    edit_selected(
+        [(attribute, operation, tags)], category, subcategory, name, jobs
+    )
+
+
+@app.command("set")
+def set_attribute(
+    attribute: str = typer.Argument(..., help="Attribute as in 'author'."),
+    value: str = typer.Argument(..., help="New value of the attribute."),
+    category: str = select_category,
+    subcategory: str = select_subcategory,
+    name: str = select_name,
+    jobs: int = edit_jobs,
+):
+    """Sets a header attribute of the selected zettels.
+
+    Category and subcategory filters match exactly, unless they contain glob
+    wildcards as in 'wood*'. Without filters all zettels are edited.
+    """
+    edit_selected(
+        [(attribute, "set", [value])], category, subcategory, name, jobs
+    )
+
+
+@app.command()
+def mv(
+    zettel: str = typer.Argument(
+        ...,
+        help="Name of the zettel to move.",
+        autocompletion=complete_zettel_name,
+    ),
+    new_name: str = typer.Argument(
+        ...,
+        help="New name as in 'category/subcategory/uid'. Only an uid moves "
+        + "the zettel into the lobby.",
+    ),
+):
+    """Moves or renames a zettel and updates the links pointing to it."""
+    linking = served(
+        "move",
+        lambda: zmove.move_zettel(zettel, new_name),
+        name=zettel,
+        new_name=new_name,
+    )
+    console.print(f"Moved [def]{zettel}[/] to [req]{new_name}[/]")
+    for name in linking:
+        console.print(f"[info]Updated links in[/] {name}")
+
+
+@app.command()
+def rm(
+    zettels: typing.List[str] = typer.Argument(
+        ...,
+        help="Names of the zettels to delete.",
+        autocompletion=complete_zettel_name,
+    ),
+    yes: bool = typer.Option(
+        False, "-y", "--yes", help="Delete without asking for confirmation."
+    ),
+):
+    """Deletes zettels, the bibliography entries and source files only they
+    reference."""
+    if not yes:
+        typer.confirm(f"Delete {len(zettels)} zettels?", abort=True)
+
+    deletion = zdelete.Deletion(
+        *served(
+            "delete",
+            lambda: zdelete.delete_zettels(zettels),
+            names=zettels,
+        )
+    )
+    for name in deletion.zettels:
+        console.print(f"[info]Deleted[/] {name}")
+    console.print(
+        f"Dropped [req]{len(deletion.entries)}[/] bibliography entries and "
+        + f"[req]{len(deletion.sources)}[/] source files"
+    )
+    for name in deletion.linking:
+        console.print(f"[warning]Dangling links in[/] {name}")
+
+
+@app.command("cited-by")
+def cited_by(
+    key: str = typer.Argument(
+        ...,
+        help="Bibtex key of the source as in 'chisel_2021_p1'.",
+    ),
+    refresh: bool = refresh_index,
+):
+    """Lists the zettels citing a source key, answered from the index."""
+    write_lines(
+        served("cited_by", lambda: zindex.citing_zettels(key, refresh), key=key)
+    )
+
+
+@app.command()
+def refs(
+    zettel: str = typer.Argument(
+        ...,
+        autocompletion=complete_zettel_name,
+        help="Zettel as in 'category/subcategory/zettel' or 'zettel'.",
+    ),
+    refresh: bool = refresh_index,
+):
+    """Lists the source keys a zettel cites, answered from the index."""
+    try:
+        references = served(
+            "refs",
+            lambda: zindex.zettel_references(zettel, refresh),
+            name=zettel,
+        )
+    except KeyError as error:
+        console.print(f"[danger]{error.args[0]}[/]")
+        raise typer.Exit(code=1)
+
+    table = Table(title=zettel)
+    table.add_column("Key", style="def")
+    table.add_column("Source")
+    for key, url in references.items():
+        table.add_row(key, url or "[warning]missing[/]")
+    console.print(table)
+
+
+def copy_progress():
+    """Transient progress bar stating the throughput of source file copies."""
+    return Progress(
+        TextColumn("[info]Copying[/]"),
+        BarColumn(),
+        DownloadColumn(),
+        TransferSpeedColumn(),
+        TimeRemainingColumn(),
+        console=console,
+        transient=True,
+    )
+
+
+def add_source_with_progress(**args):
+    """Add a source file, showing the progress of copying it.
+
+    See :func:`zettelkasten.add.new_source` for the arguments.
+    """
+    with copy_progress() as progress:
+        task = progress.add_task("copy", total=1)
+
+        def report(copied, total):
+            progress.update(task, completed=copied, total=total)
+
+        with ztransfer.reporting(report):
+            zadd.new_source(**args)
+
+
+def prompt_bib_fields(extraction, author, title, year, date):
+    """Prompt the bibliography fields not given yet.
+
+    Defaults are taken from the source's metadata, once the extraction
+    submitted by :func:`zettelkasten.metadata.submit` finished.
+
+    Returns
+    -------
+    fields: tuple
+        Author, title, year and date.
+    """
+    found = dict()
+    if extraction is not None:
+        found = zmetadata.bib_defaults(extraction.result())
+
+    if author is None:
+        author = Prompt.ask(
+            "[b cyan]Name[/b cyan] of the Author",
+            default=found.get("author", defaults.def_author),
+        )
+
+    if title is None:
+        title = Prompt.ask(
+            "[b cyan]Title[/b cyan] of the reference file",
+            default=found.get("title", defaults.def_title),
+        )
+
+    if year is None:
+        year = IntPrompt.ask(
+            "[b cyan]Year[/b cyan] of the reference file",
+            default=int(found.get("year", defaults.def_year)),
+        )
+
+    if date is None:
+        date = Prompt.ask(
+            "[b cyan]Date[/b cyan] of the reference file",
+            default=found.get("date", defaults.def_date),
+        )
+
+    return author, title, year, date
+
+
 @app.command()
 def ref(
     zettel: str = typer.Argument(
@@ -259,6 +878,11 @@ def ref(
             "[b green]Source[/b green] file serving as reference"
         )
 
+    # extract the source's metadata while the remaining prompts are answered
+    extraction = None
+    if interactive and source is not None:
+        extraction = zmetadata.submit(os.path.abspath(source))
+
     if uid is None and interactive:
         uid = Prompt.ask(
             "[b green]Unique identifier[/b green] of the reference file"
@@ -270,27 +894,9 @@ def ref(
             default=defaults.def_location_specifier,
         )
 
-    if interactive and author is None:
-        author = Prompt.ask(
-            "[b cyan]Name[/b cyan] of the Author", default=defaults.def_author
-        )
-
-    if interactive and title is None:
-        title = Prompt.ask(
-            "[b cyan]Title[/b cyan] of the reference file",
-            default=defaults.def_title,
-        )
-
-    if interactive and year is None:
-        year = IntPrompt.ask(
-            "[b cyan]Year[/b cyan] of the reference file",
-            default=defaults.def_year,
-        )
-
-    if interactive and date is None:
-        date = Prompt.ask(
-            "[b cyan]Date[/b cyan] of the reference file",
-            default=defaults.def_date,
+    if interactive:
+        author, title, year, date = prompt_bib_fields(
+            extraction, author, title, year, date
         )
 
     # console.print(f"zettel: {zettel}")
@@ -302,7 +908,7 @@ def ref(
     # console.print(f"year: {year}")
     # console.print(f"date: {date}")
 
-    zadd.new_source(
+    args = dict(
         zettel_name=zettel,
         source_file=source,
         uid=uid,
@@ -313,3 +919,246 @@ def ref(
         date=date,
         force_overwrite=force_overwrite,
     )
+
+    # the server resolves relative paths against its own working directory
+    served(
+        "ref",
+        lambda: add_source_with_progress(**args),
+        **dict(args, source_file=source and os.path.abspath(source)),
+    )
+
+
+@app.command("build-site")
+def build_site(
+    output: Path = typer.Argument(
+        ...,
+        help="Directory the html site is rendered into.",
+    ),
+    jobs: int = typer.Option(
+        None,
+        "-j",
+        "--jobs",
+        help="Number of rendering processes. Defaults to the cpu count.",
+    ),
+    force: bool = typer.Option(
+        False,
+        "-f",
+        "--force",
+        help="Ignore the manifest and render every zettel.",
+    ),
+):
+    """Renders the zettelkasten into a static html site."""
+    summary = zsite.build_site(output, processes=jobs, force=force)
+    console.print(
+        f"[req]{summary['rendered']}[/] rendered, "
+        + f"[info]{summary['skipped']}[/] unchanged, "
+        + f"[warning]{summary['removed']}[/] removed"
+    )
+
+
+@app.command()
+def check(
+    fix: bool = typer.Option(
+        False,
+        "--fix",
+        help="Fix missing org and bib files as well as missing entries of "
+        + "the zettelkasten's bib file.",
+    ),
+    jobs: int = typer.Option(
+        None,
+        "-j",
+        "--jobs",
+        help="Number of checking processes. Defaults to the cpu count.",
+    ),
+):
+    """Checks the integrity of the zettelkasten.
+
+    Exits with a non-zero code if findings remain unfixed.
+    """
+    unfixed = 0
+    for finding in zcheck.check(processes=jobs, fix=fix):
+        if finding.fixed:
+            console.print(
+                f"[req]fixed[/] [def]{finding.check}[/] "
+                + f"{finding.zettel}: {finding.message}"
+            )
+        else:
+            unfixed += 1
+            console.print(
+                f"[danger]{finding.check}[/] "
+                + f"{finding.zettel}: {finding.message}"
+            )
+
+    if unfixed:
+        console.print(f"[danger]{unfixed}[/] findings")
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def gc(
+    delete: bool = typer.Option(
+        False,
+        "-d",
+        "--delete",
+        help="Delete the orphaned source files instead of only listing them.",
+    ),
+):
+    """Lists (or deletes) source files no bibliography entry references."""
+    orphans = zsources.collect_garbage(delete=delete)
+    for orphan in orphans:
+        console.print(
+            f"[danger]deleted[/] {orphan.path}" if delete else orphan.path
+        )
+
+    table = Table(title="Deleted" if delete else "Reclaimable")
+    table.add_column("Type", style="def")
+    table.add_column("Files", justify="right")
+    table.add_column("Bytes", justify="right")
+    total = 0
+    for ftype, (files, size) in zsources.reclaimable_bytes(orphans).items():
+        table.add_row(ftype, str(files), str(size))
+        total += size
+    table.add_row("total", str(len(orphans)), str(total), style="req")
+    console.print(table)
+
+
+@app.command()
+def watch(
+    save_interval: float = typer.Option(
+        0.5,
+        "-i",
+        "--interval",
+        help="Minimum number of seconds between persisting the index.",
+    ),
+):
+    """Keeps the zettelkasten index up to date while running (linux only)."""
+    pid = zindex.watcher_pid()
+    if pid is not None:
+        console.print(f"[danger]Already watched by process {pid}[/]")
+        raise typer.Exit(code=1)
+
+    console.print(f"[info]Watching[/] {defaults.location} (Ctrl+C to stop)")
+    try:
+        zwatch.watch(save_interval=save_interval)
+    except KeyboardInterrupt:
+        console.print("[info]Stopped watching[/]")
+
+
+@migrate_app.command("lobby")
+def migrate_lobby(
+    width: int = typer.Option(
+        2,
+        "-w",
+        "--width",
+        help="Number of hex digits naming the lobby's shard folders. 0 "
+        + "unshards the lobby.",
+    ),
+):
+    """Moves the lobby zettels into hash prefix named shard folders.
+
+    Stop a running watcher or server first. The new width is stated inside
+    the config file, so following commands find the moved zettels.
+    """
+    if width == defaults.lobby_shard_width:
+        console.print(f"[info]Lobby already sharded using width {width}[/]")
+        return
+
+    try:
+        moved = zmigrate.shard_lobby(width)
+    except (ValueError, RuntimeError) as error:
+        console.print(f"[danger]{error}[/]")
+        raise typer.Exit(code=1)
+
+    if zk_path.is_file():
+        zsetup.set_config_value("lobby_shard_width", width, zk_path)
+    else:
+        console.print(
+            f"[warning]No config file found, set 'lobby_shard_width = {width}'"
+            + " when creating it[/]"
+        )
+    console.print(f"Moved [req]{len(moved)}[/] lobby zettels")
+
+
+@migrate_app.command("sources")
+def migrate_sources(
+    scheme: str = typer.Option(
+        "hash",
+        "-s",
+        "--scheme",
+        help="Sharding scheme, one of 'flat', 'hash' or 'date'.",
+    ),
+    width: int = typer.Option(
+        None,
+        "-w",
+        "--width",
+        help="Number of hex digits naming the 'hash' shard folders.",
+    ),
+):
+    """Moves the source files into shard folders and rewrites their urls.
+
+    Stop a running watcher or server first. The new scheme is stated inside
+    the config file, so following sources are added into the shard folders.
+    """
+    try:
+        moved = zmigrate.shard_sources(scheme, width)
+    except (ValueError, RuntimeError, FileExistsError) as error:
+        console.print(f"[danger]{error}[/]")
+        raise typer.Exit(code=1)
+
+    settings = {
+        "source_sharding": defaults.source_sharding,
+        "source_shard_width": defaults.source_shard_width,
+    }
+    if zk_path.is_file():
+        for key, value in settings.items():
+            zsetup.set_config_value(key, value, zk_path)
+    else:
+        console.print(
+            "[warning]No config file found, set "
+            + ", ".join(f"'{key} = {value}'" for key, value in settings.items())
+            + " when creating it[/]"
+        )
+    console.print(f"Moved [req]{len(moved)}[/] source files")
+
+
+@migrate_app.command("sqlite")
+def migrate_sqlite(
+    database: Path = typer.Argument(
+        ...,
+        help="SQLite database file as in '~/zettelkasten.sqlite'.",
+    ),
+    export: bool = typer.Option(
+        False,
+        "-e",
+        "--export",
+        help="Write the database's content into the folder layout instead.",
+    ),
+):
+    """Stores the zettelkasten's folders and files inside a SQLite database.
+
+    The database is created if not existing. Use --export for the round trip
+    back into the zettelkasten's folder layout.
+    """
+    kasten = zstorage.SQLiteBackend(database.expanduser())
+    try:
+        if export:
+            files = kasten.export_tree()
+        else:
+            files = kasten.import_tree()
+    finally:
+        kasten.close()
+    action = "Exported" if export else "Imported"
+    console.print(f"{action} [req]{files}[/] files")
+
+
+@app.command()
+def serve():
+    """Serves the zettelkasten to other commands from memory."""
+    console.print(
+        f"[info]Serving[/] {defaults.location} on "
+        + f"{zserver.socket_path()} (Ctrl+C to stop)"
+    )
+    try:
+        zserver.serve()
+    except KeyboardInterrupt:
+        console.print("[info]Stopped serving[/]")
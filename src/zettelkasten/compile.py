@@ -4,8 +4,11 @@ import os
 from collections import defaultdict
 
 from . import defaults
+from . import profiling
+from . import storage
 
 
+@profiling.timed("compile.categories")
 def categories():
     """Compiles a sorted list of categories including the :ref:`lobby`.
 
@@ -42,7 +45,7 @@ def categories():
         ['carpentry', 'lobby', 'woodturning']
     """
     path = defaults.location
-    folders = [f.name for f in os.scandir(path) if f.is_dir()]
+    folders = [f.name for f in storage.backend.list(path) if f.is_dir()]
     compiled_categories = [
         f for f in folders if f not in defaults.reserved_folder_names
     ]
@@ -50,6 +53,7 @@ def categories():
     return list(sorted(compiled_categories))
 
 
+@profiling.timed("compile.all_subcategories")
 def all_subcategories():
     """Compiles a sorted list of all subcategories inside the zettelkasten.
 
@@ -90,7 +94,7 @@ def all_subcategories():
         if category != "lobby":
             subcats = [
                 f.name
-                for f in os.scandir(os.path.join(path, category))
+                for f in storage.backend.list(os.path.join(path, category))
                 if f.is_dir()
             ]
             for subcat in subcats:
@@ -99,6 +103,7 @@ def all_subcategories():
     return list(sorted(all_subcats))
 
 
+@profiling.timed("compile.subcategory_mapping")
 def subcategory_mapping():
     """Mapping subcategories to their category.
 
@@ -145,7 +150,7 @@ def subcategory_mapping():
         if category != "lobby":
             subcats = [
                 f.name
-                for f in os.scandir(os.path.join(path, category))
+                for f in storage.backend.list(os.path.join(path, category))
                 if f.is_dir()
             ]
             cats[category] = list(sorted(subcats))
@@ -157,6 +162,7 @@ def subcategory_mapping():
     return sorted_cats
 
 
+@profiling.timed("compile.zettel_mapping")
 def zettel_mapping():
     """Mapping zettels to subcategories.
 
@@ -207,30 +213,98 @@ def zettel_mapping():
     zettels = defaultdict(dict)  # type: ignore
     for category, subcategories in subcategory_mapping().items():
         for subcategory in subcategories:
-
-            zettels[category][subcategory] = list(
-                sorted(
-                    f.name
-                    for f in os.scandir(
-                        os.path.join(path, category, subcategory)
-                    )
-                    if f.is_dir()
-                )
+            zettels[category][subcategory] = _folder_names(
+                os.path.join(path, category, subcategory)
             )
 
-    lobby_zettels = list(
+    zettels["lobby"] = _lobby_zettels(path)  # type: ignore
+
+    return dict(zettels)
+
+
+def _folder_names(folder):
+    """Sorted names of the folders inside folder."""
+    return list(
+        sorted(f.name for f in storage.backend.list(folder) if f.is_dir())
+    )
+
+
+def _lobby_zettels(path):
+    """Sorted uids of the lobby zettels below the top level folder path."""
+    lobby = os.path.join(path, "lobby")
+    if defaults.lobby_shard_width:
+        # sharded lobby, see zettelkasten.parse.lobby_shard
+        folders = [f.path for f in storage.backend.list(lobby) if f.is_dir()]
+    else:
+        folders = [lobby]
+    return list(
         sorted(
             f.name
-            for f in os.scandir(os.path.join(path, "lobby"))
+            for folder in folders
+            for f in storage.backend.list(folder)
             if f.is_dir()
         )
     )
 
-    zettels["lobby"] = lobby_zettels  # type: ignore
 
-    return dict(zettels)
+@profiling.timed("compile.category_mapping")
+def category_mapping(category, subcategory=None):
+    """Mapping zettels to subcategories of a single category.
+
+    Like :func:`zettel_mapping`, but only lists the folder of category (and
+    of subcategory if given) instead of the complete zettelkasten.
 
+    Parameters
+    ----------
+    category: str
+        Name of the category. ``lobby`` states the :ref:`lobby`.
 
+    subcategory: str, None, default=None
+        Name of the only subcategory compiled. ``None`` compiles all
+        subcategories of category.
+
+    Return
+    ------
+    compiled_zettels: dict
+        The part of :func:`zettel_mapping` holding category (and
+        subcategory). Empty if there is no such category (or subcategory).
+
+    Examples
+    --------
+    >>> from zettelkasten import add, defaults, initialize
+    >>> defaults.location = "tests/doctest_dir/doctest_kasten"
+    >>> initialize.structure_zettelkasten()
+    >>> add.new_zettel("woodturning/tools/chisel", force_overwrite=True)
+    >>> category_mapping("woodturning", "tools")["woodturning"]["tools"][0]
+    'chisel'
+    >>> category_mapping("woodturning", "missing")
+    {}
+    """
+    path = defaults.location
+    if category in defaults.reserved_folder_names:
+        return dict()
+    if category == "lobby":
+        return {"lobby": _lobby_zettels(path)}
+
+    folder = os.path.join(path, category)
+    if subcategory is None:
+        if not storage.backend.is_dir(folder):
+            return dict()
+        subcategories = _folder_names(folder)
+    elif storage.backend.is_dir(os.path.join(folder, subcategory)):
+        subcategories = [subcategory]
+    else:
+        return dict()
+
+    return {
+        category: {
+            subcat: _folder_names(os.path.join(folder, subcat))
+            for subcat in subcategories
+        }
+    }
+
+
+@profiling.timed("compile.parsed_zettels")
 def parsed_zettels():
     """Mapping zettels to subcategories to categories.
 
@@ -30,6 +30,15 @@ config_overwrites = [
     # dict of key, string
     "zettel_meta_attribute_labels",
     "zettelkasten_bib_file",
+    "index_file",
+    "citation_file",
+    "metadata_cache_file",
+    "lobby_shard_width",
+    "zettel_name_cache_size",
+    "source_sharding",
+    "source_shard_width",
+    "storage_backend",
+    "database",
 ]
 """ Default attributes that are designed to be
 :mod:`monkeypatched <zettelkasten.monkeypatch>` during zettelkasten command
@@ -172,6 +181,39 @@ The zettelkasten main bibliography location. All of the references ever added
 are to be found inside this file.
 """
 
+index_file = ".zettelkasten_index.json"
+"""
+File inside the zettelkasten's top level folder the :mod:`zettelkasten index
+<zettelkasten.index>` is persisted in.
+"""
+
+citation_file = ".zettelkasten_citations.sqlite"
+"""
+SQLite database next to the :attr:`index_file` the zettels' citations and the
+main bibliography's urls of the persisted :mod:`zettelkasten index
+<zettelkasten.index>` are looked up in.
+"""
+
+metadata_cache_file = ".zettelkasten_metadata.sqlite"
+"""
+SQLite database inside the zettelkasten's top level folder the :mod:`metadata
+<zettelkasten.metadata>` extracted from source files is cached in.
+"""
+
+lobby_shard_width = 0
+"""
+Number of hex digits of a uid's hash naming the shard folder its :ref:`Lobby`
+zettel resides in, as in ``lobby/3f/my_zettel`` for ``2``. ``0`` puts every
+lobby zettel directly inside the lobby. Convert existing lobbies using
+:func:`zettelkasten.migrate.shard_lobby`.
+"""
+
+zettel_name_cache_size = 4096
+"""
+Number of split zettel names cached by :func:`zettelkasten.parse.zettel_name`
+(least recently used). ``None`` caches every name, ``0`` disables the cache.
+"""
+
 initial_folder_structure = [
     "lobby",
     f"{sources_directory}",
@@ -185,6 +227,16 @@ Folder created on the initial :ref:`setup <installation_setup>`.
 """
 
 source_file_formats = {
+    "archives": [
+        "tar.gz",
+        "tgz",
+        "tar.xz",
+        "txz",
+        "tar",
+        "zip",
+        "gz",
+        "xz",
+    ],
     "audios": [
         "mp3",
     ],
@@ -208,6 +260,37 @@ Mapping used for infering file types and respective reference file sortings
 (Video files beeing copied to ``_sources/videos/`` etc.).
 """
 
+source_sharding = "flat"
+"""
+Scheme spreading the files of each ``_sources/<type>/`` folder across shard
+folders. ``flat`` stores the files directly inside the type folder, ``hash``
+inside the folder named by the hex prefix of the file name's hash (see
+:attr:`source_shard_width`) and ``date`` inside ``<year>/<month>`` folders of
+the date the file was added. Convert existing sources using
+:func:`zettelkasten.migrate.shard_sources`.
+"""
+
+source_shard_width = 2
+"""
+Number of hex digits naming the shard folders of the ``hash``
+:attr:`source_sharding` scheme.
+"""
+
+storage_backend = "local"
+"""
+Storage the command line interface accesses the zettelkasten through, see
+:func:`zettelkasten.storage.configured_backend`. ``local`` stores it inside
+the folders at :attr:`location`, ``sqlite`` inside the :attr:`database` file.
+Convert existing zettelkastens using ``zk migrate sqlite``.
+"""
+
+database = None
+"""
+Location of the SQLite database file used by the ``sqlite``
+:attr:`storage_backend`. Design usage is to fallback on :attr:`location`
+suffixed by ``.sqlite``, as in ``~/zettelkasten.sqlite``.
+"""
+
 reserved_folder_names = [
     f"{sources_directory}",
     "pytest_dir",
@@ -218,7 +301,12 @@ reserved_folder_names = [
 
 
 def infer_file_type(f):
-    """Tries to enfer the file type by looking at the file ending."""
+    """Tries to enfer the file type by looking at the file ending.
+
+    Case sensitive and limited to the last file ending. Sources are typed by
+    :func:`zettelkasten.filetypes.infer_file_type`, which also handles
+    compound endings and files without ending.
+    """
     file_ending = f.split(".")[-1]
 
     for folder, file_endings in source_file_formats.items():
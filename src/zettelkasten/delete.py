@@ -0,0 +1,287 @@
+# zettelkasten/delete.py
+"""Module deleting zettels including their bibliography entries and sources.
+
+Deleting a zettel removes its folder, drops the keys only it cites from the
+:attr:`zettelkasten's bibliography file
+<zettelkasten.defaults.zettelkasten_bib_file>` and removes the files inside
+the :attr:`sources directory <zettelkasten.defaults.sources_directory>` no
+remaining entry points to. Keys and files still cited by any other zettel are
+kept.
+
+All zettels are validated before anything is deleted and the main
+bibliography is rewritten once for all of them, so deleting many zettels
+costs a single pass over it. The zettel folders are renamed aside before the
+main bibliography is rewritten and only removed afterwards. If either step
+fails, the folders are restored and the bibliography is left untouched.
+"""
+import os
+import shutil
+import typing
+
+from . import defaults
+from . import edit
+from . import index as zindex
+from . import parse
+from . import sources as zsources
+from . import storage
+from . import tracing
+
+
+class Deletion(typing.NamedTuple):
+    """Outcome of :func:`delete_zettels`.
+
+    Parameters
+    ----------
+    zettels: list
+        Names of the deleted zettels.
+
+    entries: list
+        Keys dropped from the zettelkasten's bibliography file.
+
+    sources: list
+        Locations of the removed source files.
+
+    linking: list
+        Names of the remaining zettels still linking to a deleted one.
+    """
+
+    zettels: typing.List[str]
+    entries: typing.List[str]
+    sources: typing.List[str]
+    linking: typing.List[str]
+
+
+def drop_entries(content, keys):
+    """Drop the entries of keys from a bibliography file's content.
+
+    Entries are matched by their key (see
+    :attr:`zettelkasten.parse.bib_entry_pattern`), so a key being part of
+    another key or of any field value is left untouched.
+
+    Parameters
+    ----------
+    content: str
+        Text content of a bibliography file.
+
+    keys: ~collections.abc.Container
+        Keys of the entries to drop.
+
+    Returns
+    -------
+    content: str
+        Content without the dropped entries.
+
+    Examples
+    --------
+    >>> content = (
+    ...     "@misc{pdf,\\n  title = {A},\\n}%\\n"
+    ...     "@misc{pdf_2,\\n  title = {pdf},\\n}%\\n")
+    >>> print(drop_entries(content, {"pdf"}), end="")
+    @misc{pdf_2,
+      title = {pdf},
+    }%
+    """
+    kept = list()
+    start = 0
+    for match in parse.bib_entry_pattern.finditer(content):
+        if match.group(2) not in keys:
+            continue
+        kept.append(content[start : match.start()])
+        start = match.end()
+        if content.startswith("\n", start):
+            start += 1
+    kept.append(content[start:])
+
+    return "".join(kept)
+
+
+def _citations(index, deleted):
+    """Bibliography keys cited by the deleted and by the kept zettels and
+    the kept zettels linking to deleted ones."""
+    cited = set()
+    kept = set()
+    linking = set()
+    for name, record in index.zettels.items():
+        if name in deleted:
+            cited.update(record["bib"])
+        else:
+            kept.update(record["bib"])
+            if deleted.intersection(record["links"]):
+                linking.add(name)
+    return cited, kept, linking
+
+
+def _released_sources(index, entries, remaining, sources):
+    """Source keys only the dropped entries point to."""
+
+    def source_keys(keys):
+        for key in keys:
+            url = index.sources[key]
+            if url and url.startswith("file://"):
+                yield zsources.source_key(url[len("file://") :], sources)
+
+    return set(source_keys(entries)) - set(source_keys(remaining))
+
+
+def _staging_folder(folder):
+    """Hidden sibling a zettel folder is renamed to before removing it."""
+    head, tail = os.path.split(folder)
+    return os.path.join(head, f".{tail}.deleted")
+
+
+def _restore(staged):
+    """Rename staged folders back to their original location."""
+    for folder, staging in staged.items():
+        os.rename(staging, folder)
+
+
+def _stage(folders):
+    """Rename the folders aside, restoring them all if any rename fails."""
+    staged = dict()
+    try:
+        for folder in folders:
+            staging = _staging_folder(folder)
+            os.rename(folder, staging)
+            staged[folder] = staging
+    except OSError:
+        _restore(staged)
+        raise
+    return staged
+
+
+def _remove_folders(folders, main_bib_file, entries):
+    """Remove the zettel folders and rewrite the main bibliography file.
+
+    Nothing is changed if reading the bibliography, staging the folders or
+    rewriting the bibliography fails.
+    """
+    content = None
+    if entries:
+        with open(main_bib_file) as f:
+            content = f.read()
+
+    staged = _stage(folders)
+    try:
+        if content is not None:
+            edit.write_atomically(
+                main_bib_file, drop_entries(content, set(entries))
+            )
+    except BaseException:
+        _restore(staged)
+        raise
+
+    for staging in staged.values():
+        shutil.rmtree(staging)
+
+
+def _remove_sources(released, sources):
+    """Remove the released source files, returning their locations."""
+    removed = list()
+    for key in sorted(released):
+        # never remove files outside of the sources directory
+        path = os.path.join(sources, key)
+        if os.path.isabs(key) or not os.path.isfile(path):
+            continue
+        os.remove(path)
+        removed.append(path)
+    return removed
+
+
+@tracing.traced("delete.delete_zettels")
+def delete_zettels(names, index=None):
+    """Delete zettels, their bibliography entries and source files.
+
+    Uses :attr:`zettelkasten.defaults.location` as top level folder.
+
+    Parameters
+    ----------
+    names: ~collections.abc.Iterable
+        Names of the zettels to delete, see
+        :func:`zettelkasten.parse.zettel_name`.
+
+    index: zettelkasten.index.ZettelIndex, None, default=None
+        Index the citing and linking zettels are looked up in. Refreshed
+        after the deletion. ``None`` uses
+        :func:`zettelkasten.index.persisted_index`.
+
+    Returns
+    -------
+    deletion: Deletion
+        Deleted zettels, dropped keys, removed source files and the zettels
+        left with links to deleted ones.
+
+    Raises
+    ------
+    FileNotFoundError
+        Raised if any of the zettels does not exist. Nothing is deleted
+        then.
+
+    OSError
+        Raised if the zettel folders could not be renamed or the
+        zettelkasten's bibliography file could not be rewritten. Nothing is
+        deleted then.
+
+    RuntimeError
+        Raised if the :attr:`storage backend <zettelkasten.storage.backend>`
+        is not local, see :func:`zettelkasten.storage.require_local`.
+
+    Examples
+    --------
+    >>> from zettelkasten import add, defaults, initialize
+    >>> defaults.location = "tests/doctest_dir/doctest_kasten"
+    >>> initialize.structure_zettelkasten()
+    >>> add.new_zettel("deleted_idea", force_overwrite=True)
+    >>> delete_zettels(["deleted_idea"]).zettels
+    ['lobby/deleted_idea']
+    >>> parse.zettel_path("deleted_idea").exists()
+    False
+    """
+    storage.require_local("Deleting zettels")
+    folders = dict()
+    for name in names:
+        org_file = os.path.abspath(parse.zettel_path(name))
+        if not os.path.isfile(org_file):
+            raise FileNotFoundError(f"Zettel '{name}' not found")
+        folders[os.path.dirname(org_file)] = name
+
+    if index is None:
+        index = zindex.persisted_index()
+
+    # make sure the deleted zettels' records are up to date
+    location = os.path.abspath(index.location)
+    deleted = list()
+    for folder in folders:
+        index.refresh(folder)
+        parts = os.path.relpath(folder, location).split(os.sep)
+        deleted.append(zindex.folder_name(parts))
+
+    cited, kept, linking = _citations(index, set(deleted))
+    entries = sorted(key for key in cited - kept if key in index.sources)
+    remaining = [
+        key for key in index.sources if key not in cited or key in kept
+    ]
+    sources = os.path.join(location, defaults.sources_directory)
+    main_bib_file = os.path.join(sources, defaults.zettelkasten_bib_file)
+    released = _released_sources(index, entries, remaining, sources)
+
+    _remove_folders(folders, main_bib_file, entries)
+    for folder in folders:
+        index.refresh(folder)
+    removed = _remove_sources(released, sources)
+    index.refresh_sources()
+    zindex.refresh_persisted([*folders, main_bib_file])
+
+    deletion = Deletion(
+        zettels=sorted(deleted),
+        entries=entries,
+        sources=removed,
+        linking=sorted(linking),
+    )
+    tracing.event(
+        "delete.delete_zettels.deleted",
+        zettels=len(deletion.zettels),
+        entries=len(deletion.entries),
+        sources=len(deletion.sources),
+    )
+
+    return deletion
@@ -0,0 +1,287 @@
+# zettelkasten/edit.py
+"""Module editing the header attributes of many zettels at once.
+
+Only the header lines of the zettels' org files (as written by
+:func:`zettelkasten.add.write_org_zettel_attributes`) are rewritten, the
+bodies are left untouched. Each org file is replaced atomically, so an
+interrupted edit never leaves a partially written zettel behind. The zettels
+are edited by a process pool.
+
+Examples
+--------
+>>> content = "#+Title: chisel \\n#+Tags: ['#Rework'] \\n\\n* Usage\\n"
+>>> print(edit_header(content, [("tags", "add", ["#Sharp"])],
+...                   {"uid": "#+Title:", "tags": "#+Tags:"}), end="")
+#+Title: chisel
+#+Tags: ['#Rework', '#Sharp']
+<BLANKLINE>
+* Usage
+"""
+import ast
+import concurrent.futures
+import fnmatch
+import os
+
+from . import defaults
+from . import index as zindex
+from . import parse
+from . import storage
+from . import tracing
+
+edit_operations = ("set", "add", "remove")
+"""Supported edit operations. ``set`` replaces an attribute's value, ``add``
+and ``remove`` add or remove items of list attributes as ``tags``."""
+
+
+def write_atomically(path, content):
+    """Replace the content of a file without leaving it partially written.
+
+    The content is written into a temporary file next to path, which then
+    replaces path.
+
+    Parameters
+    ----------
+    path: str, pathlib.Path
+        File to be written.
+
+    content: str
+        New text content of the file.
+    """
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as f:
+        f.write(content)
+    os.replace(temporary, path)
+
+
+def attribute_items(value):
+    """Items of a list attribute's value.
+
+    Parameters
+    ----------
+    value: str, None
+        Attribute value as stated inside the org file's header.
+
+    Returns
+    -------
+    items: list
+        Items of the stated list. Empty for ``None`` values, single values
+        are wrapped into a list.
+
+    Examples
+    --------
+    >>> attribute_items("['#Rework', '#NiceTry']")
+    ['#Rework', '#NiceTry']
+    >>> attribute_items("None")
+    []
+    >>> attribute_items("#Rework")
+    ['#Rework']
+    """
+    if value is None or value in ("", "None"):
+        return list()
+    if value.startswith("["):
+        try:
+            items = ast.literal_eval(value)
+        except (SyntaxError, ValueError):
+            pass
+        else:
+            if isinstance(items, list):
+                return [str(item) for item in items]
+    return [value]
+
+
+def edit_header(content, edits, labels=None):
+    """Apply edits to the header attributes of an org file's content.
+
+    Parameters
+    ----------
+    content: str
+        Text content of a zettel's org file.
+
+    edits: ~collections.abc.Iterable
+        ``(attribute, operation, values)`` tuples applied in order.
+        Operations are stated in :attr:`edit_operations`. ``set`` replaces
+        the attribute's value by the single item of values.
+
+    labels: dict, None, default=None
+        Mapping of attribute names to their header labels. Design usage is
+        to fallback on :attr:`zettelkasten.defaults.zettel_meta_attribute_labels`.
+
+    Returns
+    -------
+    content: str
+        Content with rewritten header lines. Attributes not present inside
+        the header are appended to it.
+
+    Raises
+    ------
+    ValueError
+        Raised for unknown attributes or operations.
+    """
+    if labels is None:
+        labels = defaults.zettel_meta_attribute_labels
+
+    lines = content.splitlines(True)
+    header = 0
+    positions = dict()
+    values = dict()
+    while header < len(lines) and lines[header].startswith("#+"):
+        label, _, value = lines[header].partition(" ")
+        positions[label] = header
+        values[label] = value.strip()
+        header += 1
+
+    changed = dict()
+    for attribute, operation, items in edits:
+        if attribute not in labels:
+            raise ValueError(f"Unknown attribute '{attribute}'")
+        label = labels[attribute]
+        current = changed.get(label, values.get(label))
+        if operation == "set":
+            (value,) = items
+        elif operation == "add":
+            value = attribute_items(current)
+            value += [item for item in items if item not in value]
+        elif operation == "remove":
+            value = [
+                item for item in attribute_items(current) if item not in items
+            ]
+        else:
+            raise ValueError(f"Unknown edit operation '{operation}'")
+        changed[label] = str(value)
+
+    appended = list()
+    for label, value in changed.items():
+        line = " ".join((label, value, "\n"))
+        if label in positions:
+            lines[positions[label]] = line
+        else:
+            appended.append(line)
+    lines[header:header] = appended
+
+    return "".join(lines)
+
+
+def _edit_zettel(job):
+    """Process pool worker editing a single zettel's org file.
+
+    Returns ``True`` if the file changed.
+    """
+    org_file, edits, labels = job
+    with open(org_file) as f:
+        content = f.read()
+    edited = edit_header(content, edits, labels)
+    if edited == content:
+        return False
+    write_atomically(org_file, edited)
+    return True
+
+
+def select(category=None, subcategory=None, pattern=None):
+    """Names of the zettels matching all of the filters.
+
+    Parameters
+    ----------
+    category: str, None, default=None
+        Exact or glob category filter, see
+        :func:`zettelkasten.index.filter_mapping`.
+
+    subcategory: str, None, default=None
+        Exact or glob subcategory filter, see
+        :func:`zettelkasten.index.filter_mapping`.
+
+    pattern: str, None, default=None
+        Glob pattern the full zettel names have to match as in
+        ``woodturning/*/ch*``. ``None`` matches all names.
+
+    Returns
+    -------
+    names: list
+        Alphabetically sorted zettel names.
+    """
+    names = zindex.select_zettels(category=category, subcategory=subcategory)
+    if pattern is not None:
+        names = fnmatch.filter(names, pattern)
+    return names
+
+
+@tracing.traced("edit.edit_zettels")
+def edit_zettels(names, edits, processes=None):
+    """Edit the header attributes of multiple zettels.
+
+    Uses :attr:`zettelkasten.defaults.location` as top level folder.
+
+    Parameters
+    ----------
+    names: ~collections.abc.Iterable
+        Names of the zettels to edit as in ``woodturning/tools/chisel`` or
+        ``lobby/my_zettel``, see :func:`select`.
+
+    edits: list
+        ``(attribute, operation, values)`` tuples, see :func:`edit_header`.
+        The name attributes ``uid``, ``category`` and ``subcategory`` can
+        not be edited, use :func:`zettelkasten.move.move_zettel` instead.
+
+    processes: int, None, default=None
+        Number of worker processes used for editing. ``None`` uses
+        :func:`os.cpu_count`. ``1`` edits inside the calling process.
+
+    Returns
+    -------
+    changed: list
+        Names of the zettels whose org file changed.
+
+    Raises
+    ------
+    ValueError
+        Raised for name attributes, unknown attributes or operations.
+
+    RuntimeError
+        Raised if the :attr:`storage backend <zettelkasten.storage.backend>`
+        is not local, see :func:`zettelkasten.storage.require_local`.
+
+    Examples
+    --------
+    >>> from zettelkasten import add, defaults, initialize
+    >>> defaults.location = "tests/doctest_dir/doctest_kasten"
+    >>> initialize.structure_zettelkasten()
+    >>> add.new_zettel("woodturning/tools/chisel", force_overwrite=True)
+    >>> edit_zettels(["woodturning/tools/chisel"],
+    ...              [("tags", "add", ["#Sharp"])], processes=1)
+    ['woodturning/tools/chisel']
+    >>> edit_zettels(["woodturning/tools/chisel"],
+    ...              [("tags", "add", ["#Sharp"])], processes=1)
+    []
+    """
+    storage.require_local("Editing zettels")
+    # worker processes do not necessarily share the monkeypatched defaults
+    labels = dict(defaults.zettel_meta_attribute_labels)
+    for attribute, operation, _ in edits:
+        if attribute in defaults.required_attributes:
+            raise ValueError(
+                f"Attribute '{attribute}' is part of the zettel's name"
+            )
+        if attribute not in labels:
+            raise ValueError(f"Unknown attribute '{attribute}'")
+        if operation not in edit_operations:
+            raise ValueError(f"Unknown edit operation '{operation}'")
+
+    names = list(names)
+    jobs = list()
+    for name in names:
+        parts = parse.zettel_folder_parts(name)
+        org_file = os.path.join(defaults.location, *parts, f"{parts[-1]}.org")
+        jobs.append((org_file, edits, labels))
+
+    if processes == 1 or len(jobs) < 2:
+        results = list(map(_edit_zettel, jobs))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            workers = processes or os.cpu_count() or 1
+            chunksize = max(1, len(jobs) // (4 * workers))
+            results = list(
+                executor.map(_edit_zettel, jobs, chunksize=chunksize)
+            )
+
+    changed = [job[0] for job, edited in zip(jobs, results) if edited]
+    zindex.refresh_persisted(changed)
+    return [name for name, edited in zip(names, results) if edited]
@@ -0,0 +1,262 @@
+# zettelkasten/filetypes.py
+"""Module registering the source file types and their ingestion handlers.
+
+The type of a source file decides the ``_sources/<type>/`` folder it is
+copied into. Types are inferred by their file extension first, looked up in
+a mapping of lowercase extensions built once from
+:attr:`zettelkasten.defaults.source_file_formats`. Files with an unknown (or
+no) extension are identified by the magic bytes stated in
+:attr:`signatures`, reading only their first :attr:`sniff_size` bytes.
+
+Each type is ingested by its handler (see :attr:`handlers`), falling back on
+:func:`copy_source`. Compressed archives (``tar.gz``, ``zip``, ...) are
+registered as the ``archives`` type. Pdfs, images, audio and video files are
+copied by :func:`copy_with_metadata`, which also extracts their metadata in
+the background.
+
+Examples
+--------
+>>> infer_file_type("Manual.PDF")
+'pdfs'
+>>> infer_file_type("backup.tar.gz")
+'archives'
+>>> infer_file_type("tests/bib_sources/test_pdf.pdf", sniff=True)
+'pdfs'
+"""
+import os
+
+from . import defaults
+from . import metadata
+from . import tracing
+from . import transfer
+
+sniff_size = 16
+"""Number of leading bytes read for identifying a file by its content."""
+
+signatures = [
+    (0, b"%PDF-", "pdfs"),
+    (0, b"\xff\xd8\xff", "images"),
+    (0, b"\x89PNG\r\n\x1a\n", "images"),
+    (0, b"GIF8", "images"),
+    (8, b"WEBP", "images"),
+    (0, b"ID3", "audios"),
+    (0, b"\xff\xfb", "audios"),
+    (0, b"\xff\xf3", "audios"),
+    (0, b"fLaC", "audios"),
+    (0, b"OggS", "audios"),
+    (8, b"WAVE", "audios"),
+    (0, b"\x1a\x45\xdf\xa3", "videos"),
+    (4, b"ftyp", "videos"),
+    (0, b"\x1f\x8b", "archives"),
+    (0, b"\xfd7zXZ\x00", "archives"),
+    (0, b"PK\x03\x04", "archives"),
+]
+"""Magic bytes identifying a file type as ``(offset, magic bytes, type)``,
+matched in order. Types not stated in
+:attr:`zettelkasten.defaults.source_file_formats` are ignored. Append to
+register further types."""
+
+_extensions = None
+
+
+def clear_caches():
+    """Drop the extension mapping.
+
+    Called by :func:`zettelkasten.monkeypatch.patch_defaults`, since the
+    mapping depends on :attr:`zettelkasten.defaults.source_file_formats`.
+    """
+    global _extensions
+    _extensions = None
+
+
+def extension_map():
+    """Mapping of lowercase file extensions to their type.
+
+    Built once from :attr:`zettelkasten.defaults.source_file_formats` and
+    cached until :func:`clear_caches` is called.
+
+    Examples
+    --------
+    >>> extension_map()["jpg"]
+    'images'
+    """
+    global _extensions
+    if _extensions is None:
+        _extensions = {
+            ending.lower().lstrip("."): ftype
+            for ftype, endings in defaults.source_file_formats.items()
+            for ending in endings
+            if ending
+        }
+    return _extensions
+
+
+def extension_type(file_name):
+    """Type of a file by its extension.
+
+    Compound extensions as in ``tar.gz`` are tried before their last part.
+
+    Parameters
+    ----------
+    file_name: str
+        Name or location of the file.
+
+    Returns
+    -------
+    ftype: str, None
+        Type of the file or ``None`` if its extension is not registered.
+
+    Examples
+    --------
+    >>> extension_type("woodturning.MP4")
+    'videos'
+    >>> extension_type("download")
+    """
+    extensions = extension_map()
+    parts = os.path.basename(file_name).lower().split(".")
+    for i in range(1, len(parts)):
+        ftype = extensions.get(".".join(parts[i:]))
+        if ftype is not None:
+            return ftype
+    return None
+
+
+def sniff_type(path):
+    """Type of a file by the magic bytes at its beginning.
+
+    Parameters
+    ----------
+    path: str, pathlib.Path
+        Location of the file. Only its first :attr:`sniff_size` bytes are
+        read.
+
+    Returns
+    -------
+    ftype: str, None
+        Type of the first matching :attr:`signatures` entry or ``None`` if
+        the file is unreadable or no registered type matches.
+    """
+    try:
+        with open(path, "rb") as f:
+            head = f.read(sniff_size)
+    except OSError:
+        return None
+
+    registered = defaults.source_file_formats
+    for offset, magic, ftype in signatures:
+        if ftype in registered and head[offset : offset + len(magic)] == magic:
+            return ftype
+    return None
+
+
+def infer_file_type(path, sniff=True):
+    """Infer the type of a source file.
+
+    Parameters
+    ----------
+    path: str, pathlib.Path
+        Location of the file.
+
+    sniff: bool, default=True
+        If ``True`` files with an unknown extension are identified by their
+        content, see :func:`sniff_type`.
+
+    Returns
+    -------
+    ftype: str, None
+        Type folder as in ``pdfs`` or ``None`` if the type is unknown.
+    """
+    path = os.fspath(path)
+    ftype = extension_type(path)
+    if ftype is None and sniff:
+        ftype = sniff_type(path)
+        tracing.event(
+            "filetypes.infer_file_type.sniffed", path=path, ftype=ftype
+        )
+    return ftype
+
+
+def file_name(source_file, ftype):
+    """Name a source file is stored as.
+
+    Files whose extension does not state their type (as downloads without
+    any extension) get the first extension registered for the type
+    appended, so the stored file is recognized by its extension afterwards.
+
+    Examples
+    --------
+    >>> file_name("/tmp/download", "pdfs")
+    'download.pdf'
+    >>> file_name("/tmp/Manual.PDF", "pdfs")
+    'Manual.PDF'
+    """
+    name = os.path.basename(os.fspath(source_file))
+    if extension_type(name) == ftype:
+        return name
+    endings = defaults.source_file_formats.get(ftype)
+    if not endings:
+        return name
+    return f"{name}.{endings[0].lstrip('.')}"
+
+
+def copy_source(source_file, destination):
+    """Default handler copying a source file including its meta data.
+
+    Copies in resumable chunks, see :func:`zettelkasten.transfer.copy_file`.
+    """
+    transfer.copy_file(source_file, destination)
+
+
+def _zettelkasten_location(destination):
+    """Top level folder of the zettelkasten a source file is stored in.
+
+    ``None`` if destination is not inside a sources directory.
+    """
+    parts = os.path.abspath(destination).split(os.sep)[:-1]
+    if defaults.sources_directory not in parts:
+        return None
+    end = len(parts) - parts[::-1].index(defaults.sources_directory) - 1
+    return os.sep.join(parts[:end]) or os.sep
+
+
+def copy_with_metadata(source_file, destination):
+    """Handler copying a source file and extracting its metadata.
+
+    Copies as :func:`copy_source`, then submits the extraction to the
+    background workers of :func:`zettelkasten.metadata.submit`, caching the
+    metadata inside the zettelkasten destination is part of.
+    """
+    copy_source(source_file, destination)
+    metadata.submit(destination, _zettelkasten_location(destination))
+
+
+handlers = {
+    "archives": copy_source,
+    "audios": copy_with_metadata,
+    "images": copy_with_metadata,
+    "pdfs": copy_with_metadata,
+    "videos": copy_with_metadata,
+}
+"""Mapping of types to the callables ingesting their files as
+``handler(source_file, destination)``. Replace or add entries to ingest a
+type differently. Types without handler are ingested by
+:func:`copy_source`. Types :mod:`zettelkasten.metadata` has extractors for
+are ingested by :func:`copy_with_metadata`."""
+
+
+def ingest(source_file, destination, ftype):
+    """Ingest a source file using the handler of its type.
+
+    Parameters
+    ----------
+    source_file: str, pathlib.Path
+        Location of the file to ingest.
+
+    destination: str, pathlib.Path
+        Location the file is stored at.
+
+    ftype: str
+        Type of the file, see :func:`infer_file_type`.
+    """
+    handler = handlers.get(ftype, copy_source)
+    handler(source_file, destination)
@@ -0,0 +1,434 @@
+# zettelkasten/find.py
+"""Module providing fuzzy finding of zettels by name.
+
+Queries match every zettel name containing the query's characters in order
+(as in fzf). Matching names are ranked by how well the characters align:
+consecutive characters and characters at the start of a name part score
+higher, gaps between characters cost.
+
+Candidates are found by regular expression scans over the names' last
+parts, joined into one buffer per folder (see :class:`Finder`), so the
+per-name scoring only runs for names that actually match.
+
+Examples
+--------
+>>> finder = Finder([
+...     "woodturning/tools/chisel",
+...     "woodturning/tools/skew",
+...     "carpentry/tools/chisel",
+...     "lobby/cheese_sale",
+... ])
+>>> finder.find("chsl")
+['woodturning/tools/chisel', 'carpentry/tools/chisel', 'lobby/cheese_sale']
+>>> finder.find("wtskew")
+['woodturning/tools/skew']
+"""
+import heapq
+import re
+import sys
+
+from . import defaults
+from . import index as zindex
+
+score_match = 16
+"""Score of each matched character."""
+
+bonus_boundary = 8
+"""Bonus of characters matched at the start of a name part. Doubled for the
+query's first character."""
+
+bonus_consecutive = 4
+"""Bonus of characters matched right after the previous one."""
+
+penalty_gap_start = 3
+"""Penalty of a gap between matched characters."""
+
+penalty_gap_extension = 1
+"""Penalty of each additional character inside a gap."""
+
+boundary_characters = "/_-. "
+"""Characters separating the parts of a name."""
+
+min_folder_size = 32
+"""Minimum number of names of a folder searched on its own by
+:class:`Finder`. Names of smaller folders are searched together."""
+
+_possessive = "+" if sys.version_info >= (3, 11) else ""
+
+
+def pattern(query):
+    """Compile the regular expression matching names containing query.
+
+    Each query character is captured by its own group at its leftmost
+    position after the first character. Negated character classes keep
+    the matches inside a single line of a newline separated buffer. They
+    are possessive where supported (Python 3.11+), so failing lines are
+    not backtracked.
+
+    Parameters
+    ----------
+    query: str
+        Characters expected in the names in this order.
+    """
+    parts = list()
+    for i, char in enumerate(query):
+        escaped = re.escape(char)
+        if i == 0:
+            parts.append(f"({escaped})")
+        else:
+            parts.append(f"[^{escaped}\\n]*{_possessive}({escaped})")
+
+    return re.compile("".join(parts))
+
+
+def _alignment_score(text, positions):
+    """Score the query characters matched at positions inside text.
+
+    As in fzf, characters continuing a consecutive chunk inherit the
+    boundary bonus of the chunk's first character.
+    """
+    score = 0
+    previous = None
+    for position in positions:
+        if position == 0 or text[position - 1] in _boundaries:
+            bonus = bonus_boundary
+        else:
+            bonus = 0
+
+        if previous is None:
+            score += score_match + 2 * bonus
+            chunk_bonus = bonus
+        elif position == previous + 1:
+            chunk_bonus = max(chunk_bonus, bonus)
+            score += score_match + max(bonus, chunk_bonus, bonus_consecutive)
+        else:
+            gap = position - previous - 1
+            score += score_match + bonus - penalty_gap_start
+            score -= penalty_gap_extension * (gap - 1)
+            chunk_bonus = bonus
+        previous = position
+
+    return score
+
+
+_boundaries = boundary_characters + "\n"
+
+
+def max_score(query):
+    """Highest possible score of query.
+
+    Reached by names containing the query as a whole at the start of a name
+    part.
+    """
+    return (
+        len(query) * score_match
+        + 2 * bonus_boundary
+        + (len(query) - 1) * bonus_boundary
+    )
+
+
+def _line_scorer(query, search):
+    """Function scoring the best alignment of query inside a line.
+
+    The function is called as ``score_line(text, match, end)`` with the
+    first match of search inside the line of text ending at end. Alignments
+    are tried from each occurrence of the query's first character (starting
+    with the one of match), each continued by the leftmost following
+    characters. This covers contiguous occurrences of the query as well.
+
+    An alignment's score only depends on the text it spans (including the
+    character in front of it), so scores are cached by that text. Names
+    sharing their structure, as ``zettel0001018`` and ``zettel0001019``,
+    are scored once.
+    """
+    groups = range(1, len(query) + 1)
+    best_possible = max_score(query)
+    cache = dict()
+
+    def score_line(text, match, end):
+        best = None
+        while match is not None:
+            start = match.start()
+            if start:
+                window = text[start - 1 : match.end()]
+            else:
+                window = "\n" + text[: match.end()]
+            score = cache.get(window)
+            if score is None:
+                offset = start - 1
+                score = cache[window] = _alignment_score(
+                    window, [match.start(g) - offset for g in groups]
+                )
+            if best is None or score > best:
+                best = score
+                if best == best_possible:
+                    break
+            match = search(text, start + 1, end)
+
+        return best
+
+    return score_line
+
+
+def score(name, query):
+    """Score how well a name matches query.
+
+    Matching is case insensitive unless the query contains uppercase
+    characters (smart case).
+
+    Parameters
+    ----------
+    name: str
+        Candidate zettel name.
+
+    query: str
+        Characters expected in name in this order.
+
+    Returns
+    -------
+    score: int, None
+        Higher is better. ``None`` if name does not contain the query's
+        characters in order.
+
+    Examples
+    --------
+    >>> score("woodturning/tools/chisel", "chisel") > score(
+    ...     "lobby/cheese_sale", "chsl")
+    True
+    >>> score("woodturning/tools/chisel", "xyz") is None
+    True
+    """
+    if query == query.lower():
+        name = name.lower()
+
+    regex = pattern(query)
+    match = regex.search(name)
+    if match is None:
+        return None
+
+    return _line_scorer(query, regex.search)(name, match, len(name))
+
+
+def _consumed(text, query):
+    """Number of leading query characters found in text in this order."""
+    position = 0
+    for consumed, char in enumerate(query):
+        position = text.find(char, position) + 1
+        if not position:
+            return consumed
+    return len(query)
+
+
+def _lines(buffer, search):
+    """Lines of a newline separated buffer matched by search.
+
+    Yields the line number, the first match inside the line and the line's
+    end for each matching line.
+    """
+    line = 0
+    previous = 0
+    match = search(buffer)
+    while match is not None:
+        line += buffer.count("\n", previous, match.start())
+        end = buffer.find("\n", match.end())
+        if end < 0:
+            end = len(buffer)
+        yield line, match, end
+        previous = end
+        match = search(buffer, end)
+
+
+class Finder:
+    """Fuzzy finder ranking a fixed list of names.
+
+    Names are grouped by their folder, the part up to the last
+    :attr:`~zettelkasten.defaults.name_sep`, and the names' last parts are
+    joined into one buffer per folder. A query first consumes as many of
+    its characters as possible inside each folder, so only the rest of the
+    query is searched for inside the folder's buffer, and only if the buffer
+    contains all of the rest's characters. Only the names found are scored.
+
+    Parameters
+    ----------
+    names: ~collections.abc.Iterable
+        Names to be searched. Grouped and joined into buffers once, so a
+        finder is designed to be reused for multiple queries. Equally scored
+        names are ranked in the order given.
+
+    Notes
+    -----
+    Folders skipped by their characters or by the query's leading
+    characters cost nothing, so queries into sorted zettelkastens of a
+    million names are answered within milliseconds. Unstructured names, e.g.
+    a large :ref:`Lobby`, form a single buffer and every matching name is
+    scored. Short queries of common characters match a large share of such
+    names and take a few hundred milliseconds per million names. Filtering
+    names by the query's characters does not help there, since the time
+    goes into scoring names that actually match. Longer or rarer queries
+    are answered quickly again.
+    """
+
+    def __init__(self, names):
+        """Prepare the search buffers."""
+        self.names = [name for name in names if "\n" not in name]
+        self.buffer = "\n".join(self.names)
+        self.folded = self.buffer.lower()
+
+        groups = dict()
+        for i, name in enumerate(self.names):
+            folder = name[: name.rfind(defaults.name_sep) + 1]
+            groups.setdefault(folder, []).append(i)
+
+        self._folders = list()
+        mixed = list()
+        for folder, indices in groups.items():
+            if len(indices) < min_folder_size:
+                mixed.extend(indices)
+                continue
+            bases = [self.names[i][len(folder) :] for i in indices]
+            self._add_folder(folder, indices, bases)
+        if mixed:
+            mixed.sort()
+            self._add_folder("", mixed, [self.names[i] for i in mixed])
+
+    def _add_folder(self, folder, indices, bases):
+        """Add the search buffers of the names inside a folder."""
+        buffer = "\n".join(bases)
+        folded = buffer.lower()
+        self._folders.append(
+            (folder, indices, buffer, folded, frozenset(folded))
+        )
+
+    def __len__(self):
+        """Number of searchable names."""
+        return len(self.names)
+
+    def _contiguous(self, query, buffer, limit):
+        """Indices of names containing query as a whole at a part start.
+
+        These reach the best possible score. At most limit indices are
+        returned, in order.
+        """
+        indices = list()
+        line = 0
+        previous = 0
+        position = buffer.find(query)
+        while position >= 0 and (limit is None or len(indices) < limit):
+            if position == 0 or buffer[position - 1] in _boundaries:
+                line += buffer.count("\n", previous, position)
+                indices.append(line)
+                previous = buffer.find("\n", position)
+                if previous < 0:
+                    break
+                position = previous
+            position = buffer.find(query, position + 1)
+        return indices
+
+    def _scored(self, query, folded):
+        """Scores and indices of all names containing the query's characters
+        in order.
+
+        Parameters
+        ----------
+        query: str
+            Characters expected in the names in this order.
+
+        folded: bool
+            Match against the lowercased names.
+        """
+        search = pattern(query).search
+        score_line = _line_scorer(query, search)
+        for folder, indices, buffer, lowered, chars in self._folders:
+            if folded:
+                folder, buffer = folder.lower(), lowered
+            consumed = _consumed(folder, query)
+            if not chars.issuperset(query[consumed:].lower()):
+                continue
+
+            if not consumed:
+                # all alignments lie inside the names' last parts, which
+                # are scored inside the buffer
+                for line, match, end in _lines(buffer, search):
+                    yield score_line(buffer, match, end), indices[line]
+                continue
+
+            lines = range(len(indices))
+            if consumed < len(query):
+                rest = pattern(query[consumed:]).search
+                lines = (line for line, _, _ in _lines(buffer, rest))
+            for line in lines:
+                text = self.names[indices[line]]
+                if folded:
+                    text = text.lower()
+                yield score_line(text, search(text), len(text)), indices[line]
+
+    def ranked(self, query, limit=10):
+        """Best matching names including their scores.
+
+        Matching is case insensitive unless the query contains uppercase
+        characters (smart case).
+
+        Parameters
+        ----------
+        query: str
+            Characters expected in the names in this order.
+
+        limit: int, None, default=10
+            Maximum number of names returned. ``None`` returns all matches.
+
+        Returns
+        -------
+        ranked: list
+            List of ``(score, name)`` tuples, best match first.
+        """
+        if not query:
+            return [(0, name) for name in self.names[:limit]]
+
+        folded = query == query.lower()
+        best_possible = max_score(query)
+        # heap of the best candidates found, ranked by score and then by
+        # their order (negated index)
+        best = [
+            (best_possible, -i)
+            for i in self._contiguous(
+                query, self.folded if folded else self.buffer, limit
+            )
+        ]
+        if limit is None or len(best) < limit:
+            heapq.heapify(best)
+            found = {-i for _, i in best}
+            for score, i in self._scored(query, folded):
+                if i in found:
+                    continue
+                candidate = (score, -i)
+                if limit is None or len(best) < limit:
+                    heapq.heappush(best, candidate)
+                elif candidate > best[0]:
+                    heapq.heapreplace(best, candidate)
+
+        return [
+            (score, self.names[-i]) for score, i in sorted(best, reverse=True)
+        ]
+
+    def find(self, query, limit=10):
+        """Best matching names, see :meth:`ranked`."""
+        return [name for _, name in self.ranked(query, limit)]
+
+
+def find_zettels(query, limit=10):
+    """Fuzzy find zettels by name.
+
+    Parameters
+    ----------
+    query: str
+        Characters expected in the zettel names in this order.
+
+    limit: int, None, default=10
+        Maximum number of names returned. ``None`` returns all matches.
+
+    Returns
+    -------
+    names: list
+        Best matching zettel names, best match first. See :class:`Finder`.
+    """
+    return Finder(zindex.zettel_tree()).find(query, limit)
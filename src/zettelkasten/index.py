@@ -0,0 +1,1247 @@
+# zettelkasten/index.py
+"""Module providing an incrementally updatable index of the zettelkasten.
+
+The index maps each zettel name (as compiled by
+:func:`zettelkasten.compile.parsed_zettels`) to its header attributes and its
+bibliography keys. It also maps each key of the :attr:`main bibliography
+<zettelkasten.defaults.zettelkasten_bib_file>` to the source file it points
+to. Reverse indices of the links (:meth:`ZettelIndex.backlinks`) and the
+citations (:meth:`ZettelIndex.cited_by`) are derived from the records.
+
+The index is persisted as :attr:`zettelkasten.defaults.index_file` inside the
+zettelkasten and kept up to date by the :mod:`watcher <zettelkasten.watch>`.
+Without a watcher, the commands changing zettels update the persisted index.
+It is validated against the modification times of the zettel and
+bibliography files only if the zettelkasten's top level folder changed or
+on demand, see :func:`persisted_index`.
+
+Saving the index also updates the citations inside the
+:attr:`zettelkasten.defaults.citation_file` database, only rewriting the
+zettels refreshed since the index was loaded. :func:`citing_zettels` and
+:func:`zettel_references` look up that database instead of loading the
+index.
+"""
+import fnmatch
+import heapq
+import json
+import logging
+import os
+import sqlite3
+
+from . import compile as comp
+from . import defaults
+from . import parse
+from . import storage
+from . import tree as ztree
+
+logger = logging.getLogger(__name__)
+
+format_version = 4
+"""Version of the persisted index format."""
+
+pid_file = ".zettelkasten_watch.pid"
+"""File inside the zettelkasten a running :mod:`watcher
+<zettelkasten.watch>` states its process id in."""
+
+_citation_schema = """
+CREATE TABLE IF NOT EXISTS zettels (name TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS citations (
+    key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (key, name)
+);
+CREATE INDEX IF NOT EXISTS citations_name ON citations (name);
+CREATE TABLE IF NOT EXISTS sources (key TEXT PRIMARY KEY, url TEXT);
+"""
+
+sort_keys = ("name", "doc", "mtime")
+"""Keys zettel selections can be sorted by, see :func:`select_zettels`."""
+
+
+def linked_zettel(zettel_dir, link, location):
+    """Name of the zettel an org file link points to.
+
+    Parameters
+    ----------
+    zettel_dir: str
+        Folder of the linking zettel, relative links are resolved against.
+
+    link: str
+        Linked file as stated inside the link, see
+        :func:`zettelkasten.parse.org_file_links`.
+
+    location: str
+        Top level folder of the zettelkasten.
+
+    Returns
+    -------
+    name: str, None
+        Name of the linked zettel or ``None`` if the link points to any other
+        file.
+
+    Examples
+    --------
+    >>> linked_zettel("/kasten/wood/tools/chisel", "../skew/skew.org", "/kasten")
+    'wood/tools/skew'
+    >>> linked_zettel("/kasten/wood/tools/chisel", "notes.org", "/kasten")
+    """
+    target = os.path.normpath(os.path.join(zettel_dir, link))
+    parts = os.path.relpath(target, location).split(os.sep)
+    if parts[0] in defaults.reserved_folder_names or parts[0] == os.pardir:
+        return None
+    if len(parts) != _depth(parts) + 1 or parts[-1] != f"{parts[-2]}.org":
+        return None
+    return folder_name(parts[:-1])
+
+
+def _depth(parts):
+    """Number of folder parts leading to a zettel folder below parts[0]."""
+    if parts[0] == "lobby":
+        return 3 if defaults.lobby_shard_width else 2
+    return 3
+
+
+def folder_name(parts):
+    """Name of the zettel inside a folder.
+
+    Parameters
+    ----------
+    parts: list
+        Folder names leading to the zettel's folder relative to the
+        zettelkasten's location, see
+        :func:`zettelkasten.parse.zettel_folder_parts`.
+
+    Returns
+    -------
+    name: str
+        Full zettel name. Shard folders of the :ref:`Lobby` are no part of
+        the name.
+
+    Examples
+    --------
+    >>> folder_name(["woodturning", "tools", "chisel"])
+    'woodturning/tools/chisel'
+    >>> folder_name(["lobby", "3d", "my_zettel"])
+    'lobby/my_zettel'
+    """
+    if parts[0] == "lobby":
+        return defaults.name_sep.join((parts[0], parts[-1]))
+    return defaults.name_sep.join(parts)
+
+
+def _mtime(path):
+    """Modification time of path or ``None`` if it does not exist."""
+    status = storage.backend.stat(path)
+    return None if status is None else status.mtime
+
+
+def _read_file(path):
+    """Content and modification time of a file, ``None`` if missing."""
+    # stat first, so a concurrent change leaves the recorded mtime stale
+    mtime = _mtime(path)
+    if mtime is None:
+        return None
+    try:
+        return storage.backend.read(path), mtime
+    except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+        return None
+
+
+def _read_zettel(zettel_dir, uid, location):
+    """Read attributes, bibliography keys, links and mtimes of a zettel
+    folder."""
+    org = _read_file(os.path.join(zettel_dir, f"{uid}.org"))
+    if org is None:
+        return None
+    content, mtime = org
+    attributes = parse.org_attributes(content.splitlines())
+
+    links = set()
+    for link in parse.org_file_links(content):
+        name = linked_zettel(zettel_dir, link, location)
+        if name is not None:
+            links.add(name)
+
+    bib = list()
+    bib_mtime = None
+    bib_file = _read_file(os.path.join(zettel_dir, f"{uid}.bib"))
+    if bib_file is not None:
+        bib = [entry.key for entry in parse.bibliography_entries(bib_file[0])]
+        bib_mtime = bib_file[1]
+
+    return {
+        "attributes": attributes,
+        "bib": bib,
+        "links": sorted(links),
+        "mtime": mtime,
+        "bib_mtime": bib_mtime,
+    }
+
+
+def _is_glob(pattern):
+    """``True`` if pattern contains glob wildcards."""
+    return any(char in pattern for char in "*?[")
+
+
+def _matching(keys, pattern):
+    """Keys matching pattern. Glob patterns scan, all others look up."""
+    if pattern is None:
+        return keys
+    if _is_glob(pattern):
+        return [key for key in keys if fnmatch.fnmatchcase(key, pattern)]
+    return [pattern] if pattern in keys else list()
+
+
+def filter_mapping(mapping, category=None, subcategory=None):
+    """Zettel names of a zettel mapping matching the filters.
+
+    Filters match exactly unless they contain glob wildcards
+    (``*``, ``?``, ``[``), so ``wood`` only matches the category ``wood``
+    while ``wood*`` also matches ``woodturning``. Exact filters are answered
+    by a lookup, glob filters only scan the category or subcategory names.
+
+    Parameters
+    ----------
+    mapping: dict
+        Mapping of categories to subcategories to zettel uids as returned by
+        :func:`zettelkasten.compile.zettel_mapping`.
+
+    category: str, None, default=None
+        Category filter. ``None`` matches all categories including the
+        :ref:`Lobby`.
+
+    subcategory: str, None, default=None
+        Subcategory filter. ``None`` matches all subcategories. Zettels
+        inside the :ref:`Lobby` never match a subcategory filter.
+
+    Returns
+    -------
+    names: list
+        Unsorted zettel names.
+
+    Examples
+    --------
+    >>> mapping = {
+    ...     "wood": {"tools": ["saw"]},
+    ...     "woodturning": {"tools": ["chisel"], "woods": ["oak"]},
+    ...     "lobby": ["my_zettel"],
+    ... }
+    >>> filter_mapping(mapping, category="wood")
+    ['wood/tools/saw']
+    >>> filter_mapping(mapping, category="wood*", subcategory="tools")
+    ['wood/tools/saw', 'woodturning/tools/chisel']
+    >>> filter_mapping(mapping, category="lobby")
+    ['lobby/my_zettel']
+    """
+    sep = defaults.name_sep
+    names = list()
+    for cat in _matching(mapping, category):
+        if cat == "lobby":
+            if subcategory is None:
+                names.extend(f"lobby{sep}{uid}" for uid in mapping[cat])
+            continue
+        for subcat in _matching(mapping[cat], subcategory):
+            names.extend(
+                f"{cat}{sep}{subcat}{sep}{uid}" for uid in mapping[cat][subcat]
+            )
+
+    return names
+
+
+def _page(names, key=None, reverse=False, offset=0, limit=None):
+    """Sort names and cut out a page. Only sorts the page if limited."""
+    if limit is None:
+        return sorted(names, key=key, reverse=reverse)[offset:]
+
+    select = heapq.nlargest if reverse else heapq.nsmallest
+    return select(offset + limit, names, key=key)[offset:]
+
+
+def _subdirectories(path):
+    """List the names of the directories inside path."""
+    try:
+        return [f.name for f in storage.backend.list(path) if f.is_dir()]
+    except (FileNotFoundError, NotADirectoryError):
+        return list()
+
+
+def _zettel_folders(location):
+    """Folder parts of all zettel folders, without reading any file."""
+    for category in _subdirectories(location):
+        if category in defaults.reserved_folder_names:
+            continue
+        parts = [category]
+        stack = [parts]
+        while stack:
+            parts = stack.pop()
+            folder = os.path.join(location, *parts)
+            for name in _subdirectories(folder):
+                if len(parts) + 1 == _depth(parts):
+                    yield [*parts, name]
+                else:
+                    stack.append([*parts, name])
+
+
+class ZettelIndex:
+    """Index of zettels, their attributes and the bibliography.
+
+    Parameters
+    ----------
+    location: str, pathlib.Path, None, default=None
+        Top level folder of the indexed zettelkasten. Design usage is to
+        fallback on :attr:`zettelkasten.defaults.location`.
+
+    Attributes
+    ----------
+    zettels: dict
+        Mapping of zettel names to dicts holding the zettel's ``attributes``
+        (see :func:`zettelkasten.parse.org_attributes`), the ``bib`` keys of
+        its bibliography file, the names of the zettels it ``links`` to, its
+        org file's ``mtime`` and its bibliography file's ``bib_mtime``.
+
+    sources: dict
+        Mapping of the main bibliography's keys to their ``url`` field.
+
+    sources_mtime: float, None
+        Modification time of the main bibliography file when it was read.
+
+    source_sizes: dict
+        Mapping of the main bibliography's ``url`` fields to the size of the
+        file they point to in bytes. ``None`` for missing files.
+
+    Examples
+    --------
+    >>> from zettelkasten import add, defaults, initialize
+    >>> defaults.location = "tests/doctest_dir/doctest_kasten"
+    >>> initialize.structure_zettelkasten()
+    >>> add.new_zettel("woodturning/tools/chisel", force_overwrite=True)
+    >>> index = ZettelIndex.build()
+    >>> "woodturning/tools/chisel" in index
+    True
+    >>> index.zettels["woodturning/tools/chisel"]["attributes"]["category"]
+    'woodturning'
+    """
+
+    def __init__(self, location=None):
+        """Create an empty index."""
+        if location is None:
+            location = defaults.location
+        self.location = os.fspath(location)
+        self.zettels = dict()
+        self.sources = dict()
+        self.source_sizes = dict()
+        self.sources_mtime = None
+        self._mapping = None
+        self._tree = None
+        self._backlinks = None
+        self._citations = None
+        # zettels and sources changed since the citation database was synced
+        self._touched = set()
+        self._sources_touched = False
+        self._citations_synced = False
+
+    def __contains__(self, name):
+        """Check if zettel name is indexed."""
+        return name in self.zettels
+
+    def __len__(self):
+        """Number of indexed zettels."""
+        return len(self.zettels)
+
+    @classmethod
+    def build(cls, location=None):
+        """Build the index by scanning the complete zettelkasten.
+
+        Parameters
+        ----------
+        location: str, pathlib.Path, None, default=None
+            Top level folder of the indexed zettelkasten. Design usage is to
+            fallback on :attr:`zettelkasten.defaults.location`.
+
+        Returns
+        -------
+        index: ZettelIndex
+            Index holding all zettels found.
+        """
+        index = cls(location)
+        for category in _subdirectories(index.location):
+            if category not in defaults.reserved_folder_names:
+                index.refresh(os.path.join(index.location, category))
+        index.refresh_sources()
+
+        return index
+
+    def names(self):
+        """Sorted list of indexed zettel names.
+
+        Equivalent to :func:`zettelkasten.compile.parsed_zettels` without
+        touching the file system.
+        """
+        return sorted(self.zettels)
+
+    def tree(self):
+        """Compact tree of the indexed zettel names.
+
+        Equivalent to :func:`zettelkasten.tree.zettel_tree` without touching
+        the file system. Cached until the index changes.
+
+        Returns
+        -------
+        tree: zettelkasten.tree.ZettelTree
+        """
+        if self._tree is None:
+            self._tree = ztree.ZettelTree.from_names(self.zettels)
+        return self._tree
+
+    def mapping(self):
+        """Mapping of categories to subcategories to zettel uids.
+
+        Equivalent to :func:`zettelkasten.compile.zettel_mapping` without
+        touching the file system. Cached until the index changes.
+        """
+        if self._mapping is None:
+            mapping = {"lobby": list()}
+            for name in sorted(self.zettels):
+                parts = name.split(defaults.name_sep)
+                if len(parts) == 2:
+                    mapping["lobby"].append(parts[1])
+                else:
+                    category, subcategory, uid = parts
+                    mapping.setdefault(category, dict()).setdefault(
+                        subcategory, list()
+                    ).append(uid)
+            self._mapping = mapping
+
+        return self._mapping
+
+    def backlinks(self, name):
+        """Names of the zettels linking to the zettel name.
+
+        Answered from a reverse link index, which is built from the indexed
+        links on first use and cached until the index changes.
+
+        Parameters
+        ----------
+        name: str
+            Name of the linked zettel. Need not be indexed.
+
+        Returns
+        -------
+        names: list
+            Sorted names of the linking zettels.
+        """
+        if self._backlinks is None:
+            backlinks = dict()
+            for source, record in self.zettels.items():
+                for target in record["links"]:
+                    backlinks.setdefault(target, list()).append(source)
+            for sources in backlinks.values():
+                sources.sort()
+            self._backlinks = backlinks
+
+        return list(self._backlinks.get(name, ()))
+
+    def cited_by(self, key):
+        """Names of the zettels citing the bibliography key.
+
+        Answered from a reverse citation index, which is built from the
+        indexed bibliography keys on first use and cached until the index
+        changes.
+
+        Parameters
+        ----------
+        key: str
+            Bibtex key as stated inside the zettels' bibliography files.
+
+        Returns
+        -------
+        names: list
+            Sorted names of the citing zettels.
+        """
+        if self._citations is None:
+            citations = dict()
+            for name, record in self.zettels.items():
+                for cited in record["bib"]:
+                    citations.setdefault(cited, set()).add(name)
+            self._citations = {
+                cited: sorted(names) for cited, names in citations.items()
+            }
+
+        return list(self._citations.get(key, ()))
+
+    def references(self, name):
+        """Bibliography keys cited by a zettel and the sources they point to.
+
+        Parameters
+        ----------
+        name: str
+            Full zettel name as in ``woodturning/tools/chisel`` or
+            ``lobby/my_zettel``. Lobby zettels can be stated by their uid
+            only.
+
+        Returns
+        -------
+        references: dict
+            Mapping of the cited keys (in order of the zettel's bibliography
+            file) to the ``url`` field of their main bibliography entry.
+            ``None`` for keys missing inside the main bibliography.
+
+        Raises
+        ------
+        KeyError
+            Raised if the zettel is not indexed.
+        """
+        canonical = _canonical(name)
+        if canonical not in self.zettels:
+            raise KeyError(f"Zettel '{name}' not indexed")
+        return {
+            key: self.sources.get(key) for key in self.zettels[canonical]["bib"]
+        }
+
+    def select(
+        self,
+        category=None,
+        subcategory=None,
+        sort="name",
+        reverse=False,
+        offset=0,
+        limit=None,
+    ):
+        """Filtered, sorted and paginated zettel names.
+
+        See :func:`select_zettels` for the parameters.
+        """
+        names = filter_mapping(self.mapping(), category, subcategory)
+
+        if sort == "name":
+            key = None
+        elif sort == "doc":
+
+            def key(name):
+                doc = self.zettels[name]["attributes"].get("doc", "None")
+                return ("" if doc == "None" else doc, name)
+
+        elif sort == "mtime":
+
+            def key(name):
+                return (self.zettels[name]["mtime"], name)
+
+        else:
+            raise ValueError(f"Unknown sort key '{sort}'")
+
+        return _page(names, key, reverse, offset, limit)
+
+    def name_parts(self, path):
+        """Split a path inside the zettelkasten into its relative parts.
+
+        Returns ``None`` if the path is outside the zettelkasten.
+        """
+        relative = os.path.relpath(os.fspath(path), self.location)
+        if relative == os.curdir:
+            return list()
+        if relative.startswith(os.pardir):
+            return None
+        return relative.split(os.sep)
+
+    def refresh_sources(self):
+        """Reread the main bibliography file."""
+        zk_bib_file = os.path.join(
+            self.location,
+            defaults.sources_directory,
+            defaults.zettelkasten_bib_file,
+        )
+        self.sources = dict()
+        self.source_sizes = dict()
+        self.sources_mtime = None
+        self._sources_touched = True
+        main_bib = _read_file(zk_bib_file)
+        if main_bib is None:
+            return
+        content, self.sources_mtime = main_bib
+
+        for entry in parse.bibliography_entries(content):
+            self.sources[entry.key] = entry.fields.get("url")
+
+        for url in set(self.sources.values()):
+            if not url or not url.startswith("file://"):
+                continue
+            try:
+                status = storage.backend.stat(url[len("file://") :])
+            except ValueError:
+                # outside of the storage
+                status = None
+            self.source_sizes[url] = None if status is None else status.size
+
+    def refresh(self, path):
+        """Incrementally update the index after path changed.
+
+        Path can be any file or folder inside the zettelkasten that was
+        created, modified, moved or deleted. Changes to zettel files update
+        that single zettel, changes to category or subcategory folders rescan
+        the respective subtree and changes to the main bibliography file
+        reread it.
+
+        Parameters
+        ----------
+        path: str, pathlib.Path
+            Path that changed.
+
+        Returns
+        -------
+        changed: bool
+            ``True`` if the path affected the index.
+        """
+        changed = self._refresh(path)
+        if changed:
+            self._mapping = None
+            self._tree = None
+            self._backlinks = None
+            self._citations = None
+        return changed
+
+    def _refresh(self, path):
+        """Apply a change of path, see :meth:`refresh`."""
+        parts = self.name_parts(path)
+        if not parts:
+            return False
+        if parts[0] == defaults.sources_directory:
+            return self._refresh_source(parts)
+        if parts[0] in defaults.reserved_folder_names:
+            return False
+        if len(parts) >= _depth(parts):
+            return self._refresh_zettel(parts)
+        return self._rescan(parts)
+
+    def _refresh_source(self, parts):
+        """Apply a change inside the sources directory."""
+        if parts[1:] == [defaults.zettelkasten_bib_file]:
+            self.refresh_sources()
+            return True
+        return False
+
+    def _refresh_zettel(self, parts):
+        """Apply a change of a zettel folder or one of its files."""
+        depth = _depth(parts)
+        name = folder_name(parts[:depth])
+        zettel_dir = os.path.join(self.location, *parts[:depth])
+        record = _read_zettel(zettel_dir, parts[depth - 1], self.location)
+        self._touched.add(name)
+        if record is None:
+            return self.zettels.pop(name, None) is not None
+        self.zettels[name] = record
+        return True
+
+    def _rescan(self, parts):
+        """Rescan a category, subcategory or lobby shard folder."""
+        sep = defaults.name_sep
+        if parts[0] == "lobby" and len(parts) == 2:
+            prefix = f"lobby{sep}"
+            stale = [
+                n
+                for n in self.zettels
+                if n.startswith(prefix)
+                and parse.lobby_shard(n[len(prefix) :]) == parts[1]
+            ]
+        else:
+            prefix = sep.join(parts) + sep
+            stale = [n for n in self.zettels if n.startswith(prefix)]
+        for name in stale:
+            del self.zettels[name]
+        self._touched.update(stale)
+
+        changed = bool(stale)
+        folder = os.path.join(self.location, *parts)
+        if len(parts) == _depth(parts) - 1:
+            for uid in _subdirectories(folder):
+                record = _read_zettel(
+                    os.path.join(folder, uid), uid, self.location
+                )
+                if record is not None:
+                    name = folder_name([*parts, uid])
+                    self.zettels[name] = record
+                    self._touched.add(name)
+                    changed = True
+        else:
+            for subcategory in _subdirectories(folder):
+                changed |= self._refresh(os.path.join(folder, subcategory))
+
+        return changed
+
+    def stale_paths(self):
+        """Paths changed since the index was last refreshed.
+
+        Compares the modification times of all zettel files and the main
+        bibliography file with the recorded ones, without reading any file.
+        Costs a stat call per file instead of the full scan of
+        :meth:`build`.
+
+        Returns
+        -------
+        paths: list
+            Changed, created and deleted zettel folders and the main
+            bibliography file if changed, to be passed to :meth:`refresh`.
+        """
+        zk_bib_file = os.path.join(
+            self.location,
+            defaults.sources_directory,
+            defaults.zettelkasten_bib_file,
+        )
+        paths = list()
+        if _mtime(zk_bib_file) != self.sources_mtime:
+            paths.append(zk_bib_file)
+
+        found = set()
+        for parts in _zettel_folders(self.location):
+            name = folder_name(parts)
+            found.add(name)
+            zettel_dir = os.path.join(self.location, *parts)
+            record = self.zettels.get(name)
+            if (
+                record is None
+                or _mtime(os.path.join(zettel_dir, f"{parts[-1]}.org"))
+                != record["mtime"]
+                or _mtime(os.path.join(zettel_dir, f"{parts[-1]}.bib"))
+                != record["bib_mtime"]
+            ):
+                paths.append(zettel_dir)
+
+        for name in self.zettels.keys() - found:
+            parts = parse.zettel_folder_parts(name)
+            paths.append(os.path.join(self.location, *parts))
+
+        return paths
+
+    def to_dict(self):
+        """Serializable representation of the index."""
+        return {
+            "version": format_version,
+            "zettels": self.zettels,
+            "sources": self.sources,
+            "source_sizes": self.source_sizes,
+            "sources_mtime": self.sources_mtime,
+        }
+
+    def _citation_rows(self, names):
+        """Rows of the citation database's tables for the indexed names."""
+        names = [name for name in names if name in self.zettels]
+        citations = [
+            (key, name, position)
+            for name in names
+            for position, key in enumerate(self.zettels[name]["bib"])
+        ]
+        return [(name,) for name in names], citations
+
+    def save_citations(self, citation_file):
+        """Update the citation database to the state of the index.
+
+        Only the zettels refreshed since the last update (or since the index
+        was loaded) are rewritten. The database is rewritten completely if
+        it is missing or the index was not loaded.
+
+        Parameters
+        ----------
+        citation_file: str, pathlib.Path
+            Location of the database.
+        """
+        full = not self._citations_synced or not os.path.isfile(citation_file)
+        names = self.zettels.keys() if full else self._touched
+        zettels, citations = self._citation_rows(names)
+
+        connection = _connect_citations(citation_file)
+        try:
+            with connection:
+                if full:
+                    connection.execute("DELETE FROM zettels")
+                    connection.execute("DELETE FROM citations")
+                else:
+                    for table in ("zettels", "citations"):
+                        connection.executemany(
+                            f"DELETE FROM {table} WHERE name = ?",
+                            [(name,) for name in self._touched],
+                        )
+                connection.executemany(
+                    "INSERT INTO zettels VALUES (?)", zettels
+                )
+                connection.executemany(
+                    "INSERT OR IGNORE INTO citations VALUES (?, ?, ?)",
+                    citations,
+                )
+                if full or self._sources_touched:
+                    connection.execute("DELETE FROM sources")
+                    connection.executemany(
+                        "INSERT INTO sources VALUES (?, ?)",
+                        self.sources.items(),
+                    )
+        finally:
+            connection.close()
+
+        self._touched = set()
+        self._sources_touched = False
+        self._citations_synced = True
+
+    def save(self, index_file=None):
+        """Persist the index atomically.
+
+        The :attr:`citation database <zettelkasten.defaults.citation_file>`
+        next to the index file is updated first, see
+        :meth:`save_citations`.
+
+        Parameters
+        ----------
+        index_file: str, pathlib.Path, None, default=None
+            File the index is written to. Design usage is to fallback on
+            :attr:`zettelkasten.defaults.index_file` inside the indexed
+            zettelkasten.
+        """
+        if index_file is None:
+            index_file = os.path.join(self.location, defaults.index_file)
+        self.save_citations(
+            os.path.join(os.path.dirname(index_file), defaults.citation_file)
+        )
+
+        temporary = f"{index_file}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+        os.replace(temporary, index_file)
+
+    @classmethod
+    def load(cls, location=None, index_file=None):
+        """Load a persisted index.
+
+        Parameters
+        ----------
+        location: str, pathlib.Path, None, default=None
+            Top level folder of the indexed zettelkasten. Design usage is to
+            fallback on :attr:`zettelkasten.defaults.location`.
+
+        index_file: str, pathlib.Path, None, default=None
+            File the index was persisted in. Design usage is to fallback on
+            :attr:`zettelkasten.defaults.index_file` inside the zettelkasten.
+
+        Returns
+        -------
+        index: ZettelIndex, None
+            The loaded index or ``None`` if there is no index in a
+            compatible format.
+        """
+        index = cls(location)
+        if index_file is None:
+            index_file = os.path.join(index.location, defaults.index_file)
+
+        try:
+            with open(index_file) as f:
+                content = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        if content.get("version") != format_version:
+            return None
+
+        index.zettels = content["zettels"]
+        index.sources = content["sources"]
+        index.source_sizes = content["source_sizes"]
+        index.sources_mtime = content["sources_mtime"]
+        index._citations_synced = True
+
+        return index
+
+
+def _canonical(name):
+    """Full zettel name, prefixing uids by the lobby."""
+    if defaults.name_sep not in name:
+        return defaults.name_sep.join(("lobby", name))
+    return name
+
+
+def _connect_citations(citation_file):
+    """Connection to a citation database, creating its tables if missing.
+
+    Keeps the rollback journal like :func:`zettelkasten.metadata._connect`.
+    """
+    connection = sqlite3.connect(citation_file, timeout=10)
+    connection.execute("PRAGMA journal_mode = PERSIST")
+    connection.executescript(_citation_schema)
+    return connection
+
+
+def _persisted_citations(location=None):
+    """Connection to the citation database of a trusted persisted index.
+
+    ``None`` if the storage is not local, nothing is persisted or the
+    persisted index needs to be validated first, see
+    :func:`persisted_index`.
+    """
+    if location is None:
+        location = defaults.location
+    location = os.fspath(location)
+    citation_file = os.path.join(location, defaults.citation_file)
+    if not storage.backend.local or not os.path.isfile(citation_file):
+        return None
+    index_file = os.path.join(location, defaults.index_file)
+    if watcher_pid(location) is None and not _validated(location, index_file):
+        return None
+    return _connect_citations(citation_file)
+
+
+def watcher_pid(location=None):
+    """Process id of the watcher running on the zettelkasten.
+
+    Parameters
+    ----------
+    location: str, pathlib.Path, None, default=None
+        Top level folder of the zettelkasten. Design usage is to fallback on
+        :attr:`zettelkasten.defaults.location`.
+
+    Returns
+    -------
+    pid: int, None
+        Process id of the running watcher or ``None`` if no watcher is
+        running.
+    """
+    if location is None:
+        location = defaults.location
+
+    try:
+        with open(os.path.join(location, pid_file)) as f:
+            pid = int(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return None
+    except PermissionError:
+        pass
+
+    return pid
+
+
+def load_hot(location=None):
+    """Load the index if it is kept up to date by a running watcher.
+
+    Designed to be used by commands in favour of a full rescan of the
+    zettelkasten.
+
+    Parameters
+    ----------
+    location: str, pathlib.Path, None, default=None
+        Top level folder of the zettelkasten. Design usage is to fallback on
+        :attr:`zettelkasten.defaults.location`.
+
+    Returns
+    -------
+    index: ZettelIndex, None
+        The up to date index or ``None`` if no watcher is running or the
+        :attr:`storage backend <zettelkasten.storage.backend>` is not local.
+    """
+    if not storage.backend.local or watcher_pid(location) is None:
+        return None
+
+    return ZettelIndex.load(location)
+
+
+def refresh_persisted(paths, location=None):
+    """Apply changes of paths to the persisted index.
+
+    Skipped if no index is persisted, a running :mod:`watcher
+    <zettelkasten.watch>` keeps it up to date anyways or the :attr:`storage
+    backend <zettelkasten.storage.backend>` is not local.
+
+    Parameters
+    ----------
+    paths: ~collections.abc.Iterable
+        Changed paths, see :meth:`ZettelIndex.refresh`.
+
+    location: str, pathlib.Path, None, default=None
+        Top level folder of the zettelkasten. Design usage is to fallback on
+        :attr:`zettelkasten.defaults.location`.
+
+    Returns
+    -------
+    changed: bool
+        ``True`` if the persisted index was updated.
+    """
+    if not storage.backend.local or watcher_pid(location) is not None:
+        return False
+    index = ZettelIndex.load(location)
+    if index is None:
+        return False
+    index_file = os.path.join(index.location, defaults.index_file)
+    validated = _validated(index.location, index_file)
+
+    changed = False
+    for path in paths:
+        changed |= index.refresh(path)
+    if changed:
+        index.save()
+        if validated:
+            _stamp_validated(index.location, index_file)
+    return changed
+
+
+def _validated(location, index_file):
+    """``True`` if the top level folder did not change since the persisted
+    index was validated."""
+    try:
+        return os.stat(index_file).st_mtime_ns > os.stat(location).st_mtime_ns
+    except OSError:
+        return False
+
+
+def _stamp_validated(location, index_file):
+    """Mark the persisted index as validated.
+
+    Dates the index file just after the last modification of the top level
+    folder. Unlike the replacement by :meth:`ZettelIndex.save`, setting the
+    file's times leaves the folder's modification time alone.
+    """
+    mtime = os.stat(location).st_mtime_ns + 1
+    os.utime(index_file, ns=(mtime, mtime))
+
+
+def persisted_index(location=None, refresh=False):
+    """Index answering lookups without rescanning the zettelkasten.
+
+    Prefers the index kept up to date by a running :mod:`watcher
+    <zettelkasten.watch>`. Otherwise the persisted index is trusted as long
+    as the zettelkasten's top level folder was not modified after it was
+    saved, since the commands changing zettels update it (see
+    :func:`refresh_persisted`). If the top level folder changed or refresh
+    is set, the persisted index is validated against the modification times
+    of all files (see :meth:`ZettelIndex.stale_paths`) and only the changed
+    zettels are reread. An index is built only if nothing is persisted.
+    Updated and built indices are persisted again. Indices are only
+    persisted for the local :attr:`storage backend
+    <zettelkasten.storage.backend>`, other backends are indexed from
+    scratch.
+
+    Parameters
+    ----------
+    location: str, pathlib.Path, None, default=None
+        Top level folder of the zettelkasten. Design usage is to fallback on
+        :attr:`zettelkasten.defaults.location`.
+
+    refresh: bool, default=False
+        Validate the persisted index regardless of the top level folder,
+        picking up zettels edited outside of the zettelkasten's commands.
+        Costs a stat call per zettel file.
+
+    Returns
+    -------
+    index: ZettelIndex
+    """
+    if not storage.backend.local:
+        return ZettelIndex.build(location)
+
+    index = load_hot(location)
+    if index is not None:
+        return index
+
+    index = ZettelIndex.load(location)
+    if index is None:
+        index = ZettelIndex.build(location)
+    else:
+        index_file = os.path.join(index.location, defaults.index_file)
+        if not refresh and _validated(index.location, index_file):
+            return index
+        for path in index.stale_paths():
+            index.refresh(path)
+
+    index.save()
+    _stamp_validated(
+        index.location, os.path.join(index.location, defaults.index_file)
+    )
+    return index
+
+
+def citing_zettels(key, refresh=False):
+    """Names of the zettels citing a bibliography key.
+
+    Looked up inside the :attr:`citation database
+    <zettelkasten.defaults.citation_file>` of a trusted persisted index,
+    otherwise see :meth:`ZettelIndex.cited_by` and :func:`persisted_index`
+    for refresh.
+
+    Examples
+    --------
+    >>> from zettelkasten import add, defaults, initialize
+    >>> defaults.location = "tests/doctest_dir/doctest_kasten"
+    >>> initialize.structure_zettelkasten()
+    >>> add.new_zettel("woodturning/tools/chisel", force_overwrite=True)
+    >>> "woodturning/tools/chisel" in citing_zettels("pdf_2021_p2")
+    True
+    """
+    connection = None if refresh else _persisted_citations()
+    if connection is None:
+        return persisted_index(refresh=refresh).cited_by(key)
+
+    try:
+        rows = connection.execute(
+            "SELECT name FROM citations WHERE key = ? ORDER BY name", (key,)
+        ).fetchall()
+    finally:
+        connection.close()
+    return [name for name, in rows]
+
+
+def zettel_references(name, refresh=False):
+    """Bibliography keys cited by a zettel and the sources they point to.
+
+    Looked up inside the :attr:`citation database
+    <zettelkasten.defaults.citation_file>` of a trusted persisted index,
+    otherwise see :meth:`ZettelIndex.references` and :func:`persisted_index`
+    for refresh.
+    """
+    connection = None if refresh else _persisted_citations()
+    if connection is None:
+        return persisted_index(refresh=refresh).references(name)
+
+    canonical = _canonical(name)
+    try:
+        indexed = connection.execute(
+            "SELECT 1 FROM zettels WHERE name = ?", (canonical,)
+        ).fetchone()
+        rows = connection.execute(
+            "SELECT citations.key, sources.url FROM citations "
+            + "LEFT JOIN sources ON sources.key = citations.key "
+            + "WHERE citations.name = ? ORDER BY citations.position",
+            (canonical,),
+        ).fetchall()
+    finally:
+        connection.close()
+    if indexed is None:
+        raise KeyError(f"Zettel '{name}' not indexed")
+    return dict(rows)
+
+
+def zettel_names():
+    """Sorted list of all zettel names, avoiding a rescan where possible.
+
+    Answered from the index if a :mod:`watcher <zettelkasten.watch>` keeps it
+    up to date, otherwise falls back on
+    :func:`zettelkasten.compile.parsed_zettels`.
+
+    Returns
+    -------
+    names: list
+        Alphabetically sorted list of zettel names.
+    """
+    index = load_hot()
+    if index is not None:
+        return index.names()
+
+    return comp.parsed_zettels()
+
+
+def zettel_tree():
+    """Compact tree of all zettel names, avoiding a rescan where possible.
+
+    As :func:`zettel_names`, but keeps the names as
+    :class:`~zettelkasten.tree.ZettelTree` for completing and finding
+    names.
+
+    Returns
+    -------
+    tree: zettelkasten.tree.ZettelTree
+        Sorted sequence of zettel names.
+    """
+    index = load_hot()
+    if index is not None:
+        return index.tree()
+
+    return ztree.zettel_tree()
+
+
+def select_zettels(
+    category=None,
+    subcategory=None,
+    sort="name",
+    reverse=False,
+    offset=0,
+    limit=None,
+):
+    """Filtered, sorted and paginated list of zettel names.
+
+    Answered from the index if a :mod:`watcher <zettelkasten.watch>` keeps it
+    up to date. Otherwise name sorted selections fall back on
+    :func:`zettelkasten.compile.zettel_mapping` and all others on a freshly
+    built :class:`ZettelIndex`. Exact category filters (and exact
+    subcategory filters along with them) only scan the filtered folder, see
+    :func:`zettelkasten.compile.category_mapping`.
+
+    Parameters
+    ----------
+    category: str, None, default=None
+        Exact or glob category filter, see :func:`filter_mapping`.
+
+    subcategory: str, None, default=None
+        Exact or glob subcategory filter, see :func:`filter_mapping`.
+
+    sort: str, default="name"
+        One of :attr:`sort_keys`. ``doc`` sorts by the zettels' date of
+        creation, ``mtime`` by their org files' modification time.
+
+    reverse: bool, default=False
+        Sort in descending order.
+
+    offset: int, default=0
+        Number of leading zettels skipped.
+
+    limit: int, None, default=None
+        Maximum number of zettels returned. ``None`` returns all.
+
+    Returns
+    -------
+    names: list
+        The selected zettel names.
+
+    Raises
+    ------
+    ValueError
+        Raised if sort is not one of :attr:`sort_keys`.
+    """
+    if sort not in sort_keys:
+        raise ValueError(f"Unknown sort key '{sort}'")
+
+    selection = dict(
+        category=category,
+        subcategory=subcategory,
+        sort=sort,
+        reverse=reverse,
+        offset=offset,
+        limit=limit,
+    )
+
+    index = load_hot()
+    if index is not None:
+        return index.select(**selection)
+
+    folders = _filtered_folders(category, subcategory)
+    if sort == "name":
+        if folders is None:
+            mapping = comp.zettel_mapping()
+        else:
+            mapping = comp.category_mapping(*folders)
+        names = filter_mapping(mapping, category, subcategory)
+        return _page(names, None, reverse, offset, limit)
+
+    if folders is None:
+        return ZettelIndex.build().select(**selection)
+    index = ZettelIndex()
+    index.refresh(os.path.join(index.location, *filter(None, folders)))
+    return index.select(**selection)
+
+
+def _filtered_folders(category, subcategory):
+    """``(category, subcategory)`` folders an exact filter is confined to.
+
+    The subcategory is ``None`` if not exactly filtered or inside the
+    :ref:`Lobby`. ``None`` if the category is not exactly filtered.
+    """
+    if category is None or _is_glob(category):
+        return None
+    if category == "lobby" or subcategory is None or _is_glob(subcategory):
+        return category, None
+    return category, subcategory
@@ -6,9 +6,9 @@ the zettelkasten looks like it is expected to.
 """
 import logging
 import os
-import pathlib
 
 from . import defaults
+from . import storage
 
 logger = logging.getLogger(__name__)
 
@@ -51,7 +51,7 @@ def structure_zettelkasten(dummy_location=None):
     else:
         location = defaults.location
 
-    if not os.path.isdir(location):
+    if not storage.backend.is_dir(location):
         logger.debug(
             f"The zettelkasten directory ('{location}'"
             + "is not an existing directory"
@@ -63,9 +63,7 @@ def structure_zettelkasten(dummy_location=None):
         logger.debug("without deleting any existing structures.")
 
     for directory in defaults.initial_folder_structure:
-        pathlib.Path(os.path.join(location, directory)).mkdir(
-            parents=True, exist_ok=True
-        )
+        storage.backend.makedirs(os.path.join(location, directory))
 
     # create the zettelkasten bib file
     zk_bib_file = os.path.join(
@@ -74,5 +72,4 @@ def structure_zettelkasten(dummy_location=None):
         defaults.zettelkasten_bib_file,
     )
 
-    with open(zk_bib_file, "a"):
-        pass
+    storage.backend.write(zk_bib_file, "", append=True)
@@ -0,0 +1,691 @@
+# zettelkasten/metadata.py
+"""Module extracting cheap metadata of source files in the background.
+
+Only the headers of the files are read: the first and last
+:attr:`read_size` bytes of pdfs (document information dictionary and page
+tree), the image headers stating the dimensions and the container headers
+stating the duration of audio and video files. Files are identified by the
+magic bytes stated in :attr:`extractors`.
+
+Extracted metadata is cached inside the zettelkasten's
+:attr:`~zettelkasten.defaults.metadata_cache_file` by the size, the
+modification time and the first bytes of the file (see :func:`cache_key`),
+so a file and its copies keeping the modification time (as ingested
+sources) are only read once. The cache is a SQLite database storing each
+entry in its own transaction, so caching a file neither rewrites the other
+entries nor leaves partially written files behind. Extractions are run by
+background worker threads (see :func:`submit`), so adding a source does not
+wait on them. The command line interface waits a bounded time for pending
+extractions when exiting, see :func:`shutdown`. The :func:`bib_defaults`
+derived from the metadata are offered as defaults when interactively adding
+references.
+
+Examples
+--------
+>>> extract("tests/bib_sources/test_pdf.pdf")
+{'pages': 8, 'date': '2016-07-20'}
+>>> bib_defaults({'pages': 8, 'date': '2016-07-20'})
+{'year': '2016', 'date': '2016-07-20'}
+"""
+import concurrent.futures
+import hashlib
+import json
+import os
+import queue
+import re
+import sqlite3
+import struct
+import threading
+import zlib
+
+from . import defaults
+from . import tracing
+
+read_size = 65536
+"""Number of bytes read from the start (and for pdfs the end) of a file."""
+
+max_workers = 2
+"""Number of background worker threads extracting metadata."""
+
+_lock = threading.Lock()
+_pending = queue.Queue()
+_futures = set()
+_workers = list()
+
+
+def _read_window(f, offset=0, size=None):
+    """Read size bytes of the file object f starting at offset."""
+    f.seek(offset)
+    return f.read(read_size if size is None else size)
+
+
+def _pdf_string(value):
+    """Decode a pdf literal or hex string."""
+    if value.startswith(b"<"):
+        raw = bytes.fromhex(value[1:-1].decode("ascii", "ignore"))
+    else:
+        raw = re.sub(rb"\\([()\\])", rb"\1", value[1:-1])
+    if raw.startswith(b"\xfe\xff"):
+        return raw[2:].decode("utf-16-be", "ignore").strip()
+    return raw.decode("latin-1").strip()
+
+
+def _pdf_date(value):
+    """``YYYY-MM-DD`` date of a pdf date string as ``D:20160720165651``."""
+    match = re.match(r"(?:D:)?(\d{4})(\d{2})?(\d{2})?", value)
+    if match is None:
+        return None
+    year, month, day = match.groups()
+    return "-".join([year, month or "01", day or "01"])
+
+
+def _pdf_data(f, size):
+    """Read windows of a pdf including their inflated object streams."""
+    windows = [_read_window(f)]
+    if size > read_size:
+        windows.append(_read_window(f, max(read_size, size - read_size)))
+    for window in list(windows):
+        for match in re.finditer(rb"stream\r?\n", window):
+            end = window.find(b"endstream", match.end())
+            if end < 0:
+                continue
+            try:
+                windows.append(
+                    zlib.decompressobj().decompress(window[match.end() : end])
+                )
+            except zlib.error:
+                continue
+    return b"\n".join(windows)
+
+
+def _pdf_pages(data):
+    """Page count of the linearization dictionary or the page tree root."""
+    linearized = re.search(rb"/Linearized\s[^>]*/N\s+(\d+)", data)
+    if linearized is not None:
+        return int(linearized.group(1))
+    pages = re.search(rb"/Count\s+(\d+)[^>]*/Type\s*/Pages\b", data) or (
+        re.search(rb"/Type\s*/Pages\b[^>]*/Count\s+(\d+)", data)
+    )
+    if pages is not None:
+        return int(pages.group(1))
+    return None
+
+
+def _pdf_info(data):
+    """Title, author and date of creation of the document information."""
+    info = dict()
+    string = rb"(\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f\s]*>)"
+    for key, name in [("title", b"Title"), ("author", b"Author")]:
+        match = re.search(rb"/" + name + rb"\s*" + string, data)
+        if match is not None and _pdf_string(match.group(1)):
+            info[key] = _pdf_string(match.group(1))
+    match = re.search(rb"/CreationDate\s*" + string, data)
+    if match is not None:
+        date = _pdf_date(_pdf_string(match.group(1)))
+        if date is not None:
+            info["date"] = date
+    return info
+
+
+def pdf_metadata(f, size):
+    """Page count, title, author and date of creation of a pdf.
+
+    The page count is taken from the linearization dictionary or the
+    ``/Type/Pages`` root. Compressed object streams found inside the read
+    windows are inflated and searched as well.
+    """
+    data = _pdf_data(f, size)
+    metadata = dict()
+    pages = _pdf_pages(data)
+    if pages is not None:
+        metadata["pages"] = pages
+    metadata.update(_pdf_info(data))
+    return metadata
+
+
+def png_metadata(f, size):
+    """Dimensions of a png image stated by its ``IHDR`` chunk."""
+    width, height = struct.unpack(">II", _read_window(f, 16, 8))
+    return {"width": width, "height": height}
+
+
+def gif_metadata(f, size):
+    """Dimensions of a gif image stated by its logical screen descriptor."""
+    width, height = struct.unpack("<HH", _read_window(f, 6, 4))
+    return {"width": width, "height": height}
+
+
+def jpeg_metadata(f, size):
+    """Dimensions of a jpeg image stated by its start of frame segment.
+
+    Only the segment headers are read, skipping the segment contents.
+    """
+    offset = 2
+    while offset + 4 <= size:
+        marker, length = struct.unpack(">HH", _read_window(f, offset, 4))
+        if marker >> 8 != 0xFF:
+            break
+        if 0xFFC0 <= marker <= 0xFFCF and marker not in (
+            0xFFC4,
+            0xFFC8,
+            0xFFCC,
+        ):
+            height, width = struct.unpack(">HH", _read_window(f, offset + 5, 4))
+            return {"width": width, "height": height}
+        offset += 2 + length
+    return dict()
+
+
+def webp_metadata(f, size):
+    """Dimensions of a webp image stated by its first chunk."""
+    head = _read_window(f, 12, 18)
+    chunk = head[:4]
+    if chunk == b"VP8X":
+        width = int.from_bytes(head[12:15], "little") + 1
+        height = int.from_bytes(head[15:18], "little") + 1
+    elif chunk == b"VP8 ":
+        width, height = struct.unpack("<HH", head[14:18])
+        width, height = width & 0x3FFF, height & 0x3FFF
+    elif chunk == b"VP8L":
+        bits = int.from_bytes(head[9:13], "little")
+        width, height = (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    else:
+        return dict()
+    return {"width": width, "height": height}
+
+
+def wav_metadata(f, size):
+    """Duration of a wave file stated by its ``fmt`` and ``data`` chunks."""
+    offset = 12
+    byte_rate = None
+    while offset + 8 <= size:
+        chunk, length = struct.unpack("<4sI", _read_window(f, offset, 8))
+        if chunk == b"fmt ":
+            (byte_rate,) = struct.unpack("<I", _read_window(f, offset + 16, 4))
+        elif chunk == b"data" and byte_rate:
+            return {"duration": round(length / byte_rate, 2)}
+        offset += 8 + length + length % 2
+    return dict()
+
+
+def flac_metadata(f, size):
+    """Duration of a flac file stated by its ``STREAMINFO`` block."""
+    info = _read_window(f, 18, 8)
+    bits = int.from_bytes(info, "big")
+    sample_rate = bits >> 44
+    samples = bits & 0xFFFFFFFFF
+    if not sample_rate or not samples:
+        return dict()
+    return {"duration": round(samples / sample_rate, 2)}
+
+
+_mp3_bitrates = [
+    0,
+    32,
+    40,
+    48,
+    56,
+    64,
+    80,
+    96,
+    112,
+    128,
+    160,
+    192,
+    224,
+    256,
+    320,
+]
+_mp3_sample_rates = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000]}
+
+
+def _id3_frames(tag, version):
+    """Text frames of an ID3v2.3 or ID3v2.4 tag's content."""
+    frames = dict()
+    offset = 0
+    while offset + 10 <= len(tag) and tag[offset : offset + 1].isalnum():
+        name = tag[offset : offset + 4].decode("latin-1")
+        raw_length = tag[offset + 4 : offset + 8]
+        if version == 4:
+            length = sum(b << (7 * (3 - i)) for i, b in enumerate(raw_length))
+        else:
+            (length,) = struct.unpack(">I", raw_length)
+        value = tag[offset + 10 : offset + 10 + length]
+        if name.startswith("T") and value:
+            encoding = {0: "latin-1", 1: "utf-16", 2: "utf-16-be"}.get(
+                value[0], "utf-8"
+            )
+            frames[name] = value[1:].decode(encoding, "ignore").strip("\x00 ")
+        offset += 10 + length
+    return frames
+
+
+def _id3_metadata(f, head):
+    """Title, artist and year stated by the text frames of an ID3v2 tag."""
+    end = 10 + sum(b << (7 * (3 - i)) for i, b in enumerate(head[6:10]))
+    frames = _id3_frames(_read_window(f, 10, min(end - 10, read_size)), head[3])
+    metadata = dict()
+    for key, names in [
+        ("title", ("TIT2",)),
+        ("author", ("TPE1",)),
+        ("date", ("TDRC", "TYER")),
+    ]:
+        for name in names:
+            if frames.get(name):
+                metadata[key] = frames[name]
+                break
+    if "date" in metadata:
+        date = _pdf_date(metadata.pop("date"))
+        if date is not None:
+            metadata["date"] = date
+    return metadata, end
+
+
+def _mp3_duration(frame, size, start):
+    """Duration estimated from the first mp3 frame starting at start.
+
+    ``None`` if the frame header is invalid.
+    """
+    if len(frame) < 4 or frame[0] != 0xFF or frame[1] & 0xE0 != 0xE0:
+        return None
+    version = (frame[1] >> 3) & 0x3
+    bitrate_index = frame[2] >> 4
+    sample_rate_index = (frame[2] >> 2) & 0x3
+    if version not in _mp3_sample_rates or sample_rate_index == 3:
+        return None
+    sample_rate = _mp3_sample_rates[version][sample_rate_index]
+    xing = max(frame.find(b"Xing"), frame.find(b"Info"))
+    if xing >= 0 and frame[xing + 7] & 0x1:
+        (count,) = struct.unpack(">I", frame[xing + 8 : xing + 12])
+        samples = 1152 if version == 3 else 576
+        return round(count * samples / sample_rate, 2)
+    if 0 < bitrate_index < len(_mp3_bitrates) and version == 3:
+        bitrate = _mp3_bitrates[bitrate_index] * 1000
+        return round((size - start) * 8 / bitrate, 2)
+    return None
+
+
+def mp3_metadata(f, size):
+    """Title, artist, year and duration of an mp3 file.
+
+    Text frames are read from the ID3v2 tag. The duration is estimated from
+    the bitrate of the first frame (or the frame count of a Xing header).
+    """
+    metadata = dict()
+    head = _read_window(f, 0, 10)
+    start = 0
+    if head.startswith(b"ID3"):
+        metadata, start = _id3_metadata(f, head)
+
+    duration = _mp3_duration(_read_window(f, start, 4 + 36 + 12), size, start)
+    if duration is not None:
+        metadata["duration"] = duration
+    return metadata
+
+
+def _mp4_boxes(f, offset, end):
+    """Kind, content start and end of the mp4 boxes between offset and
+    end."""
+    while offset + 8 <= end:
+        length, kind = struct.unpack(">I4s", _read_window(f, offset, 8))
+        header = 8
+        if length == 1:
+            (length,) = struct.unpack(">Q", _read_window(f, offset + 8, 8))
+            header = 16
+        elif length == 0:
+            length = end - offset
+        if length < header:
+            return
+        yield kind, offset + header, offset + length
+        offset += length
+
+
+def _mvhd_duration(f, start):
+    """Duration stated by the ``mvhd`` box whose content starts at start."""
+    header = _read_window(f, start, 32)
+    if header[0] == 1:
+        timescale, duration = struct.unpack(">IQ", header[20:32])
+    else:
+        timescale, duration = struct.unpack(">II", header[12:20])
+    if not timescale:
+        return None
+    return round(duration / timescale, 2)
+
+
+def mp4_metadata(f, size):
+    """Duration of an mp4 or quicktime file stated by its ``mvhd`` box.
+
+    Only the box headers are read, skipping the box contents.
+    """
+    for kind, start, end in _mp4_boxes(f, 0, size):
+        if kind != b"moov":
+            continue
+        for kind, start, _ in _mp4_boxes(f, start, end):
+            if kind == b"mvhd":
+                duration = _mvhd_duration(f, start)
+                if duration is not None:
+                    return {"duration": duration}
+    return dict()
+
+
+def _ebml_number(data, offset, mask=True):
+    """Variable length integer of an EBML element and its length."""
+    first = data[offset]
+    length = 1
+    while length <= 8 and not first & (0x80 >> (length - 1)):
+        length += 1
+    if length > 8:
+        raise ValueError("Invalid EBML number")
+    value = first & (0xFF >> length) if mask else first
+    for byte in data[offset + 1 : offset + length]:
+        value = (value << 8) | byte
+    return value, length
+
+
+def matroska_metadata(f, size):
+    """Duration of a matroska or webm file stated by its segment info."""
+    data = _read_window(f)
+    offset = 0
+    end = len(data)
+    scale = 1000000
+    duration = None
+    while offset < end:
+        element, length = _ebml_number(data, offset, mask=False)
+        offset += length
+        content, length = _ebml_number(data, offset)
+        offset += length
+        if element in (0x18538067, 0x1549A966):
+            # descend into the segment and its info element
+            continue
+        value = data[offset : offset + content]
+        if element == 0x2AD7B1:
+            scale = int.from_bytes(value, "big")
+        elif element == 0x4489:
+            (duration,) = struct.unpack(">f" if content == 4 else ">d", value)
+        elif element == 0x1F43B675 and duration is not None:
+            break
+        offset += content
+    if duration is None:
+        return dict()
+    return {"duration": round(duration * scale / 1e9, 2)}
+
+
+extractors = [
+    (0, b"%PDF-", pdf_metadata),
+    (0, b"\x89PNG\r\n\x1a\n", png_metadata),
+    (0, b"GIF8", gif_metadata),
+    (0, b"\xff\xd8\xff", jpeg_metadata),
+    (8, b"WEBP", webp_metadata),
+    (8, b"WAVE", wav_metadata),
+    (0, b"fLaC", flac_metadata),
+    (0, b"ID3", mp3_metadata),
+    (0, b"\xff\xfb", mp3_metadata),
+    (0, b"\xff\xf3", mp3_metadata),
+    (4, b"ftyp", mp4_metadata),
+    (0, b"\x1a\x45\xdf\xa3", matroska_metadata),
+]
+"""Magic bytes identifying the extractor of a file as ``(offset, magic bytes,
+extractor)``, matched in order. Extractors are called as
+``extractor(file object, file size)`` and return a metadata dict."""
+
+
+def extract(path):
+    """Extract the metadata of a file by reading its headers.
+
+    Parameters
+    ----------
+    path: str, pathlib.Path
+        Location of the file.
+
+    Returns
+    -------
+    metadata: dict
+        Json serializable mapping of the found keys out of ``pages``,
+        ``title``, ``author``, ``date`` (as ``YYYY-MM-DD``), ``width``,
+        ``height`` and ``duration`` (in seconds). Empty for unknown or
+        malformed files.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(16)
+        for offset, magic, extractor in extractors:
+            if head[offset : offset + len(magic)] != magic:
+                continue
+            try:
+                return extractor(f, size)
+            except (IndexError, ValueError, struct.error):
+                return dict()
+    return dict()
+
+
+def cache_key(path):
+    """Key of a file inside the metadata cache.
+
+    Combines the size and the modification time of the file with the
+    sha256 hex digest of its first :attr:`read_size` bytes, so the key costs
+    a single read regardless of the file's size.
+    """
+    with open(path, "rb") as f:
+        status = os.fstat(f.fileno())
+        digest = hashlib.sha256(f.read(read_size)).hexdigest()
+    return f"{status.st_size}-{status.st_mtime_ns}-{digest}"
+
+
+def cache_path(location=None):
+    """Location of the metadata cache database.
+
+    Design usage is to fallback on :attr:`zettelkasten.defaults.location`.
+    """
+    if location is None:
+        location = defaults.location
+    return os.path.join(location, defaults.metadata_cache_file)
+
+
+def _connect(location=None):
+    """Connection to the cache database, creating its table if missing.
+
+    The rollback journal is kept between transactions. Creating and deleting
+    it would change the top level folder's modification time, which
+    invalidates the :func:`persisted index
+    <zettelkasten.index.persisted_index>`.
+    """
+    connection = sqlite3.connect(cache_path(location), timeout=10)
+    connection.execute("PRAGMA journal_mode = PERSIST")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS metadata "
+        + "(key TEXT PRIMARY KEY, metadata TEXT NOT NULL)"
+    )
+    return connection
+
+
+def load_cache(location=None):
+    """Mapping of cache keys to metadata. Empty if not cached yet."""
+    if not os.path.isfile(cache_path(location)):
+        return dict()
+    connection = _connect(location)
+    try:
+        rows = connection.execute("SELECT key, metadata FROM metadata")
+        return {key: json.loads(metadata) for key, metadata in rows}
+    finally:
+        connection.close()
+
+
+def _lookup(key, location):
+    """Cached metadata of key or ``None`` if not cached."""
+    if not os.path.isfile(cache_path(location)):
+        return None
+    try:
+        connection = _connect(location)
+        try:
+            row = connection.execute(
+                "SELECT metadata FROM metadata WHERE key = ?", (key,)
+            ).fetchone()
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return None
+    return None if row is None else json.loads(row[0])
+
+
+def _store(key, metadata, location):
+    """Cache the metadata of key inside its own transaction."""
+    try:
+        connection = _connect(location)
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO metadata VALUES (?, ?)",
+                    (key, json.dumps(metadata, separators=(",", ":"))),
+                )
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        # an unwritable cache merely costs extracting the file again
+        pass
+
+
+@tracing.traced("metadata.cached_metadata")
+def cached_metadata(path, location=None):
+    """Metadata of a file, extracted only if it is not cached yet.
+
+    See :func:`cache_key`. Only the entry of the file is looked up and
+    stored.
+
+    Parameters
+    ----------
+    path: str, pathlib.Path
+        Location of the file.
+
+    location: str, pathlib.Path, None, default=None
+        Zettelkasten holding the cache database. Design usage is to fallback
+        on :attr:`zettelkasten.defaults.location`.
+
+    Returns
+    -------
+    metadata: dict
+        See :func:`extract`. Empty if the file is not readable.
+    """
+    try:
+        key = cache_key(path)
+        cached = _lookup(key, location)
+        if cached is not None:
+            return cached
+        metadata = extract(path)
+    except OSError:
+        return dict()
+
+    _store(key, metadata, location)
+    tracing.event("metadata.cached_metadata.extracted", path=os.fspath(path))
+
+    return metadata
+
+
+def _work():
+    """Background worker running the submitted extractions."""
+    while True:
+        future, path, location = _pending.get()
+        try:
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(cached_metadata(path, location))
+                except Exception as error:
+                    future.set_exception(error)
+        finally:
+            _pending.task_done()
+
+
+def submit(path, location=None):
+    """Extract the metadata of a file inside a background worker.
+
+    The workers are daemon threads started on the first call, so pending
+    extractions never delay the exit of the interpreter. Their results are
+    merely cached. Use :func:`shutdown` to wait for them before exiting.
+
+    Parameters
+    ----------
+    path: str, pathlib.Path
+        Location of the file.
+
+    location: str, pathlib.Path, None, default=None
+        Zettelkasten holding the cache file. Resolved when submitting, so the
+        workers are not affected by later changes of
+        :attr:`zettelkasten.defaults.location`.
+
+    Returns
+    -------
+    future: concurrent.futures.Future
+        Future resolving to the result of :func:`cached_metadata`.
+    """
+    if location is None:
+        location = defaults.location
+    with _lock:
+        while len(_workers) < max_workers:
+            worker = threading.Thread(
+                target=_work,
+                name=f"zk-metadata-{len(_workers)}",
+                daemon=True,
+            )
+            worker.start()
+            _workers.append(worker)
+        future = concurrent.futures.Future()
+        _futures.add(future)
+    future.add_done_callback(_discard)
+    _pending.put((future, path, location))
+    return future
+
+
+def _discard(future):
+    """Forget a finished or cancelled future."""
+    with _lock:
+        _futures.discard(future)
+
+
+def shutdown(wait=True, timeout=None):
+    """Finish or cancel the pending extractions.
+
+    Parameters
+    ----------
+    wait: bool, default=True
+        If ``True`` wait for all submitted extractions to finish, otherwise
+        cancel the ones not running yet.
+
+    timeout: float, None, default=None
+        Maximum number of seconds to wait. Extractions not running once it
+        passed are cancelled. ``None`` waits without limit.
+    """
+    if wait:
+        with _lock:
+            futures = list(_futures)
+        _, not_done = concurrent.futures.wait(futures, timeout)
+        if not not_done:
+            return
+    while True:
+        try:
+            future, _, _ = _pending.get_nowait()
+        except queue.Empty:
+            return
+        future.cancel()
+        _pending.task_done()
+
+
+def bib_defaults(metadata):
+    """Bibliography entry defaults derived from a file's metadata.
+
+    Parameters
+    ----------
+    metadata: dict
+        See :func:`extract`.
+
+    Returns
+    -------
+    defaults: dict
+        Mapping of the found ``author``, ``title``, ``year`` and ``date``
+        arguments of :func:`zettelkasten.add.new_source`.
+    """
+    found = {
+        key: metadata[key] for key in ("author", "title") if metadata.get(key)
+    }
+    if metadata.get("date"):
+        found["year"] = metadata["date"][:4]
+        found["date"] = metadata["date"]
+    return found
@@ -0,0 +1,292 @@
+# zettelkasten/migrate.py
+"""Module migrating the zettelkasten's folder layout.
+
+Migrations move folders around without changing any zettel name. Links
+between org files are rewritten, so they keep resolving after the move.
+
+:func:`shard_lobby` converts the :ref:`Lobby` from the layout stated by
+:attr:`zettelkasten.defaults.lobby_shard_width` into a layout of another
+shard width. :func:`shard_sources` moves the source files into the shard
+folders of another :attr:`sharding scheme
+<zettelkasten.defaults.source_sharding>` and rewrites the ``url`` fields of
+all bibliography files pointing to them. Persist the new settings inside the
+:ref:`cfile` afterwards (see :func:`zettelkasten.setup.set_config_value`),
+so following commands use the new layout.
+"""
+import datetime
+import os
+
+from . import defaults
+from . import edit
+from . import index as zindex
+from . import move
+from . import parse
+from . import sources as zsources
+from . import storage
+from . import tracing
+
+max_lobby_shard_width = 8
+"""Maximum shard width, the number of hex digits of a crc32 checksum."""
+
+
+def _lobby_folders(index, location, width):
+    """Folders of the lobby zettels before and after sharding them by
+    width, for all zettels changing their folder."""
+    folders = dict()
+    for name in index.zettels:
+        parts = parse.zettel_folder_parts(name)
+        if parts[0] != "lobby":
+            continue
+        uid = parts[-1]
+        shard = parse.lobby_shard(uid, width)
+        new_parts = ["lobby", uid] if shard is None else ["lobby", shard, uid]
+        if parts != new_parts:
+            folders[name] = (
+                os.path.join(location, *parts),
+                os.path.join(location, *new_parts),
+            )
+    return folders
+
+
+def _move_zettel(old_dir, new_dir):
+    """Move a zettel folder, returning its old and new org file."""
+    os.makedirs(os.path.dirname(new_dir), exist_ok=True)
+    os.rename(old_dir, new_dir)
+    uid = os.path.basename(new_dir)
+    return (
+        os.path.join(old_dir, f"{uid}.org"),
+        os.path.join(new_dir, f"{uid}.org"),
+    )
+
+
+def _rewrite_links(old_dir, new_dir, moved):
+    """Rewrite the links of the zettel inside new_dir to the moved org
+    files, see :func:`zettelkasten.move.rewrite_moved_links`.
+
+    Returns ``True`` if the zettel's org file changed.
+    """
+    org_file = os.path.join(new_dir, f"{os.path.basename(new_dir)}.org")
+    with open(org_file) as f:
+        content = f.read()
+    rewritten = move.rewrite_moved_links(content, old_dir, new_dir, moved)
+    if rewritten == content:
+        return False
+    edit.write_atomically(org_file, rewritten)
+    return True
+
+
+def _remove_empty_folders(folder):
+    """Remove the empty folders below folder, as emptied shard folders."""
+    for path, _, _ in os.walk(folder, topdown=False):
+        if path != folder and not os.listdir(path):
+            os.rmdir(path)
+
+
+@tracing.traced("migrate.shard_lobby")
+def shard_lobby(width):
+    """Move the lobby zettels into the shard folders of another width.
+
+    Uses :attr:`zettelkasten.defaults.location` as top level folder. Lobby
+    zettels are expected inside the layout of the current
+    :attr:`~zettelkasten.defaults.lobby_shard_width`, which is set to width
+    afterwards.
+
+    Parameters
+    ----------
+    width: int
+        New shard width, see :func:`zettelkasten.parse.lobby_shard`. ``0``
+        moves all lobby zettels directly into the lobby.
+
+    Returns
+    -------
+    moved: list
+        Names of the moved lobby zettels.
+
+    Raises
+    ------
+    ValueError
+        Raised if width is not between ``0`` and :attr:`max_lobby_shard_width`.
+
+    RuntimeError
+        Raised if the :attr:`storage backend <zettelkasten.storage.backend>`
+        is not local or a :mod:`watcher <zettelkasten.watch>` is running on
+        the zettelkasten, since it would index the moved folders using the
+        old layout.
+
+    Examples
+    --------
+    >>> from zettelkasten import add, defaults, initialize
+    >>> defaults.location = "tests/doctest_dir/doctest_kasten"
+    >>> initialize.structure_zettelkasten()
+    >>> add.new_zettel("sharded_idea", force_overwrite=True)
+    >>> "lobby/sharded_idea" in shard_lobby(2)
+    True
+    >>> parse.zettel_path("sharded_idea").parent.parent.name
+    'ad'
+    >>> "lobby/sharded_idea" in shard_lobby(0)
+    True
+    """
+    storage.require_local("Migrating the lobby")
+    if not 0 <= width <= max_lobby_shard_width:
+        raise ValueError(
+            f"Lobby shard width must be between 0 and {max_lobby_shard_width}"
+        )
+    if zindex.watcher_pid() is not None:
+        raise RuntimeError("Stop the watcher before migrating the lobby")
+
+    location = os.path.abspath(defaults.location)
+    lobby = os.path.join(location, "lobby")
+    index = zindex.ZettelIndex.build(location)
+
+    folders = _lobby_folders(index, location, width)
+    for old_dir, new_dir in folders.values():
+        if os.path.exists(new_dir):
+            raise FileExistsError(f"Zettel in '{new_dir}' already exists")
+
+    moved = dict(_move_zettel(*dirs) for dirs in folders.values())
+    if defaults.lobby_shard_width:
+        _remove_empty_folders(lobby)
+    defaults.lobby_shard_width = width
+
+    # moved zettels adjust all of their relative links, all others only the
+    # links to moved zettels
+    rewritten_files = list()
+    for name, record in index.zettels.items():
+        if name in folders or any(link in folders for link in record["links"]):
+            old_dir, new_dir = folders.get(name, (None, None))
+            if new_dir is None:
+                old_dir = new_dir = os.path.join(
+                    location, *parse.zettel_folder_parts(name)
+                )
+            if _rewrite_links(old_dir, new_dir, moved):
+                rewritten_files.append(new_dir)
+
+    zindex.refresh_persisted([lobby, *rewritten_files], location)
+    tracing.event("migrate.shard_lobby.moved", width=width, moved=len(folders))
+
+    return sorted(folders)
+
+
+def _source_destinations(sources, scheme, width):
+    """Mapping of the source keys of all files changing their shard folder
+    to their location inside the shard folders of scheme.
+
+    Raises
+    ------
+    FileExistsError
+        Raised if two files would be moved to the same location.
+    """
+    moved = dict()
+    destinations = set()
+    for source in zsources.source_files():
+        file_name = os.path.basename(source.path)
+        date = datetime.date.fromtimestamp(os.stat(source.path).st_mtime)
+        shard = zsources.source_shard(file_name, scheme, width, date)
+        destination = os.path.join(sources, source.ftype, *shard, file_name)
+        if destination == os.path.abspath(source.path):
+            continue
+        if destination in destinations or os.path.exists(destination):
+            raise FileExistsError(f"Source '{destination}' already exists")
+        destinations.add(destination)
+        moved[zsources.source_key(source.path, sources)] = destination
+    return moved
+
+
+def _rewrite_urls(moved, sources):
+    """Rewrite the urls of all bibliography files pointing to moved
+    sources, see :func:`zettelkasten.sources.rewrite_urls`.
+
+    Returns the rewritten bibliography files.
+    """
+    rewritten_files = list()
+    for bib_file in zsources.bibliography_files():
+        with open(bib_file) as f:
+            content = f.read()
+        rewritten = zsources.rewrite_urls(content, moved, sources)
+        if rewritten != content:
+            edit.write_atomically(bib_file, rewritten)
+            rewritten_files.append(bib_file)
+    return rewritten_files
+
+
+@tracing.traced("migrate.shard_sources")
+def shard_sources(scheme, width=None):
+    """Move the source files into the shard folders of another scheme.
+
+    Uses :attr:`zettelkasten.defaults.location` as top level folder. Source
+    files are found wherever they reside inside their type folder, the
+    ``url`` fields of the zettelkasten's and all zettel bibliography files
+    are rewritten in a single pass each. Sets
+    :attr:`~zettelkasten.defaults.source_sharding` and
+    :attr:`~zettelkasten.defaults.source_shard_width` afterwards.
+
+    Parameters
+    ----------
+    scheme: str
+        New scheme, one of :attr:`zettelkasten.sources.sharding_schemes`.
+        ``date`` shards use the modification date of each file.
+
+    width: int, None, default=None
+        Number of hex digits naming ``hash`` shards. Design usage is to
+        fallback on :attr:`zettelkasten.defaults.source_shard_width`.
+
+    Returns
+    -------
+    moved: dict
+        Mapping of the moved files' :func:`source keys
+        <zettelkasten.sources.source_key>` to their new location.
+
+    Raises
+    ------
+    ValueError
+        Raised for unknown schemes.
+
+    FileExistsError
+        Raised if two files would be moved to the same location. Nothing is
+        moved then.
+
+    RuntimeError
+        Raised if the :attr:`storage backend <zettelkasten.storage.backend>`
+        is not local or a :mod:`watcher <zettelkasten.watch>` is running on
+        the zettelkasten.
+
+    Examples
+    --------
+    >>> from zettelkasten import add, defaults, initialize
+    >>> defaults.location = "tests/doctest_dir/doctest_kasten"
+    >>> initialize.structure_zettelkasten()
+    >>> add.new_zettel("woodturning/tools/chisel", force_overwrite=True)
+    >>> moved = shard_sources("hash", width=2)
+    >>> os.path.relpath(moved["pdfs/test_pdf.pdf"], defaults.location)
+    '_sources/pdfs/99/test_pdf.pdf'
+    >>> _ = shard_sources("flat")
+    """
+    storage.require_local("Migrating the sources")
+    if scheme not in zsources.sharding_schemes:
+        raise ValueError(f"Unknown source sharding scheme '{scheme}'")
+    if width is None:
+        width = defaults.source_shard_width
+    if zindex.watcher_pid() is not None:
+        raise RuntimeError("Stop the watcher before migrating the sources")
+
+    location = os.path.abspath(defaults.location)
+    sources = os.path.join(location, defaults.sources_directory)
+
+    moved = _source_destinations(sources, scheme, width)
+    for key, destination in moved.items():
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.rename(os.path.join(sources, key), destination)
+    for ftype in {key.split(os.sep)[0] for key in moved}:
+        _remove_empty_folders(os.path.join(sources, ftype))
+
+    defaults.source_sharding = scheme
+    defaults.source_shard_width = width
+
+    if moved:
+        rewritten_files = _rewrite_urls(moved, sources)
+        zindex.refresh_persisted(rewritten_files, location)
+    tracing.event(
+        "migrate.shard_sources.moved", scheme=scheme, moved=len(moved)
+    )
+
+    return moved
@@ -15,10 +15,36 @@ from typing import Optional
 from typing import Type
 
 from . import defaults
+from . import filetypes
+from . import parse
+from . import profiling
+from . import tracing
 
 logger = logging.getLogger(__name__)
 
 
+@profiling.timed("monkeypatch.patch_defaults")
+@tracing.traced("monkeypatch.patch_defaults")
+def _enforce_types():
+    """Convert the patched string values of non string defaults."""
+    # enforce path on location:
+    defaults.location = Path(defaults.location)  # type: ignore
+
+    # enforce int on the lobby and source shard widths:
+    defaults.lobby_shard_width = int(
+        defaults.lobby_shard_width or 0  # type: ignore
+    )
+    defaults.source_shard_width = int(
+        defaults.source_shard_width or 0  # type: ignore
+    )
+
+    # enforce int on the parse cache size unless unbounded:
+    if defaults.zettel_name_cache_size is not None:
+        defaults.zettel_name_cache_size = int(
+            defaults.zettel_name_cache_size  # type: ignore
+        )
+
+
 def patch_defaults(config_file_path):
     """Main monkeypatching utility.
 
@@ -36,16 +62,15 @@ def patch_defaults(config_file_path):
     value: Optional[str] = None  # add typing hint for value
     for key, value in configs["default"].items():
         if key in defaults.config_overwrites:
-            logger.debug(f"Monkeypatching {key}\n")
-            logger.debug("with")
-            logger.debug(f"{value}\n")
+            tracing.event(
+                "monkeypatch.patch_defaults.patched", key=key, value=value
+            )
             if value == "None":
                 value = None
 
             setattr(defaults, key, value)
 
-    # enforce path on location:
-    defaults.location = Path(defaults.location)  # type: ignore
+    _enforce_types()
 
     # parse pure lists
     defaults.required_attributes = configs["default"].getlist(
@@ -61,9 +86,11 @@ def patch_defaults(config_file_path):
     for key in configs["source_file_formats"]:
         source_file_formats[key] = configs["source_file_formats"].getlist(key)
 
-    logger.debug("Monkeypatching source_file_formats\n")
-    logger.debug("with")
-    logger.debug(f"{source_file_formats}\n")
+    tracing.event(
+        "monkeypatch.patch_defaults.patched",
+        key="source_file_formats",
+        value=source_file_formats,
+    )
     defaults.source_file_formats = source_file_formats
 
     # parse pure string dict
@@ -71,9 +98,11 @@ def patch_defaults(config_file_path):
         k: v for k, v in configs["zettel_meta_attribute_labels"].items()
     }
 
-    logger.debug("Monkeypatching zettel_meta_attribute_labels\n")
-    logger.debug("with")
-    logger.debug(f"{zettel_meta_attribute_labels}\n")
+    tracing.event(
+        "monkeypatch.patch_defaults.patched",
+        key="zettel_meta_attribute_labels",
+        value=zettel_meta_attribute_labels,
+    )
     defaults.zettel_meta_attribute_labels = zettel_meta_attribute_labels
 
     # pare mixed dict
@@ -100,10 +129,16 @@ def patch_defaults(config_file_path):
                 lst = list()
             zettel_meta_attribute_defaults[key] = lst
 
-    logger.debug("Monkeypatching zettel_meta_attribute_defaults\n")
-    logger.debug("with")
-    logger.debug(f"{zettel_meta_attribute_defaults}\n")
+    tracing.event(
+        "monkeypatch.patch_defaults.patched",
+        key="zettel_meta_attribute_defaults",
+        value=zettel_meta_attribute_defaults,
+    )
     defaults.zettel_meta_attribute_defaults = zettel_meta_attribute_defaults
 
-    logger.debug("Set the defaults.state 'config_file_monkeypatched'")
+    # the name cache is sized by the patched defaults
+    parse.clear_caches()
+    # the extension mapping depends on the patched source file formats
+    filetypes.clear_caches()
+
     defaults.state = "config_file_monkeypatched"
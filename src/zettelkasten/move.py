@@ -0,0 +1,281 @@
+# zettelkasten/move.py
+"""Module moving zettels inside the zettelkasten.
+
+Moving (or renaming) a zettel moves its folder, renames its org and
+bibliography file to the new uid, rewrites the ``uid``, ``category`` and
+``subcategory`` header attributes and updates every org file link pointing
+to the zettel. The zettels linking to the moved one are looked up using the
+reverse link index of :meth:`zettelkasten.index.ZettelIndex.backlinks`, so
+only their org files are read and rewritten.
+"""
+import os
+
+from . import defaults
+from . import edit
+from . import index as zindex
+from . import parse
+from . import storage
+from . import tracing
+
+
+def _canonical_name(zettel_name):
+    """Full zettel name as compiled by :mod:`zettelkasten.compile`."""
+    sep = defaults.name_sep
+    if zettel_name.category is None and zettel_name.subcategory is None:
+        return f"lobby{sep}{zettel_name.uid}"
+    return sep.join(zettel_name)
+
+
+def rewrite_links(content, old_dir, new_dir, old_org, new_org):
+    """Rewrite the org file links of an org file's content.
+
+    Links pointing to old_org are redirected to new_org. If the linking org
+    file itself moved from old_dir to new_dir, all of its relative links are
+    adjusted to the new folder as well. Absolute links stay absolute.
+
+    Parameters
+    ----------
+    content: str
+        Text content of the linking org file.
+
+    old_dir, new_dir: str
+        Absolute folder of the linking org file before and after the move.
+
+    old_org, new_org: str
+        Absolute location of the moved org file before and after the move.
+
+    Returns
+    -------
+    content: str
+        Rewritten content.
+
+    Examples
+    --------
+    >>> rewrite_links(
+    ...     "[[file:../../../lobby/skew/skew.org][skew]]",
+    ...     "/kasten/wood/tools/chisel",
+    ...     "/kasten/wood/tools/chisel",
+    ...     "/kasten/lobby/skew/skew.org",
+    ...     "/kasten/wood/tools/skew/skew.org",
+    ... )
+    '[[file:../skew/skew.org][skew]]'
+    """
+    return rewrite_moved_links(content, old_dir, new_dir, {old_org: new_org})
+
+
+def rewrite_moved_links(content, old_dir, new_dir, moved):
+    """Rewrite the org file links of an org file's content after many moves.
+
+    Same as :func:`rewrite_links`, but redirecting the links to each of the
+    moved org files at once.
+
+    Parameters
+    ----------
+    content: str
+        Text content of the linking org file.
+
+    old_dir, new_dir: str
+        Absolute folder of the linking org file before and after the move.
+
+    moved: dict
+        Mapping of the moved org files' absolute locations before the move to
+        their locations after it.
+
+    Returns
+    -------
+    content: str
+        Rewritten content.
+    """
+
+    def replace(match):
+        link, search = match.groups()
+        target = os.path.normpath(os.path.join(old_dir, link))
+        if target in moved:
+            target = moved[target]
+        elif old_dir == new_dir:
+            return match.group(0)
+
+        if os.path.isabs(link):
+            new_link = target
+        else:
+            new_link = os.path.relpath(target, new_dir)
+        if new_link == link:
+            return match.group(0)
+        return f"[[file:{new_link}{search or ''}]"
+
+    return parse.org_file_link_pattern.sub(replace, content)
+
+
+def rewrite_header(content, zettel_name):
+    """Rewrite the name attributes inside an org file's header.
+
+    Parameters
+    ----------
+    content: str
+        Text content of the zettel's org file.
+
+    zettel_name: zettelkasten.parse.ZettelName
+        New name of the zettel.
+
+    Returns
+    -------
+    content: str
+        Content stating the ``uid``, ``category`` and ``subcategory`` of
+        zettel_name (as written by
+        :func:`zettelkasten.add.write_org_zettel_attributes`) and the
+        bibliography file of the new uid.
+
+    Examples
+    --------
+    >>> print(rewrite_header(
+    ...     "#+Title: idea \\n#+Category: None \\n#+Subcategory: None \\n"
+    ...     "\\n* Bibliography\\n\\nbibliography:idea.bib",
+    ...     parse.ZettelName("woodturning", "tools", "skew")))
+    #+Title: skew
+    #+Category: woodturning
+    #+Subcategory: tools
+    <BLANKLINE>
+    * Bibliography
+    <BLANKLINE>
+    bibliography:skew.bib
+    """
+    old_uid = parse.org_attributes(content.splitlines()).get("uid")
+    content = edit.edit_header(
+        content,
+        [
+            (attribute, "set", [getattr(zettel_name, attribute)])
+            for attribute in ("uid", "category", "subcategory")
+            if attribute in defaults.zettel_meta_attribute_labels
+        ],
+    )
+
+    lines = content.splitlines(True)
+    if old_uid is not None:
+        old_line = f"bibliography:{old_uid}.bib"
+        for i, line in enumerate(lines):
+            if line.rstrip("\n") == old_line:
+                lines[i] = line.replace(
+                    old_line, f"bibliography:{zettel_name.uid}.bib"
+                )
+
+    return "".join(lines)
+
+
+@tracing.traced("move.move_zettel")
+def move_zettel(name, new_name, index=None):
+    """Move (or rename) a zettel.
+
+    Uses :attr:`zettelkasten.defaults.location` as top level folder.
+
+    Parameters
+    ----------
+    name: str
+        Current zettel name, see :func:`zettelkasten.parse.zettel_name`.
+
+    new_name: str
+        New zettel name. Using only an uid moves the zettel into the
+        :ref:`Lobby`.
+
+    index: zettelkasten.index.ZettelIndex, None, default=None
+        Index the linking zettels are looked up in. Refreshed after the
+        move. ``None`` uses the
+        :func:`persisted index <zettelkasten.index.persisted_index>`. The
+        persisted index follows the move either way.
+
+    Returns
+    -------
+    linking: list
+        Names of the zettels whose links were rewritten.
+
+    Raises
+    ------
+    FileNotFoundError
+        Raised if the zettel to move does not exist.
+
+    FileExistsError
+        Raised if a zettel named new_name already exists.
+
+    RuntimeError
+        Raised if the :attr:`storage backend <zettelkasten.storage.backend>`
+        is not local, see :func:`zettelkasten.storage.require_local`.
+
+    Examples
+    --------
+    >>> from zettelkasten import add, defaults, initialize
+    >>> defaults.location = "tests/doctest_dir/doctest_kasten"
+    >>> initialize.structure_zettelkasten()
+    >>> add.new_zettel("moving_idea", force_overwrite=True)
+    >>> import shutil
+    >>> shutil.rmtree(parse.zettel_path("woodturning/ideas/moved").parent,
+    ...               ignore_errors=True)
+    >>> move_zettel("moving_idea", "woodturning/ideas/moved")
+    []
+    >>> with open(parse.zettel_path("woodturning/ideas/moved")) as f:
+    ...     print(f.readline().strip())
+    #+Title: moved
+    """
+    storage.require_local("Moving zettels")
+    old_name = parse.zettel_name(name)
+    target_name = parse.zettel_name(new_name)
+    old_org = os.path.abspath(parse.zettel_path(name))
+    new_org = os.path.abspath(parse.zettel_path(new_name))
+    old_dir = os.path.dirname(old_org)
+    new_dir = os.path.dirname(new_org)
+
+    if not os.path.isfile(old_org):
+        raise FileNotFoundError(f"Zettel '{name}' not found in '{old_dir}'")
+    if os.path.exists(new_dir):
+        raise FileExistsError(f"Zettel in '{new_dir}' already exists")
+
+    if index is None:
+        index = zindex.persisted_index()
+    canonical = _canonical_name(old_name)
+    linking = [n for n in index.backlinks(canonical) if n != canonical]
+
+    os.makedirs(os.path.dirname(new_dir), exist_ok=True)
+    os.rename(old_dir, new_dir)
+    if old_name.uid != target_name.uid:
+        for ending in ("org", "bib"):
+            old_file = os.path.join(new_dir, f"{old_name.uid}.{ending}")
+            if os.path.isfile(old_file):
+                os.rename(
+                    old_file,
+                    os.path.join(new_dir, f"{target_name.uid}.{ending}"),
+                )
+
+    with open(new_org) as f:
+        content = f.read()
+    content = rewrite_header(content, target_name)
+    content = rewrite_links(content, old_dir, new_dir, old_org, new_org)
+    edit.write_atomically(new_org, content)
+
+    location = os.path.abspath(index.location)
+    touched = [old_dir, new_dir]
+    for linking_name in linking:
+        linking_dir = os.path.join(
+            location, *parse.zettel_folder_parts(linking_name)
+        )
+        org_file = os.path.join(
+            linking_dir, f"{os.path.basename(linking_dir)}.org"
+        )
+        with open(org_file) as f:
+            content = f.read()
+        rewritten = rewrite_links(
+            content, linking_dir, linking_dir, old_org, new_org
+        )
+        if rewritten != content:
+            edit.write_atomically(org_file, rewritten)
+            touched.append(linking_dir)
+        index.refresh(linking_dir)
+
+    index.refresh(old_dir)
+    index.refresh(new_dir)
+    zindex.refresh_persisted(touched)
+    tracing.event(
+        "move.move_zettel.moved",
+        source=old_dir,
+        destination=new_dir,
+        linking=linking,
+    )
+
+    return linking
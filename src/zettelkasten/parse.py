@@ -1,10 +1,15 @@
 # zettelkasten/parse.py
 """Module aggregating all of the user input parsing capabilities."""
+import functools
 import logging
+import re
 import typing
+import zlib
 from pathlib import Path
 
 from . import defaults
+from . import profiling
+from . import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +47,7 @@ class ZettelName(typing.NamedTuple):
     uid: str
 
 
+@profiling.timed("parse.zettel_name")
 def zettel_name(name):
     r"""Zettel name parsing syntax.
 
@@ -95,58 +101,105 @@ def zettel_name(name):
     -------
     zettel_name: tuple
         Tuple consisting of ('category', 'subcategory', 'uid')
+
+    Notes
+    -----
+    Splitting names is cached (least recently used, see
+    :attr:`zettelkasten.defaults.zettel_name_cache_size`) per name and
+    :attr:`~zettelkasten.defaults.name_sep`. Default categories are filled
+    in and warnings are logged on every call. The cache is rebuilt by
+    :func:`clear_caches`, which :func:`zettelkasten.monkeypatch.patch_defaults`
+    calls, so a patched cache size is picked up.
     """
-    logger.debug("-------------------------------")
-    logger.debug("Preparing to parse Zettel name")
-
-    # is a complete name given?
-    if defaults.name_sep in name:
-
-        # yes, so parse it
-        logger.debug(f"{defaults.name_sep} found in '{name}'")
-        name = name.strip("/")
-        parts = name.split(defaults.name_sep)
-
-        # syntax is only valid using 2 seperators:
-        if len(parts) == 3:
-            category, subcategory, uid = parts
-            logger.debug(f"Succesfully dissassembled '{name}' into:")
-            logger.debug(
-                f"category: '{category}', subcategory: "
-                + f"'{subcategory}', uid: '{uid}'"
-            )
+    parsed = _zettel_name(name, defaults.name_sep)
+    tracing.event(
+        "parse.zettel_name",
+        zettel=name,
+        category=parsed.category,
+        subcategory=parsed.subcategory,
+        uid=parsed.uid,
+    )
 
-        # used wrong syntax. State a warning and fail gracefully
-        else:
-            uid = parts[-1]
-            category = defaults.zettel_meta_attribute_defaults.get(
-                "category", None
-            )
-            subcategory = defaults.zettel_meta_attribute_defaults.get(
-                "category", None
-            )
+    return parsed
 
-            logger.warning(f"'{name}' could not be dissassembled correctly")
-            logger.warning(f"Dissassembling yielded '{parts}'. Parsing into:")
-            logger.warning(
-                f"category: '{category}', subcategory: "
-                + f"'{subcategory}', uid: '{uid}'"
-            )
 
-    # No, only a uid was passed:
-    else:
-        uid = name
-        category = defaults.zettel_meta_attribute_defaults.get("category", None)
-        subcategory = defaults.zettel_meta_attribute_defaults.get(
-            "category", None
-        )
+def _split_name(name, name_sep):
+    """Parts of a zettel name, ``None`` if only a uid is given."""
+    if name_sep not in name:
+        return None
+    return tuple(name.strip("/").split(name_sep))
+
+
+_cached_split_name = None
+
+
+def clear_caches():
+    """Drop all cached parsing results.
+
+    Rebuilds the cache of split zettel names sized by
+    :attr:`zettelkasten.defaults.zettel_name_cache_size`. Required after
+    :mod:`defaults <zettelkasten.defaults>` the parsing depends on were
+    changed.
+    """
+    global _cached_split_name
+    _cached_split_name = functools.lru_cache(
+        maxsize=defaults.zettel_name_cache_size
+    )(_split_name)
+
+
+clear_caches()
+
 
-        logger.debug("Zettel name parsed.")
-        logger.debug("-------------------------------\n")
+def _zettel_name(name, name_sep):
+    """Parse a zettel name, see :func:`zettel_name`."""
+    parts = _cached_split_name(name, name_sep)
 
+    # syntax is only valid using 2 seperators:
+    if parts is not None and len(parts) == 3:
+        return ZettelName(*parts)
+
+    category = defaults.zettel_meta_attribute_defaults.get("category", None)
+    subcategory = defaults.zettel_meta_attribute_defaults.get("category", None)
+
+    # No, only a uid was passed:
+    if parts is None:
+        return ZettelName(category, subcategory, name)
+
+    # used wrong syntax. State a warning and fail gracefully
+    uid = parts[-1]
+    logger.warning(f"'{name.strip('/')}' could not be dissassembled correctly")
+    logger.warning(f"Dissassembling yielded '{list(parts)}'. Parsing into:")
+    logger.warning(
+        f"category: '{category}', subcategory: "
+        + f"'{subcategory}', uid: '{uid}'"
+    )
     return ZettelName(category, subcategory, uid)
 
 
+def zettel_names(names):
+    """Parse multiple zettel names at once.
+
+    Parameters
+    ----------
+    names: ~collections.abc.Iterable
+        Zettel names, see :func:`zettel_name`.
+
+    Returns
+    -------
+    zettel_names: list
+        :class:`ZettelName` of each name in the order given.
+
+    Examples
+    --------
+    >>> zettel_names(["woodturning/tools/chisel", "my_zettel"])
+    [ZettelName(category='woodturning', subcategory='tools', uid='chisel'), \
+ZettelName(category=None, subcategory=None, uid='my_zettel')]
+    """
+    name_sep = defaults.name_sep
+    return [_zettel_name(name, name_sep) for name in names]
+
+
+@profiling.timed("parse.zettel_attributes")
 def zettel_attributes(parsed_zettel_name, **kwargs):
     r"""Zettel attribute parsing utility.
 
@@ -237,9 +290,6 @@ def zettel_attributes(parsed_zettel_name, **kwargs):
          '#+Topics:': []}
 
     """
-    logger.debug("-------------------------------")
-    logger.debug("Preparing to parse zettel attributes")
-
     # map zettel atrributes
     zettel_attributes = dict()
 
@@ -261,6 +311,71 @@ def zettel_attributes(parsed_zettel_name, **kwargs):
     return zettel_attributes
 
 
+def lobby_shard(uid, width=None):
+    """Shard folder of a :ref:`Lobby` zettel.
+
+    The shard is the hex prefix of the uid's crc32 checksum, so lobby
+    zettels spread evenly across ``16 ** width`` folders.
+
+    Parameters
+    ----------
+    uid: str
+        Uid of the lobby zettel.
+
+    width: int, None, default=None
+        Number of hex digits naming the shard. Design usage is to fallback on
+        :attr:`zettelkasten.defaults.lobby_shard_width`.
+
+    Returns
+    -------
+    shard: str, None
+        Name of the shard folder or ``None`` if the lobby is not sharded.
+
+    Examples
+    --------
+    >>> lobby_shard("my_zettel", width=2)
+    '3d'
+    >>> lobby_shard("my_zettel", width=0)
+    """
+    if width is None:
+        width = defaults.lobby_shard_width
+    if not width:
+        return None
+    return f"{zlib.crc32(uid.encode()):08x}"[:width]
+
+
+def zettel_folder_parts(name):
+    """Folder parts of a zettel relative to the zettelkasten's location.
+
+    Parameters
+    ----------
+    name: str
+        Full zettel name as compiled by
+        :func:`zettelkasten.compile.parsed_zettels`.
+
+    Returns
+    -------
+    parts: list
+        Folder names leading to the zettel's folder. Inside a sharded
+        :ref:`Lobby` (see :attr:`zettelkasten.defaults.lobby_shard_width`)
+        the shard folder is inserted.
+
+    Examples
+    --------
+    >>> zettel_folder_parts("woodturning/tools/chisel")
+    ['woodturning', 'tools', 'chisel']
+    >>> zettel_folder_parts("lobby/my_zettel")
+    ['lobby', 'my_zettel']
+    """
+    parts = name.split(defaults.name_sep)
+    if len(parts) == 2 and parts[0] == "lobby":
+        shard = lobby_shard(parts[1])
+        if shard is not None:
+            parts.insert(1, shard)
+    return parts
+
+
+@profiling.timed("parse.zettel_path")
 def zettel_path(name):
     r"""Infer the file system location of a given zettelname.
 
@@ -320,11 +435,12 @@ def zettel_path(name):
         parsed_zettel_name.category is None
         and parsed_zettel_name.subcategory is None
     ):
+        lobby = Path(defaults.location) / "lobby"
+        shard = lobby_shard(parsed_zettel_name.uid)
+        if shard is not None:
+            lobby = lobby / shard
         zettel_path = (
-            Path(defaults.location)
-            / "lobby"
-            / parsed_zettel_name.uid
-            / f"{parsed_zettel_name.uid}.org"
+            lobby / parsed_zettel_name.uid / f"{parsed_zettel_name.uid}.org"
         )
     elif all([part is not None for part in parsed_zettel_name]):
         zettel_path = (
@@ -340,3 +456,198 @@ def zettel_path(name):
         raise TypeError(msg)
 
     return zettel_path
+
+
+def zettel_paths(names):
+    """Infer the file system locations of multiple zettel names at once.
+
+    Parameters
+    ----------
+    names: ~collections.abc.Iterable
+        Zettel names, see :func:`zettel_path`.
+
+    Returns
+    -------
+    zettel_paths: list
+        :class:`~pathlib.Path` of each zettel's org file in the order given.
+
+    Raises
+    ------
+    TypeError:
+        Raised in case unexpected zettel parsing takes place, see
+        :func:`zettel_path`.
+
+    Examples
+    --------
+    >>> paths = zettel_paths(["woodturning/tools/chisel", "my_zettel"])
+    >>> [path.relative_to(defaults.location).as_posix() for path in paths]
+    ['woodturning/tools/chisel/chisel.org', 'lobby/my_zettel/my_zettel.org']
+    """
+    location = Path(defaults.location)
+    lobby_dir = location / "lobby"
+    paths = list()
+    for category, subcategory, uid in zettel_names(names):
+        if category is None and subcategory is None:
+            shard = lobby_shard(uid)
+            lobby = lobby_dir if shard is None else lobby_dir / shard
+            paths.append(lobby / uid / f"{uid}.org")
+        elif category is not None and subcategory is not None:
+            paths.append(location / category / subcategory / uid / f"{uid}.org")
+        else:
+            msg = "Something weired happend with the zettelname parsing"
+            raise TypeError(msg)
+
+    return paths
+
+
+def org_attributes(lines):
+    r"""Parse the zettel attributes stated inside an org file's header.
+
+    Inverse of :func:`zettelkasten.add.write_org_zettel_attributes`. Lines
+    are consumed until the first line not starting with ``#+``, so only the
+    header of the org file is read.
+
+    Parameters
+    ----------
+    lines: ~collections.abc.Iterable
+        Lines of the zettel org file, as in an opened file object.
+
+    Returns
+    -------
+    attributes: dict
+        Mapping of attribute names (as in the keys of
+        :attr:`zettelkasten.defaults.zettel_meta_attribute_labels`) to their
+        stated value strings.
+
+    Examples
+    --------
+    >>> parsed = org_attributes([
+    ...     "#+Title: chisel \n",
+    ...     "#+Category: woodturning \n",
+    ...     "#+Tags: ['#Rework'] \n",
+    ...     "\n",
+    ...     "#+Author: not part of the header \n"])
+    >>> for attribute, value in parsed.items():
+    ...     print(f"{attribute}: {value}")
+    uid: chisel
+    category: woodturning
+    tags: ['#Rework']
+    """
+    labels = {
+        label: attribute
+        for attribute, label in defaults.zettel_meta_attribute_labels.items()
+    }
+
+    attributes = dict()
+    for line in lines:
+        if not line.startswith("#+"):
+            break
+        label, _, value = line.partition(" ")
+        if label in labels:
+            attributes[labels[label]] = value.strip()
+
+    return attributes
+
+
+org_file_link_pattern = re.compile(r"\[\[file:([^\]]+?\.org)(::[^\]]*)?\]")
+"""Regular expression matching org-mode links to org files as in
+``[[file:../gouge/gouge.org][gouge]]``. The first group captures the linked
+file, the second an optional ``::search`` option."""
+
+
+def org_file_links(content):
+    """Files linked by the org-mode file links inside content.
+
+    Parameters
+    ----------
+    content: str
+        Text content of a zettel's org file.
+
+    Returns
+    -------
+    links: list
+        Linked org files as stated inside the links, in order of appearance.
+
+    Examples
+    --------
+    >>> org_file_links(
+    ...     "See [[file:../gouge/gouge.org][gouge]] and "
+    ...     "[[file:/kasten/lobby/idea/idea.org::*Usage]].")
+    ['../gouge/gouge.org', '/kasten/lobby/idea/idea.org']
+    """
+    return [match.group(1) for match in org_file_link_pattern.finditer(content)]
+
+
+class BibEntry(typing.NamedTuple):
+    """Bibliography entry consisting of ``kind``, ``key`` and ``fields``.
+
+    Parameters
+    ----------
+    kind: str
+        Bibtex entry type as in ``misc``.
+
+    key: str
+        Bibtex key uniquely identifying the entry.
+
+    fields: dict
+        Mapping of field names to their (unquoted) values.
+
+    Examples
+    --------
+    >>> BibEntry('misc', 'pdf_2021_p2', {'title': 'Test PDF'})
+    BibEntry(kind='misc', key='pdf_2021_p2', fields={'title': 'Test PDF'})
+    """
+
+    kind: str
+    key: str
+    fields: typing.Dict[str, str]
+
+
+bib_entry_pattern = re.compile(r"@(\w+)\{([^,\s]+),\n(.*?)\n\}%", re.DOTALL)
+"""Regular expression matching bibliography entries as written by
+:func:`zettelkasten.defaults.bibliography_entry`. The groups capture the
+entry's kind, key and fields."""
+
+_bib_field_pattern = re.compile(
+    r'^\s*(\w+)\s*=\s*(?:\{(.*)\}|"(.*)"),?\s*$', re.MULTILINE
+)
+
+
+def bibliography_entries(content):
+    r"""Parse the entries of a bibliography file's content.
+
+    Designed to parse entries as written by
+    :func:`zettelkasten.defaults.bibliography_entry`.
+
+    Parameters
+    ----------
+    content: str
+        Text content of a zettel's or the zettelkasten's bibliography file.
+
+    Yields
+    ------
+    entry: BibEntry
+        :class:`typing.NamedTuple` representing a single bibliography entry.
+
+    Examples
+    --------
+    >>> content = "".join(defaults.bibliography_entry(
+    ...     source_file="/tmp/test_pdf.pdf",
+    ...     key="pdf_2021_p2",
+    ...     title="Test PDF",
+    ...     location_specifier="page 2"))
+    >>> entry = next(bibliography_entries(content))
+    >>> entry.key
+    'pdf_2021_p2'
+    >>> entry.fields["url"]
+    'file:///tmp/test_pdf.pdf'
+    >>> entry.fields["keywords"]
+    'page 2'
+    """
+    for match in bib_entry_pattern.finditer(content):
+        kind, key, body = match.groups()
+        fields = dict()
+        for field in _bib_field_pattern.finditer(body):
+            name, braced, quoted = field.groups()
+            fields[name] = braced if braced is not None else quoted
+        yield BibEntry(kind, key, fields)
@@ -0,0 +1,210 @@
+# zettelkasten/profiling.py
+"""Module providing per phase wall time profiling.
+
+Phases are marked using :func:`phase` or :func:`timed` inside
+:mod:`~zettelkasten.monkeypatch`, :mod:`~zettelkasten.parse`,
+:mod:`~zettelkasten.add` and :mod:`~zettelkasten.compile`. Recording only
+takes place while profiling is :func:`enabled <enable>`, as done by the
+command line interface's ``--profile`` option. Disabled phases cost a single
+attribute lookup.
+
+Examples
+--------
+>>> enable()
+>>> with phase("example.outer"):
+...     with phase("example.inner"):
+...         pass
+>>> disable()
+>>> [row["phase"] for row in report()]
+['example.outer', 'example.inner']
+>>> reset()
+"""
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+
+enabled = False
+"""State indicating if phases are currently recorded."""
+
+_events = list()
+_profiler = None
+_origin = time.perf_counter()
+
+
+class _Phase:
+    """Context manager recording the wall time of a named phase."""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        if enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.start is not None:
+            record(self.name, self.start, time.perf_counter() - self.start)
+            self.start = None
+
+
+def phase(name):
+    """Context manager recording the wall time of a named phase.
+
+    Parameters
+    ----------
+    name: str
+        Name of the phase. By convention ``module.function`` or
+        ``module.function.step``.
+    """
+    return _Phase(name)
+
+
+def timed(name):
+    """Decorator recording each call of the decorated function as phase.
+
+    Parameters
+    ----------
+    name: str
+        Name of the phase. By convention ``module.function``.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, start, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def record(name, start, duration):
+    """Record a phase timed elsewhere.
+
+    Parameters
+    ----------
+    name: str
+        Name of the phase.
+    start: float
+        :func:`time.perf_counter` value at the start of the phase.
+    duration: float
+        Wall time of the phase in seconds.
+    """
+    _events.append((name, start, duration, threading.get_ident()))
+
+
+def enable(cprofile=False):
+    """Start recording phases.
+
+    Parameters
+    ----------
+    cprofile: bool, default=False
+        If ``True`` a :class:`cProfile.Profile` is run as well, so
+        :func:`dump` can write :mod:`pstats` statistics.
+    """
+    global enabled, _profiler
+
+    enabled = True
+    if cprofile:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def disable():
+    """Stop recording phases."""
+    global enabled
+
+    enabled = False
+    if _profiler is not None:
+        _profiler.disable()
+
+
+def reset():
+    """Drop all recorded phases and profiling statistics."""
+    global _profiler
+
+    _events.clear()
+    _profiler = None
+
+
+def report():
+    """Aggregate the recorded phases.
+
+    Returns
+    -------
+    rows: list
+        List of dicts stating each phase's ``phase`` name, number of
+        ``calls``, ``total`` and ``mean`` wall time in seconds, sorted by
+        descending total wall time. Nested phases are contained in the total
+        of their enclosing phases.
+    """
+    totals = dict()
+    for name, _, duration, _ in _events:
+        calls, total = totals.get(name, (0, 0.0))
+        totals[name] = (calls + 1, total + duration)
+
+    rows = [
+        {
+            "phase": name,
+            "calls": calls,
+            "total": total,
+            "mean": total / calls,
+        }
+        for name, (calls, total) in totals.items()
+    ]
+
+    return sorted(rows, key=lambda row: row["total"], reverse=True)
+
+
+def dump(path):
+    """Write the recorded profile to a file for offline analysis.
+
+    Parameters
+    ----------
+    path: str, pathlib.Path
+        Target file. Files ending on ``.json`` receive the phases as trace
+        in the Trace Event Format (viewable in ``chrome://tracing`` or
+        Perfetto). All other files receive :mod:`pstats` statistics.
+
+    Raises
+    ------
+    ValueError
+        Raised if pstats statistics are requested but profiling was not
+        :func:`enabled <enable>` using ``cprofile=True``.
+    """
+    if os.fspath(path).endswith(".json"):
+        pid = os.getpid()
+        trace = {
+            "traceEvents": [
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": (start - _origin) * 1e6,
+                    "dur": duration * 1e6,
+                    "pid": pid,
+                    "tid": tid,
+                }
+                for name, start, duration, tid in _events
+            ],
+            "displayTimeUnit": "ms",
+        }
+        with open(path, "w") as f:
+            json.dump(trace, f)
+        return
+
+    if _profiler is None:
+        raise ValueError("pstats dumps require enable(cprofile=True)")
+    _profiler.dump_stats(os.fspath(path))
@@ -0,0 +1,524 @@
+# zettelkasten/server.py
+"""Module providing a resident zettelkasten server and its client.
+
+The server holds the :class:`zettelkasten.index.ZettelIndex` in memory and
+answers requests over a unix domain socket, sparing each command the full
+directory walk. On linux the in-memory index follows changes made outside the
+server using :mod:`inotify <zettelkasten.watch>`.
+
+Each connection is answered by its own thread, so slow clients do not hold
+up others. Requests and index changes are applied one at a time.
+
+Requests and responses are single lines of json::
+
+    {"op": "complete", "args": {"incomplete": "wood"}}
+    {"ok": true, "result": ["woodturning/tools/chisel"]}
+
+    {"op": "add", "args": {"name": "woodturning/tools/chisel"}}
+    {"ok": false, "error": "FileExistsError", "message": "..."}
+
+Supported operations are stated in :attr:`operations`.
+"""
+import json
+import logging
+import os
+import selectors
+import socket
+import threading
+
+from . import add
+from . import defaults
+from . import delete as zdelete
+from . import find as zfind
+from . import index as zindex
+from . import move as zmove
+from . import parse
+from . import stats as zstats
+from . import storage
+from . import watch as zwatch
+
+logger = logging.getLogger(__name__)
+
+socket_file = ".zettelkasten.sock"
+"""Unix domain socket inside the zettelkasten the server listens on."""
+
+remote_exceptions = {
+    exception.__name__: exception
+    for exception in (
+        FileExistsError,
+        FileNotFoundError,
+        KeyError,
+        TypeError,
+        ValueError,
+    )
+}
+"""Exceptions raised inside the server that are reraised by the client."""
+
+
+def socket_path(location=None):
+    """Default socket location of the server serving location.
+
+    Parameters
+    ----------
+    location: str, pathlib.Path, None, default=None
+        Top level folder of the zettelkasten. Design usage is to fallback on
+        :attr:`zettelkasten.defaults.location`.
+    """
+    if location is None:
+        location = defaults.location
+
+    return os.path.join(location, socket_file)
+
+
+class KastenState:
+    """In-memory zettelkasten state the server operates on.
+
+    Parameters
+    ----------
+    location: str, pathlib.Path, None, default=None
+        Top level folder of the zettelkasten. Design usage is to fallback on
+        :attr:`zettelkasten.defaults.location`.
+    """
+
+    def __init__(self, location=None):
+        """Build the index of the served zettelkasten."""
+        self.location = location
+        self.index = zindex.ZettelIndex.build(location)
+        self.lock = threading.Lock()
+        self._names = None
+        self._finder = None
+        self._stats = dict()
+
+    def rebuild(self):
+        """Rebuild the index from scratch."""
+        self.index = zindex.ZettelIndex.build(self.location)
+        self.invalidate()
+
+    def refresh(self, path):
+        """Apply a change of path to the index."""
+        if self.index.refresh(path):
+            self.invalidate()
+
+    def invalidate(self):
+        """Drop everything cached from the index."""
+        self._names = None
+        self._finder = None
+        self._stats.clear()
+
+    def names(self):
+        """Compact tree of zettel names, cached until the index changes.
+
+        See :meth:`zettelkasten.index.ZettelIndex.tree`.
+        """
+        if self._names is None:
+            self._names = self.index.tree()
+        return self._names
+
+    def list(self):
+        """Answer the ``list`` operation."""
+        return list(self.names())
+
+    def select(self, **selection):
+        """Answer the ``select`` operation.
+
+        See :func:`zettelkasten.index.select_zettels` for the selection.
+        """
+        return self.index.select(**selection)
+
+    def complete(self, incomplete=""):
+        """Answer the ``complete`` operation using a binary search."""
+        return self.names().startswith(incomplete)
+
+    def find(self, query, limit=10):
+        """Answer the ``find`` operation using a cached finder."""
+        if self._finder is None:
+            self._finder = zfind.Finder(self.names())
+        return self._finder.find(query, limit)
+
+    def stats(self, bucket="month"):
+        """Answer the ``stats`` operation, cached until the index changes.
+
+        See :func:`zettelkasten.stats.kasten_stats`.
+        """
+        if bucket not in self._stats:
+            self._stats[bucket] = zstats.kasten_stats(self.index, bucket)
+        return self._stats[bucket]
+
+    def path(self, name):
+        """Answer the ``path`` operation."""
+        return os.fspath(parse.zettel_path(name))
+
+    def add(self, name, force_overwrite=False, **kwargs):
+        """Answer the ``add`` operation."""
+        add.new_zettel(name, force_overwrite=force_overwrite, **kwargs)
+        self.refresh(parse.zettel_path(name).parent)
+
+    def ref(self, zettel_name, source_file, uid, **kwargs):
+        """Answer the ``ref`` operation.
+
+        Relative source file paths are resolved against the server's working
+        directory, so clients are expected to send absolute paths.
+        """
+        add.new_source(zettel_name, source_file, uid, **kwargs)
+        self.refresh(parse.zettel_path(zettel_name).parent)
+        self.index.refresh_sources()
+        self._stats.clear()
+
+    def cited_by(self, key):
+        """Answer the ``cited_by`` operation.
+
+        See :meth:`zettelkasten.index.ZettelIndex.cited_by`.
+        """
+        return self.index.cited_by(key)
+
+    def refs(self, name):
+        """Answer the ``refs`` operation.
+
+        See :meth:`zettelkasten.index.ZettelIndex.references`.
+        """
+        return self.index.references(name)
+
+    def move(self, name, new_name):
+        """Answer the ``move`` operation.
+
+        See :func:`zettelkasten.move.move_zettel`.
+        """
+        linking = zmove.move_zettel(name, new_name, index=self.index)
+        self.invalidate()
+        return linking
+
+    def delete(self, names):
+        """Answer the ``delete`` operation.
+
+        See :func:`zettelkasten.delete.delete_zettels`.
+        """
+        deletion = zdelete.delete_zettels(names, index=self.index)
+        self.invalidate()
+        return deletion
+
+
+operations = (
+    "list",
+    "select",
+    "complete",
+    "find",
+    "stats",
+    "path",
+    "add",
+    "ref",
+    "cited_by",
+    "refs",
+    "move",
+    "delete",
+)
+"""Operations answered by the server, see :class:`KastenState`."""
+
+
+def handle(state, line):
+    """Answer a single request line.
+
+    Parameters
+    ----------
+    state: KastenState
+        State the request is answered from.
+
+    line: bytes, str
+        Json encoded request.
+
+    Returns
+    -------
+    response: dict
+        Json serializable response.
+    """
+    try:
+        request = json.loads(line)
+        op = request["op"]
+        if op not in operations:
+            raise ValueError(f"Unknown operation '{op}'")
+        result = getattr(state, op)(**request.get("args", {}))
+    except Exception as exception:  # noqa: B902 reported to the client
+        logger.debug(f"Request {line!r} failed", exc_info=True)
+        return {
+            "ok": False,
+            "error": type(exception).__name__,
+            "message": str(exception),
+        }
+
+    return {"ok": True, "result": result}
+
+
+def _read_line(connection):
+    """Read a single newline terminated line from a connection."""
+    chunks = list()
+    while True:
+        chunk = connection.recv(64 * 1024)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        if chunk.endswith(b"\n"):
+            break
+    return b"".join(chunks)
+
+
+def _bind(path):
+    """Bind a listening socket, replacing stale socket files."""
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            logger.debug(f"Removing stale socket '{path}'")
+            os.remove(path)
+        else:
+            raise FileExistsError(f"A server is already listening on '{path}'")
+        finally:
+            probe.close()
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(16)
+    return listener
+
+
+def _answer(state, connection):
+    """Answer the request of a single connection.
+
+    Failing connections, e.g. clients timing out or disconnecting before
+    reading the response, are dropped without affecting the server. Only
+    answering the request holds the state's lock, reading and writing the
+    connection does not.
+    """
+    try:
+        connection.settimeout(5)
+        line = _read_line(connection)
+        with state.lock:
+            response = handle(state, line)
+        connection.sendall(json.dumps(response).encode() + b"\n")
+    except OSError:
+        logger.debug("Dropping failed connection", exc_info=True)
+    finally:
+        connection.close()
+
+
+def _follow(state, inotify):
+    """Apply pending inotify events to state.
+
+    The index is rebuilt if the event queue overflowed.
+    """
+    for changed, mask in inotify.read_events(timeout=0):
+        with state.lock:
+            if changed is None:
+                state.rebuild()
+                continue
+            if mask & zwatch.IN_ISDIR and mask & (
+                zwatch.IN_CREATE | zwatch.IN_MOVED_TO
+            ):
+                zwatch.watch_tree(inotify, changed)
+            state.refresh(changed)
+
+
+def _dispatch(state, listener, threads):
+    """Accept a connection and answer it inside a new thread."""
+    connection, _ = listener.accept()
+    thread = threading.Thread(
+        target=_answer, args=(state, connection), daemon=True
+    )
+    thread.start()
+    threads.add(thread)
+    threads.difference_update(
+        [thread for thread in threads if not thread.is_alive()]
+    )
+
+
+def serve(location=None, path=None, stop=None, ready=None, timeout=0.5):
+    """Serve requests until stopped.
+
+    Parameters
+    ----------
+    location: str, pathlib.Path, None, default=None
+        Top level folder of the served zettelkasten. Design usage is to
+        fallback on :attr:`zettelkasten.defaults.location`.
+
+    path: str, pathlib.Path, None, default=None
+        Socket the server listens on. Design usage is to fallback on
+        :func:`socket_path`.
+
+    stop: threading.Event, None, default=None
+        Event stopping the server when set. Serves until interrupted if
+        ``None``.
+
+    ready: threading.Event, None, default=None
+        Event set as soon as the server accepts requests.
+
+    timeout: float, default=0.5
+        Seconds to wait for events before checking the stop event again.
+
+    Raises
+    ------
+    FileExistsError
+        Raised if another server is already listening on the socket.
+
+    RuntimeError
+        Raised if the :attr:`storage backend <zettelkasten.storage.backend>`
+        is not local, see :func:`zettelkasten.storage.require_local`.
+    """
+    storage.require_local("Serving the zettelkasten")
+    if location is None:
+        location = defaults.location
+    if path is None:
+        path = socket_path(location)
+    path = os.fspath(path)
+
+    state = KastenState(location)
+
+    selector = selectors.DefaultSelector()
+    listener = _bind(path)
+    selector.register(listener, selectors.EVENT_READ)
+
+    inotify = None
+    try:
+        inotify = zwatch.Inotify()
+    except OSError:
+        logger.info("No inotify support, outside changes are not followed")
+    else:
+        zwatch.watch_tree(inotify, location)
+        selector.register(inotify.fd, selectors.EVENT_READ)
+
+    logger.info(f"Serving '{location}' on '{path}'")
+    if ready is not None:
+        ready.set()
+
+    threads = set()
+    try:
+        while stop is None or not stop.is_set():
+            for key, _ in selector.select(timeout):
+                if key.fileobj is listener:
+                    _dispatch(state, listener, threads)
+                else:
+                    _follow(state, inotify)
+    finally:
+        selector.close()
+        listener.close()
+        # let answered requests finish writing the zettelkasten
+        for thread in threads:
+            thread.join()
+        if os.path.exists(path):
+            os.remove(path)
+        if inotify is not None:
+            inotify.close()
+
+
+def send(op, path=None, timeout=5, **args):
+    """Send a request to a running server and return its raw response.
+
+    Parameters
+    ----------
+    op: str
+        Requested operation, one of :attr:`operations`.
+
+    path: str, pathlib.Path, None, default=None
+        Socket the server listens on. Design usage is to fallback on
+        :func:`socket_path`.
+
+    timeout: float, default=5
+        Seconds to wait for the server's response.
+
+    args:
+        Arguments of the requested operation. See :class:`KastenState`.
+
+    Returns
+    -------
+    response: dict
+        Response as returned by :func:`handle`, see :func:`unpack`.
+
+    Raises
+    ------
+    ConnectionError
+        Raised if no server is listening on the socket or the server closed
+        the connection without responding.
+    OSError
+        Raised if the connection failed otherwise, e.g. if the server did
+        not respond in time (:class:`socket.timeout`).
+    """
+    if path is None:
+        path = socket_path()
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.settimeout(timeout)
+    try:
+        connection.connect(os.fspath(path))
+    except (FileNotFoundError, ConnectionRefusedError) as error:
+        connection.close()
+        raise ConnectionError(f"No server listening on '{path}'") from error
+
+    with connection:
+        payload = {"op": op, "args": args}
+        connection.sendall(json.dumps(payload).encode() + b"\n")
+        line = _read_line(connection)
+
+    if not line.endswith(b"\n"):
+        raise ConnectionError(f"Server on '{path}' did not respond")
+    return json.loads(line)
+
+
+def unpack(response):
+    """Result of a server's response.
+
+    Parameters
+    ----------
+    response: dict
+        Response as returned by :func:`send`.
+
+    Returns
+    -------
+    result:
+        The operation's result.
+
+    Raises
+    ------
+    RuntimeError
+        Raised if the server failed answering the request with an
+        exception not stated in :attr:`remote_exceptions`. Exceptions
+        stated are reraised as they are.
+    """
+    if not response["ok"]:
+        exception = remote_exceptions.get(response["error"], RuntimeError)
+        raise exception(response["message"])
+
+    return response["result"]
+
+
+def request(op, path=None, timeout=5, **args):
+    """Send a request to a running server.
+
+    Combines :func:`send` and :func:`unpack`.
+
+    Parameters
+    ----------
+    op: str
+        Requested operation, one of :attr:`operations`.
+
+    path: str, pathlib.Path, None, default=None
+        Socket the server listens on. Design usage is to fallback on
+        :func:`socket_path`.
+
+    timeout: float, default=5
+        Seconds to wait for the server's response.
+
+    args:
+        Arguments of the requested operation. See :class:`KastenState`.
+
+    Returns
+    -------
+    result:
+        The operation's result.
+
+    Raises
+    ------
+    ConnectionError
+        Raised if no server is listening on the socket.
+    RuntimeError
+        Raised if the server failed answering the request with an
+        exception not stated in :attr:`remote_exceptions`.
+    """
+    return unpack(send(op, path=path, timeout=timeout, **args))
@@ -4,6 +4,7 @@ import logging
 from pathlib import Path
 
 from . import defaults
+from . import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -41,24 +42,13 @@ def create_config_folder(dummy_location=None):
         >>> Path('tests/doctest_dir/.zettelkasten.d').is_dir()
         True
     """
-    logger.debug("Initializing zettelkasten configuration file")
-
     if dummy_location:
-        logger.debug("Config folder requested to be created at dummy location")
-        logger.debug(f"{Path(dummy_location)}")
-
         config_folder_path = Path(dummy_location)
     else:
-
-        logger.debug(
-            "Config folder requested to be created at default location"
-        )
-        logger.debug(f"{defaults.config_folder}")
         config_folder_path = Path(defaults.config_folder)
 
     config_folder_path.mkdir(parents=True, exist_ok=True)
-    logger.debug("Succesfully create zettelkasten config folder at")
-    logger.debug(f"{Path(config_folder_path).resolve()}")
+    tracing.event("setup.create_config_folder", path=config_folder_path)
 
 
 def create_config_file_lines():
@@ -73,6 +63,14 @@ def create_config_file_lines():
         "\n",
         "location = ~/zettelkasten\n",
         "\n",
+        "lobby_shard_width = 0\n",
+        "\n",
+        "source_sharding = flat\n",
+        "source_shard_width = 2\n",
+        "\n",
+        "storage_backend = local\n",
+        "database = None\n",
+        "\n",
         "initial_folder_structure = \n",
         "    lobby,\n",
         "    %(sources_directory)s,\n",
@@ -102,6 +100,15 @@ def create_config_file_lines():
         "zettelkasten_bib_file = zettelkasten.bib\n",
         "\n",
         "[source_file_formats]\n",
+        "archives = \n",
+        "    tar.gz,\n",
+        "    tgz,\n",
+        "    tar.xz,\n",
+        "    txz,\n",
+        "    tar,\n",
+        "    zip,\n",
+        "    gz,\n",
+        "    xz\n",
         "audios = \n",
         "    mp3,\n",
         "    wav\n",
@@ -190,29 +197,72 @@ def create_config_file(dummy_location=None):
         >>> Path('tests/doctest_dir/.zettelkasten.d/zk.cfg').is_file()
         True
     """
-    logger.debug("Initializing zettelkasten configuration file")
-
     if dummy_location:
-        logger.debug("Config file requested to be created at dummy location")
-        logger.debug(f"{Path(dummy_location)}")
-
         config_file_path = Path(dummy_location)
     else:
-
-        logger.debug("Config file requested to be created at default location")
-        logger.debug(f"{defaults.config_file}")
         config_file_path = Path(defaults.config_file)
 
     if config_file_path.is_file():
-        logger.debug("Configuration file already present")
-        logger.debug("Zettelkasten has been setup before.")
-        logger.debug("Not overwriting the existing config.")
+        # zettelkasten has been setup before, don't overwrite the config
+        tracing.event("setup.create_config_file.present", path=config_file_path)
     else:
         with open(config_file_path, "w") as f:
             f.writelines(create_config_file_lines())
 
-            logger.debug("Succesfully create zettelkasten config file at")
-            logger.debug(f"{config_file_path}")
+        tracing.event("setup.create_config_file", path=config_file_path)
+
+
+def set_config_value(key, value, dummy_location=None):
+    """Set a value of the :ref:`cfile's <cfile>` ``[default]`` section.
+
+    Only the line stating key is replaced (or added at the end of the
+    section), so comments and formatting of the file are preserved.
+
+    Parameters
+    ----------
+    key: str
+        Name of the setting as in ``lobby_shard_width``.
+
+    value: str, ~numbers.Number
+        New value of the setting.
+
+    dummy_location: str, pathlib.Path, None, default=None
+        Dummy location used for testing. Design usage is to fallback on
+        :attr:`zettelkasten.defaults.config_file`.
+    """
+    if dummy_location:
+        config_file_path = Path(dummy_location)
+    else:
+        config_file_path = Path(defaults.config_file)
+
+    with open(config_file_path) as f:
+        lines = f.readlines()
+
+    line = f"{key} = {value}\n"
+    section = None
+    end = None
+    for i, current in enumerate(lines):
+        stripped = current.strip()
+        if stripped.startswith("[") and stripped.endswith("]"):
+            if section == "[default]" and end is None:
+                end = i
+            section = stripped
+        elif section == "[default]" and stripped.split("=")[0].strip() == key:
+            lines[i] = line
+            break
+    else:
+        if section == "[default]" and end is None:
+            end = len(lines)
+        if end is None:
+            lines[:0] = ["[default]\n", line, "\n"]
+        else:
+            while end > 0 and not lines[end - 1].strip():
+                end -= 1
+            lines.insert(end, line)
+
+    with open(config_file_path, "w") as f:
+        f.writelines(lines)
+    tracing.event("setup.set_config_value", key=key, value=value)
 
 
 def create_styles_file_lines():
@@ -273,26 +323,16 @@ def create_styles_file(dummy_location=None):
         >>> Path('tests/doctest_dir/.zettelkasten.d/styles.cfg').is_file()
         True
     """
-    logger.debug("Initializing zettelkasten styles file")
-
     if dummy_location:
-        logger.debug("Styles file requested to be created at dummy location")
-        logger.debug(f"{Path(dummy_location)}")
-
         styles_file_path = Path(dummy_location)
     else:
-
-        logger.debug("Styles file requested to be created at default location")
-        logger.debug(f"{defaults.styles_file}")
         styles_file_path = Path(defaults.styles_file)
 
     if styles_file_path.is_file():
-        logger.debug("Styles file already present")
-        logger.debug("Zettelkasten has been setup before.")
-        logger.debug("Not overwriting the existing config.")
+        # zettelkasten has been setup before, don't overwrite the config
+        tracing.event("setup.create_styles_file.present", path=styles_file_path)
     else:
         with open(styles_file_path, "w") as f:
             f.writelines(create_styles_file_lines())
 
-            logger.debug("Succesfully create zettelkasten styles file at")
-            logger.debug(f"{styles_file_path}")
+        tracing.event("setup.create_styles_file", path=styles_file_path)
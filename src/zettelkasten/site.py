@@ -0,0 +1,482 @@
+# zettelkasten/site.py
+"""Module rendering the zettelkasten into a static html site.
+
+Zettels are rendered incrementally. A manifest of input hashes is kept inside
+the output directory so only zettels whose org or bib file changed since the
+last build are rendered again. The zettels are read through the
+:attr:`storage backend <zettelkasten.storage.backend>`, the site is written to
+the local file system.
+"""
+import concurrent.futures
+import hashlib
+import html
+import json
+import logging
+import os
+import re
+
+from . import compile as comp
+from . import defaults
+from . import parse
+from . import storage
+
+logger = logging.getLogger(__name__)
+
+manifest_file = ".manifest.json"
+"""Name of the manifest file stored inside the site's output directory."""
+
+renderer_version = "1"
+"""Version of the html renderer. Changing it invalidates every manifest."""
+
+_heading_pattern = re.compile(r"^(\*+)\s+(.*)$")
+_attribute_pattern = re.compile(r"^(#\+\w+:)\s?(.*)$")
+_link_pattern = re.compile(r"\[\[([^\]]+)\](?:\[([^\]]+)\])?\]")
+
+_page_template = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+def _inline(text):
+    """Escape a line of org text and convert its links into anchors."""
+    parts = list()
+    last = 0
+    for match in _link_pattern.finditer(text):
+        target, description = match.groups()
+        if target.startswith("file:"):
+            target = target[len("file:") :]
+            if target.endswith(".org"):
+                target = target[: -len(".org")] + ".html"
+        parts.append(html.escape(text[last : match.start()]))
+        parts.append(
+            f'<a href="{html.escape(target)}">'
+            + f"{html.escape(description or target)}</a>"
+        )
+        last = match.end()
+    parts.append(html.escape(text[last:]))
+
+    return "".join(parts)
+
+
+def render_bibliography(content):
+    """Render the content of a bibliography file as html list.
+
+    Parameters
+    ----------
+    content: str
+        Text content of a zettel's bibliography file.
+
+    Returns
+    -------
+    rendered: str
+        Html ``<ul>`` element listing the entries. Empty string if the
+        bibliography holds no entries.
+
+    Examples
+    --------
+    >>> content = "".join(defaults.bibliography_entry(
+    ...     source_file="/tmp/test_pdf.pdf",
+    ...     key="pdf_2021_p2",
+    ...     author="Doe, Jane",
+    ...     title="Test PDF",
+    ...     year=2021))
+    >>> print(render_bibliography(content))
+    <ul class="bibliography">
+    <li id="pdf_2021_p2">Doe, Jane: <a href="file:///tmp/test_pdf.pdf">Test PDF</a> (2021)</li>
+    </ul>
+    """
+    items = list()
+    for entry in parse.bibliography_entries(content):
+        fields = entry.fields
+        title = html.escape(fields.get("title", entry.key))
+        url = fields.get("url")
+        if url:
+            title = f'<a href="{html.escape(url)}">{title}</a>'
+        item = f"{html.escape(fields.get('author', ''))}: {title}"
+        if fields.get("year"):
+            item += f" ({html.escape(fields['year'])})"
+        locspec = fields.get("keywords")
+        if locspec and locspec != "None":
+            item += f", {html.escape(locspec)}"
+        items.append(f'<li id="{html.escape(entry.key)}">{item}</li>')
+
+    if not items:
+        return ""
+
+    return "\n".join(['<ul class="bibliography">', *items, "</ul>"])
+
+
+def _render_body(lines, bib_content):
+    """Html elements of the stripped org lines following the attributes."""
+    body = list()
+    paragraph = list()
+
+    def close_paragraph():
+        if paragraph:
+            body.append(f"<p>{' '.join(paragraph)}</p>")
+            paragraph.clear()
+
+    for stripped in lines:
+        heading = _heading_pattern.match(stripped)
+        if heading:
+            close_paragraph()
+            level = min(len(heading.group(1)), 6)
+            body.append(f"<h{level}>{_inline(heading.group(2))}</h{level}>")
+        elif stripped.startswith("bibliography:"):
+            close_paragraph()
+            rendered = render_bibliography(bib_content)
+            if rendered:
+                body.append(rendered)
+        elif not stripped:
+            close_paragraph()
+        else:
+            paragraph.append(_inline(stripped))
+    close_paragraph()
+
+    return body
+
+
+def render_zettel(org_content, bib_content="", title_label=None):
+    """Render a zettel's org and bib file contents as html page.
+
+    Supports the subset of org-mode used by zettelkasten zettels: header
+    attributes, headings, links, paragraphs and the ``bibliography:`` line
+    written by :func:`zettelkasten.add.write_org_zettel_bibliography`.
+
+    Parameters
+    ----------
+    org_content: str
+        Text content of the zettel's org file.
+
+    bib_content: str, default=""
+        Text content of the zettel's bibliography file.
+
+    title_label: str, None, default=None
+        Attribute label holding the page title. ``None`` falls back on the
+        ``uid`` label of :attr:`zettelkasten.defaults.zettel_meta_attribute_labels`.
+
+    Returns
+    -------
+    page: str
+        Complete html document.
+
+    Examples
+    --------
+    >>> page = render_zettel("#+Title: chisel\\n\\n* Bibliography\\n")
+    >>> print(page.split("<body>")[1].split("</body>")[0].strip())
+    <dl class="attributes">
+    <dt>Title</dt><dd>chisel</dd>
+    </dl>
+    <h1>Bibliography</h1>
+    """
+    if title_label is None:
+        title_label = defaults.zettel_meta_attribute_labels.get("uid")
+
+    title = ""
+    attributes = list()
+    lines = list()
+    for line in org_content.splitlines():
+        stripped = line.strip()
+        attribute = _attribute_pattern.match(stripped)
+        if attribute is None:
+            lines.append(stripped)
+            continue
+        label, value = attribute.groups()
+        if label == title_label:
+            title = value.strip()
+        attributes.append(
+            f"<dt>{html.escape(label[2:-1])}</dt>"
+            + f"<dd>{html.escape(value.strip())}</dd>"
+        )
+    body = _render_body(lines, bib_content)
+
+    if attributes:
+        body = ['<dl class="attributes">', *attributes, "</dl>", *body]
+
+    return _page_template.format(title=html.escape(title), body="\n".join(body))
+
+
+def _render_page(job):
+    """Process pool worker rendering a single zettel page."""
+    org_content, bib_content, html_file, title_label = job
+
+    os.makedirs(os.path.dirname(html_file), exist_ok=True)
+    with open(html_file, "w") as f:
+        f.write(render_zettel(org_content, bib_content, title_label))
+
+    return html_file
+
+
+def _read_inputs(org_file, bib_file):
+    """Contents of the org and bib file, missing files read as empty."""
+    contents = list()
+    for path in (org_file, bib_file):
+        contents.append(
+            storage.backend.read(path) if storage.backend.is_file(path) else ""
+        )
+
+    return contents
+
+
+def _digest(org_content, bib_content):
+    """Hex digest over both contents and the renderer version."""
+    digest = hashlib.sha256(renderer_version.encode())
+    for content in (org_content, bib_content):
+        digest.update(b"\0")
+        digest.update(content.encode())
+
+    return digest.hexdigest()
+
+
+def input_digest(org_file, bib_file):
+    """Hash the input files a zettel page is rendered from.
+
+    Parameters
+    ----------
+    org_file: str, pathlib.Path
+        Location of the zettel's org file.
+
+    bib_file: str, pathlib.Path
+        Location of the zettel's bibliography file. Missing files are hashed
+        as empty.
+
+    Returns
+    -------
+    digest: str
+        Hex digest over both files and the :attr:`renderer_version`.
+    """
+    return _digest(*_read_inputs(org_file, bib_file))
+
+
+def _index_page(title, links):
+    """Render a page listing links as ``(href, text)`` tuples."""
+    items = [
+        f'<li><a href="{html.escape(href)}">{html.escape(text)}</a></li>'
+        for href, text in links
+    ]
+    body = "\n".join(
+        [f"<h1>{html.escape(title)}</h1>", "<ul>", *items, "</ul>"]
+    )
+
+    return _page_template.format(title=html.escape(title), body=body)
+
+
+def _write_if_changed(path, content):
+    """Write content unless the file already holds exactly that content."""
+    if os.path.isfile(path):
+        with open(path) as f:
+            if f.read() == content:
+                return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def _remove_pages(output_dir, pages):
+    """Remove existing pages given relative to output_dir and the folders
+    left empty. Returns the number of removed pages."""
+    removed = 0
+    top = os.path.abspath(output_dir)
+    for page in pages:
+        path = os.path.join(top, page)
+        if not os.path.isfile(path):
+            continue
+        os.remove(path)
+        removed += 1
+        folder = os.path.dirname(path)
+        while folder != top and not os.listdir(folder):
+            os.rmdir(folder)
+            folder = os.path.dirname(folder)
+
+    return removed
+
+
+def write_index_pages(output_dir):
+    """Write the category and subcategory index pages.
+
+    Index pages are generated from :func:`zettelkasten.compile.zettel_mapping`
+    (whose sorted categories and subcategories stem from
+    :func:`zettelkasten.compile.subcategory_mapping`) as::
+
+        index.html
+        category/index.html
+        category/subcategory/index.html
+        lobby/index.html
+
+    Parameters
+    ----------
+    output_dir: str, pathlib.Path
+        Top level directory of the rendered site.
+
+    Returns
+    -------
+    pages: list
+        Locations of the index pages relative to output_dir, as recorded
+        inside the :attr:`manifest <manifest_file>`.
+    """
+    mapping = comp.zettel_mapping()
+    pages = list()
+
+    def write(page, title, links):
+        pages.append(page)
+        _write_if_changed(
+            os.path.join(output_dir, page), _index_page(title, links)
+        )
+
+    top_level = list()
+    for category, subcategories in mapping.items():
+        top_level.append((f"{category}/index.html", category))
+
+        if category == "lobby":
+            links = [(f"{uid}/{uid}.html", uid) for uid in subcategories]
+            write(f"{category}/index.html", category, links)
+            continue
+
+        write(
+            f"{category}/index.html",
+            category,
+            [(f"{sub}/index.html", sub) for sub in subcategories],
+        )
+        for subcategory, uids in subcategories.items():
+            write(
+                f"{category}/{subcategory}/index.html",
+                f"{category}{defaults.name_sep}{subcategory}",
+                [(f"{uid}/{uid}.html", uid) for uid in uids],
+            )
+
+    write("index.html", "Zettelkasten", sorted(top_level, key=lambda x: x[1]))
+
+    return pages
+
+
+def build_site(output_dir, processes=None, force=False):
+    """Render all zettels of the zettelkasten into a static html site.
+
+    Uses :attr:`zettelkasten.defaults.location` as top level folder for
+    compiling. Each zettel ``category/subcategory/uid`` is rendered into
+    ``output_dir/category/subcategory/uid/uid.html`` mirroring the zettelkasten
+    layout.
+
+    Only zettels whose :func:`input digest <input_digest>` differs from the
+    one stored inside the :attr:`manifest <manifest_file>` are rendered.
+    Pages of zettels and index pages of categories no longer present inside
+    the zettelkasten are removed.
+
+    Parameters
+    ----------
+    output_dir: str, pathlib.Path
+        Top level directory of the rendered site. Created if not present.
+
+    processes: int, None, default=None
+        Number of worker processes used for rendering. ``None`` uses
+        :func:`os.cpu_count`. ``1`` renders inside the calling process.
+
+    force: bool, default=False
+        If ``True`` every zettel is rendered regardless of its digest. The
+        manifest is still read to remove pages of deleted zettels.
+
+    Returns
+    -------
+    summary: dict
+        Mapping of ``"rendered"``, ``"skipped"`` and ``"removed"`` to the
+        respective number of zettel pages.
+
+    Examples
+    --------
+    >>> from zettelkasten import add, defaults, initialize
+    >>> defaults.location = "tests/doctest_dir/doctest_kasten"
+    >>> initialize.structure_zettelkasten()
+    >>> add.new_zettel("woodturning/tools/chisel", force_overwrite=True)
+    >>> summary = build_site("tests/doctest_dir/doctest_site", processes=1)
+    >>> summary = build_site("tests/doctest_dir/doctest_site", processes=1)
+    >>> summary["rendered"]
+    0
+    """
+    manifest_path = os.path.join(output_dir, manifest_file)
+    manifest = dict()
+    if os.path.isfile(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    digests = manifest.get("zettels", dict())
+
+    # worker processes do not necessarily share the monkeypatched defaults
+    title_label = defaults.zettel_meta_attribute_labels.get("uid")
+
+    new_digests = dict()
+    jobs = list()
+    for name in comp.parsed_zettels():
+        zettel_dir = os.path.join(
+            defaults.location, *parse.zettel_folder_parts(name)
+        )
+        uid = os.path.basename(zettel_dir)
+        org_file = os.path.join(zettel_dir, f"{uid}.org")
+        if not storage.backend.is_file(org_file):
+            logger.warning(f"Skipping '{name}', no org file found")
+            continue
+        bib_file = os.path.join(zettel_dir, f"{uid}.bib")
+        html_file = os.path.join(
+            output_dir, *name.split(defaults.name_sep), f"{uid}.html"
+        )
+
+        # worker processes can not access memory or database backends
+        org_content, bib_content = _read_inputs(org_file, bib_file)
+        digest = _digest(org_content, bib_content)
+        new_digests[name] = digest
+        if (
+            force
+            or digests.get(name) != digest
+            or not os.path.isfile(html_file)
+        ):
+            jobs.append((org_content, bib_content, html_file, title_label))
+
+    logger.debug(f"{len(jobs)} of {len(new_digests)} zettels need rendering")
+
+    if processes == 1 or len(jobs) < 2:
+        for job in jobs:
+            _render_page(job)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            workers = processes or os.cpu_count() or 1
+            chunksize = max(1, len(jobs) // (4 * workers))
+            for _ in executor.map(_render_page, jobs, chunksize=chunksize):
+                pass
+
+    # remove pages of zettels gone since the last build
+    removed = _remove_pages(
+        output_dir,
+        [
+            os.path.join(*parts, f"{parts[-1]}.html")
+            for parts in (
+                name.split(defaults.name_sep)
+                for name in set(digests) - set(new_digests)
+            )
+        ],
+    )
+
+    pages = write_index_pages(output_dir)
+    _remove_pages(
+        output_dir, set(manifest.get("index_pages", list())) - set(pages)
+    )
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(manifest_path, "w") as f:
+        json.dump(
+            {"zettels": new_digests, "index_pages": sorted(pages)},
+            f,
+            indent=0,
+            sort_keys=True,
+        )
+
+    return {
+        "rendered": len(jobs),
+        "skipped": len(new_digests) - len(jobs),
+        "removed": removed,
+    }
@@ -0,0 +1,431 @@
+# zettelkasten/sources.py
+"""Module managing the files inside the zettelkasten's sources directory.
+
+:func:`zettelkasten.add.new_source` copies every source file into
+``<sources directory>/<type>/`` or one of its :func:`shard folders
+<source_shard>`. Files no bibliography entry references any
+more (e.g. after an entry was overwritten using another file) are
+orphans, which can be found and removed using :func:`collect_garbage`.
+
+Referenced files are identified by their path relative to the
+:attr:`sources directory <zettelkasten.defaults.sources_directory>`, so urls
+written before the zettelkasten was moved still protect their files.
+"""
+import datetime
+import os
+import re
+import typing
+import zlib
+
+from . import compile as comp
+from . import defaults
+from . import filetypes
+from . import parse
+from . import storage
+from . import tracing
+from . import transfer
+
+_url_pattern = re.compile(
+    r'^\s*url\s*=\s*(?:"file://(.*)"|\{file://(.*)\}),?\s*$', re.MULTILINE
+)
+
+sharding_schemes = ("flat", "hash", "date")
+"""Supported :attr:`source sharding schemes
+<zettelkasten.defaults.source_sharding>`."""
+
+
+class SourceFile(typing.NamedTuple):
+    """Source file consisting of ``path``, ``ftype`` and ``size``.
+
+    Parameters
+    ----------
+    path: str
+        Location of the source file.
+
+    ftype: str
+        Source type folder the file resides in as in ``pdfs``.
+
+    size: int
+        Size of the file in bytes.
+    """
+
+    path: str
+    ftype: str
+    size: int
+
+
+def source_shard(file_name, scheme=None, width=None, date=None):
+    """Shard folders a source file is stored in below its type folder.
+
+    Parameters
+    ----------
+    file_name: str
+        Name of the source file.
+
+    scheme: str, None, default=None
+        One of :attr:`sharding_schemes`. Design usage is to fallback on
+        :attr:`zettelkasten.defaults.source_sharding`.
+
+    width: int, None, default=None
+        Number of hex digits naming ``hash`` shards. Design usage is to
+        fallback on :attr:`zettelkasten.defaults.source_shard_width`.
+
+    date: datetime.date, None, default=None
+        Date naming ``date`` shards. ``None`` uses today's date.
+
+    Returns
+    -------
+    parts: list
+        Shard folder names, empty if the sources are not sharded.
+
+    Raises
+    ------
+    ValueError
+        Raised if scheme is not one of :attr:`sharding_schemes`.
+
+    Examples
+    --------
+    >>> source_shard("test.pdf", scheme="hash", width=2)
+    ['a4']
+    >>> source_shard("test.pdf", scheme="date", date=datetime.date(2021, 7, 4))
+    ['2021', '07']
+    >>> source_shard("test.pdf", scheme="flat")
+    []
+    """
+    if scheme is None:
+        scheme = defaults.source_sharding
+    if scheme not in sharding_schemes:
+        raise ValueError(f"Unknown source sharding scheme '{scheme}'")
+
+    if scheme == "hash":
+        if width is None:
+            width = defaults.source_shard_width
+        return [f"{zlib.crc32(file_name.encode()):08x}"[:width]]
+    if scheme == "date":
+        if date is None:
+            date = datetime.date.today()
+        return [f"{date.year:04d}", f"{date.month:02d}"]
+    return list()
+
+
+def source_destination(source_file, ftype, location=None):
+    """Location a source file is copied to by
+    :func:`zettelkasten.add.new_source`.
+
+    Parameters
+    ----------
+    source_file: str
+        Location of the source file to add.
+
+    ftype: str
+        Type folder of the source file, see
+        :func:`zettelkasten.filetypes.infer_file_type`.
+
+    location: str, pathlib.Path, None, default=None
+        Top level folder of the zettelkasten. Design usage is to fallback on
+        :attr:`zettelkasten.defaults.location`.
+
+    Returns
+    -------
+    destination: str
+        ``<sources directory>/<type>/<shard folders>/<file name>``, see
+        :func:`source_shard` and :func:`zettelkasten.filetypes.file_name`.
+        An interrupted local copy of the source into the date shard of the
+        current or previous month is resumed there, see
+        :func:`zettelkasten.transfer.interrupted_copy`.
+
+    Examples
+    --------
+    >>> source_destination("/tmp/test.pdf", "pdfs", "kasten")
+    'kasten/_sources/pdfs/test.pdf'
+    """
+    if location is None:
+        location = defaults.location
+    file_name = filetypes.file_name(source_file, ftype)
+    folder = os.path.join(location, defaults.sources_directory, ftype)
+
+    # date shards change over time, resume in the shard of the first attempt
+    if defaults.source_sharding == "date" and storage.backend.local:
+        today = datetime.date.today()
+        last_month = today.replace(day=1) - datetime.timedelta(days=1)
+        destination = transfer.interrupted_copy(
+            source_file,
+            [
+                os.path.join(
+                    folder, *source_shard(file_name, date=date), file_name
+                )
+                for date in (today, last_month)
+            ],
+        )
+        if destination is not None:
+            return destination
+
+    return os.path.join(folder, *source_shard(file_name), file_name)
+
+
+def rewrite_urls(content, moved, sources=None):
+    r"""Rewrite the ``url`` fields of a bibliography file's content.
+
+    Parameters
+    ----------
+    content: str
+        Text content of a bibliography file.
+
+    moved: dict
+        Mapping of :func:`source keys <source_key>` of moved files to their
+        new location.
+
+    sources: str, None, default=None
+        Absolute location of the sources directory. ``None`` infers it from
+        :attr:`zettelkasten.defaults.location`.
+
+    Returns
+    -------
+    content: str
+        Content whose urls point to the moved files' new locations.
+
+    Examples
+    --------
+    >>> rewrite_urls(
+    ...     '  url      = "file:///kasten/_sources/pdfs/test.pdf",\n',
+    ...     {"pdfs/test.pdf": "/kasten/_sources/pdfs/a4/test.pdf"},
+    ...     "/kasten/_sources")
+    '  url      = "file:///kasten/_sources/pdfs/a4/test.pdf",\n'
+    """
+    if sources is None:
+        sources = os.path.abspath(
+            os.path.join(defaults.location, defaults.sources_directory)
+        )
+
+    def replace(match):
+        quoted, braced = match.groups()
+        path = quoted or braced
+        destination = moved.get(source_key(path, sources))
+        if destination is None:
+            return match.group(0)
+        start, end = match.span(1 if quoted else 2)
+        offset = match.start()
+        line = match.group(0)
+        return line[: start - offset] + destination + line[end - offset :]
+
+    return _url_pattern.sub(replace, content)
+
+
+def bibliography_files():
+    """Yield the location of every bibliography file of the zettelkasten.
+
+    Uses :attr:`zettelkasten.defaults.location` as top level folder. Yields
+    the :attr:`zettelkasten's bibliography file
+    <zettelkasten.defaults.zettelkasten_bib_file>` followed by the zettel's
+    bibliography files, as far as present.
+    """
+    location = defaults.location
+    main_bib_file = os.path.join(
+        location, defaults.sources_directory, defaults.zettelkasten_bib_file
+    )
+    if os.path.isfile(main_bib_file):
+        yield main_bib_file
+
+    for category, subcategories in comp.zettel_mapping().items():
+        if category == "lobby":
+            folders = [
+                parse.zettel_folder_parts(f"lobby{defaults.name_sep}{uid}")
+                for uid in subcategories
+            ]
+        else:
+            folders = [
+                (category, subcategory, uid)
+                for subcategory, uids in subcategories.items()
+                for uid in uids
+            ]
+        for parts in folders:
+            bib_file = os.path.join(location, *parts, f"{parts[-1]}.bib")
+            if os.path.isfile(bib_file):
+                yield bib_file
+
+
+def source_key(path, sources=None):
+    """Identify a source file by its path relative to the sources directory.
+
+    Parameters
+    ----------
+    path: str
+        Location of a source file, as stated in a bibliography url.
+
+    sources: str, None, default=None
+        Absolute location of the sources directory. ``None`` infers it from
+        :attr:`zettelkasten.defaults.location`.
+
+    Returns
+    -------
+    key: str
+        Path relative to the sources directory. Paths outside of it are
+        keyed on the part following their last
+        :attr:`~zettelkasten.defaults.sources_directory` component, or
+        returned as absolute path if there is none.
+
+    Examples
+    --------
+    >>> source_key("/old/kasten/_sources/pdfs/test.pdf", "/new/kasten/_sources")
+    'pdfs/test.pdf'
+    >>> source_key("/somewhere/test.pdf", "/new/kasten/_sources")
+    '/somewhere/test.pdf'
+    """
+    if sources is None:
+        sources = os.path.abspath(
+            os.path.join(defaults.location, defaults.sources_directory)
+        )
+    path = os.path.abspath(path)
+    if os.path.commonpath([path, sources]) == sources:
+        return os.path.relpath(path, sources)
+
+    component = f"{os.sep}{defaults.sources_directory}{os.sep}"
+    if component in path:
+        return path.rsplit(component, 1)[-1]
+
+    return path
+
+
+def referenced_sources():
+    """Collect the source files referenced by any bibliography entry.
+
+    Reads every :func:`bibliography file <bibliography_files>` once, only
+    extracting the ``url`` fields.
+
+    Returns
+    -------
+    referenced: set
+        :func:`Source keys <source_key>` of all referenced files.
+    """
+    sources = os.path.abspath(
+        os.path.join(defaults.location, defaults.sources_directory)
+    )
+    referenced = set()
+    files = 0
+    for bib_file in bibliography_files():
+        files += 1
+        with open(bib_file) as f:
+            content = f.read()
+        for quoted, braced in _url_pattern.findall(content):
+            referenced.add(source_key(quoted or braced, sources))
+    tracing.event(
+        "sources.referenced_sources", files=files, referenced=len(referenced)
+    )
+
+    return referenced
+
+
+def source_files():
+    """Yield every file stored inside the sources directory.
+
+    Uses :attr:`zettelkasten.defaults.location` as top level folder. The
+    :attr:`zettelkasten's bibliography file
+    <zettelkasten.defaults.zettelkasten_bib_file>` is skipped.
+
+    Yields
+    ------
+    source: SourceFile
+        Location, type folder and size of each file.
+    """
+    sources = os.path.join(defaults.location, defaults.sources_directory)
+    if not os.path.isdir(sources):
+        return
+
+    folders = [sources]
+    while folders:
+        folder = folders.pop()
+        with os.scandir(folder) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    folders.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    relative = os.path.relpath(entry.path, sources)
+                    if relative == defaults.zettelkasten_bib_file:
+                        continue
+                    ftype = os.path.dirname(relative).split(os.sep)[0]
+                    yield SourceFile(entry.path, ftype, entry.stat().st_size)
+
+
+def collect_garbage(delete=False):
+    """Find (and delete) the source files no bibliography entry references.
+
+    Parameters
+    ----------
+    delete: bool, default=False
+        If ``True`` the orphaned files are removed.
+
+    Returns
+    -------
+    orphans: list
+        :class:`SourceFile` orphans sorted by location.
+
+    Raises
+    ------
+    RuntimeError
+        Raised if the :attr:`storage backend <zettelkasten.storage.backend>`
+        is not local, see :func:`zettelkasten.storage.require_local`.
+
+    Examples
+    --------
+    >>> from zettelkasten import add, defaults, initialize
+    >>> defaults.location = "tests/doctest_dir/doctest_kasten"
+    >>> initialize.structure_zettelkasten()
+    >>> add.new_zettel("woodturning/tools/chisel", force_overwrite=True)
+    >>> orphan = os.path.join(
+    ...     defaults.location, defaults.sources_directory, "pdfs", "orphan.pdf")
+    >>> with open(orphan, "w") as f:
+    ...     _ = f.write("unreferenced")
+    >>> [(o.ftype, o.size) for o in collect_garbage() if o.path == orphan]
+    [('pdfs', 12)]
+    >>> os.remove(orphan)
+    """
+    storage.require_local("Collecting orphaned sources")
+    with tracing.span("sources.collect_garbage", delete=delete) as span:
+        referenced = referenced_sources()
+        sources = os.path.abspath(
+            os.path.join(defaults.location, defaults.sources_directory)
+        )
+
+        orphans = sorted(
+            source
+            for source in source_files()
+            if source_key(source.path, sources) not in referenced
+        )
+        span.set(orphans=len(orphans))
+
+        if delete:
+            for orphan in orphans:
+                os.remove(orphan.path)
+
+    return orphans
+
+
+def reclaimable_bytes(orphans):
+    """Sum up the size of orphans per type.
+
+    Parameters
+    ----------
+    orphans: ~collections.abc.Iterable
+        :class:`SourceFile` orphans as returned by :func:`collect_garbage`.
+
+    Returns
+    -------
+    reclaimable: dict
+        Alphabetically sorted mapping of type folders to a tuple of the
+        number of files and their total size in bytes.
+
+    Examples
+    --------
+    >>> reclaimable_bytes([
+    ...     SourceFile("_sources/pdfs/a.pdf", "pdfs", 10),
+    ...     SourceFile("_sources/pdfs/b.pdf", "pdfs", 5),
+    ...     SourceFile("_sources/audios/c.mp3", "audios", 7),
+    ... ])
+    {'audios': (1, 7), 'pdfs': (2, 15)}
+    """
+    reclaimable = dict()
+    for orphan in orphans:
+        files, size = reclaimable.get(orphan.ftype, (0, 0))
+        reclaimable[orphan.ftype] = (files + 1, size + orphan.size)
+
+    return dict(sorted(reclaimable.items()))
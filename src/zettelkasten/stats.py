@@ -0,0 +1,129 @@
+# zettelkasten/stats.py
+"""Module aggregating statistics of the zettelkasten.
+
+Statistics are computed from a :class:`zettelkasten.index.ZettelIndex`, so
+no zettel or source file is read. Each statistic is a histogram (a
+:class:`collections.Counter` over the indexed records) of the zettels by
+category, subcategory and creation date or of the sources by type.
+
+Examples
+--------
+>>> from zettelkasten import add, defaults, initialize, index
+>>> defaults.location = "tests/doctest_dir/doctest_kasten"
+>>> initialize.structure_zettelkasten()
+>>> add.new_zettel("woodturning/tools/chisel", force_overwrite=True)
+>>> report = kasten_stats(index.ZettelIndex.build())
+>>> report["categories"]["woodturning"] >= 1
+True
+>>> sorted(report["sources"])
+['audios', 'images', 'pdfs', 'videos']
+"""
+import collections
+
+from . import defaults
+from . import filetypes
+from . import index as zindex
+
+date_buckets = {"year": 4, "month": 7, "day": 10}
+"""Creation date buckets mapped to the length of their ``%Y-%m-%d`` prefix.
+"""
+
+
+def kasten_stats(index, bucket="month"):
+    """Aggregate the statistics of an indexed zettelkasten.
+
+    Parameters
+    ----------
+    index: zettelkasten.index.ZettelIndex
+        Index the statistics are computed from.
+
+    bucket: str, default="month"
+        One of :attr:`date_buckets`. Zettels are counted per bucket of their
+        ``doc`` attribute (date of creation).
+
+    Returns
+    -------
+    stats: dict
+        Json serializable mapping of:
+
+            - ``zettels``: number of zettels
+            - ``categories``: zettels per category (including the lobby)
+            - ``subcategories``: zettels per ``category/subcategory``
+            - ``growth``: zettels per date bucket, chronologically sorted.
+              Zettels without date of creation are counted as ``"None"``.
+            - ``references``: number of entries of all zettel bibliographies
+            - ``bib_entries``: number of entries of the zettelkasten's
+              bibliography
+            - ``sources``: source files per type
+            - ``source_bytes``: size of the source files per type
+            - ``missing_sources``: number of source files not found
+
+    Raises
+    ------
+    ValueError
+        Raised if bucket is not one of :attr:`date_buckets`.
+    """
+    if bucket not in date_buckets:
+        raise ValueError(f"Unknown date bucket '{bucket}'")
+    width = date_buckets[bucket]
+    sep = defaults.name_sep
+
+    # zettels per lobby or category/subcategory prefix, the categories are
+    # aggregated from these few prefixes afterwards
+    prefixes = collections.Counter(
+        name.rpartition(sep)[0] for name in index.zettels
+    )
+    categories = collections.Counter()
+    subcategories = dict()
+    for prefix, count in prefixes.items():
+        categories[prefix.partition(sep)[0]] += count
+        if sep in prefix:
+            subcategories[prefix] = count
+
+    records = index.zettels.values()
+    growth = collections.Counter(
+        record["attributes"].get("doc", "None")[:width] for record in records
+    )
+    references = sum(len(record["bib"]) for record in records)
+
+    sources = collections.Counter()
+    source_bytes = collections.Counter()
+    missing = 0
+    for url, size in index.source_sizes.items():
+        if size is None:
+            missing += 1
+            continue
+        ftype = filetypes.infer_file_type(url, sniff=False) or "other"
+        sources[ftype] += 1
+        source_bytes[ftype] += size
+
+    undated = growth.pop("None", 0)
+    growth = dict(sorted(growth.items()))
+    if undated:
+        growth["None"] = undated
+
+    return {
+        "zettels": len(index.zettels),
+        "categories": dict(sorted(categories.items())),
+        "subcategories": dict(sorted(subcategories.items())),
+        "growth": growth,
+        "references": references,
+        "bib_entries": len(index.sources),
+        "sources": dict(sorted(sources.items())),
+        "source_bytes": dict(sorted(source_bytes.items())),
+        "missing_sources": missing,
+    }
+
+
+def collect(bucket="month", refresh=False):
+    """Statistics of the zettelkasten, avoiding a rescan where possible.
+
+    Computed from the index kept up to date by a :mod:`watcher
+    <zettelkasten.watch>` or otherwise from the persisted index, which is
+    only validated if the zettelkasten's top level folder changed or refresh
+    is set (see :func:`zettelkasten.index.persisted_index`). Only the first
+    call without a persisted index walks the complete zettelkasten. The
+    sizes of the source files are updated along with the zettelkasten's
+    bibliography. See :func:`kasten_stats`.
+    """
+    return kasten_stats(zindex.persisted_index(refresh=refresh), bucket)
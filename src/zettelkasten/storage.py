@@ -0,0 +1,818 @@
+# zettelkasten/storage.py
+"""Module abstracting the storage the zettelkasten is written to.
+
+:mod:`~zettelkasten.add`, :mod:`~zettelkasten.compile` and
+:mod:`~zettelkasten.initialize` access the zettelkasten's files through the
+:attr:`backend` instead of calling :mod:`os` directly. Each backend
+implements the operations of :class:`Backend`:
+
+    - :meth:`~Backend.list`: entries of a folder
+    - :meth:`~Backend.read`: text content of a file
+    - :meth:`~Backend.write`: write or append text content to a file
+    - :meth:`~Backend.copy`: copy a (local) source file into the storage
+    - :meth:`~Backend.stat`: kind, size and modification time of an entry
+    - :meth:`~Backend.makedirs`: create a folder including its parents
+
+:class:`LocalBackend` stores everything inside the local file system and is
+used by default. :class:`MemoryBackend` keeps everything in memory, which is
+designed for fast tests and benchmarks. :class:`SQLiteBackend` stores
+everything inside a single database file. Switch backends temporarily using
+:func:`using`. The command line interface uses the
+:func:`configured_backend`. Operations on the local files only, as moving or
+deleting zettels, call :func:`require_local` first.
+
+Examples
+--------
+>>> from zettelkasten import add, compile, defaults, initialize
+>>> defaults.location = "tests/doctest_dir/memory_kasten"
+>>> with using(MemoryBackend()) as memory:
+...     initialize.structure_zettelkasten()
+...     add.new_zettel("woodturning/tools/chisel")
+...     compile.zettel_mapping()["woodturning"]
+...     memory.stat(defaults.location).kind
+{'tools': ['chisel']}
+'dir'
+>>> os.path.exists(defaults.location)
+False
+"""
+import contextlib
+import os
+import posixpath
+import sqlite3
+import stat
+import time
+import typing
+
+from . import defaults
+from . import filetypes
+
+
+class Entry(typing.NamedTuple):
+    """Entry of a folder as listed by :meth:`Backend.list`.
+
+    Mirrors the :class:`os.DirEntry` interface used by the zettelkasten.
+
+    Parameters
+    ----------
+    name: str
+        Name of the entry.
+
+    path: str
+        Location of the entry, joined from the listed folder and name.
+
+    kind: str
+        ``file`` or ``dir``.
+    """
+
+    name: str
+    path: str
+    kind: str
+
+    def is_dir(self):
+        """``True`` if the entry is a folder."""
+        return self.kind == "dir"
+
+    def is_file(self):
+        """``True`` if the entry is a file."""
+        return self.kind == "file"
+
+
+class Stat(typing.NamedTuple):
+    """Status of an entry as returned by :meth:`Backend.stat`.
+
+    Parameters
+    ----------
+    kind: str
+        ``file`` or ``dir``.
+
+    size: int
+        Size of a file's content in bytes. ``0`` for folders.
+
+    mtime: float
+        Time of the last modification in seconds since the epoch.
+    """
+
+    kind: str
+    size: int
+    mtime: float
+
+
+class Backend:
+    """Interface of the storage backends.
+
+    Locations are given as :class:`str` or :class:`pathlib.Path` as used
+    with :mod:`os`.
+    """
+
+    local = False
+    """``True`` if the storage is the local file system. Modules accessing
+    the local files directly, as the persisted :mod:`index
+    <zettelkasten.index>` and resumable :mod:`transfers
+    <zettelkasten.transfer>`, only apply to local storages."""
+
+    def list(self, path):
+        """Entries of a folder.
+
+        Parameters
+        ----------
+        path: str, pathlib.Path
+            Location of the folder.
+
+        Returns
+        -------
+        entries: list
+            :class:`Entry` of each file and folder inside path in arbitrary
+            order.
+
+        Raises
+        ------
+        FileNotFoundError
+            Raised if path is not a folder.
+        """
+        raise NotImplementedError
+
+    def read(self, path):
+        """Text content of a file.
+
+        Parameters
+        ----------
+        path: str, pathlib.Path
+            Location of the file.
+
+        Returns
+        -------
+        content: str
+            Decoded content of the file.
+
+        Raises
+        ------
+        FileNotFoundError
+            Raised if path is not a file.
+        """
+        raise NotImplementedError
+
+    def write(self, path, content, append=False):
+        """Write the text content of a file.
+
+        Parameters
+        ----------
+        path: str, pathlib.Path
+            Location of the file. Its folder has to exist.
+
+        content: str
+            Text written to the file.
+
+        append: bool, default=False
+            If ``True`` content is appended to an existing file instead of
+            replacing it.
+        """
+        raise NotImplementedError
+
+    def copy(self, source_file, path, ftype=None):
+        """Copy a file of the local file system into the storage.
+
+        Parameters
+        ----------
+        source_file: str, pathlib.Path
+            Location of the local file.
+
+        path: str, pathlib.Path
+            Location of the copy inside the storage. Its folder has to
+            exist.
+
+        ftype: str, None, default=None
+            Type of the file, see
+            :func:`zettelkasten.filetypes.infer_file_type`.
+        """
+        raise NotImplementedError
+
+    def stat(self, path):
+        """Status of an entry.
+
+        Parameters
+        ----------
+        path: str, pathlib.Path
+            Location of the file or folder.
+
+        Returns
+        -------
+        stat: Stat, None
+            Status of the file or folder at path or ``None`` if it does not
+            exist.
+        """
+        raise NotImplementedError
+
+    def makedirs(self, path):
+        """Create a folder including its missing parents.
+
+        Parameters
+        ----------
+        path: str, pathlib.Path
+            Location of the folder. Nothing is done if it exists.
+
+        Raises
+        ------
+        FileExistsError
+            Raised if path or one of its parents is a file.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release the resources held by the backend. Nothing by default."""
+
+    def is_file(self, path):
+        """``True`` if path is an existing file."""
+        stat = self.stat(path)
+        return stat is not None and stat.kind == "file"
+
+    def is_dir(self, path):
+        """``True`` if path is an existing folder."""
+        stat = self.stat(path)
+        return stat is not None and stat.kind == "dir"
+
+
+class LocalBackend(Backend):
+    """Backend storing the zettelkasten inside the local file system."""
+
+    local = True
+
+    def list(self, path):
+        """Entries of a folder, listed by :func:`os.scandir`."""
+        with os.scandir(path) as it:
+            return [
+                Entry(f.name, f.path, "dir" if f.is_dir() else "file")
+                for f in it
+            ]
+
+    def read(self, path):
+        """Text content of a file."""
+        with open(path) as f:
+            return f.read()
+
+    def write(self, path, content, append=False):
+        """Write or append the text content of a file."""
+        with open(path, "a" if append else "w") as f:
+            f.write(content)
+
+    def copy(self, source_file, path, ftype=None):
+        """Ingest the file using the handler of its type, see
+        :func:`zettelkasten.filetypes.ingest`."""
+        filetypes.ingest(source_file, path, ftype)
+
+    def stat(self, path):
+        """Status of an entry, queried by :func:`os.stat`."""
+        try:
+            status = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        if stat.S_ISDIR(status.st_mode):
+            return Stat("dir", 0, status.st_mtime)
+        return Stat("file", status.st_size, status.st_mtime)
+
+    def makedirs(self, path):
+        """Create a folder including its missing parents."""
+        os.makedirs(path, exist_ok=True)
+
+
+class MemoryBackend(Backend):
+    """Backend keeping the zettelkasten in memory.
+
+    Locations are normalized (see :meth:`key`), so relative and absolute
+    locations of the same entry are interchangeable. Nothing is written to
+    the local file system.
+    """
+
+    def __init__(self):
+        """Start with an empty storage holding only the root folder."""
+        self.files = dict()
+        """Mapping of normalized file locations to their bytes and
+        modification time."""
+        self.folders = {"/": time.time()}
+        """Mapping of normalized folder locations to their modification
+        time."""
+        self.children = {"/": dict()}
+        """Mapping of normalized folder locations to the names and kinds of
+        their entries, so listing a folder does not scan all locations."""
+
+    @staticmethod
+    def key(path):
+        """Normalized absolute posix location of path."""
+        return posixpath.normpath(
+            os.path.abspath(os.fspath(path)).replace(os.sep, "/")
+        )
+
+    def _parent(self, key):
+        """Normalized location of the existing folder of key."""
+        parent = posixpath.dirname(key)
+        if parent not in self.folders:
+            raise FileNotFoundError(f"No such folder: '{parent}'")
+        return parent
+
+    def list(self, path):
+        """Entries of a folder, found by their normalized locations."""
+        key = self.key(path)
+        if key not in self.folders:
+            raise FileNotFoundError(f"No such folder: '{path}'")
+        return [
+            Entry(name, os.path.join(os.fspath(path), name), kind)
+            for name, kind in self.children[key].items()
+        ]
+
+    def read(self, path):
+        """Text content of a file."""
+        key = self.key(path)
+        if key not in self.files:
+            raise FileNotFoundError(f"No such file: '{path}'")
+        return self.files[key][0].decode()
+
+    def _store(self, key, content):
+        """Store the bytes of a file, updating its folder's mtime."""
+        if key in self.folders:
+            raise IsADirectoryError(f"Is a folder: '{key}'")
+        now = time.time()
+        parent = self._parent(key)
+        self.folders[parent] = now
+        self.children[parent][posixpath.basename(key)] = "file"
+        self.files[key] = (content, now)
+
+    def write(self, path, content, append=False):
+        """Write or append the text content of a file."""
+        key = self.key(path)
+        data = content.encode()
+        if append and key in self.files:
+            data = self.files[key][0] + data
+        self._store(key, data)
+
+    def copy(self, source_file, path, ftype=None):
+        """Store the bytes of the local file. No handler is applied."""
+        with open(source_file, "rb") as f:
+            self._store(self.key(path), f.read())
+
+    def stat(self, path):
+        """Status of an entry, modification times as stored."""
+        key = self.key(path)
+        if key in self.folders:
+            return Stat("dir", 0, self.folders[key])
+        if key in self.files:
+            content, mtime = self.files[key]
+            return Stat("file", len(content), mtime)
+        return None
+
+    def makedirs(self, path):
+        """Create a folder including its missing parents."""
+        key = self.key(path)
+        missing = list()
+        while key not in self.folders:
+            if key in self.files:
+                raise FileExistsError(f"Is a file: '{key}'")
+            missing.append(key)
+            parent = posixpath.dirname(key)
+            if parent == key:
+                # root of another drive
+                break
+            key = parent
+        now = time.time()
+        for key in reversed(missing):
+            self.folders[key] = now
+            self.children[key] = dict()
+            parent = posixpath.dirname(key)
+            if parent in self.children and parent != key:
+                self.children[parent][posixpath.basename(key)] = "dir"
+
+
+class SQLiteBackend(Backend):
+    """Backend storing the zettelkasten inside a single SQLite database.
+
+    Designed for zettelkastens of many small zettels, which would otherwise
+    cost a folder and two files each. Every file and folder below root is a
+    row of the ``entries`` table, listed using an index on the parent
+    folder. Zettel org files are additionally recorded inside the ``zettels``
+    table, indexed by category, subcategory and uid (see :meth:`zettels`).
+    The database is opened in write-ahead-logging mode, so reading commands
+    are not blocked by a writing one.
+
+    Convert folder based zettelkastens using :meth:`import_tree` and back
+    using :meth:`export_tree`.
+
+    Parameters
+    ----------
+    database: str, pathlib.Path
+        Location of the database file. Created if not existing.
+
+    root: str, pathlib.Path, None, default=None
+        Folder the stored locations are relative to. Design usage is to
+        fallback on :attr:`zettelkasten.defaults.location`.
+
+    Examples
+    --------
+    >>> import tempfile
+    >>> from zettelkasten import add, compile, defaults, initialize
+    >>> defaults.location = "tests/doctest_dir/sqlite_kasten"
+    >>> with tempfile.TemporaryDirectory() as folder:
+    ...     database = os.path.join(folder, "kasten.sqlite")
+    ...     with using(SQLiteBackend(database)) as kasten:
+    ...         initialize.structure_zettelkasten()
+    ...         add.new_zettel("woodturning/tools/chisel")
+    ...         kasten.zettels(category="woodturning")
+    ...         kasten.close()
+    ['woodturning/tools/chisel']
+    """
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS entries (
+            path TEXT PRIMARY KEY,
+            parent TEXT NOT NULL,
+            name TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            content BLOB,
+            mtime REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS entries_parent ON entries (parent);
+        CREATE TABLE IF NOT EXISTS zettels (
+            path TEXT PRIMARY KEY,
+            category TEXT,
+            subcategory TEXT,
+            uid TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS zettels_name
+            ON zettels (category, subcategory, uid);
+    """
+    """Tables and indices created inside the database."""
+
+    def __init__(self, database, root=None):
+        """Connect to the database, creating its tables if missing."""
+        if root is None:
+            root = defaults.location
+        self.database = os.path.abspath(os.fspath(database))
+        self.root = os.path.abspath(os.fspath(root))
+        self.connection = sqlite3.connect(self.database)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(self.schema)
+
+    def close(self):
+        """Close the database connection."""
+        self.connection.close()
+
+    def key(self, path):
+        """Posix location of path relative to :attr:`root`.
+
+        ``""`` states the root itself.
+
+        Raises
+        ------
+        ValueError
+            Raised for locations outside of the root.
+        """
+        relative = os.path.relpath(os.path.abspath(os.fspath(path)), self.root)
+        if relative == os.curdir:
+            return ""
+        if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+            raise ValueError(f"'{path}' is outside of '{self.root}'")
+        return relative.replace(os.sep, "/")
+
+    def _row(self, key, columns="kind, length(content), mtime"):
+        """Columns of the entry stored at key or ``None``."""
+        if key == "":
+            return ("dir", None, os.path.getmtime(self.database))
+        return self.connection.execute(
+            f"SELECT {columns} FROM entries WHERE path = ?", (key,)
+        ).fetchone()
+
+    def list(self, path):
+        """Entries of a folder, looked up by the index on their parent."""
+        key = self.key(path)
+        row = self._row(key)
+        if row is None or row[0] != "dir":
+            raise FileNotFoundError(f"No such folder: '{path}'")
+        rows = self.connection.execute(
+            "SELECT name, kind FROM entries WHERE parent = ?", (key,)
+        )
+        return [
+            Entry(name, os.path.join(os.fspath(path), name), kind)
+            for name, kind in rows
+        ]
+
+    def read(self, path):
+        """Text content of a file."""
+        row = self._row(self.key(path), "kind, content")
+        if row is None or row[0] != "file":
+            raise FileNotFoundError(f"No such file: '{path}'")
+        return bytes(row[1]).decode()
+
+    @staticmethod
+    def _zettel(key):
+        """``(category, subcategory, uid)`` if key is a zettel's org file."""
+        *parts, name = key.split("/")
+        if len(parts) < 2 or name != f"{parts[-1]}.org":
+            return None
+        if parts[0] == "lobby" and len(parts) <= 3:
+            return None, None, parts[-1]
+        if len(parts) == 3:
+            return parts[0], parts[1], parts[2]
+        return None
+
+    def _store(self, key, content):
+        """Store the bytes of a file inside a transaction."""
+        parent, _, name = key.rpartition("/")
+        parent_row = self._row(parent)
+        if parent_row is None or parent_row[0] != "dir":
+            raise FileNotFoundError(f"No such folder: '{parent}'")
+        row = self._row(key)
+        if row is not None and row[0] == "dir":
+            raise IsADirectoryError(f"Is a folder: '{key}'")
+
+        now = time.time()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, 'file', ?, ?)",
+            (key, parent, name, content, now),
+        )
+        self.connection.execute(
+            "UPDATE entries SET mtime = ? WHERE path = ?", (now, parent)
+        )
+        zettel = self._zettel(key)
+        if zettel is not None:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO zettels VALUES (?, ?, ?, ?)",
+                (key, *zettel),
+            )
+
+    def write(self, path, content, append=False):
+        """Write or append the text content of a file in one transaction."""
+        key = self.key(path)
+        data = content.encode()
+        with self.connection:
+            if append:
+                row = self._row(key, "kind, content")
+                if row is not None and row[0] == "file":
+                    data = bytes(row[1]) + data
+            self._store(key, data)
+
+    def copy(self, source_file, path, ftype=None):
+        """Store the bytes of the local file. No handler is applied."""
+        with open(source_file, "rb") as f:
+            content = f.read()
+        with self.connection:
+            self._store(self.key(path), content)
+
+    def stat(self, path):
+        """Status of an entry, modification times as stored."""
+        row = self._row(self.key(path))
+        if row is None:
+            return None
+        kind, size, mtime = row
+        return Stat(kind, size or 0, mtime)
+
+    def makedirs(self, path):
+        """Create a folder including its missing parents."""
+        key = self.key(path)
+        missing = list()
+        while key:
+            row = self._row(key)
+            if row is not None:
+                if row[0] != "dir":
+                    raise FileExistsError(f"Is a file: '{key}'")
+                break
+            missing.append(key)
+            key = key.rpartition("/")[0]
+
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO entries VALUES (?, ?, ?, 'dir', NULL, ?)",
+                [
+                    (key, key.rpartition("/")[0], key.rpartition("/")[2], now)
+                    for key in missing
+                ],
+            )
+
+    def zettels(self, category=None, subcategory=None):
+        """Names of the stored zettels, looked up by the zettel index.
+
+        Parameters
+        ----------
+        category: str, None, default=None
+            Only zettels of this category. ``lobby`` states the lobby
+            zettels, ``None`` all zettels.
+
+        subcategory: str, None, default=None
+            Only zettels of this subcategory.
+
+        Returns
+        -------
+        names: list
+            Alphabetically sorted zettel names as in
+            ``woodturning/tools/chisel`` or ``lobby/my_zettel``.
+        """
+        query = "SELECT category, subcategory, uid FROM zettels"
+        conditions = list()
+        parameters = list()
+        if category == "lobby":
+            conditions.append("category IS NULL")
+        elif category is not None:
+            conditions.append("category = ?")
+            parameters.append(category)
+        if subcategory is not None:
+            conditions.append("subcategory = ?")
+            parameters.append(subcategory)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        sep = defaults.name_sep
+        return sorted(
+            f"lobby{sep}{uid}" if cat is None else sep.join((cat, sub, uid))
+            for cat, sub, uid in self.connection.execute(query, parameters)
+        )
+
+    def import_tree(self, folder=None):
+        """Store all files and folders of a folder based zettelkasten.
+
+        Existing entries are replaced. The database file itself is skipped,
+        if it resides inside folder.
+
+        Parameters
+        ----------
+        folder: str, pathlib.Path, None, default=None
+            Top level folder of the zettelkasten. Design usage is to
+            fallback on :attr:`root`.
+
+        Returns
+        -------
+        files: int
+            Number of stored files.
+        """
+        folder = self.root if folder is None else os.fspath(folder)
+        skipped = {self.database + suffix for suffix in ("", "-wal", "-shm")}
+        folders = list()
+        files = list()
+        for current, dirs, names in os.walk(folder):
+            relative = os.path.relpath(current, folder)
+            prefix = "" if relative == os.curdir else relative + os.sep
+            for name in dirs:
+                path = os.path.join(current, name)
+                folders.append(
+                    (self.key(os.path.join(self.root, prefix + name)), path)
+                )
+            for name in names:
+                path = os.path.join(current, name)
+                if os.path.abspath(path) in skipped:
+                    continue
+                files.append(
+                    (self.key(os.path.join(self.root, prefix + name)), path)
+                )
+
+        def rows(entries, kind):
+            for key, path in entries:
+                content = None
+                if kind == "file":
+                    with open(path, "rb") as f:
+                        content = f.read()
+                parent, _, name = key.rpartition("/")
+                yield key, parent, name, kind, content, os.path.getmtime(path)
+
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                rows(folders, "dir"),
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                rows(files, "file"),
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO zettels VALUES (?, ?, ?, ?)",
+                [
+                    (key, *self._zettel(key))
+                    for key, _ in files
+                    if self._zettel(key) is not None
+                ],
+            )
+
+        return len(files)
+
+    def export_tree(self, folder=None):
+        """Write all stored files and folders into a folder based layout.
+
+        Existing files are replaced, modification times are kept.
+
+        Parameters
+        ----------
+        folder: str, pathlib.Path, None, default=None
+            Top level folder of the exported zettelkasten. Design usage is
+            to fallback on :attr:`root`.
+
+        Returns
+        -------
+        files: int
+            Number of written files.
+        """
+        folder = self.root if folder is None else os.fspath(folder)
+        os.makedirs(folder, exist_ok=True)
+        written = 0
+        rows = self.connection.execute(
+            "SELECT path, kind, content, mtime FROM entries ORDER BY path"
+        )
+        folders = list()
+        for key, kind, content, mtime in rows:
+            path = os.path.join(folder, *key.split("/"))
+            if kind == "dir":
+                os.makedirs(path, exist_ok=True)
+                folders.append((path, mtime))
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(content)
+            os.utime(path, (mtime, mtime))
+            written += 1
+        # writing files changes their folders' modification times
+        for path, mtime in folders:
+            os.utime(path, (mtime, mtime))
+
+        return written
+
+
+backend = LocalBackend()
+"""Backend the zettelkasten is accessed through. Replace it (or use
+:func:`using`) to switch the storage."""
+
+
+def configured_backend():
+    """Backend selected by :attr:`zettelkasten.defaults.storage_backend`.
+
+    Returns
+    -------
+    storage: Backend
+        :class:`LocalBackend` for ``local`` and :class:`SQLiteBackend` of
+        :attr:`zettelkasten.defaults.database` for ``sqlite``.
+
+    Raises
+    ------
+    ValueError
+        Raised for unknown storage backends.
+
+    Examples
+    --------
+    >>> configured_backend().local
+    True
+    """
+    if defaults.storage_backend == "local":
+        return LocalBackend()
+    if defaults.storage_backend == "sqlite":
+        database = defaults.database
+        if database is None:
+            database = f"{os.fspath(defaults.location)}.sqlite"
+        return SQLiteBackend(os.path.expanduser(database))
+    raise ValueError(
+        f"Unknown storage backend '{defaults.storage_backend}', "
+        + "use 'local' or 'sqlite'"
+    )
+
+
+def require_local(operation):
+    """Refuse operations accessing the local files directly on other backends.
+
+    Parameters
+    ----------
+    operation: str
+        Description of the operation as in ``"Moving zettels"``.
+
+    Raises
+    ------
+    RuntimeError
+        Raised if the :attr:`backend` does not store the zettelkasten inside
+        the local file system.
+
+    Examples
+    --------
+    >>> with using(MemoryBackend()):
+    ...     require_local("Moving zettels")
+    Traceback (most recent call last):
+    RuntimeError: Moving zettels needs the local storage backend...
+    """
+    if not backend.local:
+        raise RuntimeError(
+            f"{operation} needs the local storage backend, not "
+            + f"{type(backend).__name__}. Export the zettelkasten using "
+            + "'zk migrate sqlite --export' first"
+        )
+
+
+@contextlib.contextmanager
+def using(storage):
+    """Access the zettelkasten through another backend inside the context.
+
+    Parameters
+    ----------
+    storage: Backend
+        Backend used inside the context.
+
+    Yields
+    ------
+    storage: Backend
+        The backend used.
+    """
+    global backend
+    previous, backend = backend, storage
+    try:
+        yield storage
+    finally:
+        backend = previous
@@ -0,0 +1,233 @@
+# zettelkasten/tracing.py
+"""Module providing structured tracing of the zettelkasten's hot paths.
+
+Operations are traced using :func:`span` and noteworthy steps inside of them
+using :func:`event`. Both take their details as keyword fields, which are
+only serialized while tracing is :func:`enabled <enable>`. Disabled tracing
+therefore costs a function call per span or event, but never formats a
+string, as opposed to ``logger.debug(f"...")``.
+
+Enabled tracing appends one json object per finished span or event to the
+trace file::
+
+    {"type": "span", "name": "add.new_zettel", "id": 1, "parent": null,
+     "ts": 1634651387.25, "dur": 0.0031, "pid": 4711, "tid": 1397,
+     "fields": {"name": "woodturning/tools/chisel"}}
+
+Examples
+--------
+>>> import json, os, tempfile
+>>> trace_file = os.path.join(tempfile.mkdtemp(), "trace.jsonl")
+>>> enable(trace_file)
+>>> with span("example.outer", answer=42):
+...     event("example.event", detail="inside")
+>>> disable()
+>>> with open(trace_file) as f:
+...     records = [json.loads(line) for line in f]
+>>> [(record["type"], record["name"]) for record in records]
+[('event', 'example.event'), ('span', 'example.outer')]
+>>> records[0]["parent"] == records[1]["id"]
+True
+"""
+import atexit
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+
+enabled = False
+"""State indicating if spans and events are currently exported."""
+
+_file = None
+_lock = threading.Lock()
+_local = threading.local()
+_ids = itertools.count(1)
+
+
+class _NullSpan:
+    """Span handed out while tracing is disabled. Does nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def set(self, **fields):
+        """Ignore fields set on a disabled span."""
+
+
+_null_span = _NullSpan()
+
+
+class _Span:
+    """Span exported to the trace file when its context is left."""
+
+    __slots__ = ("name", "fields", "id", "parent", "ts", "start")
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.id = next(_ids)
+        self.parent = None
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self.id)
+        self.ts = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.perf_counter() - self.start
+        _stack().pop()
+        if exc_type is not None:
+            self.fields["error"] = exc_type.__name__
+        _write(
+            {
+                "type": "span",
+                "name": self.name,
+                "id": self.id,
+                "parent": self.parent,
+                "ts": self.ts,
+                "dur": duration,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "fields": self.fields,
+            }
+        )
+
+    def set(self, **fields):
+        """Add fields known only after the span was entered."""
+        self.fields.update(fields)
+
+
+def _stack():
+    """Ids of the spans entered by the running thread."""
+    try:
+        return _local.stack
+    except AttributeError:
+        _local.stack = list()
+        return _local.stack
+
+
+def _write(record):
+    """Append a record to the trace file."""
+    line = json.dumps(record, default=str) + "\n"
+    with _lock:
+        if _file is not None:
+            _file.write(line)
+
+
+def span(name, **fields):
+    """Context manager tracing a named operation.
+
+    Parameters
+    ----------
+    name: str
+        Name of the span. By convention ``module.function``.
+
+    fields:
+        Details of the traced operation. Values that are not json
+        serializable are exported using their :class:`str` representation.
+
+    Returns
+    -------
+    span:
+        Context manager. Its ``set(**fields)`` method adds fields while the
+        span is entered.
+    """
+    if not enabled:
+        return _null_span
+    return _Span(name, fields)
+
+
+def traced(name):
+    """Decorator tracing each call of the decorated function as span.
+
+    Parameters
+    ----------
+    name: str
+        Name of the span. By convention ``module.function``.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            with _Span(name, dict()):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def event(name, **fields):
+    """Trace a single step inside the currently entered span.
+
+    Parameters
+    ----------
+    name: str
+        Name of the event. By convention ``module.function.step``.
+
+    fields:
+        Details of the traced step, see :func:`span`.
+    """
+    if not enabled:
+        return
+    stack = _stack()
+    _write(
+        {
+            "type": "event",
+            "name": name,
+            "parent": stack[-1] if stack else None,
+            "ts": time.time(),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "fields": fields,
+        }
+    )
+
+
+def enable(path):
+    """Start exporting spans and events.
+
+    Parameters
+    ----------
+    path: str, pathlib.Path
+        Json-lines file the records are appended to.
+    """
+    global enabled, _file
+
+    disable()
+    with _lock:
+        _file = open(path, "a")
+    enabled = True
+
+
+def disable():
+    """Stop exporting spans and events and close the trace file."""
+    global enabled, _file
+
+    enabled = False
+    with _lock:
+        if _file is not None:
+            _file.close()
+            _file = None
+
+
+trace_variable = "ZETTELKASTEN_TRACE"
+"""Environment variable naming a trace file. Enables tracing at import, so
+spans and events of import time operations like
+:func:`zettelkasten.monkeypatch.patch_defaults` are exported as well."""
+
+if os.environ.get(trace_variable):
+    enable(os.environ[trace_variable])
+    atexit.register(disable)
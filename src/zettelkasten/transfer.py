@@ -0,0 +1,220 @@
+# zettelkasten/transfer.py
+"""Module copying (large) source files in resumable chunks.
+
+Files are copied chunk by chunk through a single reused buffer of
+:attr:`chunk_size` bytes into ``<destination>.partial``, which is only
+renamed to the destination after the last chunk is written and synced. An
+interrupted copy therefore never leaves a truncated file behind, that later
+looks like a valid source.
+
+After each chunk the copied offset and the rolling adler32 checksum of all
+copied bytes are recorded inside ``<destination>.partial.json``, along with
+the location of the source. Copying the same file again resumes at the
+recorded offset, if the source is unchanged (same size and modification
+time) and the checksum of the partial file's content still matches.
+Otherwise the copy is restarted. Destinations depending on the time of the
+copy (as date shards) are found again by :func:`interrupted_copy`.
+
+Progress is reported to the callback passed to :func:`copy_file` or set by
+:func:`reporting`, as done by the command line interface.
+
+Examples
+--------
+>>> import tempfile
+>>> with tempfile.TemporaryDirectory() as folder:
+...     destination = os.path.join(folder, "test_pdf.pdf")
+...     _ = copy_file("tests/bib_sources/test_pdf.pdf", destination)
+...     sorted(os.listdir(folder))
+['test_pdf.pdf']
+"""
+import contextlib
+import json
+import os
+import shutil
+import zlib
+
+from . import tracing
+
+chunk_size = 8 * 1024 * 1024
+"""Number of bytes copied per chunk. A multiple of the common page and block
+sizes."""
+
+_reporter = None
+
+
+def partial_path(destination):
+    """Location a file is copied into before being renamed to destination."""
+    return f"{os.fspath(destination)}.partial"
+
+
+def checkpoint_path(destination):
+    """Location of the checkpoint of an interrupted copy to destination."""
+    return f"{partial_path(destination)}.json"
+
+
+def interrupted_copy(source_file, destinations):
+    """Destination of an interrupted copy of a source file.
+
+    Found by the source location recorded inside the checkpoints of the
+    candidate destinations, so a copy is resumed at its original
+    destination, even if the destination computed for the source changed
+    since. Only the candidates' checkpoints are read, no folder is searched.
+
+    Parameters
+    ----------
+    source_file: str, pathlib.Path
+        Location of the copied file.
+
+    destinations: ~collections.abc.Iterable
+        Candidate destinations of the interrupted copy, as the shards of
+        the current and the previous month.
+
+    Returns
+    -------
+    destination: str, None
+        Destination of the interrupted copy or ``None`` if there is none.
+    """
+    source = os.path.abspath(source_file)
+    for destination in destinations:
+        try:
+            with open(checkpoint_path(destination)) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if state.get("source") == source:
+            return os.fspath(destination)
+    return None
+
+
+@contextlib.contextmanager
+def reporting(callback):
+    """Report the progress of all copies inside the context to callback.
+
+    Parameters
+    ----------
+    callback: ~collections.abc.Callable
+        Called as ``callback(copied, total)`` with the number of bytes
+        copied so far and the size of the source file.
+    """
+    global _reporter
+    previous, _reporter = _reporter, callback
+    try:
+        yield
+    finally:
+        _reporter = previous
+
+
+def _checksum(path, size):
+    """Adler32 checksum of the first size bytes of a file."""
+    checksum = zlib.adler32(b"")
+    buffer = bytearray(min(chunk_size, max(size, 1)))
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        remaining = size
+        while remaining > 0:
+            read = f.readinto(view[: min(remaining, len(buffer))])
+            if not read:
+                break
+            checksum = zlib.adler32(view[:read], checksum)
+            remaining -= read
+    return checksum
+
+
+def _resume_offset(partial, checkpoint, stat):
+    """Offset and checksum an interrupted copy can be resumed at.
+
+    ``(0, adler32 of nothing)`` if there is nothing to resume.
+    """
+    start = (0, zlib.adler32(b""))
+    try:
+        with open(checkpoint) as f:
+            state = json.load(f)
+        partial_size = os.path.getsize(partial)
+    except (OSError, ValueError):
+        return start
+    if (
+        state.get("size") != stat.st_size
+        or state.get("mtime_ns") != stat.st_mtime_ns
+        or not 0 < state.get("offset", 0) <= partial_size
+    ):
+        return start
+    if _checksum(partial, state["offset"]) != state.get("checksum"):
+        return start
+    return state["offset"], state["checksum"]
+
+
+@tracing.traced("transfer.copy_file")
+def copy_file(source_file, destination, progress=None):
+    """Copy a file including its meta data, resuming interrupted copies.
+
+    Parameters
+    ----------
+    source_file: str, pathlib.Path
+        Location of the file to copy.
+
+    destination: str, pathlib.Path
+        Location of the copy. Replaced if existing.
+
+    progress: ~collections.abc.Callable, None, default=None
+        Called as ``progress(copied, total)`` after each chunk. Design usage
+        is to fallback on the callback set by :func:`reporting`.
+
+    Returns
+    -------
+    checksum: int
+        Adler32 checksum of the copied content.
+    """
+    if progress is None:
+        progress = _reporter
+    partial = partial_path(destination)
+    checkpoint = checkpoint_path(destination)
+    stat = os.stat(source_file)
+
+    offset, checksum = _resume_offset(partial, checkpoint, stat)
+    if offset:
+        tracing.event(
+            "transfer.copy_file.resumed",
+            path=os.fspath(destination),
+            offset=offset,
+        )
+    buffer = bytearray(min(chunk_size, max(stat.st_size, 1)))
+    view = memoryview(buffer)
+
+    with open(source_file, "rb", buffering=0) as src, open(
+        partial, "r+b" if offset else "wb", buffering=0
+    ) as dst:
+        src.seek(offset)
+        dst.seek(offset)
+        dst.truncate()
+        if progress is not None:
+            progress(offset, stat.st_size)
+        while True:
+            read = src.readinto(view)
+            if not read:
+                break
+            written = 0
+            while written < read:
+                written += dst.write(view[written:read])
+            offset += read
+            checksum = zlib.adler32(view[:read], checksum)
+            with open(checkpoint, "w") as f:
+                json.dump(
+                    {
+                        "source": os.path.abspath(source_file),
+                        "size": stat.st_size,
+                        "mtime_ns": stat.st_mtime_ns,
+                        "offset": offset,
+                        "checksum": checksum,
+                    },
+                    f,
+                )
+            if progress is not None:
+                progress(offset, stat.st_size)
+        os.fsync(dst.fileno())
+
+    shutil.copystat(source_file, partial)
+    os.replace(partial, destination)
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(checkpoint)
+
+    return checksum
@@ -0,0 +1,425 @@
+# zettelkasten/tree.py
+"""Module providing a compact in-memory representation of all zettel names.
+
+A list of full zettel names as returned by
+:func:`zettelkasten.compile.parsed_zettels` repeats each category and
+subcategory inside every name and costs a separate string object per zettel.
+A :class:`ZettelTree` stores each category and subcategory string once
+(interned) and the uids of all zettels inside one shared bytes buffer.
+
+Rows are kept in the order of the sorted full names, so a tree behaves like
+the sorted list of names it replaces. Zettels of the same folder are
+therefore consecutive rows, and only the first row of each folder records
+the folder's category and subcategory id. Consecutive uids mostly share
+their beginning, so each uid is front coded: only the bytes differing from
+the previous uid are stored, along with the number of shared bytes. Every
+:attr:`block_size` rows the full uid is stored again, so any uid is decoded
+from at most :attr:`block_size` rows.
+
+Examples
+--------
+>>> tree = ZettelTree.from_names([
+...     "woodturning/tools/skew",
+...     "woodturning/tools/chisel",
+...     "lobby/my_zettel",
+... ])
+>>> list(tree)
+['lobby/my_zettel', 'woodturning/tools/chisel', 'woodturning/tools/skew']
+>>> tree[1]
+'woodturning/tools/chisel'
+>>> "woodturning/tools/skew" in tree
+True
+>>> tree.zettel_name(0)
+ZettelName(category=None, subcategory=None, uid='my_zettel')
+"""
+import array
+import bisect
+import itertools
+import sys
+
+from . import compile as comp
+from . import defaults
+from . import parse
+
+block_size = 16
+"""Number of rows between two uids stored in full. Larger blocks save a
+little memory at the cost of slower random access."""
+
+
+def _typecode(maximum):
+    """Smallest unsigned :mod:`array` typecode holding maximum."""
+    for typecode in "BHIL":
+        if maximum < 2 ** (8 * array.array(typecode).itemsize):
+            return typecode
+    return "Q"
+
+
+def _shrunk(column):
+    """Copy of an :mod:`array` column using the smallest item size."""
+    return array.array(_typecode(max(column, default=0)), column)
+
+
+def _shared_length(previous, uid):
+    """Number of leading bytes uid shares with the previous uid."""
+    length = 0
+    for a, b in zip(previous, uid):
+        if a != b:
+            break
+        length += 1
+    return length
+
+
+class ZettelTree:
+    """Compact, immutable and sorted sequence of zettel names.
+
+    Designed to be created using :meth:`from_names` or :meth:`from_mapping`.
+
+    Parameters
+    ----------
+    categories: list
+        Interned category strings, indexed by the category ids.
+
+    subcategories: list
+        Interned subcategory strings, indexed by the subcategory ids. Id
+        ``0`` is reserved for zettels without subcategory (inside the lobby).
+
+    folder_starts: array.array
+        First row of each folder, i.e. of each run of zettels sharing their
+        category and subcategory.
+
+    category_ids: array.array
+        Category id of each folder.
+
+    subcategory_ids: array.array
+        Subcategory id of each folder.
+
+    shared_lengths: array.array
+        Number of leading uid bytes each zettel shares with the zettel in
+        the row before. ``0`` for the first row of each block.
+
+    suffix_lengths: array.array
+        Number of uid bytes each zettel stores inside suffixes.
+
+    block_starts: array.array
+        Offset of each block's first row inside suffixes.
+
+    suffixes: bytes
+        Concatenated utf-8 encoded, front coded uids of all zettels.
+
+    sep: str, None, default=None
+        Separator joining the name parts. Design usage is to fallback on
+        :attr:`zettelkasten.defaults.name_sep`.
+    """
+
+    __slots__ = (
+        "categories",
+        "subcategories",
+        "folder_starts",
+        "category_ids",
+        "subcategory_ids",
+        "shared_lengths",
+        "suffix_lengths",
+        "block_starts",
+        "suffixes",
+        "sep",
+    )
+
+    def __init__(
+        self,
+        categories,
+        subcategories,
+        folder_starts,
+        category_ids,
+        subcategory_ids,
+        shared_lengths,
+        suffix_lengths,
+        block_starts,
+        suffixes,
+        sep=None,
+    ):
+        """Wrap the columns of a tree."""
+        self.categories = categories
+        self.subcategories = subcategories
+        self.folder_starts = folder_starts
+        self.category_ids = category_ids
+        self.subcategory_ids = subcategory_ids
+        self.shared_lengths = shared_lengths
+        self.suffix_lengths = suffix_lengths
+        self.block_starts = block_starts
+        self.suffixes = suffixes
+        self.sep = defaults.name_sep if sep is None else sep
+
+    @classmethod
+    def from_names(cls, names, sep=None):
+        """Create a tree from full zettel names.
+
+        Parameters
+        ----------
+        names: ~collections.abc.Iterable
+            Zettel names of the ``category/subcategory/uid`` or the
+            ``lobby/uid`` form, as returned by
+            :func:`zettelkasten.compile.parsed_zettels`. Need not be sorted.
+
+        sep: str, None, default=None
+            Separator joining the name parts. Design usage is to fallback on
+            :attr:`zettelkasten.defaults.name_sep`.
+
+        Raises
+        ------
+        ValueError
+            Raised if a name consists of neither two nor three parts.
+        """
+        if sep is None:
+            sep = defaults.name_sep
+
+        category_ids = dict()
+        subcategory_ids = {None: 0}
+        folders = array.array("Q"), array.array("Q"), array.array("Q")
+        shared_lengths = array.array("Q")
+        suffix_lengths = array.array("Q")
+        block_starts = array.array("Q")
+        suffixes = bytearray()
+        folder = previous = None
+        for row, name in enumerate(sorted(names)):
+            parts = name.split(sep)
+            if len(parts) == 2:
+                category, uid = parts
+                subcategory = None
+            elif len(parts) == 3:
+                category, subcategory, uid = parts
+            else:
+                raise ValueError(f"'{name}' is no valid zettel name")
+
+            if (category, subcategory) != folder:
+                folder = (category, subcategory)
+                category_id = category_ids.setdefault(
+                    sys.intern(category), len(category_ids)
+                )
+                subcategory_id = subcategory_ids.get(subcategory)
+                if subcategory_id is None:
+                    subcategory_id = len(subcategory_ids)
+                    subcategory_ids[sys.intern(subcategory)] = subcategory_id
+                for column, value in zip(
+                    folders, (row, category_id, subcategory_id)
+                ):
+                    column.append(value)
+
+            uid = uid.encode()
+            if row % block_size:
+                shared = _shared_length(previous, uid)
+            else:
+                shared = 0
+                block_starts.append(len(suffixes))
+            shared_lengths.append(shared)
+            suffix_lengths.append(len(uid) - shared)
+            suffixes += uid[shared:]
+            previous = uid
+
+        # shrink the columns to the smallest item size holding their values
+        return cls(
+            categories=list(category_ids),
+            subcategories=list(subcategory_ids),
+            folder_starts=_shrunk(folders[0]),
+            category_ids=_shrunk(folders[1]),
+            subcategory_ids=_shrunk(folders[2]),
+            shared_lengths=_shrunk(shared_lengths),
+            suffix_lengths=_shrunk(suffix_lengths),
+            block_starts=_shrunk(block_starts),
+            suffixes=bytes(suffixes),
+            sep=sep,
+        )
+
+    @classmethod
+    def from_mapping(cls, mapping, sep=None):
+        """Create a tree from a zettel mapping.
+
+        Parameters
+        ----------
+        mapping: dict
+            Mapping of categories to subcategories to uids (or of ``lobby``
+            to uids) as returned by
+            :func:`zettelkasten.compile.zettel_mapping`.
+
+        sep: str, None, default=None
+            Separator joining the name parts. Design usage is to fallback on
+            :attr:`zettelkasten.defaults.name_sep`.
+        """
+        if sep is None:
+            sep = defaults.name_sep
+
+        def names():
+            for category, subcategories in mapping.items():
+                if category == "lobby":
+                    for uid in subcategories:
+                        yield f"lobby{sep}{uid}"
+                    continue
+                for subcategory, uids in subcategories.items():
+                    prefix = f"{category}{sep}{subcategory}{sep}"
+                    for uid in uids:
+                        yield prefix + uid
+
+        return cls.from_names(names(), sep)
+
+    def __len__(self):
+        """Number of zettels."""
+        return len(self.shared_lengths)
+
+    def _uids(self, first, stop):
+        """Encoded uids of the rows from first, starting a block, to stop."""
+        start = self.block_starts[first // block_size]
+        uid = b""
+        for row in range(first, stop):
+            end = start + self.suffix_lengths[row]
+            uid = uid[: self.shared_lengths[row]] + self.suffixes[start:end]
+            start = end
+            yield uid
+
+    def uid(self, index):
+        """Uid of the zettel at index."""
+        for uid in self._uids(index - index % block_size, index + 1):
+            pass
+        return uid.decode()
+
+    def _folder(self, index):
+        """Category and subcategory (or None) of the zettel at index."""
+        folder = bisect.bisect_right(self.folder_starts, index) - 1
+        return (
+            self.categories[self.category_ids[folder]],
+            self.subcategories[self.subcategory_ids[folder]],
+        )
+
+    def _prefix(self, index):
+        """Category and subcategory part of the name of the zettel at index."""
+        category, subcategory = self._folder(index)
+        if subcategory is None:
+            return category + self.sep
+        return f"{category}{self.sep}{subcategory}{self.sep}"
+
+    def __getitem__(self, index):
+        """Full name of the zettel at index. Slices return lists of names."""
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("zettel index out of range")
+
+        return self._prefix(index) + self.uid(index)
+
+    def __iter__(self):
+        """Iterate the full zettel names in sorted order."""
+        sep = self.sep
+        suffixes = self.suffixes
+        rows = zip(self.shared_lengths, self.suffix_lengths)
+        uid = b""
+        start = 0
+        for first, end, category_id, subcategory_id in zip(
+            self.folder_starts,
+            (*self.folder_starts[1:], len(self)),
+            self.category_ids,
+            self.subcategory_ids,
+        ):
+            subcategory = self.subcategories[subcategory_id]
+            prefix = self.categories[category_id] + sep
+            if subcategory is not None:
+                prefix += subcategory + sep
+            for shared, length in itertools.islice(rows, end - first):
+                uid = uid[:shared] + suffixes[start : start + length]
+                start += length
+                yield prefix + uid.decode()
+
+    def zettel_name(self, index):
+        """:class:`~zettelkasten.parse.ZettelName` of the zettel at index.
+
+        As for :func:`zettelkasten.parse.zettel_name`, lobby zettels have
+        neither category nor subcategory.
+        """
+        category, subcategory = self._folder(index)
+        if subcategory is None:
+            return parse.ZettelName(None, None, self.uid(index))
+        return parse.ZettelName(category, subcategory, self.uid(index))
+
+    def bisect(self, name):
+        """Index name would be inserted at to keep the names sorted."""
+        # find the block by its first name, then decode the block row by row
+        low, high = 0, len(self.block_starts)
+        while low < high:
+            middle = (low + high) // 2
+            if self[middle * block_size] < name:
+                low = middle + 1
+            else:
+                high = middle
+        if not low:
+            return 0
+        first = (low - 1) * block_size
+        stop = min(low * block_size, len(self))
+        for row, uid in enumerate(self._uids(first, stop), first):
+            if self._prefix(row) + uid.decode() >= name:
+                return row
+        return stop
+
+    def index(self, name):
+        """Index of the zettel name.
+
+        Raises
+        ------
+        ValueError
+            Raised if name is not part of the tree.
+        """
+        index = self.bisect(name)
+        if index < len(self) and self[index] == name:
+            return index
+        raise ValueError(f"'{name}' is not in tree")
+
+    def __contains__(self, name):
+        """Check if the zettel name is part of the tree."""
+        try:
+            self.index(name)
+        except ValueError:
+            return False
+        return True
+
+    def startswith(self, prefix):
+        """Names starting with prefix, as for completing zettel names.
+
+        Examples
+        --------
+        >>> tree = ZettelTree.from_names(
+        ...     ["wood/tools/chisel", "wood/tools/skew", "lobby/wood"])
+        >>> tree.startswith("wood/tools/s")
+        ['wood/tools/skew']
+        """
+        names = list()
+        for index in range(self.bisect(prefix), len(self)):
+            name = self[index]
+            if not name.startswith(prefix):
+                break
+            names.append(name)
+        return names
+
+    def nbytes(self):
+        """Approximate memory footprint of the tree in bytes."""
+        return sum(
+            sys.getsizeof(column)
+            for column in (
+                self.folder_starts,
+                self.category_ids,
+                self.subcategory_ids,
+                self.shared_lengths,
+                self.suffix_lengths,
+                self.block_starts,
+                self.suffixes,
+                *self.categories,
+                *self.subcategories,
+            )
+        )
+
+
+def zettel_tree():
+    """Compile the compact tree of all zettels.
+
+    Uses :attr:`zettelkasten.defaults.location` as top level folder for
+    compiling. Equivalent to :func:`zettelkasten.compile.parsed_zettels`,
+    but stored as :class:`ZettelTree`.
+    """
+    return ZettelTree.from_mapping(comp.zettel_mapping())
@@ -0,0 +1,216 @@
+# zettelkasten/watch.py
+"""Module providing the watcher keeping the zettelkasten index up to date.
+
+The watcher subscribes to Linux inotify events on
+:attr:`zettelkasten.defaults.location` (including
+:attr:`zettelkasten.defaults.sources_directory`) and incrementally updates the
+:class:`zettelkasten.index.ZettelIndex` as zettels are edited, added, moved or
+deleted. While it is running, commands use the persisted index instead of
+rescanning the zettelkasten (see :func:`zettelkasten.index.load_hot`).
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+
+from . import defaults
+from . import index as zindex
+from . import storage
+
+logger = logging.getLogger(__name__)
+
+# inotify constants as stated in <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+watch_mask = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+"""Inotify events subscribed to for each watched folder."""
+
+_event_header = struct.Struct("iIII")
+
+
+class Inotify:
+    """Minimal ctypes wrapper around the Linux inotify api.
+
+    Raises
+    ------
+    OSError
+        Raised if inotify is not available on the running platform.
+    """
+
+    def __init__(self):
+        """Create the inotify instance."""
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on linux")
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+        self.paths = dict()
+
+    def add_watch(self, path, mask=watch_mask):
+        """Watch a folder. Returns the watch descriptor or ``None``."""
+        wd = self._libc.inotify_add_watch(
+            self.fd, os.fsencode(path), ctypes.c_uint32(mask)
+        )
+        if wd < 0:
+            # folder vanished before it could be watched
+            return None
+
+        self.paths[wd] = os.fspath(path)
+        return wd
+
+    def read_events(self, timeout=None):
+        """Read pending events as list of ``(path, mask)`` tuples.
+
+        Waits at most timeout seconds for events to arrive.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return list()
+
+        buffer = os.read(self.fd, 64 * 1024)
+        events = list()
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = _event_header.unpack_from(buffer, offset)
+            offset += _event_header.size
+            name = buffer[offset : offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_IGNORED:
+                self.paths.pop(wd, None)
+                continue
+
+            folder = self.paths.get(wd)
+            if folder is None:
+                if mask & IN_Q_OVERFLOW:
+                    events.append((None, mask))
+                continue
+
+            path = os.path.join(folder, os.fsdecode(name)) if name else folder
+            events.append((path, mask))
+
+        return events
+
+    def close(self):
+        """Close the inotify instance."""
+        os.close(self.fd)
+
+
+def watch_tree(inotify, path):
+    """Recursively watch path and all of its subfolders."""
+    inotify.add_watch(path)
+    for root, dirs, _ in os.walk(path):
+        for directory in dirs:
+            inotify.add_watch(os.path.join(root, directory))
+
+
+def watch(location=None, save_interval=0.5, stop=None, ready=None):
+    """Keep the zettelkasten index up to date until stopped.
+
+    Builds the :class:`zettelkasten.index.ZettelIndex`, persists it and
+    states the watcher's process id inside the zettelkasten (see
+    :func:`zettelkasten.index.watcher_pid`). Afterwards every inotify event is
+    applied to the index using :meth:`zettelkasten.index.ZettelIndex.refresh`
+    and the index is persisted again at most every ``save_interval`` seconds.
+    The persisted index is removed together with the process id when the
+    watcher stops, as it would go stale afterwards.
+
+    Parameters
+    ----------
+    location: str, pathlib.Path, None, default=None
+        Top level folder of the watched zettelkasten. Design usage is to
+        fallback on :attr:`zettelkasten.defaults.location`.
+
+    save_interval: float, default=0.5
+        Minimum number of seconds between persisting the updated index.
+
+    stop: threading.Event, None, default=None
+        Event stopping the watcher when set. Watches until interrupted if
+        ``None``.
+
+    ready: threading.Event, None, default=None
+        Event set as soon as the watcher is subscribed and the index is
+        persisted.
+
+    Raises
+    ------
+    RuntimeError
+        Raised if the :attr:`storage backend <zettelkasten.storage.backend>`
+        is not local, see :func:`zettelkasten.storage.require_local`.
+    """
+    storage.require_local("Watching the zettelkasten")
+    if location is None:
+        location = defaults.location
+    location = os.fspath(location)
+
+    inotify = Inotify()
+    watch_tree(inotify, location)
+
+    index = zindex.ZettelIndex.build(location)
+    index.save()
+
+    pid_path = os.path.join(location, zindex.pid_file)
+    with open(pid_path, "w") as f:
+        f.write(str(os.getpid()))
+
+    logger.info(f"Watching {len(inotify.paths)} folders in '{location}'")
+    if ready is not None:
+        ready.set()
+
+    dirty = False
+    last_save = time.monotonic()
+    try:
+        while stop is None or not stop.is_set():
+            for path, mask in inotify.read_events(timeout=save_interval):
+                if path is None:
+                    logger.warning("Inotify queue overflowed, rebuilding index")
+                    index = zindex.ZettelIndex.build(location)
+                    dirty = True
+                    continue
+
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    watch_tree(inotify, path)
+
+                dirty |= index.refresh(path)
+
+            now = time.monotonic()
+            if dirty and now - last_save >= save_interval:
+                index.save()
+                dirty = False
+                last_save = now
+    finally:
+        # nothing keeps the index up to date once the watcher is gone
+        for path in (pid_path, os.path.join(location, defaults.index_file)):
+            if os.path.isfile(path):
+                os.remove(path)
+        inotify.close()
@@ -0,0 +1,52 @@
+"""Fixtures of the benchmark suite.
+
+The size of the benchmarked zettelkasten is controlled by the environment
+variables ``ZK_BENCH_ZETTELS``, ``ZK_BENCH_CATEGORIES``,
+``ZK_BENCH_SUBCATEGORIES``, ``ZK_BENCH_BIB_ENTRIES`` and
+``ZK_BENCH_SOURCE_SIZE``.
+"""
+import os
+
+import pytest
+from kasten_generator import generate_config_folder
+from kasten_generator import generate_kasten
+
+from zettelkasten import defaults
+
+pytest.importorskip("pytest_benchmark")
+
+
+def setting(name, default):
+    """Integer benchmark setting read from the environment."""
+    return int(os.environ.get(f"ZK_BENCH_{name}", default))
+
+
+@pytest.fixture(scope="session")
+def synthetic_kasten(tmp_path_factory):
+    """Synthetic zettelkasten shared by all benchmarks of a session."""
+    location = tmp_path_factory.mktemp("benchmarks") / "zettelkasten"
+    names = generate_kasten(
+        location,
+        zettels=setting("ZETTELS", 1000),
+        categories=setting("CATEGORIES", 10),
+        subcategories=setting("SUBCATEGORIES", 5),
+        bib_entries=setting("BIB_ENTRIES", 2),
+        source_size=setting("SOURCE_SIZE", 1024),
+    )
+    config_folder = location.parent / ".zettelkasten.d"
+    styles_file = generate_config_folder(
+        config_folder, source_size=setting("SOURCE_SIZE", 1024)
+    )
+
+    return location, config_folder, styles_file, names
+
+
+@pytest.fixture
+def kasten(synthetic_kasten, monkeypatch):
+    """Point the zettelkasten defaults at the synthetic zettelkasten."""
+    location, config_folder, styles_file, names = synthetic_kasten
+    monkeypatch.setattr(defaults, "location", location)
+    monkeypatch.setattr(defaults, "config_folder", config_folder)
+    monkeypatch.setattr(defaults, "styles_file", styles_file)
+
+    return location, names
@@ -0,0 +1,182 @@
+"""Deterministic generator of synthetic zettelkastens for benchmarking.
+
+The generated zettelkastens are laid out exactly like the ones created by
+:func:`zettelkasten.add.new_zettel` and :func:`zettelkasten.add.new_source`,
+but the files are written directly so kastens of up to a million zettels can
+be generated in reasonable time. The same parameters always generate the
+same zettelkasten.
+
+Can also be run as a script::
+
+    python tests/benchmarks/kasten_generator.py /tmp/kasten --zettels 100000
+"""
+import argparse
+import os
+import random
+
+from zettelkasten import add
+from zettelkasten import defaults
+from zettelkasten import initialize
+from zettelkasten import parse
+
+
+def source_content(rng, size):
+    """Deterministic pseudo random bytes of the requested size."""
+    if size == 0:
+        return b""
+    return rng.getrandbits(8 * size).to_bytes(size, "little")
+
+
+def generate_kasten(
+    location,
+    zettels=1000,
+    categories=10,
+    subcategories=5,
+    lobby_fraction=0.1,
+    bib_entries=2,
+    source_files=10,
+    source_size=1024,
+    seed=0,
+):
+    """Generate a synthetic zettelkasten at location.
+
+    Parameters
+    ----------
+    location: str, pathlib.Path
+        Top level folder of the generated zettelkasten.
+    zettels: int, default=1000
+        Total number of zettels.
+    categories: int, default=10
+        Number of categories.
+    subcategories: int, default=5
+        Number of subcategories per category.
+    lobby_fraction: float, default=0.1
+        Fraction of zettels put into the lobby.
+    bib_entries: int, default=2
+        Number of bibliography entries per zettel.
+    source_files: int, default=10
+        Number of source files per source type, shared by all zettels.
+    source_size: int, default=1024
+        Size of each source file in bytes.
+    seed: int, default=0
+        Seed of the random number generator.
+
+    Returns
+    -------
+    names: list
+        Names of the generated zettels in creation order.
+    """
+    rng = random.Random(seed)
+    location = os.fspath(location)
+    initialize.structure_zettelkasten(dummy_location=location)
+
+    sources = list()
+    for ftype, endings in sorted(defaults.source_file_formats.items()):
+        folder = os.path.join(location, defaults.sources_directory, ftype)
+        os.makedirs(folder, exist_ok=True)
+        for i in range(source_files):
+            path = os.path.join(folder, f"{ftype}_{i:06d}.{endings[0]}")
+            with open(path, "wb") as f:
+                f.write(source_content(rng, source_size))
+            sources.append(path)
+
+    names = list()
+    main_bib = list()
+    for i in range(zettels):
+        if rng.random() < lobby_fraction:
+            name = f"zettel{i:07d}"
+        else:
+            category = f"category{rng.randrange(categories):03d}"
+            subcategory = f"subcategory{rng.randrange(subcategories):03d}"
+            name = defaults.name_sep.join(
+                [category, subcategory, f"zettel{i:07d}"]
+            )
+        names.append(name)
+
+        zettel_name = parse.zettel_name(name)
+        zettel_path = add.create_zettel_location(
+            zettel_name, dummy_location=location
+        )
+        org_file = os.path.join(zettel_path, f"{zettel_name.uid}.org")
+        add.write_org_zettel_attributes(
+            org_file,
+            parse.zettel_attributes(
+                zettel_name,
+                doc=f"20{rng.randrange(10, 23)}-{rng.randrange(1, 13):02d}-01",
+                tags=[f"#tag{rng.randrange(50)}"],
+            ),
+        )
+        add.write_org_zettel_bibliography(org_file, f"{zettel_name.uid}.bib")
+
+        entries = list()
+        for j in range(bib_entries):
+            entries.extend(
+                defaults.bibliography_entry(
+                    source_file=rng.choice(sources) if sources else "",
+                    key=f"{zettel_name.uid}_source{j}",
+                    location_specifier=f"page {rng.randrange(1, 500)}",
+                )
+            )
+        with open(
+            os.path.join(zettel_path, f"{zettel_name.uid}.bib"), "w"
+        ) as f:
+            f.writelines(entries)
+        main_bib.extend(entries)
+
+    zk_bib_file = os.path.join(
+        location, defaults.sources_directory, defaults.zettelkasten_bib_file
+    )
+    with open(zk_bib_file, "w") as f:
+        f.writelines(main_bib)
+
+    return names
+
+
+def generate_config_folder(config_folder, source_size=1024, seed=0):
+    """Generate the config folder test files used by ``add.new_zettel``.
+
+    See :func:`zettelkasten.add.create_bibliography_file_test_entries`.
+    """
+    rng = random.Random(seed)
+    testfiles = os.path.join(config_folder, "testfiles")
+    os.makedirs(testfiles, exist_ok=True)
+    for filename in [
+        "test_audio.mp3",
+        "test_image.jpg",
+        "test_pdf.pdf",
+        "test_video.mp4",
+    ]:
+        with open(os.path.join(testfiles, filename), "wb") as f:
+            f.write(source_content(rng, source_size))
+
+    styles_file = os.path.join(config_folder, "styles.cfg")
+    with open(styles_file, "w") as f:
+        f.writelines(["[list_colors]\n", "lobby = green\n"])
+
+    return styles_file
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("location")
+    parser.add_argument("--zettels", type=int, default=1000)
+    parser.add_argument("--categories", type=int, default=10)
+    parser.add_argument("--subcategories", type=int, default=5)
+    parser.add_argument("--lobby-fraction", type=float, default=0.1)
+    parser.add_argument("--bib-entries", type=int, default=2)
+    parser.add_argument("--source-files", type=int, default=10)
+    parser.add_argument("--source-size", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+
+    generate_kasten(
+        arguments.location,
+        zettels=arguments.zettels,
+        categories=arguments.categories,
+        subcategories=arguments.subcategories,
+        lobby_fraction=arguments.lobby_fraction,
+        bib_entries=arguments.bib_entries,
+        source_files=arguments.source_files,
+        source_size=arguments.source_size,
+        seed=arguments.seed,
+    )
@@ -0,0 +1,137 @@
+"""Benchmarks of the zettelkasten api and command line interface.
+
+Run using ``nox -s benchmarks``. Results are compared against the baselines
+stored in ``tests/benchmarks/baselines``.
+"""
+import importlib
+import itertools
+import os
+
+import pytest
+
+from zettelkasten import add
+from zettelkasten import compile
+from zettelkasten import defaults
+from zettelkasten import find
+from zettelkasten import index
+from zettelkasten import initialize
+from zettelkasten import stats
+from zettelkasten import storage
+
+counter = itertools.count()
+
+
+@pytest.fixture(scope="module")
+def cli():
+    """Command line interface module.
+
+    Importing it patches the defaults using the user's config file, so they
+    are reverted afterwards.
+    """
+    try:
+        from zettelkasten import cli
+    except (ImportError, KeyError) as error:
+        pytest.skip(f"Command line interface not importable: {error!r}")
+    finally:
+        importlib.reload(defaults)
+    return cli
+
+
+def test_parsed_zettels(benchmark, kasten):
+    """Benchmark compiling all zettel names."""
+    location, names = kasten
+    result = benchmark(compile.parsed_zettels)
+    # other benchmarks add zettels to the shared zettelkasten
+    assert len(result) >= len(names)
+
+
+def test_new_zettel(benchmark, kasten):
+    """Benchmark adding a new zettel including its test bib entries."""
+
+    def setup():
+        return (f"benchmarks/new_zettel/zettel{next(counter)}",), {}
+
+    benchmark.pedantic(add.new_zettel, setup=setup, rounds=20)
+
+
+def test_new_zettel_memory(benchmark, kasten):
+    """Benchmark adding a new zettel to an in-memory zettelkasten."""
+    location, names = kasten
+    with storage.using(storage.MemoryBackend()):
+        initialize.structure_zettelkasten()
+
+        def setup():
+            return (f"benchmarks/new_zettel/zettel{next(counter)}",), {}
+
+        benchmark.pedantic(add.new_zettel, setup=setup, rounds=20)
+
+
+def test_new_source(benchmark, kasten):
+    """Benchmark adding a source to an existing zettel."""
+    location, names = kasten
+    zettel = names[0]
+    source = os.path.join(location.parent, ".zettelkasten.d", "testfiles")
+
+    def setup():
+        return (
+            zettel,
+            os.path.join(source, "test_pdf.pdf"),
+            f"benchmark_source{next(counter)}",
+        ), {"locspec": "page 1"}
+
+    benchmark.pedantic(add.new_source, setup=setup, rounds=20)
+
+
+def test_cli_list(benchmark, kasten, cli, monkeypatch):
+    """Benchmark listing all zettels on the command line."""
+    with open(os.devnull, "w") as devnull:
+        monkeypatch.setattr(cli.console, "file", devnull)
+        benchmark(
+            cli.list,
+            category=None,
+            subcategory=None,
+            porcelain=False,
+            json_output=False,
+            sort="name",
+            reverse=False,
+            offset=0,
+            limit=None,
+        )
+
+
+def test_cli_list_porcelain(benchmark, kasten, cli, monkeypatch):
+    """Benchmark listing all zettels as plain names."""
+    with open(os.devnull, "w") as devnull:
+        monkeypatch.setattr("sys.stdout", devnull)
+        benchmark(
+            cli.list,
+            category=None,
+            subcategory=None,
+            porcelain=True,
+            json_output=False,
+            sort="name",
+            reverse=False,
+            offset=0,
+            limit=None,
+        )
+
+
+def test_completion(benchmark, kasten, cli):
+    """Benchmark completing a zettel name."""
+    result = benchmark(cli.complete_zettel_name, "category00")
+    assert result
+
+
+def test_find(benchmark, kasten):
+    """Benchmark fuzzy ranking all zettel names."""
+    location, names = kasten
+    finder = find.Finder(sorted(names))
+    result = benchmark(finder.find, "cat1sub2z1")
+    assert result
+
+
+def test_stats(benchmark, kasten):
+    """Benchmark aggregating the statistics of an index."""
+    kasten_index = index.ZettelIndex.build()
+    result = benchmark(stats.kasten_stats, kasten_index)
+    assert result["zettels"] == len(kasten_index)
@@ -0,0 +1,36 @@
+"""Fixtures shared by the api tests."""
+import pytest
+
+from zettelkasten import add
+from zettelkasten import defaults
+from zettelkasten import initialize
+
+
+@pytest.fixture
+def zettels():
+    """Names of the zettels the kasten fixture is created with.
+
+    Override inside a test module to create different zettels.
+    """
+    return [
+        "woodturning/tools/chisel",
+        "woodturning/tools/skew",
+        "carpentry/tools/plane",
+        "my_zettel",
+    ]
+
+
+@pytest.fixture
+def kasten(tmp_path, monkeypatch, zettels):
+    """Location of a zettelkasten holding zettels, used as default location.
+
+    Override inside a test module requesting ``kasten`` to add further
+    content.
+    """
+    location = tmp_path / "zettelkasten"
+    monkeypatch.setattr(defaults, "location", location)
+    initialize.structure_zettelkasten()
+    for name in zettels:
+        add.new_zettel(name)
+
+    return location
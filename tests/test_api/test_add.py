@@ -196,9 +196,13 @@ def test_dummy_source_addition(tmp_path):
         dummy_location=tmp_path / "zettelkasten",
     )
 
+    # a video consisting of its file type box only
+    video = tmp_path / "test_video.mp4"
+    video.write_bytes(b"\x00\x00\x00\x18ftypmp42" + bytes(16))
+
     add.new_source(
         zettel_name="woodturning/tools/skew",
-        source_file="tests/bib_sources/test_video.mp4",
+        source_file=video,
         uid="video2_2021_min42",
         locspec="min 42",
         dummy_location=tmp_path / "zettelkasten",
@@ -0,0 +1,73 @@
+"""Module for testing the zettelkasten integrity checks."""
+import os
+
+from zettelkasten import add
+from zettelkasten import check
+from zettelkasten import defaults
+from zettelkasten import initialize
+
+
+def test_integrity_checks(tmp_path, monkeypatch):
+    """Test finding and fixing integrity violations."""
+    location = tmp_path / "zettelkasten"
+    monkeypatch.setattr(defaults, "location", location)
+    monkeypatch.setattr(check, "chunk_size", 1)
+    initialize.structure_zettelkasten()
+    for zettel in [
+        "woodturning/tools/chisel",
+        "woodturning/tools/skew",
+        "my_zettel",
+    ]:
+        add.new_zettel(zettel)
+
+    assert list(check.check(processes=2)) == []
+
+    chisel = location / "woodturning" / "tools" / "chisel"
+    os.remove(chisel / "chisel.org")
+    os.remove(location / "lobby" / "my_zettel" / "my_zettel.bib")
+    os.remove(location / defaults.sources_directory / "pdfs" / "test_pdf.pdf")
+    with open(location / "woodturning" / "tools" / "skew" / "skew.bib") as f:
+        content = f.read()
+    with open(
+        location / "woodturning" / "tools" / "skew" / "skew.bib", "w"
+    ) as f:
+        f.write(content.replace("Test Image", "Changed Image"))
+    with open(chisel / "chisel.bib", "a") as f:
+        f.writelines(
+            defaults.bibliography_entry(
+                source_file=location
+                / defaults.sources_directory
+                / "audios"
+                / "test_audio.mp3",
+                key="chisel_only",
+            )
+        )
+
+    findings = sorted(
+        (finding.zettel, finding.check) for finding in check.check(processes=2)
+    )
+    assert findings == [
+        ("lobby/my_zettel", "missing_bib"),
+        ("woodturning/tools/chisel", "missing_main_entry"),
+        ("woodturning/tools/chisel", "missing_org"),
+        ("woodturning/tools/chisel", "missing_source"),
+        ("woodturning/tools/skew", "entry_mismatch"),
+        ("woodturning/tools/skew", "missing_source"),
+    ]
+
+    fixed = {
+        finding.check
+        for finding in check.check(processes=1, fix=True)
+        if finding.fixed
+    }
+    assert fixed == set(check.fixable_checks)
+    assert os.path.isfile(chisel / "chisel.org")
+
+    remaining = sorted(
+        (finding.zettel, finding.check) for finding in check.check(processes=1)
+    )
+    assert remaining == [
+        ("woodturning/tools/chisel", "missing_source"),
+        ("woodturning/tools/skew", "entry_mismatch"),
+        ("woodturning/tools/skew", "missing_source"),
+    ]
@@ -0,0 +1,113 @@
+"""Module for testing deleting zettels."""
+import os
+import shutil
+
+import pytest
+
+from zettelkasten import add
+from zettelkasten import defaults
+from zettelkasten import delete
+from zettelkasten import index
+from zettelkasten import parse
+
+
+def main_bib_keys():
+    """Keys of the zettelkasten's bibliography file."""
+    main_bib_file = os.path.join(
+        defaults.location,
+        defaults.sources_directory,
+        defaults.zettelkasten_bib_file,
+    )
+    with open(main_bib_file) as f:
+        return [entry.key for entry in parse.bibliography_entries(f.read())]
+
+
+@pytest.fixture
+def zettels():
+    """Three tool zettels and a lobby zettel."""
+    return [
+        "woodturning/tools/chisel",
+        "woodturning/tools/skew",
+        "woodturning/tools/gouge",
+        "idea",
+    ]
+
+
+@pytest.fixture
+def kasten(kasten, tmp_path):
+    """Zettelkasten whose skew and gouge zettels cite their own sources."""
+    for uid in ["skew", "gouge"]:
+        source = os.fspath(tmp_path / f"{uid}_manual.pdf")
+        shutil.copyfile("tests/bib_sources/test_pdf.pdf", source)
+        add.new_source(f"woodturning/tools/{uid}", source, f"{uid}_2021_p1")
+    # the skew's manual is cited by the idea as well
+    skew_bib = parse.zettel_path("woodturning/tools/skew").with_suffix(".bib")
+    with open(skew_bib) as f:
+        entry = f.read().split("@misc{")[-1]
+    with open(parse.zettel_path("idea").with_suffix(".bib"), "a") as f:
+        f.write("@misc{" + entry)
+
+    with open(parse.zettel_path("woodturning/tools/chisel"), "a") as f:
+        f.write("\nSee [[file:../gouge/gouge.org][gouge]].\n")
+    return kasten
+
+
+def test_delete_zettels(kasten):
+    """Test deleting zettels including their entries and sources."""
+    pdfs = os.path.join(defaults.location, defaults.sources_directory, "pdfs")
+    kasten_index = index.ZettelIndex.build()
+    kasten_index.save()
+
+    deletion = delete.delete_zettels(
+        ["woodturning/tools/skew", "woodturning/tools/gouge"],
+        index=kasten_index,
+    )
+    assert deletion.zettels == [
+        "woodturning/tools/gouge",
+        "woodturning/tools/skew",
+    ]
+    assert deletion.entries == ["gouge_2021_p1"]
+    assert deletion.sources == [os.path.join(pdfs, "gouge_manual.pdf")]
+    assert deletion.linking == ["woodturning/tools/chisel"]
+
+    assert not parse.zettel_path("woodturning/tools/skew").parent.exists()
+    assert not os.path.exists(os.path.join(pdfs, "gouge_manual.pdf"))
+    # still cited by the idea
+    assert os.path.isfile(os.path.join(pdfs, "skew_manual.pdf"))
+    assert "skew_2021_p1" in main_bib_keys()
+    assert "gouge_2021_p1" not in main_bib_keys()
+    assert "pdf_2021_p2" in main_bib_keys()
+
+    # the passed index follows the deletion
+    assert kasten_index.zettels == index.ZettelIndex.build().zettels
+    assert kasten_index.sources == index.ZettelIndex.build().sources
+    # and so does the persisted one
+    assert index.ZettelIndex.load().zettels == kasten_index.zettels
+    assert index.ZettelIndex.load().stale_paths() == []
+
+    deletion = delete.delete_zettels(["idea"])
+    assert deletion.entries == ["skew_2021_p1"]
+    assert deletion.sources == [os.path.join(pdfs, "skew_manual.pdf")]
+
+
+def test_delete_missing_zettel(kasten):
+    """Test deleting nothing if any of the zettels is missing."""
+    with pytest.raises(FileNotFoundError):
+        delete.delete_zettels(["woodturning/tools/skew", "missing"])
+    assert parse.zettel_path("woodturning/tools/skew").exists()
+
+
+def test_failed_bib_rewrite(kasten, monkeypatch):
+    """Test restoring the zettels if rewriting the bibliography fails."""
+
+    def write_atomically(path, content):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(delete.edit, "write_atomically", write_atomically)
+    with pytest.raises(OSError):
+        delete.delete_zettels(["woodturning/tools/gouge"])
+
+    assert parse.zettel_path("woodturning/tools/gouge").is_file()
+    assert "gouge_2021_p1" in main_bib_keys()
+    tools = parse.zettel_path("woodturning/tools/gouge").parent.parent
+    assert sorted(os.listdir(tools)) == ["chisel", "gouge", "skew"]
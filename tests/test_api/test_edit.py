@@ -0,0 +1,87 @@
+"""Module for testing bulk editing of zettel headers."""
+import pytest
+
+from zettelkasten import edit
+from zettelkasten import index
+from zettelkasten import parse
+
+
+def header(name):
+    """Header attributes of zettel name."""
+    with open(parse.zettel_path(name)) as f:
+        return parse.org_attributes(f.read().splitlines())
+
+
+@pytest.fixture
+def zettels():
+    """Two tool zettels and a lobby zettel."""
+    return ["woodturning/tools/chisel", "woodturning/tools/skew", "idea"]
+
+
+@pytest.fixture
+def kasten(kasten):
+    """Zettelkasten whose idea contains a tag line below its header."""
+    with open(parse.zettel_path("idea"), "a") as f:
+        f.write("\n* Idea\n#+Tags: not part of the header\n")
+    return kasten
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_tag_zettels(kasten, processes):
+    """Test adding and removing tags of the selected zettels."""
+    index.ZettelIndex.build().save()
+    names = edit.select(category="woodturning")
+    assert names == ["woodturning/tools/chisel", "woodturning/tools/skew"]
+
+    changed = edit.edit_zettels(
+        names, [("tags", "add", ["#Rework", "#Sharp"])], processes=processes
+    )
+    assert changed == names
+    assert header("woodturning/tools/skew")["tags"] == "['#Rework', '#Sharp']"
+    assert header("idea")["tags"] == "[]"
+
+    changed = edit.edit_zettels(
+        edit.select(pattern="*/*/sk*"),
+        [("tags", "remove", ["#Rework"])],
+        processes=processes,
+    )
+    assert changed == ["woodturning/tools/skew"]
+    assert header("woodturning/tools/skew")["tags"] == "['#Sharp']"
+    assert header("woodturning/tools/chisel")["tags"] == "['#Rework', '#Sharp']"
+
+    # the persisted index follows the edits
+    persisted = index.ZettelIndex.load()
+    assert persisted.stale_paths() == []
+    record = persisted.zettels["woodturning/tools/skew"]
+    assert record["attributes"]["tags"] == "['#Sharp']"
+
+
+def test_set_attribute(kasten):
+    """Test setting an attribute without touching the body."""
+    with open(parse.zettel_path("idea")) as f:
+        before = f.read()
+
+    assert edit.edit_zettels(
+        ["lobby/idea"], [("author", "set", ["Someone Else"])]
+    ) == ["lobby/idea"]
+
+    with open(parse.zettel_path("idea")) as f:
+        after = f.read()
+    assert header("idea")["author"] == "Someone Else"
+    assert after.splitlines()[4:] == before.splitlines()[4:]
+    assert after.count("\n") == before.count("\n")
+
+
+@pytest.mark.parametrize(
+    "edits",
+    [
+        [("uid", "set", ["other"])],
+        [("category", "set", ["other"])],
+        [("unknown", "set", ["value"])],
+        [("tags", "replace", ["#Rework"])],
+    ],
+)
+def test_invalid_edits(kasten, edits):
+    """Test rejecting name attributes, unknown attributes and operations."""
+    with pytest.raises(ValueError):
+        edit.edit_zettels(["lobby/idea"], edits)
@@ -0,0 +1,126 @@
+"""Module for testing the source file type registry."""
+import gzip
+import os
+
+import pytest
+
+from zettelkasten import add
+from zettelkasten import defaults
+from zettelkasten import filetypes
+from zettelkasten import metadata
+
+
+def test_extension_type():
+    """Test inferring types by case insensitive extensions."""
+    assert filetypes.extension_type("Manual.PDF") == "pdfs"
+    assert filetypes.extension_type("chisel.Jpeg") == "images"
+    assert filetypes.extension_type("download") is None
+    assert filetypes.extension_type("notes.unknown") is None
+
+
+def test_compound_extension():
+    """Test compound archive extensions taking precedence."""
+    assert filetypes.extension_type("backup.2021.tar.gz") == "archives"
+    assert filetypes.extension_type("Backup.TGZ") == "archives"
+    assert filetypes.extension_type("backup.2021") is None
+    assert filetypes.file_name("backup", "archives") == "backup.tar.gz"
+    assert filetypes.file_name("backup.2021.tar.gz", "archives") == (
+        "backup.2021.tar.gz"
+    )
+
+
+def test_sniff_type(tmp_path):
+    """Test identifying extensionless files by their content."""
+    download = tmp_path / "download"
+    with open("tests/bib_sources/test_pdf.pdf", "rb") as f:
+        download.write_bytes(f.read())
+    assert filetypes.infer_file_type(download) == "pdfs"
+    assert filetypes.infer_file_type(download, sniff=False) is None
+
+    for magic in [b"\x1f\x8b\x08", b"PK\x03\x04", b"\xfd7zXZ\x00"]:
+        archive = tmp_path / "archive"
+        archive.write_bytes(magic + bytes(32))
+        assert filetypes.infer_file_type(archive) == "archives"
+
+    unknown = tmp_path / "unknown"
+    unknown.write_bytes(b"plain text")
+    assert filetypes.infer_file_type(unknown) is None
+    assert filetypes.infer_file_type(tmp_path / "missing") is None
+
+
+@pytest.fixture
+def zettels():
+    """A single zettel."""
+    return ["woodturning/tools/chisel"]
+
+
+def test_new_extensionless_source(kasten, tmp_path):
+    """Test storing an extensionless pdf with the registered extension."""
+    download = tmp_path / "download"
+    with open("tests/bib_sources/test_pdf.pdf", "rb") as f:
+        download.write_bytes(f.read())
+
+    add.new_source(
+        "woodturning/tools/chisel", os.fspath(download), "chisel_2021_p1"
+    )
+    pdfs = os.path.join(defaults.location, defaults.sources_directory, "pdfs")
+    assert os.path.isfile(os.path.join(pdfs, "download.pdf"))
+
+
+def test_custom_handler(kasten, tmp_path, monkeypatch):
+    """Test ingesting a type using its registered handler."""
+    ingested = list()
+
+    def handler(source_file, destination):
+        ingested.append(os.path.basename(destination))
+        filetypes.copy_source(source_file, destination)
+
+    monkeypatch.setitem(filetypes.handlers, "pdfs", handler)
+    source = tmp_path / "manual.pdf"
+    with open("tests/bib_sources/test_pdf.pdf", "rb") as f:
+        source.write_bytes(f.read())
+
+    add.new_source(
+        "woodturning/tools/chisel", os.fspath(source), "chisel_2021_p1"
+    )
+    assert ingested == ["manual.pdf"]
+
+
+def test_new_archive_source(kasten, tmp_path):
+    """Test ingesting compressed archives with and without extension."""
+    tarball = tmp_path / "lathe-plans.tar.gz"
+    with gzip.open(tarball, "wb") as f:
+        f.write(b"plans")
+    download = tmp_path / "download"
+    download.write_bytes(tarball.read_bytes())
+
+    add.new_source("woodturning/tools/chisel", os.fspath(tarball), "plans_2021")
+    add.new_source(
+        "woodturning/tools/chisel", os.fspath(download), "download_2021"
+    )
+    archives = os.path.join(
+        defaults.location, defaults.sources_directory, "archives"
+    )
+    assert sorted(os.listdir(archives)) == [
+        "download.tar.gz",
+        "lathe-plans.tar.gz",
+    ]
+
+
+def test_metadata_handlers(kasten, tmp_path):
+    """Test copying pdfs, images, audio and video files with metadata."""
+    for ftype in ["pdfs", "images", "audios", "videos"]:
+        assert filetypes.handlers[ftype] is filetypes.copy_with_metadata
+
+    # an image not stored yet
+    source = tmp_path / "lathe.jpg"
+    with open("tests/bib_sources/test_image.jpg", "rb") as f:
+        source.write_bytes(f.read() + b"\0")
+
+    metadata.shutdown()
+    cached = len(metadata.load_cache(kasten))
+    destination = kasten / defaults.sources_directory / "images" / "lathe.jpg"
+    filetypes.ingest(source, destination, "images")
+    metadata.shutdown()
+    assert destination.is_file()
+    assert len(metadata.load_cache(kasten)) == cached + 1
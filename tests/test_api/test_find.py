@@ -0,0 +1,77 @@
+"""Module for testing the fuzzy zettel finder."""
+import random
+
+from zettelkasten import add
+from zettelkasten import defaults
+from zettelkasten import find
+from zettelkasten import initialize
+
+
+def test_ranking():
+    """Test ranking against scoring each name on its own."""
+    rng = random.Random(0)
+    words = ["wood", "turning", "tools", "chisel", "skew", "gouge", "notes"]
+    names = sorted(
+        "/".join(rng.choice(words) for _ in range(3)) + f"_{i}"
+        for i in range(2000)
+    )
+    finder = find.Finder(names)
+
+    for query in [
+        "chsl",
+        "wood",
+        "t",
+        "gouge_1",
+        "Skew",
+        "xyz",
+        "tls/sk",
+        "wtgouge",
+        "notes/tools/w",
+    ]:
+        expected = sorted(
+            (
+                (find.score(name, query), -i)
+                for i, name in enumerate(names)
+                if find.score(name, query) is not None
+            ),
+            reverse=True,
+        )[:10]
+        assert finder.ranked(query) == [
+            (score, names[-i]) for score, i in expected
+        ]
+
+    assert finder.find("") == names[:10]
+    assert len(finder.find("_", limit=None)) == len(names)
+
+
+def test_scoring():
+    """Test the alignment preferences."""
+    # consecutive beats spread out
+    assert find.score("lobby/chisel", "chis") > find.score(
+        "lobby/c_h_i_s", "chis"
+    )
+    # start of a name part beats the middle
+    assert find.score("tools/skew", "skew") > find.score("tools/askew", "skew")
+    # smart case
+    assert find.score("tools/skew", "Skew") is None
+    assert find.score("tools/Skew", "skew") is not None
+    assert find.max_score("skew") == find.score("tools/skew", "skew")
+
+
+def test_find_zettels(tmp_path, monkeypatch):
+    """Test finding the zettels of a zettelkasten."""
+    monkeypatch.setattr(defaults, "location", tmp_path / "zettelkasten")
+    initialize.structure_zettelkasten()
+    for zettel in [
+        "woodturning/tools/chisel",
+        "woodturning/tools/skew",
+        "carpentry/tools/plane",
+        "my_zettel",
+    ]:
+        add.new_zettel(zettel)
+
+    assert find.find_zettels("wtchsl") == ["woodturning/tools/chisel"]
+    assert find.find_zettels("tools", limit=2) == [
+        "carpentry/tools/plane",
+        "woodturning/tools/chisel",
+    ]
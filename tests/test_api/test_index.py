@@ -0,0 +1,259 @@
+"""Module for testing the zettelkasten index."""
+import os
+import shutil
+
+import pytest
+
+from zettelkasten import add
+from zettelkasten import compile
+from zettelkasten import defaults
+from zettelkasten import index
+
+
+def test_index_building(kasten):
+    """Test the index matching the compiled zettels."""
+    zettel_index = index.ZettelIndex.build()
+
+    assert zettel_index.names() == compile.parsed_zettels()
+    assert list(zettel_index.tree()) == compile.parsed_zettels()
+
+    record = zettel_index.zettels["woodturning/tools/chisel"]
+    assert record["attributes"]["uid"] == "chisel"
+    assert record["attributes"]["subcategory"] == "tools"
+    assert "pdf_2021_p2" in record["bib"]
+    assert "pdf_2021_p2" in zettel_index.sources
+
+
+def test_incremental_refresh(kasten):
+    """Test applying single changes to the index."""
+    zettel_index = index.ZettelIndex.build()
+
+    # new zettel
+    add.new_zettel("woodturning/tools/gouge")
+    assert "woodturning/tools/gouge" not in zettel_index.tree()
+    assert zettel_index.refresh(kasten / "woodturning" / "tools" / "gouge")
+    assert "woodturning/tools/gouge" in zettel_index
+    assert "woodturning/tools/gouge" in zettel_index.tree()
+
+    # deleted zettel
+    shutil.rmtree(kasten / "lobby" / "my_zettel")
+    assert zettel_index.refresh(kasten / "lobby" / "my_zettel")
+    assert "lobby/my_zettel" not in zettel_index
+
+    # deleted category
+    shutil.rmtree(kasten / "carpentry")
+    assert zettel_index.refresh(kasten / "carpentry")
+    assert "carpentry/tools/plane" not in zettel_index
+
+    # unrelated files are ignored
+    assert not zettel_index.refresh(kasten / defaults.index_file)
+    assert not zettel_index.refresh(kasten / "_sources" / "pdfs" / "x.pdf")
+
+    assert zettel_index.names() == compile.parsed_zettels()
+
+
+def test_index_persistence(kasten):
+    """Test saving, loading and the hot index detection."""
+    zettel_index = index.ZettelIndex.build()
+    zettel_index.save()
+
+    loaded = index.ZettelIndex.load()
+    assert loaded.zettels == zettel_index.zettels
+    assert loaded.sources == zettel_index.sources
+
+    # no watcher running
+    assert index.load_hot() is None
+
+    with open(os.path.join(kasten, index.pid_file), "w") as f:
+        f.write(str(os.getpid()))
+    assert index.watcher_pid() == os.getpid()
+    assert index.load_hot().names() == zettel_index.names()
+    assert index.zettel_names() == zettel_index.names()
+    assert list(index.zettel_tree()) == zettel_index.names()
+
+
+def test_selection(kasten):
+    """Test filtering, sorting and paginating zettel names."""
+    add.new_zettel("wood/tools/saw")
+    zettel_index = index.ZettelIndex.build()
+    assert zettel_index.mapping() == compile.zettel_mapping()
+
+    assert zettel_index.select(category="wood") == ["wood/tools/saw"]
+    assert zettel_index.select(category="wood*", subcategory="tools") == [
+        "wood/tools/saw",
+        "woodturning/tools/chisel",
+        "woodturning/tools/skew",
+    ]
+    assert zettel_index.select(category="lobby") == ["lobby/my_zettel"]
+    assert zettel_index.select(subcategory="tool") == []
+
+    names = zettel_index.names()
+    assert zettel_index.select(offset=1, limit=2) == names[1:3]
+    assert zettel_index.select(reverse=True, limit=1) == names[-1:]
+
+    os.utime(kasten / "lobby" / "my_zettel" / "my_zettel.org", (0, 0))
+    zettel_index.refresh(kasten / "lobby" / "my_zettel" / "my_zettel.org")
+    assert zettel_index.select(sort="mtime", limit=1) == ["lobby/my_zettel"]
+
+    with pytest.raises(ValueError):
+        zettel_index.select(sort="size")
+
+    # fallback without a running watcher
+    assert index.select_zettels(category="wood*", subcategory="tools") == [
+        "wood/tools/saw",
+        "woodturning/tools/chisel",
+        "woodturning/tools/skew",
+    ]
+    assert index.select_zettels(sort="mtime", limit=1) == ["lobby/my_zettel"]
+
+
+def test_confined_selection(kasten, monkeypatch):
+    """Test exact category filters only scanning the category's folder."""
+    monkeypatch.setattr(compile, "zettel_mapping", None)
+    monkeypatch.setattr(index.ZettelIndex, "build", None)
+
+    assert index.select_zettels(category="woodturning") == [
+        "woodturning/tools/chisel",
+        "woodturning/tools/skew",
+    ]
+    assert index.select_zettels(
+        category="woodturning", subcategory="tools", sort="doc", limit=1
+    ) == ["woodturning/tools/chisel"]
+    assert index.select_zettels(category="woodturning", subcategory="t*") == [
+        "woodturning/tools/chisel",
+        "woodturning/tools/skew",
+    ]
+    assert index.select_zettels(category="lobby", sort="mtime") == [
+        "lobby/my_zettel"
+    ]
+    assert index.select_zettels(category="lobby", subcategory="tools") == []
+    assert index.select_zettels(category="wood", sort="mtime") == []
+    assert index.select_zettels(category="wood", subcategory="tools") == []
+
+
+def test_citations(kasten, tmp_path):
+    """Test looking up the zettels citing a key and the keys of a zettel."""
+    zettel_index = index.ZettelIndex.build()
+    assert zettel_index.cited_by("pdf_2021_p2") == [
+        "carpentry/tools/plane",
+        "lobby/my_zettel",
+        "woodturning/tools/chisel",
+        "woodturning/tools/skew",
+    ]
+    assert zettel_index.cited_by("unknown_key") == []
+
+    references = zettel_index.references("my_zettel")
+    assert list(references) == [
+        "audio_2021_sec2",
+        "image_2021",
+        "pdf_2021_p2",
+        "video_2021_min42",
+    ]
+    assert references["pdf_2021_p2"].startswith("file://")
+    with pytest.raises(KeyError):
+        zettel_index.references("woodturning/tools/gouge")
+
+    # the reverse index follows refreshes
+    shutil.rmtree(kasten / "carpentry")
+    zettel_index.refresh(kasten / "carpentry")
+    assert "carpentry/tools/plane" not in zettel_index.cited_by("pdf_2021_p2")
+
+
+def test_persisted_citations(kasten, tmp_path):
+    """Test new sources updating the persisted index."""
+    index.ZettelIndex.build().save()
+    source = tmp_path / "skew_manual.pdf"
+    shutil.copy("tests/bib_sources/test_pdf.pdf", source)
+    add.new_source("woodturning/tools/skew", os.fspath(source), "skew_2021")
+
+    assert index.citing_zettels("skew_2021") == ["woodturning/tools/skew"]
+    assert "skew_2021" in index.zettel_references("woodturning/tools/skew")
+    assert (
+        index.ZettelIndex.load()
+        .sources["skew_2021"]
+        .endswith("skew_manual.pdf")
+    )
+
+
+def test_citation_database(kasten, tmp_path, monkeypatch):
+    """Test answering citation lookups without loading the index."""
+    index.persisted_index()
+    assert (kasten / defaults.citation_file).is_file()
+
+    def load(cls, index_file=None):
+        raise AssertionError("loaded the index")
+
+    with monkeypatch.context() as m:
+        m.setattr(index.ZettelIndex, "load", classmethod(load))
+        assert index.citing_zettels("pdf_2021_p2") == [
+            "carpentry/tools/plane",
+            "lobby/my_zettel",
+            "woodturning/tools/chisel",
+            "woodturning/tools/skew",
+        ]
+        references = index.zettel_references("my_zettel")
+        assert list(references)[0] == "audio_2021_sec2"
+        assert references["pdf_2021_p2"].startswith("file://")
+        with pytest.raises(KeyError):
+            index.zettel_references("woodturning/tools/gouge")
+
+    # new sources update the database incrementally
+    source = tmp_path / "skew_manual.pdf"
+    shutil.copy("tests/bib_sources/test_pdf.pdf", source)
+    add.new_source("woodturning/tools/skew", os.fspath(source), "skew_2021")
+    with monkeypatch.context() as m:
+        m.setattr(index.ZettelIndex, "load", classmethod(load))
+        assert index.citing_zettels("skew_2021") == ["woodturning/tools/skew"]
+        references = index.zettel_references("woodturning/tools/skew")
+        assert references["skew_2021"].endswith("skew_manual.pdf")
+
+
+def test_stale_persisted_index(kasten):
+    """Test validating the persisted index against the files' mtimes."""
+    index.ZettelIndex.build().save()
+    assert index.ZettelIndex.load().stale_paths() == []
+
+    # changed, created and deleted behind the persisted index's back
+    with open(kasten / "woodturning/tools/chisel/chisel.bib", "a") as f:
+        f.write("@misc{chisel_2021,\n  url = {https://chisel.org},\n}%\n")
+    os.utime(kasten / "woodturning/tools/chisel/chisel.bib", (0, 0))
+    shutil.rmtree(kasten / "carpentry")
+    add.new_zettel("idea")
+
+    assert sorted(index.ZettelIndex.load().stale_paths()) == [
+        os.fspath(kasten / "carpentry/tools/plane"),
+        os.fspath(kasten / "lobby/idea"),
+        os.fspath(kasten / "woodturning/tools/chisel"),
+    ]
+    assert index.citing_zettels("chisel_2021") == ["woodturning/tools/chisel"]
+    assert index.persisted_index().names() == compile.parsed_zettels()
+    assert index.ZettelIndex.load().stale_paths() == []
+
+
+def test_trusted_persisted_index(kasten, monkeypatch):
+    """Test trusting the persisted index until the top level folder changed."""
+    index.persisted_index()
+    bib_file = kasten / "woodturning/tools/chisel/chisel.bib"
+    with open(bib_file, "a") as f:
+        f.write("@misc{chisel_2021,\n  url = {https://chisel.org},\n}%\n")
+
+    def stale_paths(self):
+        raise AssertionError("validated a trusted index")
+
+    with monkeypatch.context() as m:
+        m.setattr(index.ZettelIndex, "stale_paths", stale_paths)
+        assert index.citing_zettels("chisel_2021") == []
+
+    # edits outside of zk are picked up on demand
+    assert index.citing_zettels("chisel_2021", refresh=True) == [
+        "woodturning/tools/chisel"
+    ]
+
+    # new categories are picked up by the top level folder's mtime
+    (kasten / "turning" / "tools" / "gouge").mkdir(parents=True)
+    with open(kasten / "turning" / "tools" / "gouge" / "gouge.org", "w") as f:
+        f.write("#+Title: gouge\n")
+    # coarse file system timestamps may date the change as the validation
+    mtime = os.stat(kasten / defaults.index_file).st_mtime_ns + 10**6
+    os.utime(kasten, ns=(mtime, mtime))
+    assert "turning/tools/gouge" in index.persisted_index()
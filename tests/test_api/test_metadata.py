@@ -0,0 +1,154 @@
+"""Module for testing the source metadata extraction."""
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from zettelkasten import add
+from zettelkasten import defaults
+from zettelkasten import initialize
+from zettelkasten import metadata
+
+
+def test_extract_sources():
+    """Test extracting the metadata of the test sources."""
+    assert metadata.extract("tests/bib_sources/test_pdf.pdf") == {
+        "pages": 8,
+        "date": "2016-07-20",
+    }
+    assert metadata.extract("tests/bib_sources/test_image.jpg") == {
+        "width": 3800,
+        "height": 2534,
+    }
+    audio = metadata.extract("tests/bib_sources/test_audio.mp3")
+    assert audio["title"] == "Impact Moderato"
+    assert audio["author"] == "Kevin MacLeod"
+    assert audio["duration"] == pytest.approx(27.25)
+
+
+@pytest.mark.parametrize(
+    "content, expected",
+    [
+        (
+            b"\x89PNG\r\n\x1a\n"
+            + b"\x00\x00\x00\rIHDR"
+            + struct.pack(">II", 640, 480),
+            {"width": 640, "height": 480},
+        ),
+        (b"GIF89a" + struct.pack("<HH", 32, 16), {"width": 32, "height": 16}),
+        (
+            b"RIFF\x00\x00\x00\x00WAVE"
+            + b"fmt "
+            + struct.pack("<IHHIIHH", 16, 1, 1, 8000, 16000, 2, 16)
+            + b"data"
+            + struct.pack("<I", 48000),
+            {"duration": 3.0},
+        ),
+        (
+            struct.pack(">I4s", 16, b"ftyp")
+            + b"isom\x00\x00\x00\x00"
+            + struct.pack(">I4s", 40, b"moov")
+            + struct.pack(">I4s", 32, b"mvhd")
+            + struct.pack(">IIIII", 0, 0, 0, 1000, 90500)
+            + b"\x00" * 4,
+            {"duration": 90.5},
+        ),
+        (b"plain text", {}),
+        (b"%PDF-1.7 truncated", {}),
+        (b"\x89PNG\r\n\x1a\n", {}),
+    ],
+)
+def test_extract_headers(tmp_path, content, expected):
+    """Test extracting metadata from the file headers."""
+    path = tmp_path / "source"
+    path.write_bytes(content)
+    assert metadata.extract(path) == expected
+
+
+def test_cached_metadata(tmp_path, monkeypatch):
+    """Test looking up files by their size, mtime and first bytes."""
+    copy = tmp_path / "copy.pdf"
+    shutil.copy2("tests/bib_sources/test_pdf.pdf", copy)
+    found = metadata.cached_metadata(
+        "tests/bib_sources/test_pdf.pdf", location=tmp_path
+    )
+    assert os.path.isfile(tmp_path / defaults.metadata_cache_file)
+    assert list(metadata.load_cache(tmp_path).values()) == [found]
+
+    def extract(path):
+        raise AssertionError("cached metadata extracted again")
+
+    monkeypatch.setattr(metadata, "extract", extract)
+    assert metadata.cached_metadata(copy, location=tmp_path) == found
+    assert metadata.cached_metadata(tmp_path / "missing") == {}
+
+    # changed files are extracted again
+    os.utime(copy, (0, 0))
+    with pytest.raises(AssertionError):
+        metadata.cached_metadata(copy, location=tmp_path)
+
+
+def test_submit(tmp_path, monkeypatch):
+    """Test warming the cache in the background when adding sources."""
+    monkeypatch.setattr(defaults, "location", tmp_path / "zettelkasten")
+    initialize.structure_zettelkasten()
+    add.new_zettel("woodturning/tools/chisel")
+    add.new_source(
+        "woodturning/tools/chisel",
+        "tests/bib_sources/test_audio.mp3",
+        "chisel_2021_min1",
+    )
+    metadata.shutdown()
+    cache = metadata.load_cache()
+    stored = os.path.join(
+        defaults.location,
+        defaults.sources_directory,
+        "audios",
+        "test_audio.mp3",
+    )
+    assert cache[metadata.cache_key(stored)]["title"] == "Impact Moderato"
+
+    future = metadata.submit("tests/bib_sources/test_pdf.pdf")
+    assert metadata.bib_defaults(future.result()) == {
+        "year": "2016",
+        "date": "2016-07-20",
+    }
+
+
+def test_exit_with_pending_extractions(tmp_path):
+    """Test pending extractions not delaying the exit of the interpreter."""
+    script = (
+        "import time\n"
+        "from zettelkasten import metadata\n"
+        "metadata.cached_metadata = lambda *args: time.sleep(60)\n"
+        "for _ in range(3):\n"
+        f"    metadata.submit('tests/bib_sources/test_pdf.pdf', '{tmp_path}')\n"
+    )
+    subprocess.run([sys.executable, "-c", script], check=True, timeout=30)
+
+
+def test_bounded_shutdown(tmp_path, monkeypatch):
+    """Test waiting a bounded time for pending extractions."""
+    release = threading.Event()
+    monkeypatch.setattr(
+        metadata, "cached_metadata", lambda *args: release.wait(10)
+    )
+    futures = [
+        metadata.submit("tests/bib_sources/test_pdf.pdf", tmp_path)
+        for _ in range(metadata.max_workers + 1)
+    ]
+    while not all(f.running() for f in futures[:-1]):
+        time.sleep(0.01)
+    start = time.perf_counter()
+    metadata.shutdown(timeout=0.2)
+    assert time.perf_counter() - start < 5
+    assert futures[-1].cancelled()
+
+    release.set()
+    metadata.shutdown()
+    assert all(f.result() for f in futures[:-1])
@@ -0,0 +1,156 @@
+"""Module for testing folder layout migrations."""
+import os
+
+import pytest
+
+from zettelkasten import add
+from zettelkasten import check
+from zettelkasten import compile as comp
+from zettelkasten import defaults
+from zettelkasten import index
+from zettelkasten import migrate
+from zettelkasten import parse
+from zettelkasten import sources
+
+
+def append_link(name, target):
+    """Append a relative org link from zettel name to zettel target."""
+    org_file = parse.zettel_path(name)
+    link = os.path.relpath(parse.zettel_path(target), org_file.parent)
+    with open(org_file, "a") as f:
+        f.write(f"\nSee [[file:{link}][{target}]].\n")
+
+
+def resolved_links(name):
+    """Absolute org files linked by zettel name."""
+    org_file = parse.zettel_path(name)
+    with open(org_file) as f:
+        links = parse.org_file_links(f.read())
+    return [os.path.normpath(org_file.parent / link) for link in links]
+
+
+@pytest.fixture
+def zettels(monkeypatch):
+    """A sorted zettel and two zettels inside the unsharded lobby."""
+    monkeypatch.setattr(defaults, "lobby_shard_width", 0)
+    return ["woodturning/tools/chisel", "idea", "other_idea"]
+
+
+@pytest.fixture
+def kasten(kasten):
+    """Zettelkasten holding linked lobby and sorted zettels."""
+    append_link("woodturning/tools/chisel", "idea")
+    append_link("idea", "other_idea")
+    append_link("idea", "woodturning/tools/chisel")
+    return kasten
+
+
+def test_shard_lobby(kasten):
+    """Test sharding and unsharding the lobby."""
+    mapping = comp.zettel_mapping()
+    zettels = index.ZettelIndex.build().zettels
+    index.ZettelIndex.build().save()
+
+    assert migrate.shard_lobby(2) == ["lobby/idea", "lobby/other_idea"]
+    assert defaults.lobby_shard_width == 2
+
+    idea = parse.zettel_path("idea")
+    assert idea.is_file()
+    assert idea.parent.parent.name == parse.lobby_shard("idea", 2)
+    assert comp.zettel_mapping() == mapping
+    sharded = index.ZettelIndex.build()
+    assert sorted(sharded.zettels) == sorted(zettels)
+    assert sharded.backlinks("lobby/idea") == ["woodturning/tools/chisel"]
+    assert index.ZettelIndex.load().zettels == sharded.zettels
+
+    # links keep resolving in both directions
+    assert resolved_links("woodturning/tools/chisel") == [
+        os.path.normpath(idea)
+    ]
+    assert resolved_links("idea") == [
+        os.path.normpath(parse.zettel_path("other_idea")),
+        os.path.normpath(parse.zettel_path("woodturning/tools/chisel")),
+    ]
+
+    # the sharded layout is used transparently
+    add.new_zettel("new_idea")
+    assert parse.zettel_path("new_idea").is_file()
+    assert "lobby/new_idea" in comp.parsed_zettels()
+    sharded.refresh(parse.zettel_path("new_idea").parent.parent)
+    assert "lobby/new_idea" in sharded
+    assert list(check.check(processes=1)) == []
+
+    assert "lobby/idea" in migrate.shard_lobby(0)
+    assert parse.zettel_path("idea").parent.parent.name == "lobby"
+    assert sorted(os.listdir(os.path.join(defaults.location, "lobby"))) == [
+        "idea",
+        "new_idea",
+        "other_idea",
+    ]
+    assert resolved_links("woodturning/tools/chisel") == [
+        os.path.normpath(parse.zettel_path("idea"))
+    ]
+
+
+def test_invalid_shard_width(kasten):
+    """Test rejecting shard widths beyond the checksum's digits."""
+    with pytest.raises(ValueError):
+        migrate.shard_lobby(9)
+
+
+def source_urls():
+    """Url fields of the zettelkasten's and the chisel's bibliography."""
+    urls = list()
+    for bib_file in [
+        os.path.join(
+            defaults.location,
+            defaults.sources_directory,
+            defaults.zettelkasten_bib_file,
+        ),
+        parse.zettel_path("woodturning/tools/chisel").with_suffix(".bib"),
+    ]:
+        with open(bib_file) as f:
+            urls.extend(
+                entry.fields["url"]
+                for entry in parse.bibliography_entries(f.read())
+            )
+    return urls
+
+
+@pytest.mark.parametrize("scheme", ["hash", "date"])
+def test_shard_sources(kasten, monkeypatch, scheme):
+    """Test sharding the sources and rewriting the urls pointing to them."""
+    monkeypatch.setattr(defaults, "source_sharding", "flat")
+    pdfs = os.path.join(defaults.location, defaults.sources_directory, "pdfs")
+    flat_pdf = os.path.join(pdfs, "test_pdf.pdf")
+    assert f"file://{os.path.abspath(flat_pdf)}" in source_urls()
+
+    index.ZettelIndex.build().save()
+    moved = migrate.shard_sources(scheme, width=2)
+    assert defaults.source_sharding == scheme
+    sharded_pdf = moved[os.path.join("pdfs", "test_pdf.pdf")]
+    assert os.path.isfile(sharded_pdf)
+    assert not os.path.exists(flat_pdf)
+    assert os.path.dirname(sharded_pdf) != pdfs
+    assert f"file://{sharded_pdf}" in source_urls()
+    assert all(os.path.isfile(url[len("file://") :]) for url in source_urls())
+    assert list(check.check(processes=1)) == []
+    assert sources.collect_garbage() == []
+    persisted = index.ZettelIndex.load()
+    assert persisted.stale_paths() == []
+    assert f"file://{sharded_pdf}" in persisted.sources.values()
+
+    # new sources are added into the shard folders
+    add.new_zettel("woodturning/tools/skew")
+    assert not os.path.exists(flat_pdf)
+
+    migrate.shard_sources("flat")
+    assert os.path.isfile(flat_pdf)
+    assert os.listdir(pdfs) == ["test_pdf.pdf"]
+    assert f"file://{os.path.abspath(flat_pdf)}" in source_urls()
+
+
+def test_unknown_sharding_scheme(kasten):
+    """Test rejecting unknown sharding schemes."""
+    with pytest.raises(ValueError):
+        migrate.shard_sources("size")
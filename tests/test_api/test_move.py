@@ -0,0 +1,102 @@
+"""Module for testing moving zettels."""
+import os
+
+import pytest
+
+from zettelkasten import add
+from zettelkasten import defaults
+from zettelkasten import index
+from zettelkasten import initialize
+from zettelkasten import move
+from zettelkasten import parse
+
+
+def append_link(name, target):
+    """Append a relative org link from zettel name to zettel target."""
+    org_file = parse.zettel_path(name)
+    link = os.path.relpath(parse.zettel_path(target), org_file.parent)
+    with open(org_file, "a") as f:
+        f.write(f"\nSee [[file:{link}::*Usage][{target}]].\n")
+
+
+def resolved_links(name):
+    """Absolute org files linked by zettel name."""
+    org_file = parse.zettel_path(name)
+    with open(org_file) as f:
+        links = parse.org_file_links(f.read())
+    return [os.path.normpath(org_file.parent / link) for link in links]
+
+
+def test_move_zettel(tmp_path, monkeypatch):
+    """Test moving a zettel including its header, files and links."""
+    monkeypatch.setattr(defaults, "location", tmp_path / "zettelkasten")
+    initialize.structure_zettelkasten()
+    for name in ["woodturning/tools/chisel", "woodturning/tools/skew", "idea"]:
+        add.new_zettel(name)
+    append_link("woodturning/tools/chisel", "idea")
+    append_link("idea", "woodturning/tools/skew")
+
+    kasten_index = index.ZettelIndex.build()
+    assert kasten_index.backlinks("lobby/idea") == ["woodturning/tools/chisel"]
+
+    linking = move.move_zettel(
+        "idea", "woodturning/concepts/concept", index=kasten_index
+    )
+    assert linking == ["woodturning/tools/chisel"]
+
+    new_org = parse.zettel_path("woodturning/concepts/concept")
+    assert not parse.zettel_path("idea").parent.exists()
+    assert os.path.isfile(new_org.parent / "concept.bib")
+    with open(new_org) as f:
+        content = f.read()
+    attributes = parse.org_attributes(content.splitlines())
+    assert attributes["uid"] == "concept"
+    assert attributes["category"] == "woodturning"
+    assert attributes["subcategory"] == "concepts"
+    assert "bibliography:concept.bib" in content
+    assert "::*Usage]" in content
+
+    # inbound and outbound links still resolve
+    assert resolved_links("woodturning/tools/chisel") == [
+        os.path.normpath(new_org)
+    ]
+    assert resolved_links("woodturning/concepts/concept") == [
+        os.path.normpath(parse.zettel_path("woodturning/tools/skew"))
+    ]
+
+    # the passed index follows the move
+    assert "lobby/idea" not in kasten_index
+    assert kasten_index.backlinks("woodturning/concepts/concept") == [
+        "woodturning/tools/chisel"
+    ]
+    assert kasten_index.zettels == index.ZettelIndex.build().zettels
+
+    with pytest.raises(FileNotFoundError):
+        move.move_zettel("idea", "elsewhere")
+    with pytest.raises(FileExistsError):
+        move.move_zettel("woodturning/tools/chisel", "woodturning/tools/skew")
+
+
+def test_move_persisted(tmp_path, monkeypatch):
+    """Test moving zettels keeping the persisted index up to date."""
+    monkeypatch.setattr(defaults, "location", tmp_path / "zettelkasten")
+    initialize.structure_zettelkasten()
+    for name in ["woodturning/tools/chisel", "idea"]:
+        add.new_zettel(name)
+    append_link("woodturning/tools/chisel", "idea")
+    index.ZettelIndex.build().save()
+
+    monkeypatch.setattr(
+        index.ZettelIndex,
+        "build",
+        classmethod(lambda *args: pytest.fail("rebuilt the index")),
+    )
+    assert move.move_zettel("idea", "woodturning/ideas/idea") == [
+        "woodturning/tools/chisel"
+    ]
+
+    persisted = index.ZettelIndex.load()
+    assert "lobby/idea" not in persisted
+    assert persisted.backlinks("woodturning/ideas/idea") == [
+        "woodturning/tools/chisel"
+    ]
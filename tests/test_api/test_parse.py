@@ -82,3 +82,39 @@ def test_zettel_path_parsing(zettel, path):
     assert parse.zettel_path(zettel) == concat_path
 
     importlib.reload(defaults)
+
+
+def test_zettel_name_caching(monkeypatch):
+    """Test caching split names per separator and rebuilding the cache."""
+    parse.clear_caches()
+    parse.zettel_name("woodturning/tools/chisel")
+    parse.zettel_name("woodturning/tools/chisel")
+    assert parse._cached_split_name.cache_info().hits == 1
+
+    monkeypatch.setattr(defaults, "name_sep", "_")
+    assert parse.zettel_name("woodturning/tools/chisel").uid == (
+        "woodturning/tools/chisel"
+    )
+
+    # default categories are not cached
+    monkeypatch.setitem(
+        defaults.zettel_meta_attribute_defaults, "category", "inbox"
+    )
+    assert parse.zettel_name("my_zettel").category == "inbox"
+
+    monkeypatch.setattr(defaults, "zettel_name_cache_size", 1)
+    parse.clear_caches()
+    assert parse._cached_split_name.cache_info().maxsize == 1
+    monkeypatch.undo()
+    parse.clear_caches()
+
+
+def test_batch_parsing():
+    """Test parsing names and paths of multiple zettels at once."""
+    names = ["woodturning/tools/chisel", "my_zettel"]
+    assert parse.zettel_names(names) == [
+        parse.zettel_name(name) for name in names
+    ]
+    assert parse.zettel_paths(names) == [
+        parse.zettel_path(name) for name in names
+    ]
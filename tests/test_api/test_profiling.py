@@ -0,0 +1,79 @@
+"""Module for testing the per phase profiling."""
+import json
+import pstats
+
+import pytest
+
+from zettelkasten import compile
+from zettelkasten import defaults
+from zettelkasten import initialize
+from zettelkasten import profiling
+
+
+@pytest.fixture
+def profiled():
+    """Enable profiling for the duration of a test."""
+    profiling.reset()
+    yield profiling
+    profiling.disable()
+    profiling.reset()
+
+
+def test_disabled_phases_are_not_recorded(profiled):
+    """Test phases being ignored while profiling is disabled."""
+    with profiling.phase("test.phase"):
+        pass
+
+    assert profiling.report() == []
+
+
+def test_phase_report(profiled, tmp_path, monkeypatch):
+    """Test nested and decorated phases being aggregated."""
+    monkeypatch.setattr(defaults, "location", tmp_path / "zettelkasten")
+    initialize.structure_zettelkasten()
+
+    profiling.enable()
+    with profiling.phase("test.outer"):
+        compile.parsed_zettels()
+        compile.parsed_zettels()
+    profiling.disable()
+
+    rows = {row["phase"]: row for row in profiling.report()}
+    assert rows["compile.parsed_zettels"]["calls"] == 2
+    assert rows["test.outer"]["calls"] == 1
+    assert (
+        rows["test.outer"]["total"] >= rows["compile.parsed_zettels"]["total"]
+    )
+    assert profiling.report()[0]["phase"] == "test.outer"
+
+
+def test_trace_dump(profiled, tmp_path):
+    """Test dumping the phases as chrome trace."""
+    profiling.enable()
+    with profiling.phase("test.phase"):
+        pass
+    profiling.disable()
+
+    profiling.dump(tmp_path / "trace.json")
+    with open(tmp_path / "trace.json") as f:
+        trace = json.load(f)
+
+    (event,) = trace["traceEvents"]
+    assert event["name"] == "test.phase"
+    assert event["ph"] == "X"
+
+
+def test_pstats_dump(profiled, tmp_path):
+    """Test dumping cProfile statistics."""
+    profiling.enable()
+    with pytest.raises(ValueError):
+        profiling.dump(tmp_path / "profile.prof")
+    profiling.disable()
+    profiling.reset()
+
+    profiling.enable(cprofile=True)
+    sorted(range(100))
+    profiling.disable()
+
+    profiling.dump(tmp_path / "profile.prof")
+    assert pstats.Stats(str(tmp_path / "profile.prof")).total_calls > 0
@@ -0,0 +1,123 @@
+"""Module for testing the resident zettelkasten server."""
+import os
+import socket
+import struct
+import threading
+
+import pytest
+
+from zettelkasten import parse
+from zettelkasten import server
+
+
+@pytest.fixture
+def zettels():
+    """A sorted zettel and a lobby zettel."""
+    return ["woodturning/tools/chisel", "my_zettel"]
+
+
+@pytest.fixture
+def served_kasten(kasten):
+    """Zettelkasten served by a server running in a thread."""
+    stop = threading.Event()
+    ready = threading.Event()
+    thread = threading.Thread(
+        target=server.serve,
+        kwargs={"stop": stop, "ready": ready, "timeout": 0.05},
+    )
+    thread.start()
+    assert ready.wait(5)
+    yield kasten
+    stop.set()
+    thread.join()
+
+
+def test_server_requests(served_kasten):
+    """Test answering list, complete, path, add, ref, cited_by, refs, move
+    and delete requests."""
+    assert server.request("list") == [
+        "lobby/my_zettel",
+        "woodturning/tools/chisel",
+    ]
+    assert server.request("complete", incomplete="wood") == [
+        "woodturning/tools/chisel"
+    ]
+    assert server.request("select", category="lobby", limit=1) == [
+        "lobby/my_zettel"
+    ]
+    assert server.request("find", query="wtchsl") == [
+        "woodturning/tools/chisel"
+    ]
+    assert server.request("stats")["categories"] == {
+        "lobby": 1,
+        "woodturning": 1,
+    }
+    assert server.request("path", name="my_zettel") == os.fspath(
+        parse.zettel_path("my_zettel")
+    )
+
+    server.request("add", name="woodturning/tools/skew")
+    assert server.request("complete", incomplete="woodturning/tools/s") == [
+        "woodturning/tools/skew"
+    ]
+
+    server.request(
+        "ref",
+        zettel_name="woodturning/tools/skew",
+        source_file=os.path.abspath("tests/bib_sources/test_pdf.pdf"),
+        uid="pdf2_2021_p3",
+        locspec="page 3",
+    )
+    with open(served_kasten / "woodturning/tools/skew/skew.bib") as f:
+        assert "pdf2_2021_p3" in f.read()
+    assert server.request("stats")["bib_entries"] == 5
+    assert server.request("cited_by", key="pdf2_2021_p3") == [
+        "woodturning/tools/skew"
+    ]
+    assert "pdf2_2021_p3" in server.request(
+        "refs", name="woodturning/tools/skew"
+    )
+
+    assert server.request("move", name="my_zettel", new_name="a/b/c") == []
+    assert "a/b/c" in server.request("list")
+
+    deletion = server.request("delete", names=["a/b/c"])
+    assert deletion[0] == ["a/b/c"]
+    assert "a/b/c" not in server.request("list")
+
+
+def test_server_errors(served_kasten):
+    """Test reraising server side exceptions inside the client."""
+    with pytest.raises(FileExistsError):
+        server.request("add", name="my_zettel")
+
+    with pytest.raises(ValueError):
+        server.request("remove", name="my_zettel")
+
+
+def test_failing_clients(served_kasten):
+    """Test surviving clients resetting their connection."""
+    for _ in range(3):
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(server.socket_path())
+        client.setsockopt(
+            socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0)
+        )
+        client.sendall(b'{"op": "list"')
+        client.close()
+
+    assert "lobby/my_zettel" in server.request("list")
+
+
+def test_slow_clients(served_kasten):
+    """Test answering requests while another client is still sending."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(server.socket_path())
+        client.sendall(b'{"op": "list"')
+        assert "lobby/my_zettel" in server.request("list", timeout=1)
+
+
+def test_no_server(tmp_path):
+    """Test requesting without a running server."""
+    with pytest.raises(ConnectionError):
+        server.request("list", path=tmp_path / "missing.sock")
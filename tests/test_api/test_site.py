@@ -0,0 +1,154 @@
+"""Module for testing the static html site generation."""
+import os
+
+import zettelkasten.compile
+from zettelkasten import add
+from zettelkasten import defaults
+from zettelkasten import initialize
+from zettelkasten import site
+from zettelkasten import storage
+
+
+def test_zettel_rendering():
+    """Test rendering attributes, headings, links and the bibliography."""
+    org_content = "".join(
+        [
+            "#+Title: chisel \n",
+            "#+Category: woodturning \n",
+            "\n",
+            "* Usage\n",
+            "Sharpen <first>, see [[file:../gouge/gouge.org][gouge]].\n",
+            "\n",
+            "* Bibliography\n\n",
+            "bibliography:chisel.bib",
+        ]
+    )
+    bib_content = "".join(
+        defaults.bibliography_entry(
+            source_file="/tmp/test_pdf.pdf",
+            key="pdf_2021_p2",
+            title="Test PDF",
+        )
+    )
+
+    page = site.render_zettel(org_content, bib_content)
+
+    assert "<title>chisel</title>" in page
+    assert "<dt>Category</dt><dd>woodturning</dd>" in page
+    assert "<h1>Usage</h1>" in page
+    assert "&lt;first&gt;" in page
+    assert '<a href="../gouge/gouge.html">gouge</a>' in page
+    assert '<li id="pdf_2021_p2">' in page
+    assert "bibliography:" not in page
+
+
+def test_incremental_site_building(tmp_path, monkeypatch):
+    """Test only rendering changed zettels and writing index pages."""
+    monkeypatch.setattr(defaults, "location", tmp_path / "zettelkasten")
+    initialize.structure_zettelkasten()
+    for zettel in ["woodturning/tools/chisel", "woodturning/tools/skew"]:
+        add.new_zettel(zettel)
+    add.new_zettel("my_zettel")
+
+    output = tmp_path / "site"
+    summary = site.build_site(output, processes=2)
+    assert summary == {"rendered": 3, "skipped": 0, "removed": 0}
+
+    for page in [
+        "index.html",
+        "lobby/index.html",
+        "lobby/my_zettel/my_zettel.html",
+        "woodturning/index.html",
+        "woodturning/tools/index.html",
+        "woodturning/tools/chisel/chisel.html",
+    ]:
+        assert (output / page).is_file()
+
+    # unchanged zettels are skipped
+    summary = site.build_site(output, processes=1)
+    assert summary == {"rendered": 0, "skipped": 3, "removed": 0}
+
+    # changed zettels are rendered again
+    with open(
+        defaults.location / "lobby" / "my_zettel" / "my_zettel.org", "a"
+    ) as f:
+        f.write("\nChanged content\n")
+    summary = site.build_site(output, processes=1)
+    assert summary == {"rendered": 1, "skipped": 2, "removed": 0}
+    with open(output / "lobby" / "my_zettel" / "my_zettel.html") as f:
+        assert "Changed content" in f.read()
+
+    # pages of removed zettels are deleted
+    zettel_dir = defaults.location / "woodturning" / "tools" / "skew"
+    for f in os.scandir(zettel_dir):
+        os.remove(f.path)
+    os.rmdir(zettel_dir)
+    assert "woodturning/tools/skew" not in zettelkasten.compile.parsed_zettels()
+
+    summary = site.build_site(output, processes=1)
+    assert summary == {"rendered": 0, "skipped": 2, "removed": 1}
+    assert not (output / "woodturning/tools/skew/skew.html").is_file()
+
+
+def test_forced_site_building(tmp_path, monkeypatch):
+    """Test forced builds rendering every zettel and removing stale pages."""
+    monkeypatch.setattr(defaults, "location", tmp_path / "zettelkasten")
+    initialize.structure_zettelkasten()
+    for zettel in ["woodturning/tools/chisel", "woodturning/tools/skew"]:
+        add.new_zettel(zettel)
+
+    output = tmp_path / "site"
+    site.build_site(output, processes=1)
+
+    zettel_dir = defaults.location / "woodturning" / "tools" / "skew"
+    for f in os.scandir(zettel_dir):
+        os.remove(f.path)
+    os.rmdir(zettel_dir)
+
+    summary = site.build_site(output, processes=1, force=True)
+    assert summary == {"rendered": 1, "skipped": 0, "removed": 1}
+    assert not (output / "woodturning/tools/skew/skew.html").is_file()
+
+
+def test_stale_index_pages(tmp_path, monkeypatch):
+    """Test removing index pages of categories gone since the last build."""
+    monkeypatch.setattr(defaults, "location", tmp_path / "zettelkasten")
+    initialize.structure_zettelkasten()
+    add.new_zettel("woodturning/tools/chisel")
+    add.new_zettel("carpentry/tools/plane")
+
+    output = tmp_path / "site"
+    site.build_site(output, processes=1)
+    assert (output / "carpentry/tools/index.html").is_file()
+
+    category_dir = defaults.location / "carpentry"
+    zettel_dir = category_dir / "tools" / "plane"
+    for f in os.scandir(zettel_dir):
+        os.remove(f.path)
+    for folder in [zettel_dir, zettel_dir.parent, category_dir]:
+        os.rmdir(folder)
+
+    summary = site.build_site(output, processes=1)
+    assert summary == {"rendered": 0, "skipped": 1, "removed": 1}
+    assert not (output / "carpentry").exists()
+    assert (output / "woodturning/tools/index.html").is_file()
+    with open(output / "index.html") as f:
+        assert "carpentry" not in f.read()
+
+
+def test_memory_site_building(tmp_path, monkeypatch):
+    """Test rendering a zettelkasten held by another storage backend."""
+    monkeypatch.setattr(defaults, "location", tmp_path / "zettelkasten")
+    output = tmp_path / "site"
+    with storage.using(storage.MemoryBackend()):
+        initialize.structure_zettelkasten()
+        add.new_zettel("woodturning/tools/chisel")
+        add.new_zettel("woodturning/tools/skew")
+        summary = site.build_site(output, processes=2)
+        assert summary == {"rendered": 2, "skipped": 0, "removed": 0}
+        summary = site.build_site(output, processes=2)
+        assert summary == {"rendered": 0, "skipped": 2, "removed": 0}
+
+    assert not os.path.exists(defaults.location)
+    with open(output / "woodturning/tools/chisel/chisel.html") as f:
+        assert "<title>chisel</title>" in f.read()
@@ -0,0 +1,83 @@
+"""Module for testing the source file garbage collection."""
+import datetime
+import os
+
+import pytest
+
+from zettelkasten import add
+from zettelkasten import defaults
+from zettelkasten import initialize
+from zettelkasten import sources
+from zettelkasten import transfer
+
+
+def test_garbage_collection(tmp_path, monkeypatch):
+    """Test finding and deleting unreferenced source files."""
+    location = tmp_path / "zettelkasten"
+    monkeypatch.setattr(defaults, "location", location)
+    initialize.structure_zettelkasten()
+    add.new_zettel("woodturning/tools/chisel")
+
+    assert sources.collect_garbage() == []
+
+    sources_dir = location / defaults.sources_directory
+    with open(sources_dir / "pdfs" / "old.pdf", "wb") as f:
+        f.write(b"x" * 10)
+    with open(sources_dir / "audios" / "old.mp3", "wb") as f:
+        f.write(b"x" * 3)
+
+    orphans = sources.collect_garbage()
+    assert [os.path.basename(orphan.path) for orphan in orphans] == [
+        "old.mp3",
+        "old.pdf",
+    ]
+    assert sources.reclaimable_bytes(orphans) == {
+        "audios": (1, 3),
+        "pdfs": (1, 10),
+    }
+
+    # urls written before moving the zettelkasten still protect their files
+    moved = tmp_path / "moved"
+    os.rename(location, moved)
+    monkeypatch.setattr(defaults, "location", moved)
+    assert len(sources.collect_garbage(delete=True)) == 2
+    assert sources.collect_garbage() == []
+    assert os.path.isfile(
+        moved / defaults.sources_directory / "pdfs" / "test_pdf.pdf"
+    )
+
+
+def test_resumed_date_shard(kasten, tmp_path, monkeypatch):
+    """Test resuming an interrupted copy inside its original date shard."""
+    monkeypatch.setattr(defaults, "source_sharding", "date")
+
+    class February(datetime.date):
+        @classmethod
+        def today(cls):
+            return cls(2020, 2, 3)
+
+    monkeypatch.setattr(datetime, "date", February)
+    source = tmp_path / "manual.pdf"
+    with open("tests/bib_sources/test_pdf.pdf", "rb") as f:
+        source.write_bytes(f.read())
+    stale = kasten / defaults.sources_directory / "pdfs" / "2020" / "01"
+    stale.mkdir(parents=True)
+
+    def interrupt(copied, total):
+        if copied:
+            raise RuntimeError("interrupted")
+
+    with pytest.raises(RuntimeError):
+        transfer.copy_file(source, stale / "manual.pdf", progress=interrupt)
+    # leftovers of interrupted copies are reported as orphans
+    assert sorted(os.listdir(stale)) == [
+        "manual.pdf.partial",
+        "manual.pdf.partial.json",
+    ]
+    assert len(sources.collect_garbage()) == 2
+
+    destination = sources.source_destination(os.fspath(source), "pdfs")
+    assert destination == os.fspath(stale / "manual.pdf")
+    add.new_source("woodturning/tools/chisel", os.fspath(source), "manual")
+    assert os.listdir(stale) == ["manual.pdf"]
+    assert sources.collect_garbage() == []
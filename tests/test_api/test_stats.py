@@ -0,0 +1,57 @@
+"""Module for testing the zettelkasten statistics."""
+import pytest
+
+from zettelkasten import add
+from zettelkasten import defaults
+from zettelkasten import index
+from zettelkasten import initialize
+from zettelkasten import stats
+
+
+def test_kasten_stats(tmp_path, monkeypatch):
+    """Test aggregating zettel and source histograms from the index."""
+    monkeypatch.setattr(defaults, "location", tmp_path / "zettelkasten")
+    initialize.structure_zettelkasten()
+    add.new_zettel("woodturning/tools/chisel", doc="2021-03-14")
+    add.new_zettel("woodturning/tools/skew", doc="2021-03-20")
+    add.new_zettel("woodturning/lathes/bench", doc="2022-01-01")
+    add.new_zettel("my_zettel")
+
+    kasten_index = index.ZettelIndex.build()
+    report = stats.kasten_stats(kasten_index)
+    assert report["zettels"] == 4
+    assert report["categories"] == {"lobby": 1, "woodturning": 3}
+    assert report["subcategories"] == {
+        "woodturning/lathes": 1,
+        "woodturning/tools": 2,
+    }
+    assert report["growth"] == {"2021-03": 2, "2022-01": 1, "None": 1}
+    assert report["references"] == 16
+    assert report["bib_entries"] == 4
+    assert report["sources"] == {
+        "audios": 1,
+        "images": 1,
+        "pdfs": 1,
+        "videos": 1,
+    }
+    assert sum(report["source_bytes"].values()) > 0
+
+    assert stats.kasten_stats(kasten_index, "year")["growth"] == {
+        "2021": 2,
+        "2022": 1,
+        "None": 1,
+    }
+    assert stats.collect("day") == stats.kasten_stats(kasten_index, "day")
+
+    with pytest.raises(ValueError):
+        stats.kasten_stats(kasten_index, "week")
+
+
+def test_persisted_stats(kasten, monkeypatch):
+    """Test collecting the statistics from the persisted index."""
+    report = stats.collect()
+    assert index.ZettelIndex.load() is not None
+
+    monkeypatch.setattr(index.ZettelIndex, "build", None)
+    add.new_zettel("woodturning/lathes/bench")
+    assert stats.collect()["zettels"] == report["zettels"] + 1
@@ -0,0 +1,213 @@
+"""Module for testing the storage backends."""
+import os
+
+import pytest
+
+from zettelkasten import add
+from zettelkasten import compile as comp
+from zettelkasten import defaults
+from zettelkasten import delete
+from zettelkasten import index
+from zettelkasten import initialize
+from zettelkasten import move
+from zettelkasten import stats
+from zettelkasten import storage
+
+
+@pytest.fixture(params=["local", "memory", "sqlite"])
+def backend(request, tmp_path):
+    """Each of the storage backends."""
+    if request.param == "local":
+        yield storage.LocalBackend()
+    elif request.param == "memory":
+        yield storage.MemoryBackend()
+    else:
+        database = storage.SQLiteBackend(tmp_path / "kasten.sqlite", tmp_path)
+        yield database
+        database.close()
+
+
+def test_backend(backend, tmp_path):
+    """Test the operations every backend implements."""
+    folder = tmp_path / "kasten" / "lobby"
+    assert backend.stat(folder) is None
+    backend.makedirs(folder)
+    assert backend.is_dir(folder)
+
+    org_file = folder / "idea.org"
+    backend.write(org_file, "#+Title: idea\n")
+    backend.write(org_file, "* Body\n", append=True)
+    assert backend.read(org_file) == "#+Title: idea\n* Body\n"
+    assert backend.is_file(org_file)
+    assert backend.stat(org_file).size == len("#+Title: idea\n* Body\n")
+
+    backend.copy("tests/bib_sources/test_pdf.pdf", folder / "idea.pdf", "pdfs")
+    assert backend.stat(folder / "idea.pdf").size == os.path.getsize(
+        "tests/bib_sources/test_pdf.pdf"
+    )
+    backend.makedirs(folder / "shard")
+    entries = sorted((e.name, e.is_dir()) for e in backend.list(folder))
+    assert entries == [
+        ("idea.org", False),
+        ("idea.pdf", False),
+        ("shard", True),
+    ]
+
+    with pytest.raises(FileNotFoundError):
+        backend.read(folder / "missing.org")
+    with pytest.raises(FileNotFoundError):
+        backend.list(folder / "missing")
+
+
+def test_memory_zettelkasten(tmp_path, monkeypatch):
+    """Test adding and compiling zettels without touching the disk."""
+    monkeypatch.setattr(defaults, "location", tmp_path / "zettelkasten")
+    with storage.using(storage.MemoryBackend()) as memory:
+        initialize.structure_zettelkasten()
+        add.new_zettel("woodturning/tools/chisel", tags=["#Sharp"])
+        add.new_zettel("idea")
+        with pytest.raises(FileExistsError):
+            add.new_zettel("idea")
+
+        assert comp.zettel_mapping() == {
+            "woodturning": {"tools": ["chisel"]},
+            "lobby": ["idea"],
+        }
+        org_file = tmp_path / "zettelkasten/woodturning/tools/chisel/chisel.org"
+        assert "#+Tags: ['#Sharp']" in memory.read(org_file)
+        main_bib = memory.read(
+            tmp_path
+            / "zettelkasten"
+            / defaults.sources_directory
+            / defaults.zettelkasten_bib_file
+        )
+        assert "pdf_2021_p2" in main_bib
+
+    assert not os.path.exists(defaults.location)
+    assert isinstance(storage.backend, storage.LocalBackend)
+
+
+def test_memory_keeps_local_index(kasten, monkeypatch):
+    """Test zettels added in memory leaving a persisted local index alone."""
+    index.ZettelIndex.build().save()
+    refreshed = list()
+    monkeypatch.setattr(
+        index, "refresh_persisted", lambda *args: refreshed.append(args)
+    )
+    with storage.using(storage.MemoryBackend()):
+        initialize.structure_zettelkasten()
+        add.new_zettel("woodturning/tools/gouge")
+    assert refreshed == []
+
+    add.new_zettel("woodturning/tools/gouge")
+    assert refreshed
+
+
+def test_configured_backend(tmp_path, monkeypatch):
+    """Test selecting the backend by the defaults."""
+    monkeypatch.setattr(defaults, "location", tmp_path / "zettelkasten")
+    assert isinstance(storage.configured_backend(), storage.LocalBackend)
+
+    monkeypatch.setattr(defaults, "storage_backend", "sqlite")
+    database = storage.configured_backend()
+    assert database.database == str(tmp_path / "zettelkasten.sqlite")
+    database.close()
+
+    monkeypatch.setattr(defaults, "database", str(tmp_path / "kasten.db"))
+    database = storage.configured_backend()
+    assert os.path.isfile(tmp_path / "kasten.db")
+    database.close()
+
+    monkeypatch.setattr(defaults, "storage_backend", "cloud")
+    with pytest.raises(ValueError):
+        storage.configured_backend()
+
+
+def tree(folder):
+    """Mapping of the files below folder to their content."""
+    files = dict()
+    for current, _, names in os.walk(folder):
+        for name in names:
+            path = os.path.join(current, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, folder)] = f.read()
+    return files
+
+
+def test_sqlite_round_trip(tmp_path, monkeypatch):
+    """Test importing, using and exporting a SQLite zettelkasten."""
+    location = tmp_path / "zettelkasten"
+    monkeypatch.setattr(defaults, "location", location)
+    initialize.structure_zettelkasten()
+    for name in ["woodturning/tools/chisel", "carpentry/tools/plane", "idea"]:
+        add.new_zettel(name)
+    mapping = comp.zettel_mapping()
+    files = tree(location)
+
+    database = storage.SQLiteBackend(tmp_path / "kasten.sqlite")
+    assert database.import_tree() == len(files)
+    with storage.using(database):
+        assert comp.zettel_mapping() == mapping
+        assert comp.parsed_zettels() == sorted(comp.parsed_zettels())
+        add.new_zettel("woodturning/tools/skew")
+        with pytest.raises(FileExistsError):
+            add.new_zettel("idea")
+
+    assert database.zettels(category="woodturning") == [
+        "woodturning/tools/chisel",
+        "woodturning/tools/skew",
+    ]
+    assert database.zettels(category="lobby") == ["lobby/idea"]
+    assert len(database.zettels(subcategory="tools")) == 3
+
+    exported = tmp_path / "exported"
+    database.export_tree(exported)
+    database.close()
+    exported_files = tree(exported)
+    for path, content in files.items():
+        if path != os.path.join(
+            defaults.sources_directory, defaults.zettelkasten_bib_file
+        ):
+            assert exported_files[path] == content
+    assert os.path.join("woodturning", "tools", "skew", "skew.org") in (
+        exported_files
+    )
+
+    # the database persists across connections
+    reopened = storage.SQLiteBackend(tmp_path / "kasten.sqlite")
+    assert len(reopened.zettels()) == 4
+    reopened.close()
+
+
+def test_sqlite_outside_root(tmp_path):
+    """Test rejecting locations outside of the database's root."""
+    database = storage.SQLiteBackend(tmp_path / "kasten.sqlite", tmp_path)
+    with pytest.raises(ValueError):
+        database.makedirs(tmp_path.parent / "elsewhere")
+    database.close()
+
+
+def test_sqlite_index(tmp_path, monkeypatch):
+    """Test indexing a SQLite zettelkasten and refusing local operations."""
+    location = tmp_path / "zettelkasten"
+    monkeypatch.setattr(defaults, "location", location)
+    database = storage.SQLiteBackend(tmp_path / "kasten.sqlite", tmp_path)
+    with storage.using(database):
+        initialize.structure_zettelkasten()
+        for name in ["woodturning/tools/chisel", "woodturning/tools/skew"]:
+            add.new_zettel(name)
+
+        assert index.select_zettels(sort="doc") == [
+            "woodturning/tools/chisel",
+            "woodturning/tools/skew",
+        ]
+        assert stats.collect()["zettels"] == 2
+        assert "woodturning/tools/skew" in index.citing_zettels("pdf_2021_p2")
+
+        with pytest.raises(RuntimeError, match="local storage backend"):
+            move.move_zettel("woodturning/tools/skew", "woodturning/skew")
+        with pytest.raises(RuntimeError, match="local storage backend"):
+            delete.delete_zettels(["woodturning/tools/skew"])
+    database.close()
+
+    assert not os.path.exists(location)
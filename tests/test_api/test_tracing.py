@@ -0,0 +1,73 @@
+"""Module for testing the structured tracing."""
+import json
+
+import pytest
+
+from zettelkasten import add
+from zettelkasten import defaults
+from zettelkasten import initialize
+from zettelkasten import tracing
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    """Enable tracing into a temporary file for the duration of a test."""
+    path = tmp_path / "trace.jsonl"
+    tracing.enable(path)
+    yield path
+    tracing.disable()
+
+
+def read_records(path):
+    """Read the exported records."""
+    tracing.disable()
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_disabled_tracing(tmp_path):
+    """Test disabled tracing handing out a shared no-op span."""
+    assert not tracing.enabled
+    with tracing.span("test.span", field=object()) as span:
+        span.set(more="fields")
+        tracing.event("test.event")
+
+    assert tracing.span("test.other") is span
+
+
+def test_span_nesting(trace_file):
+    """Test events and spans referencing their enclosing span."""
+    with tracing.span("test.outer", number=1) as outer:
+        with tracing.span("test.inner"):
+            tracing.event("test.event", value=object())
+        outer.set(late="field")
+
+    with pytest.raises(KeyError):
+        with tracing.span("test.failing"):
+            raise KeyError
+
+    event, inner, outer, failing = read_records(trace_file)
+
+    assert event["type"] == "event"
+    assert event["parent"] == inner["id"]
+    assert event["fields"]["value"].startswith("<object")
+    assert inner["parent"] == outer["id"]
+    assert outer["parent"] is None
+    assert outer["fields"] == {"number": 1, "late": "field"}
+    assert outer["dur"] >= inner["dur"]
+    assert failing["fields"]["error"] == "KeyError"
+
+
+def test_traced_operations(trace_file, tmp_path, monkeypatch):
+    """Test the add and parse hot paths being traced."""
+    monkeypatch.setattr(defaults, "location", tmp_path / "zettelkasten")
+    initialize.structure_zettelkasten()
+    add.new_zettel("woodturning/tools/chisel")
+
+    records = read_records(trace_file)
+    (span,) = [r for r in records if r["name"] == "add.new_zettel"]
+    parsed = [r for r in records if r["name"] == "parse.zettel_name"]
+
+    assert span["type"] == "span"
+    assert parsed[0]["parent"] == span["id"]
+    assert parsed[0]["fields"]["uid"] == "chisel"
@@ -0,0 +1,115 @@
+"""Module for testing the chunked, resumable source file copies."""
+import os
+import zlib
+
+import pytest
+
+from zettelkasten import transfer
+
+
+class Interrupt(Exception):
+    """Raised to interrupt a copy."""
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    """Source file spanning multiple chunks."""
+    monkeypatch.setattr(transfer, "chunk_size", 4096)
+    path = tmp_path / "video.mp4"
+    path.write_bytes(os.urandom(5 * 4096 + 123))
+    return path
+
+
+def interrupted_copy(source, destination, chunks):
+    """Copy source to destination, interrupted after a number of chunks."""
+
+    def interrupt(copied, total):
+        if copied >= chunks * transfer.chunk_size:
+            raise Interrupt
+
+    with pytest.raises(Interrupt):
+        transfer.copy_file(source, destination, progress=interrupt)
+
+
+def test_copy_file(source, tmp_path):
+    """Test copying a file including its meta data and reporting progress."""
+    destination = tmp_path / "copy.mp4"
+    reported = list()
+    with transfer.reporting(lambda copied, total: reported.append(copied)):
+        checksum = transfer.copy_file(source, destination)
+
+    content = source.read_bytes()
+    assert destination.read_bytes() == content
+    assert checksum == zlib.adler32(content)
+    assert os.stat(destination).st_mtime == os.stat(source).st_mtime
+    assert reported[0] == 0 and reported[-1] == len(content)
+    assert len(reported) == 7
+    assert sorted(os.listdir(tmp_path)) == ["copy.mp4", "video.mp4"]
+
+
+def test_interrupted_copy(source, tmp_path):
+    """Test never leaving a truncated file at the destination."""
+    destination = tmp_path / "copy.mp4"
+    interrupted_copy(source, destination, 2)
+
+    assert not destination.exists()
+    assert os.path.getsize(transfer.partial_path(destination)) == 2 * 4096
+    assert os.path.isfile(transfer.checkpoint_path(destination))
+
+
+def test_resume(source, tmp_path):
+    """Test resuming an interrupted copy at its offset."""
+    destination = tmp_path / "copy.mp4"
+    interrupted_copy(source, destination, 3)
+
+    reported = list()
+    transfer.copy_file(
+        source, destination, lambda copied, total: reported.append(copied)
+    )
+    assert reported[0] == 3 * 4096
+    assert destination.read_bytes() == source.read_bytes()
+    assert not os.path.exists(transfer.checkpoint_path(destination))
+
+
+def test_restart_corrupted(source, tmp_path):
+    """Test restarting copies whose partial file no longer matches."""
+    destination = tmp_path / "copy.mp4"
+    interrupted_copy(source, destination, 3)
+    with open(transfer.partial_path(destination), "r+b") as f:
+        f.write(b"corrupted")
+
+    reported = list()
+    transfer.copy_file(
+        source, destination, lambda copied, total: reported.append(copied)
+    )
+    assert reported[0] == 0
+    assert destination.read_bytes() == source.read_bytes()
+
+
+def test_restart_changed_source(source, tmp_path):
+    """Test restarting copies whose source changed meanwhile."""
+    destination = tmp_path / "copy.mp4"
+    interrupted_copy(source, destination, 3)
+    source.write_bytes(os.urandom(4096))
+
+    reported = list()
+    transfer.copy_file(
+        source, destination, lambda copied, total: reported.append(copied)
+    )
+    assert reported[0] == 0
+    assert destination.read_bytes() == source.read_bytes()
+
+
+def test_find_interrupted_copy(source, tmp_path):
+    """Test finding interrupted copies by the location of their source."""
+    shards = tmp_path / "shards"
+    destination = shards / "2021" / "07" / "copy.mp4"
+    destination.parent.mkdir(parents=True)
+    interrupted_copy(source, destination, 2)
+
+    candidates = [shards / "2021" / "08" / "copy.mp4", destination]
+    assert transfer.interrupted_copy(source, candidates) == os.fspath(
+        destination
+    )
+    assert transfer.interrupted_copy(tmp_path / "other.mp4", candidates) is None
+    assert transfer.interrupted_copy(source, candidates[:1]) is None
@@ -0,0 +1,79 @@
+"""Module for testing the compact zettel tree."""
+import pytest
+
+from zettelkasten import add
+from zettelkasten import compile
+from zettelkasten import defaults
+from zettelkasten import initialize
+from zettelkasten import parse
+from zettelkasten import tree
+
+
+def test_tree_sequence():
+    """Test the tree behaving like the sorted list of its names."""
+    names = sorted(
+        [
+            "woodturning/tools/chisel",
+            "woodturning/tools/skew",
+            "woodturning/lathes/bench",
+            "wood-carving/knives/hook",
+            "carpentry/tools/chisel",
+            "lobby/my_zettel",
+            "lobby/another_zettel",
+        ]
+    )
+    zettel_tree = tree.ZettelTree.from_names(reversed(names))
+
+    assert list(zettel_tree) == names
+    assert len(zettel_tree) == len(names)
+    assert zettel_tree[-1] == names[-1]
+    assert zettel_tree[1:3] == names[1:3]
+    for i, name in enumerate(names):
+        assert zettel_tree[i] == name
+        assert zettel_tree.index(name) == i
+        assert name in zettel_tree
+        assert zettel_tree.zettel_name(i) == parse.zettel_name(
+            name[len("lobby/") :] if name.startswith("lobby/") else name
+        )
+    assert "woodturning/tools/gouge" not in zettel_tree
+    assert zettel_tree.startswith("woodturning/tools/") == names[-2:]
+
+    # the category and subcategory strings are stored only once
+    assert zettel_tree.categories.count("woodturning") == 1
+    assert zettel_tree.subcategories.count("tools") == 1
+
+    with pytest.raises(IndexError):
+        zettel_tree[len(names)]
+    with pytest.raises(ValueError):
+        tree.ZettelTree.from_names(["too/many/name/parts"])
+
+
+def test_tree_blocks():
+    """Test decoding front coded uids across blocks and folders."""
+    names = [
+        f"{category}/tools/{uid}{i}"
+        for category in ["carpentry", "woodturning"]
+        for uid in ["chisel", "chisel_skew", "gouge_ü", "ß"]
+        for i in range(3 * tree.block_size)
+    ]
+    names = sorted(names + ["lobby/idea", "woodturning/tools/" + "x" * 300])
+    zettel_tree = tree.ZettelTree.from_names(names)
+
+    assert list(zettel_tree) == names
+    assert [zettel_tree[i] for i in range(len(names))] == names
+    assert all(zettel_tree.index(name) == i for i, name in enumerate(names))
+    assert zettel_tree.bisect("") == 0
+    assert zettel_tree.bisect("woodturning/tools/gouge") == names.index(
+        "woodturning/tools/gouge_ü0"
+    )
+    assert zettel_tree.bisect("z") == len(names)
+
+
+def test_zettel_tree(tmp_path, monkeypatch):
+    """Test compiling the tree equivalent to the parsed zettels."""
+    monkeypatch.setattr(defaults, "location", tmp_path / "zettelkasten")
+    initialize.structure_zettelkasten()
+    for name in ["woodturning/tools/chisel", "carpentry/tools/plane", "x"]:
+        add.new_zettel(name)
+
+    assert list(tree.zettel_tree()) == compile.parsed_zettels()
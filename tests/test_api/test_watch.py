@@ -0,0 +1,55 @@
+"""Module for testing the inotify based index watcher."""
+import sys
+import threading
+import time
+
+import pytest
+
+from zettelkasten import add
+from zettelkasten import defaults
+from zettelkasten import index
+from zettelkasten import initialize
+from zettelkasten import watch
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="inotify is linux only"
+)
+
+
+def wait_for(condition, timeout=5):
+    """Poll condition until it is met or timeout seconds passed."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_watcher_updates_index(tmp_path, monkeypatch):
+    """Test the persisted index following zettel additions."""
+    location = tmp_path / "zettelkasten"
+    monkeypatch.setattr(defaults, "location", location)
+    initialize.structure_zettelkasten()
+    add.new_zettel("my_zettel")
+
+    stop = threading.Event()
+    ready = threading.Event()
+    watcher = threading.Thread(
+        target=watch.watch,
+        kwargs={"save_interval": 0.05, "stop": stop, "ready": ready},
+    )
+    watcher.start()
+    try:
+        assert ready.wait(5)
+        assert index.load_hot().names() == ["lobby/my_zettel"]
+
+        add.new_zettel("woodturning/tools/chisel")
+        assert wait_for(lambda: "woodturning/tools/chisel" in index.load_hot())
+    finally:
+        stop.set()
+        watcher.join()
+
+    # pid file and the then stale index are removed on exit
+    assert index.watcher_pid() is None
+    assert not (location / defaults.index_file).exists()